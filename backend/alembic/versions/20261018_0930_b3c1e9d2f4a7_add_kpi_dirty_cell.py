@@ -0,0 +1,40 @@
+"""Add kpi_dirty_cell ledger for incremental KPI refresh
+
+Revision ID: b3c1e9d2f4a7
+Revises: fa4199ad3467
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3c1e9d2f4a7'
+down_revision: Union[str, None] = 'fa4199ad3467'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 登记源数据变更影响的 (门店, 日期)，供增量刷新器认领
+    op.create_table(
+        'kpi_dirty_cell',
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('store_id', sa.Integer(), nullable=False, comment='门店ID'),
+        sa.Column('biz_date', sa.Date(), nullable=False, comment='业务日期'),
+        sa.Column('reason', sa.String(length=50), nullable=True, comment='登记来源（order/expense/import）'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='登记时间'),
+        sa.ForeignKeyConstraint(['store_id'], ['store.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('store_id', 'biz_date', name='uq_kpi_dirty_cell_store_date'),
+        comment='KPI 脏单元登记表'
+    )
+    op.create_index(op.f('ix_kpi_dirty_cell_id'), 'kpi_dirty_cell', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_kpi_dirty_cell_id'), table_name='kpi_dirty_cell')
+    op.drop_table('kpi_dirty_cell')
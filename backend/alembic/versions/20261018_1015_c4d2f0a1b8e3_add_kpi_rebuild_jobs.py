@@ -0,0 +1,100 @@
+"""Add kpi_rebuild_jobs and kpi_rebuild_job_chunks tables
+
+Revision ID: c4d2f0a1b8e3
+Revises: b3c1e9d2f4a7
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d2f0a1b8e3'
+down_revision: Union[str, None] = 'b3c1e9d2f4a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """创建 KPI 重建任务相关表"""
+    
+    # 创建枚举类型（使用 DO 块检查是否存在）
+    op.execute("""
+        DO $$ BEGIN
+            CREATE TYPE kpi_rebuild_job_status AS ENUM ('pending', 'running', 'success', 'fail', 'cancelled');
+        EXCEPTION
+            WHEN duplicate_object THEN null;
+        END $$;
+    """)
+    
+    status_enum = sa.Enum(
+        'pending', 'running', 'success', 'fail', 'cancelled',
+        name='kpi_rebuild_job_status', create_type=False
+    )
+    
+    # 创建 KPI 重建任务表
+    op.create_table(
+        'kpi_rebuild_jobs',
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('start_date', sa.Date(), nullable=False, comment='开始日期'),
+        sa.Column('end_date', sa.Date(), nullable=False, comment='结束日期'),
+        sa.Column('store_id', sa.Integer(), nullable=True, comment='门店ID（为空表示全部门店）'),
+        sa.Column('mode', sa.String(length=20), nullable=False, server_default='bulk', comment='重建模式 (bulk/per_cell)'),
+        sa.Column('status', status_enum, nullable=False, server_default='pending', comment='任务状态'),
+        sa.Column('total_chunks', sa.Integer(), nullable=False, server_default='0', comment='分片总数'),
+        sa.Column('done_chunks', sa.Integer(), nullable=False, server_default='0', comment='已完成分片数'),
+        sa.Column('failed_chunks', sa.Integer(), nullable=False, server_default='0', comment='失败分片数'),
+        sa.Column('total_cells', sa.Integer(), nullable=False, server_default='0', comment='(门店, 日期) 单元总数'),
+        sa.Column('done_cells', sa.Integer(), nullable=False, server_default='0', comment='已重算单元数'),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.text('false'), comment='是否已请求取消'),
+        sa.Column('error_message', sa.Text(), nullable=True, comment='错误信息'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='开始执行时间'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True, comment='结束时间'),
+        sa.Column('created_by_id', sa.Integer(), nullable=True, comment='创建用户ID'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['store_id'], ['store.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['created_by_id'], ['user.id'], ondelete='SET NULL'),
+        comment='KPI 重建任务表'
+    )
+    op.create_index('idx_kpi_rebuild_job_status', 'kpi_rebuild_jobs', ['status'])
+    op.create_index('idx_kpi_rebuild_job_created_at', 'kpi_rebuild_jobs', ['created_at'])
+    
+    # 创建 KPI 重建任务分片表
+    op.create_table(
+        'kpi_rebuild_job_chunks',
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('job_id', sa.Integer(), nullable=False, comment='任务ID'),
+        sa.Column('store_id', sa.Integer(), nullable=False, comment='门店ID'),
+        sa.Column('start_date', sa.Date(), nullable=False, comment='分片开始日期'),
+        sa.Column('end_date', sa.Date(), nullable=False, comment='分片结束日期'),
+        sa.Column('status', status_enum, nullable=False, server_default='pending', comment='分片状态'),
+        sa.Column('cell_count', sa.Integer(), nullable=False, server_default='0', comment='分片单元数'),
+        sa.Column('worker', sa.String(length=100), nullable=True, comment='处理该分片的 worker 标识'),
+        sa.Column('error_message', sa.Text(), nullable=True, comment='错误信息'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='开始时间'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True, comment='结束时间'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['job_id'], ['kpi_rebuild_jobs.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['store_id'], ['store.id'], ondelete='CASCADE'),
+        comment='KPI 重建任务分片表'
+    )
+    op.create_index('idx_kpi_rebuild_chunk_job_status', 'kpi_rebuild_job_chunks', ['job_id', 'status'])
+    op.create_index('idx_kpi_rebuild_chunk_job_store', 'kpi_rebuild_job_chunks', ['job_id', 'store_id'])
+
+
+def downgrade() -> None:
+    """删除 KPI 重建任务相关表"""
+    op.drop_index('idx_kpi_rebuild_chunk_job_store', table_name='kpi_rebuild_job_chunks')
+    op.drop_index('idx_kpi_rebuild_chunk_job_status', table_name='kpi_rebuild_job_chunks')
+    op.drop_table('kpi_rebuild_job_chunks')
+    op.drop_index('idx_kpi_rebuild_job_created_at', table_name='kpi_rebuild_jobs')
+    op.drop_index('idx_kpi_rebuild_job_status', table_name='kpi_rebuild_jobs')
+    op.drop_table('kpi_rebuild_jobs')
+    op.execute("DROP TYPE IF EXISTS kpi_rebuild_job_status")
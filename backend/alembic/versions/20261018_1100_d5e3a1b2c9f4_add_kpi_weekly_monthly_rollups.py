@@ -0,0 +1,117 @@
+"""Add kpi_weekly_store and kpi_monthly_store rollup tables
+
+Revision ID: d5e3a1b2c9f4
+Revises: c4d2f0a1b8e3
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e3a1b2c9f4'
+down_revision: Union[str, None] = 'c4d2f0a1b8e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (字段名, 是否整数, 注释)
+MEASURES = [
+    ('revenue', False, '营业收入（gross）'),
+    ('refund_amount', False, '退款金额'),
+    ('discount_amount', False, '优惠金额'),
+    ('net_revenue', False, '净收入'),
+    ('cost_total', False, '总成本'),
+    ('cost_material', False, '原材料成本'),
+    ('cost_labor', False, '人工成本'),
+    ('cost_rent', False, '租金成本'),
+    ('cost_utilities', False, '水电煤成本'),
+    ('cost_marketing', False, '营销成本'),
+    ('cost_other', False, '其他成本'),
+    ('gross_profit', False, '毛利润'),
+    ('operating_profit', False, '营业利润'),
+    ('order_count', True, '订单数'),
+    ('customer_count', True, '客户数'),
+    ('dine_in_revenue', False, '堂食收入'),
+    ('takeout_revenue', False, '外带收入'),
+    ('delivery_revenue', False, '外卖收入'),
+    ('online_revenue', False, '线上收入'),
+]
+
+
+def _create_rollup_table(table_name: str, period_field: str, period_comment: str,
+                         unique_name: str, table_comment: str) -> None:
+    columns = [
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column(period_field, sa.Date(), nullable=False, comment=period_comment),
+        sa.Column('store_id', sa.Integer(), nullable=True, comment='门店ID（为空表示全品牌汇总）'),
+    ]
+    for name, is_int, comment in MEASURES:
+        if is_int:
+            columns.append(sa.Column(name, sa.Integer(), nullable=False, server_default='0', comment=comment))
+        else:
+            columns.append(sa.Column(name, sa.Numeric(14, 2), nullable=False, server_default='0', comment=comment))
+    columns.extend([
+        sa.Column('day_count', sa.Integer(), nullable=False, server_default='0', comment='汇总的日 KPI 行数'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+    ])
+
+    op.create_table(
+        table_name,
+        *columns,
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['store_id'], ['store.id'], ondelete='CASCADE'),
+        # 全品牌行 store_id 为空，需要 NULLS NOT DISTINCT（PostgreSQL 15+）保证唯一
+        sa.UniqueConstraint(period_field, 'store_id', name=unique_name, postgresql_nulls_not_distinct=True),
+        comment=table_comment
+    )
+    op.create_index(op.f(f'ix_{table_name}_id'), table_name, ['id'], unique=False)
+    op.create_index(op.f(f'ix_{table_name}_{period_field}'), table_name, [period_field], unique=False)
+    op.create_index(op.f(f'ix_{table_name}_store_id'), table_name, ['store_id'], unique=False)
+
+
+def _backfill(table_name: str, period_field: str, trunc_unit: str) -> None:
+    """由现有日 KPI 回填门店行和全品牌行"""
+    measure_names = [name for name, _, _ in MEASURES]
+    insert_cols = ', '.join([period_field, 'store_id', *measure_names, 'day_count'])
+    store_sums = ', '.join(f'SUM({name})' for name in measure_names)
+
+    op.execute(f"""
+        INSERT INTO {table_name} ({insert_cols})
+        SELECT CAST(date_trunc('{trunc_unit}', biz_date) AS DATE), store_id, {store_sums}, COUNT(*)
+        FROM kpi_daily_store
+        GROUP BY CAST(date_trunc('{trunc_unit}', biz_date) AS DATE), store_id
+    """)
+    op.execute(f"""
+        INSERT INTO {table_name} ({insert_cols})
+        SELECT {period_field}, NULL, {store_sums}, SUM(day_count)
+        FROM {table_name}
+        WHERE store_id IS NOT NULL
+        GROUP BY {period_field}
+    """)
+
+
+def upgrade() -> None:
+    _create_rollup_table(
+        'kpi_weekly_store', 'week_start', '周开始日期（周一）',
+        'uq_kpi_weekly_store_week_store', '门店周度 KPI 汇总表'
+    )
+    _create_rollup_table(
+        'kpi_monthly_store', 'month_start', '月份第一天',
+        'uq_kpi_monthly_store_month_store', '门店月度 KPI 汇总表'
+    )
+
+    _backfill('kpi_weekly_store', 'week_start', 'week')
+    _backfill('kpi_monthly_store', 'month_start', 'month')
+
+
+def downgrade() -> None:
+    for table_name, period_field in (('kpi_monthly_store', 'month_start'), ('kpi_weekly_store', 'week_start')):
+        op.drop_index(op.f(f'ix_{table_name}_store_id'), table_name=table_name)
+        op.drop_index(op.f(f'ix_{table_name}_{period_field}'), table_name=table_name)
+        op.drop_index(op.f(f'ix_{table_name}_id'), table_name=table_name)
+        op.drop_table(table_name)
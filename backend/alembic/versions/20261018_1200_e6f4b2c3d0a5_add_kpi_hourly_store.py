@@ -0,0 +1,76 @@
+"""Add kpi_hourly_store table
+
+Revision ID: e6f4b2c3d0a5
+Revises: d5e3a1b2c9f4
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f4b2c3d0a5'
+down_revision: Union[str, None] = 'd5e3a1b2c9f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'kpi_hourly_store',
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('biz_date', sa.Date(), nullable=False, comment='业务日期'),
+        sa.Column('store_id', sa.Integer(), nullable=False, comment='门店ID'),
+        sa.Column('hour', sa.Integer(), nullable=False, comment='小时（0-23，按业务时区）'),
+        sa.Column('revenue', sa.Numeric(12, 2), nullable=False, server_default='0', comment='营业收入'),
+        sa.Column('order_count', sa.Integer(), nullable=False, server_default='0', comment='订单数'),
+        sa.Column('customer_count', sa.Integer(), nullable=False, server_default='0', comment='客户数'),
+        sa.Column('dine_in_revenue', sa.Numeric(12, 2), nullable=False, server_default='0', comment='堂食收入'),
+        sa.Column('takeout_revenue', sa.Numeric(12, 2), nullable=False, server_default='0', comment='外带收入'),
+        sa.Column('delivery_revenue', sa.Numeric(12, 2), nullable=False, server_default='0', comment='外卖收入'),
+        sa.Column('online_revenue', sa.Numeric(12, 2), nullable=False, server_default='0', comment='线上收入'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['store_id'], ['store.id'], ondelete='CASCADE'),
+        sa.UniqueConstraint('biz_date', 'store_id', 'hour', name='uq_kpi_hourly_store_date_store_hour'),
+        sa.CheckConstraint('hour >= 0 AND hour <= 23', name='ck_kpi_hourly_store_hour'),
+        comment='门店小时级 KPI 表'
+    )
+    op.create_index(op.f('ix_kpi_hourly_store_id'), 'kpi_hourly_store', ['id'], unique=False)
+    op.create_index(op.f('ix_kpi_hourly_store_biz_date'), 'kpi_hourly_store', ['biz_date'], unique=False)
+    op.create_index(op.f('ix_kpi_hourly_store_store_id'), 'kpi_hourly_store', ['store_id'], unique=False)
+
+    # 由现有已完成订单回填
+    timezone = settings.kpi_business_timezone.replace("'", "''")
+    op.execute(f"""
+        INSERT INTO kpi_hourly_store (
+            biz_date, store_id, hour, revenue, order_count, customer_count,
+            dine_in_revenue, takeout_revenue, delivery_revenue, online_revenue
+        )
+        SELECT biz_date, store_id, hour,
+               SUM(net_amount), COUNT(*), COUNT(*),
+               SUM(CASE WHEN channel = 'dine_in' THEN net_amount ELSE 0 END),
+               SUM(CASE WHEN channel = 'takeout' THEN net_amount ELSE 0 END),
+               SUM(CASE WHEN channel = 'delivery' THEN net_amount ELSE 0 END),
+               SUM(CASE WHEN channel = 'online' THEN net_amount ELSE 0 END)
+        FROM (
+            SELECT biz_date, store_id, channel, net_amount,
+                   CAST(EXTRACT(HOUR FROM timezone('{timezone}', order_time)) AS INTEGER) AS hour
+            FROM order_header
+            WHERE status = 'completed'
+        ) AS detail
+        GROUP BY biz_date, store_id, hour
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_kpi_hourly_store_store_id'), table_name='kpi_hourly_store')
+    op.drop_index(op.f('ix_kpi_hourly_store_biz_date'), table_name='kpi_hourly_store')
+    op.drop_index(op.f('ix_kpi_hourly_store_id'), table_name='kpi_hourly_store')
+    op.drop_table('kpi_hourly_store')
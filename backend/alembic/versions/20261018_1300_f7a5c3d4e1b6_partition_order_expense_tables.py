@@ -0,0 +1,191 @@
+"""Partition order_header, order_item and expense_record by month on biz_date
+
+Revision ID: f7a5c3d4e1b6
+Revises: e6f4b2c3d0a5
+Create Date: 2026-10-18 13:00:00.000000
+
+说明：
+- 三张表改为按 biz_date 的月度范围分区表，不设默认分区（缺失月份由 partition_service 补建）
+- 分区表的主键/唯一约束必须包含分区键：主键改为 (id, biz_date)，
+  订单号唯一约束改为 (order_no, biz_date)，跨日期的订单号重复由应用层检查
+- order_item 新增 biz_date（与所属订单一致），外键改为 (order_id, biz_date)，
+  明细与订单落在同月分区
+- id 序列保持不变，迁移前后 id 不变
+"""
+from datetime import date
+from typing import Dict, List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.services.partition_service import add_months, iter_months, partition_ddl
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a5c3d4e1b6'
+down_revision: Union[str, None] = 'e6f4b2c3d0a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 表定义：表注释、外键 (列, 引用, ON DELETE)、普通索引列
+TABLES: Dict[str, Dict] = {
+    'order_header': {
+        'comment': '订单主表（按 biz_date 月度分区）',
+        'legacy_comment': '订单主表',
+        'foreign_keys': [
+            ('store_id', 'store (id)', 'RESTRICT'),
+            ('operator_id', '"user" (id)', 'SET NULL'),
+        ],
+        'indexes': ['id', 'biz_date', 'order_no', 'order_time', 'status', 'store_id'],
+    },
+    'order_item': {
+        'comment': '订单明细表（按 biz_date 月度分区）',
+        'legacy_comment': '订单明细表',
+        'foreign_keys': [
+            ('product_id', 'product (id)', 'RESTRICT'),
+        ],
+        'indexes': ['id', 'order_id', 'product_id'],
+    },
+    'expense_record': {
+        'comment': '费用记录表（按 biz_date 月度分区）',
+        'legacy_comment': '费用记录表',
+        'foreign_keys': [
+            ('approved_by', '"user" (id)', 'SET NULL'),
+            ('created_by', '"user" (id)', 'RESTRICT'),
+            ('expense_type_id', 'expense_type (id)', 'RESTRICT'),
+            ('store_id', 'store (id)', 'RESTRICT'),
+        ],
+        'indexes': ['id', 'biz_date', 'created_by', 'expense_type_id', 'invoice_no', 'status', 'store_id'],
+    },
+}
+
+# 订单明细随订单复制，使用订单的业务日期
+COPY_SQL: Dict[str, str] = {
+    'order_header': 'INSERT INTO order_header SELECT * FROM order_header_legacy',
+    'order_item': (
+        'INSERT INTO order_item SELECT i.*, h.biz_date FROM order_item_legacy i '
+        'JOIN order_header_legacy h ON h.id = i.order_id'
+    ),
+    'expense_record': 'INSERT INTO expense_record SELECT * FROM expense_record_legacy',
+}
+
+DOWNGRADE_COPY_SQL: Dict[str, str] = {
+    'order_header': 'INSERT INTO order_header SELECT * FROM order_header_legacy',
+    'order_item': (
+        'INSERT INTO order_item SELECT {columns} FROM order_item_legacy'
+    ),
+    'expense_record': 'INSERT INTO expense_record SELECT * FROM expense_record_legacy',
+}
+
+
+def _id_sequence(bind, table: str) -> Union[str, None]:
+    return bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', 'id')")).scalar()
+
+
+def _swap_in(bind, table: str, create_sql: str) -> Union[str, None]:
+    """建新表并与旧表交换名称，返回 id 序列名（解除旧表归属，避免随旧表删除）"""
+    op.execute(create_sql)
+    op.execute(f'ALTER TABLE {table} RENAME TO {table}_legacy')
+    op.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    sequence = _id_sequence(bind, f'{table}_legacy')
+    if sequence:
+        op.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+    return sequence
+
+
+def _finish(table: str, sequence: Union[str, None], comment: str) -> None:
+    if sequence:
+        op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+    op.execute(f"COMMENT ON TABLE {table} IS '{comment}'")
+    for fk_column, reference, ondelete in TABLES[table]['foreign_keys']:
+        op.execute(
+            f'ALTER TABLE {table} ADD FOREIGN KEY ({fk_column}) REFERENCES {reference} ON DELETE {ondelete}'
+        )
+    for column in TABLES[table]['indexes']:
+        op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+
+
+def _partition_months(bind) -> List[date]:
+    """已有数据的最早月份至当前月后 N 个月"""
+    earliest = bind.execute(sa.text(
+        'SELECT LEAST((SELECT MIN(biz_date) FROM order_header), (SELECT MIN(biz_date) FROM expense_record))'
+    )).scalar()
+    today = date.today()
+    return list(iter_months(
+        min(earliest, today) if earliest else today,
+        add_months(today, settings.partition_months_ahead),
+    ))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    months = _partition_months(bind)
+
+    sequences: Dict[str, Union[str, None]] = {}
+    for table in TABLES:
+        extra_columns = ", biz_date DATE NOT NULL" if table == 'order_item' else ""
+        sequences[table] = _swap_in(bind, table, (
+            f'CREATE TABLE {table}_new (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+            f'INCLUDING COMMENTS{extra_columns}) PARTITION BY RANGE (biz_date)'
+        ))
+    op.execute("COMMENT ON COLUMN order_item.biz_date IS '业务日期（与所属订单一致）'")
+
+    for month in months:
+        for table in TABLES:
+            op.execute(partition_ddl(table, month))
+
+    for table in TABLES:
+        op.execute(COPY_SQL[table])
+    op.execute('DROP TABLE order_item_legacy')
+    op.execute('DROP TABLE order_header_legacy')
+    op.execute('DROP TABLE expense_record_legacy')
+
+    # 主键、唯一约束（需包含分区键），在数据复制后创建
+    op.create_primary_key('pk_order_header', 'order_header', ['id', 'biz_date'])
+    op.create_unique_constraint('uq_order_header_order_no_biz_date', 'order_header', ['order_no', 'biz_date'])
+    op.create_primary_key('pk_order_item', 'order_item', ['id', 'biz_date'])
+    op.create_primary_key('pk_expense_record', 'expense_record', ['id', 'biz_date'])
+    op.execute(
+        'ALTER TABLE order_item ADD FOREIGN KEY (order_id, biz_date) '
+        'REFERENCES order_header (id, biz_date) ON DELETE CASCADE'
+    )
+
+    for table in TABLES:
+        _finish(table, sequences[table], TABLES[table]['comment'])
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    item_columns = [
+        row[0] for row in bind.execute(sa.text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = 'order_item' AND column_name <> 'biz_date' ORDER BY ordinal_position"
+        )).all()
+    ]
+
+    sequences: Dict[str, Union[str, None]] = {}
+    for table in TABLES:
+        sequences[table] = _swap_in(bind, table, (
+            f'CREATE TABLE {table}_new (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS)'
+        ))
+    op.execute('ALTER TABLE order_item DROP COLUMN biz_date')
+
+    for table in TABLES:
+        op.execute(DOWNGRADE_COPY_SQL[table].format(columns=', '.join(item_columns)))
+    op.execute('DROP TABLE order_item_legacy')
+    op.execute('DROP TABLE order_header_legacy')
+    op.execute('DROP TABLE expense_record_legacy')
+
+    op.create_primary_key('pk_order_header', 'order_header', ['id'])
+    op.create_unique_constraint('uq_order_header_order_no', 'order_header', ['order_no'])
+    op.create_primary_key('pk_order_item', 'order_item', ['id'])
+    op.create_primary_key('pk_expense_record', 'expense_record', ['id'])
+    op.execute(
+        'ALTER TABLE order_item ADD FOREIGN KEY (order_id) REFERENCES order_header (id) ON DELETE CASCADE'
+    )
+
+    for table in TABLES:
+        _finish(table, sequences[table], TABLES[table]['legacy_comment'])
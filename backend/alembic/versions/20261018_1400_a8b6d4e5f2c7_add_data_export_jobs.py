@@ -0,0 +1,97 @@
+"""Add data_export_jobs table
+
+Revision ID: a8b6d4e5f2c7
+Revises: f7a5c3d4e1b6
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8b6d4e5f2c7'
+down_revision: Union[str, None] = 'f7a5c3d4e1b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """创建数据导出任务表"""
+
+    # 创建枚举类型（使用 DO 块检查是否存在）
+    op.execute("""
+        DO $$ BEGIN
+            CREATE TYPE export_target_type AS ENUM ('orders', 'expense_records', 'report');
+        EXCEPTION
+            WHEN duplicate_object THEN null;
+        END $$;
+    """)
+    op.execute("""
+        DO $$ BEGIN
+            CREATE TYPE export_job_status AS ENUM ('pending', 'running', 'success', 'fail', 'expired');
+        EXCEPTION
+            WHEN duplicate_object THEN null;
+        END $$;
+    """)
+
+    target_type_enum = sa.Enum(
+        'orders', 'expense_records', 'report',
+        name='export_target_type', create_type=False
+    )
+    status_enum = sa.Enum(
+        'pending', 'running', 'success', 'fail', 'expired',
+        name='export_job_status', create_type=False
+    )
+
+    op.create_table(
+        'data_export_jobs',
+        sa.Column('id', sa.Integer(), nullable=False, comment='主键ID'),
+        sa.Column('job_name', sa.String(length=200), nullable=False, comment='任务名称'),
+        sa.Column('target_type', target_type_enum, nullable=False, comment='导出数据类型 (orders/expense_records/report)'),
+        sa.Column('export_format', sa.String(length=20), nullable=False, server_default='xlsx', comment='导出格式 (xlsx/csv/parquet/arrow)'),
+        sa.Column('status', status_enum, nullable=False, server_default='pending', comment='任务状态'),
+        sa.Column('params', postgresql.JSONB(astext_type=sa.Text()), nullable=True, comment='导出筛选条件'),
+        sa.Column('dedupe_key', sa.String(length=64), nullable=False, comment='去重键（数据类型、格式、筛选条件、可访问门店的摘要）'),
+        sa.Column('file_name', sa.String(length=500), nullable=True, comment='下载文件名'),
+        sa.Column('file_path', sa.String(length=1000), nullable=True, comment='文件存储路径'),
+        sa.Column('file_size', sa.BigInteger(), nullable=True, comment='文件大小（字节）'),
+        sa.Column('row_count', sa.Integer(), nullable=True, comment='导出行数（xlsx 格式统计）'),
+        sa.Column('error_message', sa.Text(), nullable=True, comment='错误信息'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='开始生成时间'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True, comment='结束时间'),
+        sa.Column('expires_at', sa.DateTime(), nullable=True, comment='文件过期时间'),
+        sa.Column('created_by_id', sa.Integer(), nullable=True, comment='创建用户ID'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='更新时间'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['created_by_id'], ['user.id'], ondelete='SET NULL'),
+        comment='数据导出任务表'
+    )
+    op.create_index('idx_export_job_status', 'data_export_jobs', ['status'])
+    op.create_index('idx_export_job_created_by', 'data_export_jobs', ['created_by_id'])
+    op.create_index('idx_export_job_created_at', 'data_export_jobs', ['created_at'])
+    op.create_index('idx_export_job_expires_at', 'data_export_jobs', ['expires_at'])
+    # 同一去重键最多一个待生成/生成中的任务
+    op.create_index(
+        'uq_export_job_active_dedupe_key',
+        'data_export_jobs',
+        ['dedupe_key'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('pending', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    """删除数据导出任务表"""
+    op.drop_index('uq_export_job_active_dedupe_key', table_name='data_export_jobs')
+    op.drop_index('idx_export_job_expires_at', table_name='data_export_jobs')
+    op.drop_index('idx_export_job_created_at', table_name='data_export_jobs')
+    op.drop_index('idx_export_job_created_by', table_name='data_export_jobs')
+    op.drop_index('idx_export_job_status', table_name='data_export_jobs')
+    op.drop_table('data_export_jobs')
+    op.execute("DROP TYPE IF EXISTS export_job_status")
+    op.execute("DROP TYPE IF EXISTS export_target_type")
@@ -0,0 +1,39 @@
+"""Add report_data_version table
+
+Revision ID: b9c7e5f6a3d8
+Revises: a8b6d4e5f2c7
+Create Date: 2026-10-18 15:00:00.000000
+
+说明：
+- 每个门店一行版本号，源数据或 KPI 写入时在同一事务内 +1
+- 报表结果缓存的键包含范围内门店的版本号，数据变化后旧缓存自然失效
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9c7e5f6a3d8'
+down_revision: Union[str, None] = 'a8b6d4e5f2c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """创建门店数据版本表"""
+    op.create_table(
+        'report_data_version',
+        sa.Column('store_id', sa.Integer(), nullable=False, comment='门店ID'),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='1', comment='数据版本号'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='最后变更时间'),
+        sa.PrimaryKeyConstraint('store_id'),
+        sa.ForeignKeyConstraint(['store_id'], ['store.id'], ondelete='CASCADE'),
+        comment='门店数据版本表（报表缓存失效）'
+    )
+
+
+def downgrade() -> None:
+    """删除门店数据版本表"""
+    op.drop_table('report_data_version')
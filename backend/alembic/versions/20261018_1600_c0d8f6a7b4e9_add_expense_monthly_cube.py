@@ -0,0 +1,63 @@
+"""Add expense_monthly_cube table
+
+Revision ID: c0d8f6a7b4e9
+Revises: b9c7e5f6a3d8
+Create Date: 2026-10-18 16:00:00.000000
+
+说明：
+- 按 (门店, 费用科目, 月份) 汇总未删除且已审批/已支付的费用记录
+- 费用报表、预算分析、本量利分析、仪表盘费用结构读取该表，首尾零散日期仍读明细
+- 升级时由现有费用记录回填
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0d8f6a7b4e9'
+down_revision: Union[str, None] = 'b9c7e5f6a3d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """创建费用月度汇总表并回填"""
+    op.create_table(
+        'expense_monthly_cube',
+        sa.Column('store_id', sa.Integer(), nullable=False, comment='门店ID'),
+        sa.Column('expense_type_id', sa.Integer(), nullable=False, comment='费用科目ID'),
+        sa.Column('month_start', sa.Date(), nullable=False, comment='月份第一天'),
+        sa.Column('total_amount', sa.Numeric(14, 2), nullable=False, server_default='0', comment='费用合计'),
+        sa.Column('record_count', sa.Integer(), nullable=False, server_default='0', comment='费用记录数'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='最后刷新时间'),
+        sa.PrimaryKeyConstraint('store_id', 'expense_type_id', 'month_start'),
+        sa.ForeignKeyConstraint(['store_id'], ['store.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['expense_type_id'], ['expense_type.id'], ondelete='CASCADE'),
+        comment='费用月度汇总表（门店 × 科目 × 月）'
+    )
+    op.create_index('ix_expense_monthly_cube_expense_type_id', 'expense_monthly_cube', ['expense_type_id'])
+    op.create_index('ix_expense_monthly_cube_month_start', 'expense_monthly_cube', ['month_start'])
+
+    op.execute(
+        """
+        INSERT INTO expense_monthly_cube (store_id, expense_type_id, month_start, total_amount, record_count)
+        SELECT store_id,
+               expense_type_id,
+               date_trunc('month', biz_date)::date,
+               SUM(amount),
+               COUNT(id)
+        FROM expense_record
+        WHERE is_deleted = false
+          AND status IN ('approved', 'paid')
+        GROUP BY store_id, expense_type_id, date_trunc('month', biz_date)::date
+        """
+    )
+
+
+def downgrade() -> None:
+    """删除费用月度汇总表"""
+    op.drop_index('ix_expense_monthly_cube_month_start', table_name='expense_monthly_cube')
+    op.drop_index('ix_expense_monthly_cube_expense_type_id', table_name='expense_monthly_cube')
+    op.drop_table('expense_monthly_cube')
@@ -0,0 +1,39 @@
+"""Add checkpoint columns to data_import_jobs
+
+Revision ID: d1e9a7b8c5f0
+Revises: c0d8f6a7b4e9
+Create Date: 2026-10-18 17:00:00.000000
+
+说明：
+- 导入任务按批读取文件，每批独立事务提交
+- processed_rows 记录已提交的行数，checkpoint_at 记录最近一次提交时间
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1e9a7b8c5f0'
+down_revision: Union[str, None] = 'c0d8f6a7b4e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """增加导入进度字段"""
+    op.add_column(
+        'data_import_jobs',
+        sa.Column('processed_rows', sa.Integer(), nullable=False, server_default='0', comment='已处理行数（进度检查点）')
+    )
+    op.add_column(
+        'data_import_jobs',
+        sa.Column('checkpoint_at', sa.DateTime(), nullable=True, comment='最近一次批次提交时间')
+    )
+
+
+def downgrade() -> None:
+    """删除导入进度字段"""
+    op.drop_column('data_import_jobs', 'checkpoint_at')
+    op.drop_column('data_import_jobs', 'processed_rows')
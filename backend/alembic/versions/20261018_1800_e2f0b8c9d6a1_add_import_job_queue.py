@@ -0,0 +1,42 @@
+"""Add queued status and execution columns to data_import_jobs
+
+Revision ID: e2f0b8c9d6a1
+Revises: d1e9a7b8c5f0
+Create Date: 2026-10-18 18:00:00.000000
+
+说明：
+- 执行导入改为排队：接口把任务置为 queued 后立即返回，由后台 worker 认领执行
+- 记录排队、开始、结束时间和失败原因（后台执行的异常不再返回给调用方）
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f0b8c9d6a1'
+down_revision: Union[str, None] = 'd1e9a7b8c5f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """增加排队状态和执行信息字段"""
+    # 枚举新值须在事务外添加
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE import_job_status ADD VALUE IF NOT EXISTS 'queued' AFTER 'pending'")
+
+    op.add_column('data_import_jobs', sa.Column('queued_at', sa.DateTime(), nullable=True, comment='加入执行队列时间'))
+    op.add_column('data_import_jobs', sa.Column('started_at', sa.DateTime(), nullable=True, comment='开始执行时间'))
+    op.add_column('data_import_jobs', sa.Column('finished_at', sa.DateTime(), nullable=True, comment='执行结束时间'))
+    op.add_column('data_import_jobs', sa.Column('error_message', sa.Text(), nullable=True, comment='任务失败原因'))
+
+
+def downgrade() -> None:
+    """删除执行信息字段（枚举值无法删除，排队中的任务退回待处理）"""
+    op.execute("UPDATE data_import_jobs SET status = 'pending' WHERE status = 'queued'")
+    op.drop_column('data_import_jobs', 'error_message')
+    op.drop_column('data_import_jobs', 'finished_at')
+    op.drop_column('data_import_jobs', 'started_at')
+    op.drop_column('data_import_jobs', 'queued_at')
@@ -0,0 +1,57 @@
+"""Add import checkpoint hash, lease and expense import key
+
+Revision ID: f3a1c9d0e7b2
+Revises: e2f0b8c9d6a1
+Create Date: 2026-10-18 19:00:00.000000
+
+说明：
+- checkpoint_hash：已提交行内容的 sha256，续传时校验文件未变化，已提交的行不再校验
+- lease_owner / lease_expires_at：执行租约，worker 定期续约，过期的运行中任务可被续传
+- expense_record.import_key：导入费用的去重键，(import_key, biz_date) 唯一，
+  手工录入的记录为 NULL 不受约束；订单去重由已有的 (order_no, biz_date) 唯一约束保证
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a1c9d0e7b2'
+down_revision: Union[str, None] = 'e2f0b8c9d6a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """增加续传检查点、执行租约和费用导入去重键"""
+    op.add_column(
+        'data_import_jobs',
+        sa.Column('checkpoint_hash', sa.String(length=64), nullable=True, comment='已处理行内容的 sha256（续传时校验文件未变化）')
+    )
+    op.add_column(
+        'data_import_jobs',
+        sa.Column('lease_owner', sa.String(length=100), nullable=True, comment='执行中任务的 worker 标识')
+    )
+    op.add_column(
+        'data_import_jobs',
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True, comment='执行租约到期时间（过期视为执行进程已退出）')
+    )
+
+    op.add_column(
+        'expense_record',
+        sa.Column('import_key', sa.String(length=32), nullable=True, comment='导入去重键（门店、日期、科目、金额、说明的 md5，仅导入的记录有值）')
+    )
+    # 分区表上的唯一约束会同步创建到所有分区，之后新建的分区自动继承
+    op.create_unique_constraint(
+        'uq_expense_record_import_key_biz_date', 'expense_record', ['import_key', 'biz_date']
+    )
+
+
+def downgrade() -> None:
+    """删除续传检查点、执行租约和费用导入去重键"""
+    op.drop_constraint('uq_expense_record_import_key_biz_date', 'expense_record', type_='unique')
+    op.drop_column('expense_record', 'import_key')
+    op.drop_column('data_import_jobs', 'lease_expires_at')
+    op.drop_column('data_import_jobs', 'lease_owner')
+    op.drop_column('data_import_jobs', 'checkpoint_hash')
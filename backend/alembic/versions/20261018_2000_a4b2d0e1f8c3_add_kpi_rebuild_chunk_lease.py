@@ -0,0 +1,35 @@
+"""Add lease expiry to kpi_rebuild_job_chunks
+
+Revision ID: a4b2d0e1f8c3
+Revises: f3a1c9d0e7b2
+Create Date: 2026-10-18 20:00:00.000000
+
+说明：
+- 分片认领时写入 worker 与 lease_expires_at，执行期间定期续约
+- 进程退出后租约过期，运行中的分片可被重新认领，任务可续跑至终态
+- 已有的运行中分片没有租约，视为已过期
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4b2d0e1f8c3'
+down_revision: Union[str, None] = 'f3a1c9d0e7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """增加分片执行租约字段"""
+    op.add_column(
+        'kpi_rebuild_job_chunks',
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True, comment='执行租约到期时间（过期视为 worker 已退出，可重新认领）')
+    )
+
+
+def downgrade() -> None:
+    """删除分片执行租约字段"""
+    op.drop_column('kpi_rebuild_job_chunks', 'lease_expires_at')
@@ -0,0 +1,47 @@
+"""Add order_no_registry for global order number uniqueness
+
+Revision ID: b5c3e1f2a9d4
+Revises: a4b2d0e1f8c3
+Create Date: 2026-10-18 21:00:00.000000
+
+说明：
+- order_header 按月分区后唯一约束只能是 (order_no, biz_date)，跨日期同号订单仅靠写入前查询排除，并发下不可靠
+- 新增不分区的 order_no_registry（order_no 主键），手工创建与导入写订单前先登记订单号，主键冲突即视为重复
+- 按已有订单回填，同一订单号存在多条时取最早的业务日期
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5c3e1f2a9d4'
+down_revision: Union[str, None] = 'a4b2d0e1f8c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """创建订单号登记表并回填"""
+    op.create_table(
+        'order_no_registry',
+        sa.Column('order_no', sa.String(length=50), nullable=False, comment='订单号'),
+        sa.Column('biz_date', sa.Date(), nullable=False, comment='订单业务日期'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False, comment='登记时间'),
+        sa.PrimaryKeyConstraint('order_no'),
+        comment='订单号登记表（保证订单号全局唯一）'
+    )
+    op.execute(
+        """
+        INSERT INTO order_no_registry (order_no, biz_date)
+        SELECT order_no, MIN(biz_date)
+        FROM order_header
+        GROUP BY order_no
+        """
+    )
+
+
+def downgrade() -> None:
+    """删除订单号登记表"""
+    op.drop_table('order_no_registry')
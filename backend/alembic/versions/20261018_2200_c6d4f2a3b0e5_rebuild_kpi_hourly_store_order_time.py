@@ -0,0 +1,58 @@
+"""Rebuild kpi_hourly_store without orders whose order_time is off biz_date
+
+Revision ID: c6d4f2a3b0e5
+Revises: b5c3e1f2a9d4
+Create Date: 2026-10-18 22:00:00.000000
+
+说明：
+- 导入的订单没有下单时间，order_time 写入的是导入时间，原回填把这些历史订单都计入导入时刻所在的小时
+- 小时级 KPI 改为只统计下单时间（业务时区）落在业务日期当天的订单，按新口径清空并重新回填
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6d4f2a3b0e5'
+down_revision: Union[str, None] = 'b5c3e1f2a9d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _backfill(only_same_day: bool) -> None:
+    """由已完成订单回填小时级 KPI"""
+    timezone = settings.kpi_business_timezone.replace("'", "''")
+    same_day = f"AND CAST(timezone('{timezone}', order_time) AS DATE) = biz_date" if only_same_day else ""
+    op.execute("DELETE FROM kpi_hourly_store")
+    op.execute(f"""
+        INSERT INTO kpi_hourly_store (
+            biz_date, store_id, hour, revenue, order_count, customer_count,
+            dine_in_revenue, takeout_revenue, delivery_revenue, online_revenue
+        )
+        SELECT biz_date, store_id, hour,
+               SUM(net_amount), COUNT(*), COUNT(*),
+               SUM(CASE WHEN channel = 'dine_in' THEN net_amount ELSE 0 END),
+               SUM(CASE WHEN channel = 'takeout' THEN net_amount ELSE 0 END),
+               SUM(CASE WHEN channel = 'delivery' THEN net_amount ELSE 0 END),
+               SUM(CASE WHEN channel = 'online' THEN net_amount ELSE 0 END)
+        FROM (
+            SELECT biz_date, store_id, channel, net_amount,
+                   CAST(EXTRACT(HOUR FROM timezone('{timezone}', order_time)) AS INTEGER) AS hour
+            FROM order_header
+            WHERE status = 'completed' {same_day}
+        ) AS detail
+        GROUP BY biz_date, store_id, hour
+    """)
+
+
+def upgrade() -> None:
+    """按新口径重建小时级 KPI"""
+    _backfill(only_same_day=True)
+
+
+def downgrade() -> None:
+    """恢复原口径（统计全部已完成订单）"""
+    _backfill(only_same_day=False)
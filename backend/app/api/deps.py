@@ -4,15 +4,20 @@ API 依赖项模块
 提供常用的依赖注入函数，如数据库会话、当前用户等
 """
 
-from typing import AsyncGenerator
-from fastapi import Depends, HTTPException, status
+import hashlib
+import json
+from datetime import date
+from typing import AsyncGenerator, List, Optional
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.core.config import settings
 from app.core.database import AsyncSessionLocal
 from app.core.security import verify_token
 from app.models.user import User
+from app.services.report_cache import get_data_versions
 
 # HTTP Bearer 认证方案
 security = HTTPBearer()
@@ -32,6 +37,24 @@ async def get_current_user(
     db: AsyncSession = Depends(get_db),
 ) -> User:
     """获取当前认证用户"""
+    return await _authenticate(credentials, db)
+
+
+async def get_current_user_short_session(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> User:
+    """
+    获取当前认证用户（独立短会话，查询后立即关闭）
+    
+    用于 SSE 等长连接接口：依赖的清理要等响应结束才执行，
+    使用 get_db 会在整个推送期间占用连接池中的连接。
+    """
+    async with AsyncSessionLocal() as session:
+        return await _authenticate(credentials, session)
+
+
+async def _authenticate(credentials: HTTPAuthorizationCredentials, db: AsyncSession) -> User:
+    """校验令牌并加载用户"""
     token_data = verify_token(credentials.credentials)
     if not token_data:
         raise HTTPException(
@@ -124,3 +147,45 @@ async def check_permission(
         )
     
     return True
+
+
+async def check_not_modified(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    accessible_store_ids: Optional[List[int]]
+) -> Optional[Response]:
+    """
+    分析类 GET 接口的条件请求（ETag / If-None-Match）
+
+    ETag 由请求路径、查询参数、门店范围、范围内门店的数据版本号、当天日期
+    （未传日期时默认取当天的接口）和应用版本计算，须在权限和门店范围校验之后、聚合查询之前调用。
+
+    Returns:
+        与 If-None-Match 一致时返回 304 响应（调用方直接返回）；
+        否则把 ETag 写入响应头并返回 None
+    """
+    versions = await get_data_versions(db, accessible_store_ids)
+    payload = {
+        "path": request.url.path,
+        "query": sorted(request.query_params.multi_items()),
+        "stores": sorted(accessible_store_ids) if accessible_store_ids is not None else None,
+        "versions": versions,
+        "today": date.today().isoformat(),
+        "app_version": settings.app_version,
+    }
+    digest = hashlib.sha256(
+        json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()[:32]
+    etag = f'W/"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    # 弱比较：忽略 W/ 前缀
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in candidates or etag.removeprefix("W/") in candidates:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -4,13 +4,14 @@ API 路由汇总模块
 
 from fastapi import APIRouter
 from app.api.v1 import health, auth, stores, orders, kpi, audit
-from app.api.v1 import expense_types, expense_records, import_jobs, reports, user_stores
+from app.api.v1 import expense_types, expense_records, import_jobs, export_jobs, reports, user_stores
 from app.api.v1 import roles, permissions
 from app.api.v1 import product_analysis
 from app.api.v1 import comparison
 from app.api.v1 import dashboard
 from app.api.v1 import budgets
 from app.api.v1 import cvp
+from app.api.v1 import pivot
 
 api_router = APIRouter()
 
@@ -28,6 +29,7 @@ api_router.include_router(orders.router, prefix="/orders", tags=["订单管理"]
 api_router.include_router(kpi.router, prefix="/kpi", tags=["KPI 数据"])
 api_router.include_router(audit.router, prefix="/audit", tags=["审计日志"])
 api_router.include_router(import_jobs.router, prefix="/import-jobs", tags=["数据导入"])
+api_router.include_router(export_jobs.router, prefix="/export-jobs", tags=["数据导出"])
 api_router.include_router(reports.router, prefix="/reports", tags=["报表中心"])
 api_router.include_router(user_stores.router, prefix="/user-stores", tags=["用户门店权限"])
 api_router.include_router(roles.router, prefix="/roles", tags=["角色管理"])
@@ -37,3 +39,4 @@ api_router.include_router(comparison.router, prefix="/comparison", tags=["同比
 api_router.include_router(dashboard.router, prefix="/dashboard", tags=["管理驾驶舱"])
 api_router.include_router(budgets.router, prefix="/budgets", tags=["预算管理"])
 api_router.include_router(cvp.router, prefix="/cvp", tags=["本量利分析"])
+api_router.include_router(pivot.router, prefix="/pivot", tags=["透视分析"])
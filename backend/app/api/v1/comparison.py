@@ -8,10 +8,10 @@
 from datetime import date
 from typing import List
 
-from fastapi import APIRouter, Depends, Query, Request
+from fastapi import APIRouter, Depends, Query, Request, Response as HTTPResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_current_user, check_permission
+from app.api.deps import get_db, get_current_user, check_permission, check_not_modified
 from app.models.user import User
 from app.schemas.common import Response
 from app.schemas.comparison import (
@@ -20,7 +20,7 @@ from app.schemas.comparison import (
     StoreComparisonItem,
 )
 from app.services import comparison_service
-from app.services.audit_log_service import log_audit
+from app.services.audit_log_service import log_audit, log_not_modified_audit
 from app.services.data_scope_service import filter_stores_by_access
 
 router = APIRouter()
@@ -29,6 +29,7 @@ router = APIRouter()
 @router.get("/period", response_model=Response[PeriodComparisonResponse])
 async def get_period_comparison(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="当期开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="当期结束日期 (YYYY-MM-DD)"),
     compare_type: str = Query("yoy", description="对比类型: yoy/mom/custom"),
@@ -47,6 +48,11 @@ async def get_period_comparison(
 
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
 
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "VIEW", current_user, request, "comparison")
+        return not_modified
+
     data = await comparison_service.get_period_comparison(
         db=db,
         start_date=date.fromisoformat(start_date),
@@ -77,6 +83,7 @@ async def get_period_comparison(
 @router.get("/trend", response_model=Response[TrendComparisonResponse])
 async def get_trend_comparison(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="当期开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="当期结束日期 (YYYY-MM-DD)"),
     metric: str = Query("revenue", description="指标: revenue/net_revenue/operating_profit/order_count/avg_order_value"),
@@ -96,6 +103,11 @@ async def get_trend_comparison(
 
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
 
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "VIEW", current_user, request, "comparison")
+        return not_modified
+
     data = await comparison_service.get_trend_comparison(
         db=db,
         start_date=date.fromisoformat(start_date),
@@ -128,6 +140,7 @@ async def get_trend_comparison(
 @router.get("/stores", response_model=Response[List[StoreComparisonItem]])
 async def get_store_comparison(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="当期开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="当期结束日期 (YYYY-MM-DD)"),
     compare_type: str = Query("yoy", description="对比类型: yoy/mom/custom"),
@@ -146,6 +159,11 @@ async def get_store_comparison(
 
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
 
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "VIEW", current_user, request, "comparison")
+        return not_modified
+
     data = await comparison_service.get_store_comparison(
         db=db,
         start_date=date.fromisoformat(start_date),
@@ -6,15 +6,15 @@ Dashboard 仪表盘 API
 
 from datetime import date
 
-from fastapi import APIRouter, Depends, Query, Request
+from fastapi import APIRouter, Depends, Query, Request, Response as HTTPResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_current_user, check_permission
+from app.api.deps import get_db, get_current_user, check_permission, check_not_modified
 from app.models.user import User
 from app.schemas.common import Response
 from app.schemas.dashboard import DashboardOverview
 from app.services import dashboard_service
-from app.services.audit_log_service import log_audit
+from app.services.audit_log_service import log_audit, log_not_modified_audit
 from app.services.data_scope_service import filter_stores_by_access
 
 router = APIRouter()
@@ -23,6 +23,7 @@ router = APIRouter()
 @router.get("/overview", response_model=Response[DashboardOverview])
 async def get_dashboard_overview(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID"),
@@ -33,6 +34,7 @@ async def get_dashboard_overview(
     获取仪表盘全量数据
 
     一次请求返回: 核心指标卡片(含同比/环比) + 趋势 + 门店排名 + 费用结构 + 渠道分布 + 利润率
+    支持 ETag / If-None-Match，数据未变化时返回 304
 
     权限: dashboard:view
     """
@@ -40,6 +42,12 @@ async def get_dashboard_overview(
 
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
 
+    # 数据未变化时直接返回 304
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "VIEW", current_user, request, "dashboard")
+        return not_modified
+
     data = await dashboard_service.get_dashboard_overview(
         db=db,
         start_date=date.fromisoformat(start_date),
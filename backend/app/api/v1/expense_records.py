@@ -3,15 +3,10 @@
 """
 
 from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, Query, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import date, datetime
-import io
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from urllib.parse import quote
 
 from app.core.database import get_db
 from app.core.exceptions import NotFoundException
@@ -23,7 +18,20 @@ from app.schemas.common import Response, success
 from app.schemas.expense_record import ExpenseRecordCreate, ExpenseRecordUpdate
 from app.services.audit import create_audit_log
 from app.services.data_scope_service import assert_store_access
-from app.services.expense_record_service import get_expense_record_list, get_expense_record_export_rows
+from app.services.expense_cube_service import refresh_expense_cube
+from app.services.expense_record_service import (
+    EXPENSE_RECORD_EXPORT_COLUMNS,
+    EXPENSE_RECORD_EXPORT_XLSX_LIMIT,
+    build_expense_record_export_query,
+    get_expense_record_list,
+)
+from app.services.export_stream import ExportFormat, XlsxStreamWriter, export_response, stream_export
+from app.services.kpi_refresh_service import (
+    DIRTY_REASON_EXPENSE,
+    mark_kpi_dirty,
+    refresh_dirty_kpi_in_background,
+)
+from app.services.partition_service import EXPENSE_TABLES, ensure_partitions
 
 router = APIRouter()
 
@@ -69,7 +77,7 @@ async def list_expense_records(
 @router.get(
     "/export",
     summary="导出费用记录",
-    description="导出费用记录列表为Excel文件"
+    description="导出费用记录列表，支持 xlsx / csv / parquet / arrow 格式"
 )
 async def export_expense_records(
     request: Request,
@@ -77,13 +85,14 @@ async def export_expense_records(
     expense_type_id: int = Query(None, description="费用类型ID"),
     start_date: date = Query(None, description="开始日期"),
     end_date: date = Query(None, description="结束日期"),
+    export_format: ExportFormat = Query("xlsx", alias="format", description="导出格式：xlsx / csv / parquet / arrow"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """导出费用记录列表"""
+    """导出费用记录列表（xlsx 最多 10000 条，其余格式不限条数，均流式输出）"""
     # 权限检查
     await check_permission(current_user, "expense:export", db)
-    rows = await get_expense_record_export_rows(
+    query = await build_expense_record_export_query(
         db=db,
         current_user=current_user,
         store_id=store_id,
@@ -92,47 +101,20 @@ async def export_expense_records(
         end_date=end_date,
     )
     
-    # 创建Excel工作簿
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "费用记录"
-    
-    # 设置表头样式
-    header_fill = PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # 写入表头
-    headers = ["序号", "门店", "费用类型", "费用分类", "金额", "费用日期", "备注"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-    
-    # 写入数据
-    for idx, row in enumerate(rows, 1):
-        ws.cell(row=idx+1, column=1, value=idx)
-        ws.cell(row=idx+1, column=2, value=row.store_name or '未知门店')
-        ws.cell(row=idx+1, column=3, value=row.expense_type_name or '未知类型')
-        ws.cell(row=idx+1, column=4, value=row.expense_type_category or '未分类')
-        ws.cell(row=idx+1, column=5, value=float(row.ExpenseRecord.amount or 0))
-        ws.cell(row=idx+1, column=6, value=row.ExpenseRecord.biz_date.strftime('%Y-%m-%d') if row.ExpenseRecord.biz_date else '')
-        ws.cell(row=idx+1, column=7, value=row.ExpenseRecord.remark or '')
-    
-    # 调整列宽
-    ws.column_dimensions['A'].width = 8
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 18
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 15
-    ws.column_dimensions['F'].width = 15
-    ws.column_dimensions['G'].width = 30
-    
-    # 保存到内存
-    excel_file = io.BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
+    count = None
+    if export_format == "xlsx":
+        writer = XlsxStreamWriter()
+        count = await writer.write_query(
+            db,
+            "费用记录",
+            EXPENSE_RECORD_EXPORT_COLUMNS,
+            query.limit(EXPENSE_RECORD_EXPORT_XLSX_LIMIT),
+            header_color="E67E22",
+            row_number_title="序号",
+        )
+        body = writer.iter_bytes()
+    else:
+        body = stream_export(db, query, EXPENSE_RECORD_EXPORT_COLUMNS, export_format)
     
     # 记录审计日志
     await create_audit_log(
@@ -146,22 +128,20 @@ async def export_expense_records(
             "expense_type_id": expense_type_id,
             "start_date": start_date.isoformat() if start_date else None,
             "end_date": end_date.isoformat() if end_date else None,
-            "count": len(rows)
+            "format": export_format,
+            "count": count
         },
         request=request,
         status_code=200
     )
     await db.commit()
     
-    # 返回Excel文件
-    filename = f"费用记录_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    encoded_filename = quote(filename)
-    return StreamingResponse(
-        excel_file,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f"attachment; filename=expenses.xlsx; filename*=UTF-8''{encoded_filename}"
-        }
+    # 返回文件流
+    return export_response(
+        body,
+        export_format,
+        f"费用记录_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        "expenses",
     )
 
 
@@ -211,10 +191,14 @@ async def get_expense_record(
 async def create_expense_record(
     data: ExpenseRecordCreate,
     request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """创建费用记录"""
+    # 补建目标月份分区（独立会话提交，须在本事务读取费用表之前）
+    await ensure_partitions(EXPENSE_TABLES, [data.biz_date])
+    
     # 数据权限校验：检查是否有权访问该门店
     await assert_store_access(db, current_user, data.store_id)
     
@@ -238,8 +222,12 @@ async def create_expense_record(
     )
     
     db.add(record)
+    # 重算费用月度汇总、登记受影响的 KPI 单元（与费用记录同一事务）
+    await refresh_expense_cube(db, [(record.store_id, record.biz_date)])
+    await mark_kpi_dirty(db, [(record.store_id, record.biz_date)], DIRTY_REASON_EXPENSE)
     await db.commit()
     await db.refresh(record)
+    background_tasks.add_task(refresh_dirty_kpi_in_background)
     
     # 记录审计日志
     await create_audit_log(
@@ -282,10 +270,15 @@ async def update_expense_record(
     record_id: int,
     data: ExpenseRecordUpdate,
     request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """更新费用记录"""
+    # 业务日期跨月时记录移动到目标月份分区，须在本事务读取费用表之前补建
+    if data.biz_date is not None:
+        await ensure_partitions(EXPENSE_TABLES, [data.biz_date])
+    
     # 查询记录
     result = await db.execute(select(ExpenseRecord).where(ExpenseRecord.id == record_id))
     record = result.scalar_one_or_none()
@@ -333,8 +326,16 @@ async def update_expense_record(
     if data.remark is not None:
         record.remark = data.remark
     
+    # 重算修改前后的费用月度汇总、登记 KPI 单元（门店或日期变化时两者都需重算）
+    touched_cells = [
+        (old_values["store_id"], date.fromisoformat(old_values["biz_date"])),
+        (record.store_id, record.biz_date),
+    ]
+    await refresh_expense_cube(db, touched_cells)
+    await mark_kpi_dirty(db, touched_cells, DIRTY_REASON_EXPENSE)
     await db.commit()
     await db.refresh(record)
+    background_tasks.add_task(refresh_dirty_kpi_in_background)
     
     # 记录审计日志
     new_values = {
@@ -382,6 +383,7 @@ async def update_expense_record(
 async def delete_expense_record(
     record_id: int,
     request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -407,7 +409,10 @@ async def delete_expense_record(
     
     # 删除记录
     await db.delete(record)
+    await refresh_expense_cube(db, [(record.store_id, record.biz_date)])
+    await mark_kpi_dirty(db, [(record.store_id, record.biz_date)], DIRTY_REASON_EXPENSE)
     await db.commit()
+    background_tasks.add_task(refresh_dirty_kpi_in_background)
     
     # 记录审计日志
     await create_audit_log(
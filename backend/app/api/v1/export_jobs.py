@@ -0,0 +1,148 @@
+"""
+数据导出任务 API
+
+大批量导出提交为后台任务，生成完成后通过下载地址获取文件
+"""
+
+from typing import List
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db, get_current_user, check_permission
+from app.core.config import settings
+from app.models.user import User
+from app.schemas.common import Response, PaginatedResponse
+from app.schemas.export_job import ExportJobCreate, ExportJobOut
+from app.services.audit_log_service import log_audit
+from app.services.export_job_service import EXPORT_PERMISSIONS, ExportJobService
+from app.services.export_stream import EXPORT_MEDIA_TYPES
+
+
+router = APIRouter(tags=["数据导出"])
+
+
+@router.post("", response_model=Response[ExportJobOut])
+async def create_export_job(
+    request: Request,
+    data: ExportJobCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    创建导出任务
+
+    - 权限与同步导出接口一致（order:export / expense:export / report:export）
+    - 立即返回任务，文件在后台生成，生成成功后通过 download_url 下载
+    - 数据范围和筛选条件相同的请求在生成期间共用同一任务，不重复生成
+    """
+    # 权限检查
+    await check_permission(current_user, EXPORT_PERMISSIONS[data.target_type], db)
+
+    job, created = await ExportJobService.create_job(db, data, current_user)
+    if created:
+        background_tasks.add_task(ExportJobService.run_job_in_background, job.id)
+
+    # 记录审计日志
+    await log_audit(
+        db=db,
+        user=current_user,
+        action="create_export_job",
+        request=request,
+        resource_type="export_job",
+        resource_id=job.id,
+        detail={
+            "target_type": job.target_type.value,
+            "format": job.export_format,
+            "params": job.params,
+            "deduplicated": not created,
+        },
+    )
+
+    return Response(
+        code=0,
+        message="导出任务已创建" if created else "已有相同导出任务在生成中",
+        data=ExportJobOut.from_job(job, settings.api_v1_prefix),
+    )
+
+
+@router.get("", response_model=PaginatedResponse[List[ExportJobOut]])
+async def list_export_jobs(
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    分页查询当前用户的导出任务
+
+    - 按创建时间倒序
+    """
+    jobs, total = await ExportJobService.list_jobs(db, current_user, page, page_size)
+
+    return PaginatedResponse(
+        code=0,
+        message="查询成功",
+        data=[ExportJobOut.from_job(job, settings.api_v1_prefix) for job in jobs],
+        total=total,
+        page=page,
+        page_size=page_size,
+    )
+
+
+@router.get("/{job_id}", response_model=Response[ExportJobOut])
+async def get_export_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    获取导出任务状态
+
+    - 用于轮询生成进度，状态为 success 时返回下载地址
+    """
+    job = await ExportJobService.get_job(db, job_id, current_user)
+
+    return Response(
+        code=0,
+        message="查询成功",
+        data=ExportJobOut.from_job(job, settings.api_v1_prefix),
+    )
+
+
+@router.get("/{job_id}/download")
+async def download_export_file(
+    request: Request,
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    下载导出文件
+
+    - 仅生成成功且未过期的任务可下载
+    """
+    job, file_path = await ExportJobService.get_download_path(db, job_id, current_user)
+
+    # 记录审计日志
+    await log_audit(
+        db=db,
+        user=current_user,
+        action="download_export_file",
+        request=request,
+        resource_type="export_job",
+        resource_id=job.id,
+        detail={
+            "job_name": job.job_name,
+            "file_name": job.file_name,
+            "file_size": job.file_size,
+        },
+    )
+
+    return FileResponse(
+        path=str(file_path),
+        filename=job.file_name or file_path.name,
+        media_type=EXPORT_MEDIA_TYPES[job.export_format],
+    )
@@ -24,6 +24,7 @@ from app.schemas.import_job import (
     ImportJobFilter,
 )
 from app.services.import_service import ImportService
+from app.services.import_worker import import_worker_pool
 from app.services.audit_log_service import log_audit
 from app.core.exceptions import NotFoundException
 
@@ -44,7 +45,7 @@ async def create_import_job(
     创建导入任务（上传文件）
     
     - 支持 Excel (.xlsx, .xls) 和 CSV 文件
-    - 文件大小限制 50MB
+    - 文件大小上限由 IMPORT_MAX_FILE_MB 配置（默认 1024MB），不限制行数
     - 订单和费用记录导入必须指定门店ID
     """
     # 权限检查
@@ -76,20 +77,50 @@ async def run_import_job(
     """
     执行导入任务
     
-    - 解析文件内容
+    任务置为排队中后立即返回，由后台 worker 认领执行（可轮询任务详情查看进度）：
+    - 在子进程中按批（IMPORT_CHUNK_SIZE 行）解析文件内容
     - 校验数据有效性
-    - 批量写入数据库
+    - 每批写入数据库后独立提交，并更新任务进度（processed_rows）
     - 生成错误报告
+    - 增量刷新受影响门店日期的 KPI
     """
     # 权限检查
     await check_permission(current_user, "import_job:run", db)
     
-    # 执行任务
-    job = await ImportService.run_job(db, job_id, current_user)
+    # 加入执行队列
+    job = await ImportService.enqueue_job(db, job_id, current_user)
+    import_worker_pool.notify()
     
     return Response(
         code=0,
-        message="任务执行完成",
+        message="任务已加入执行队列",
+        data=ImportJobOut.model_validate(job),
+    )
+
+
+@router.post("/{job_id}/resume", response_model=Response[ImportJobOut])
+async def resume_import_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    从检查点续传导入任务
+    
+    - 适用于执行失败，或执行进程退出、租约已过期的任务
+    - 已提交的批次、进度和错误记录保留，从 processed_rows 之后的行继续
+    - 续传前校验已处理行的内容哈希，文件有变化时任务失败
+    """
+    # 权限检查
+    await check_permission(current_user, "import_job:run", db)
+    
+    # 加入执行队列
+    job = await ImportService.resume_job(db, job_id, current_user)
+    import_worker_pool.notify()
+    
+    return Response(
+        code=0,
+        message="任务已加入续传队列",
         data=ImportJobOut.model_validate(job),
     )
 
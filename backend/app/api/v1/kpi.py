@@ -3,27 +3,48 @@ KPI 数据 API
 """
 
 from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Request
+from fastapi import Response as HTTPResponse
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from datetime import datetime, date
 
-from app.core.database import get_db
-from app.api.deps import get_current_user
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.exceptions import ValidationException
+from app.api.deps import get_current_user, get_current_user_short_session, check_not_modified
 from app.models.user import User
 from app.models.kpi import KpiDailyStore
 from app.models.store import Store
 from app.models.order import OrderHeader
 from app.models.expense import ExpenseRecord, ExpenseType
-from app.schemas.common import Response, success
-from app.schemas.kpi import KpiRebuildRequest
+from app.schemas.common import PaginatedResponse, Response, success
+from app.schemas.kpi import (
+    KpiHourHeatmapResponse,
+    KpiRebuildJobDetailOut,
+    KpiRebuildJobOut,
+    KpiRebuildRequest,
+    KpiWeekdayHeatmapResponse,
+)
 from app.services.kpi_calculator import KpiCalculator
+from app.services.kpi_refresh_service import count_dirty_cells, refresh_dirty_kpi
+from app.services.kpi_rebuild_job_service import (
+    TERMINAL_STATUSES,
+    KpiRebuildJobService,
+    rebuild_job_progress_key,
+)
+from app.services.kpi_progress import KpiRebuildProgress, stream_progress_events
+from app.services.kpi_rollup_service import aggregate_kpi_buckets
+from app.services import kpi_hourly_service
 from app.services.audit import create_audit_log
 from app.services.data_scope_service import filter_stores_by_access, assert_store_access
 from decimal import Decimal
 
 router = APIRouter()
 
+# SSE 响应头：禁止缓存和反向代理缓冲
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 
 @router.get(
     "/daily",
@@ -32,6 +53,8 @@ router = APIRouter()
     description="获取门店日常KPI数据"
 )
 async def get_daily_kpi(
+    request: Request,
+    response: HTTPResponse,
     store_id: int = Query(None, description="门店ID"),
     date_from: date = Query(None, description="开始日期"),
     date_to: date = Query(None, description="结束日期"),
@@ -41,6 +64,9 @@ async def get_daily_kpi(
     """获取日常KPI数据"""
     # 数据权限过滤：获取可访问的门店ID列表
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        return not_modified
     
     query = select(KpiDailyStore)
     
@@ -79,6 +105,8 @@ async def get_daily_kpi(
     description="获取KPI汇总统计数据"
 )
 async def get_kpi_summary(
+    request: Request,
+    response: HTTPResponse,
     start_date: date = Query(None, description="开始日期"),
     end_date: date = Query(None, description="结束日期"),
     store_id: int = Query(None, description="门店ID"),
@@ -96,26 +124,16 @@ async def get_kpi_summary(
     
     # 数据权限过滤：获取可访问的门店ID列表
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        return not_modified
     
-    # 构建查询条件
-    conditions = [
-        KpiDailyStore.biz_date >= start_date,
-        KpiDailyStore.biz_date <= end_date
-    ]
-    if accessible_store_ids is not None:
-        conditions.append(KpiDailyStore.store_id.in_(accessible_store_ids))
-    
-    # 获取总营收
-    revenue_result = await db.execute(
-        select(func.sum(KpiDailyStore.revenue)).where(and_(*conditions))
+    # 营收、订单数按门店汇总（完整月/周读取汇总表，边缘日期读取日表）
+    store_totals = await aggregate_kpi_buckets(
+        db, [("summary", start_date, end_date)], accessible_store_ids, by_store=True
     )
-    total_revenue = float(revenue_result.scalar() or 0)
-    
-    # 获取总订单数
-    orders_result = await db.execute(
-        select(func.sum(KpiDailyStore.order_count)).where(and_(*conditions))
-    )
-    order_count = int(orders_result.scalar() or 0)
+    total_revenue = float(sum(row["revenue"] for row in store_totals.values()))
+    order_count = int(sum(row["order_count"] for row in store_totals.values()))
     
     # 获取总成本（从费用记录）
     expense_conditions = [
@@ -136,11 +154,8 @@ async def get_kpi_summary(
     )
     expense_count = int(expense_count_result.scalar() or 0)
     
-    # 获取门店数量
-    store_count_result = await db.execute(
-        select(func.count(func.distinct(KpiDailyStore.store_id))).where(and_(*conditions))
-    )
-    store_count = int(store_count_result.scalar() or 0)
+    # 获取门店数量（有 KPI 数据的门店）
+    store_count = sum(1 for row in store_totals.values() if row["day_count"] > 0)
     
     # 计算利润和利润率
     total_profit = total_revenue - total_cost
@@ -170,6 +185,8 @@ async def get_kpi_summary(
     description="获取KPI趋势数据，支持按日、周、月聚合"
 )
 async def get_kpi_trend(
+    request: Request,
+    response: HTTPResponse,
     start_date: date = Query(..., description="开始日期"),
     end_date: date = Query(..., description="结束日期"),
     store_id: int = Query(None, description="门店ID"),
@@ -182,9 +199,12 @@ async def get_kpi_trend(
     
     # 数据权限过滤：获取可访问的门店ID列表
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        return not_modified
     
-    # 查询订单数据，将order_time转换为日期
-    order_date_expr = func.date(OrderHeader.order_time)
+    # 查询订单数据，按业务日期（分区键）汇总，只扫描覆盖日期范围的分区
+    order_date_expr = OrderHeader.biz_date
     query = select(
         order_date_expr.label('order_date'),
         func.sum(OrderHeader.net_amount).label('revenue'),
@@ -192,8 +212,8 @@ async def get_kpi_trend(
     )
     
     conditions = [
-        func.date(OrderHeader.order_time) >= start_date,
-        func.date(OrderHeader.order_time) <= end_date
+        OrderHeader.biz_date >= start_date,
+        OrderHeader.biz_date <= end_date
     ]
     
     if accessible_store_ids is not None:
@@ -276,6 +296,8 @@ async def get_kpi_trend(
     description="按费用类型统计费用金额和占比"
 )
 async def get_expense_category(
+    request: Request,
+    response: HTTPResponse,
     start_date: date = Query(..., description="开始日期"),
     end_date: date = Query(..., description="结束日期"),
     store_id: int = Query(None, description="门店ID"),
@@ -288,6 +310,9 @@ async def get_expense_category(
     
     # 数据权限过滤：获取可访问的门店ID列表
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        return not_modified
     
     # 查询费用记录
     query = select(
@@ -346,6 +371,8 @@ async def get_expense_category(
     description="按营收、利润或利润率对门店进行排名"
 )
 async def get_store_ranking(
+    request: Request,
+    response: HTTPResponse,
     start_date: date = Query(..., description="开始日期"),
     end_date: date = Query(..., description="结束日期"),
     top_n: int = Query(999, description="Top N，999表示全部"),
@@ -358,6 +385,9 @@ async def get_store_ranking(
     
     # 数据权限过滤：获取可访问的门店ID列表
     accessible_store_ids = await filter_stores_by_access(db, current_user, None)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        return not_modified
     
     # 查询订单数据（按门店）
     order_query = select(
@@ -368,8 +398,8 @@ async def get_store_ranking(
     ).join(Store, OrderHeader.store_id == Store.id)
     
     order_conditions = [
-        func.date(OrderHeader.order_time) >= start_date,
-        func.date(OrderHeader.order_time) <= end_date
+        OrderHeader.biz_date >= start_date,
+        OrderHeader.biz_date <= end_date
     ]
     if accessible_store_ids is not None:
         order_conditions.append(OrderHeader.store_id.in_(accessible_store_ids))
@@ -449,6 +479,69 @@ async def get_store_ranking(
     )
 
 
+HEATMAP_METRIC_PATTERN = "^(revenue|order_count|customer_count|dine_in_revenue|takeout_revenue|delivery_revenue|online_revenue)$"
+
+
+@router.get(
+    "/heatmap/hour-of-day",
+    response_model=Response[KpiHourHeatmapResponse],
+    summary="获取小时分布热力图",
+    description="按门店 × 小时（0-23）汇总指标，数据来自小时级 KPI 表"
+)
+async def get_hour_of_day_heatmap(
+    request: Request,
+    response: HTTPResponse,
+    start_date: date = Query(..., description="开始日期"),
+    end_date: date = Query(..., description="结束日期"),
+    store_id: int = Query(None, description="门店ID"),
+    metric: str = Query("revenue", pattern=HEATMAP_METRIC_PATTERN, description="指标"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取小时分布热力图"""
+    if start_date > end_date:
+        raise ValidationException("开始日期不能晚于结束日期")
+    
+    accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        return not_modified
+    data = await kpi_hourly_service.get_hour_of_day_heatmap(
+        db, start_date, end_date, metric, accessible_store_ids
+    )
+    return success(data=data)
+
+
+@router.get(
+    "/heatmap/day-of-week",
+    response_model=Response[KpiWeekdayHeatmapResponse],
+    summary="获取星期分布热力图",
+    description="按星期 × 小时（0-23）统计指标日均值，数据来自小时级 KPI 表"
+)
+async def get_day_of_week_heatmap(
+    request: Request,
+    response: HTTPResponse,
+    start_date: date = Query(..., description="开始日期"),
+    end_date: date = Query(..., description="结束日期"),
+    store_id: int = Query(None, description="门店ID"),
+    metric: str = Query("revenue", pattern=HEATMAP_METRIC_PATTERN, description="指标"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取星期分布热力图"""
+    if start_date > end_date:
+        raise ValidationException("开始日期不能晚于结束日期")
+    
+    accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        return not_modified
+    data = await kpi_hourly_service.get_day_of_week_heatmap(
+        db, start_date, end_date, metric, accessible_store_ids
+    )
+    return success(data=data)
+
+
 @router.post(
     "/rebuild",
     response_model=Response[dict],
@@ -483,12 +576,15 @@ async def rebuild_kpi(
                 detail="门店不存在"
             )
     
-    # 执行重建
-    calculator = KpiCalculator(db)
+    # 执行重建（指定 progress_id 时推送进度）
+    progress = KpiRebuildProgress(rebuild_progress_key(data.progress_id)) if data.progress_id else None
+    calculator = KpiCalculator(db, progress=progress)
     affected_dates, affected_stores, total_records = await calculator.rebuild_daily_kpi(
         start_date=data.start_date,
         end_date=data.end_date,
-        store_id=data.store_id
+        store_id=data.store_id,
+        mode=data.mode,
+        concurrency=data.concurrency
     )
     
     # 记录审计日志
@@ -501,6 +597,8 @@ async def rebuild_kpi(
             "start_date": data.start_date.isoformat(),
             "end_date": data.end_date.isoformat(),
             "store_id": data.store_id,
+            "mode": data.mode,
+            "concurrency": data.concurrency,
             "affected_dates": affected_dates,
             "affected_stores": affected_stores,
             "total_records": total_records
@@ -517,4 +615,283 @@ async def rebuild_kpi(
             "affected_stores": affected_stores,
             "total_records": total_records
         }
-    )
\ No newline at end of file
+    )
+
+
+def rebuild_progress_key(progress_id: str) -> str:
+    """同步重建的进度推送标识"""
+    return f"kpi-rebuild-{progress_id}"
+
+
+@router.get(
+    "/rebuild-progress/{progress_id}/events",
+    summary="订阅KPI重建进度（SSE）",
+    description="以 Server-Sent Events 推送同步重建的进度，需在 POST /kpi/rebuild 时传入相同的 progress_id"
+)
+async def stream_rebuild_progress(
+    progress_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user_short_session)
+):
+    """
+    订阅同步重建进度
+    
+    事件：progress（已完成门店数、已完成日期数、upsert 行数、吞吐量），
+    complete（重建结束，status 为 success/fail），
+    timeout（长时间没有进度或连接时间过长，推送后关闭连接）。
+    推送期间不占用数据库连接。
+    """
+    return StreamingResponse(
+        stream_progress_events(rebuild_progress_key(progress_id), request.is_disconnected),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.get(
+    "/dirty-cells",
+    response_model=Response[dict],
+    summary="待刷新KPI单元数",
+    description="查询源数据变更后尚未重算的 (门店, 日期) 单元数量"
+)
+async def get_dirty_cells(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """查询待刷新的脏单元数量"""
+    pending = await count_dirty_cells(db)
+    return success(data={"pending_cells": pending})
+
+
+@router.post(
+    "/refresh",
+    response_model=Response[dict],
+    summary="增量刷新KPI",
+    description="仅重算订单/费用/导入写入所登记的脏单元"
+)
+async def refresh_kpi(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    增量刷新KPI数据
+    
+    认领全部脏单元并重算对应的日 KPI，无需全范围重建。
+    """
+    refreshed_cells = await refresh_dirty_kpi(db)
+    
+    # 记录审计日志
+    await create_audit_log(
+        db=db,
+        user=current_user,
+        action="REFRESH_KPI",
+        resource="kpi",
+        detail={"refreshed_cells": refreshed_cells},
+        request=request,
+        status_code=200
+    )
+    await db.commit()
+    
+    return success(
+        data={
+            "message": "KPI增量刷新完成",
+            "refreshed_cells": refreshed_cells
+        }
+    )
+
+
+@router.post(
+    "/rebuild-jobs",
+    response_model=Response[KpiRebuildJobOut],
+    summary="创建KPI重建任务",
+    description="以后台任务方式重建KPI，立即返回任务ID，可轮询进度或取消"
+)
+async def create_rebuild_job(
+    data: KpiRebuildRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    创建KPI重建任务
+    
+    - 日期范围按门店和固定天数切分为分片
+    - 多个 worker 并发认领分片执行
+    - 通过 GET /kpi/rebuild-jobs/{job_id} 查询进度
+    """
+    # 如果指定了门店，校验数据权限
+    if data.store_id:
+        await assert_store_access(db, current_user, data.store_id)
+    
+    job = await KpiRebuildJobService.create_job(db, data, current_user)
+    background_tasks.add_task(KpiRebuildJobService.run_job_in_background, job.id)
+    
+    # 记录审计日志
+    await create_audit_log(
+        db=db,
+        user=current_user,
+        action="CREATE_KPI_REBUILD_JOB",
+        resource="kpi",
+        resource_id=str(job.id),
+        detail={
+            "start_date": data.start_date.isoformat(),
+            "end_date": data.end_date.isoformat(),
+            "store_id": data.store_id,
+            "mode": data.mode,
+            "total_chunks": job.total_chunks
+        },
+        request=request,
+        status_code=200
+    )
+    await db.commit()
+    
+    return success(data=KpiRebuildJobOut.model_validate(job), message="KPI重建任务已创建")
+
+
+@router.get(
+    "/rebuild-jobs",
+    response_model=PaginatedResponse[List[KpiRebuildJobOut]],
+    summary="KPI重建任务列表"
+)
+async def list_rebuild_jobs(
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """分页查询KPI重建任务（按创建时间倒序，非超级管理员只能看到自己创建的任务）"""
+    jobs, total = await KpiRebuildJobService.list_jobs(db, current_user, page, page_size)
+    
+    return PaginatedResponse(
+        code=0,
+        message="ok",
+        data=[KpiRebuildJobOut.model_validate(job) for job in jobs],
+        total=total,
+        page=page,
+        page_size=page_size,
+    )
+
+
+@router.get(
+    "/rebuild-jobs/{job_id}",
+    response_model=Response[KpiRebuildJobDetailOut],
+    summary="KPI重建任务详情",
+    description="查询任务状态、完成百分比和各门店进度（仅创建者或超级管理员；门店进度只含可访问的门店）"
+)
+async def get_rebuild_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """查询KPI重建任务进度"""
+    job = await KpiRebuildJobService.get_job(db, job_id, current_user)
+    stores = await KpiRebuildJobService.get_store_progress(db, job_id, current_user)
+    
+    detail = KpiRebuildJobDetailOut(
+        **KpiRebuildJobOut.model_validate(job).model_dump(),
+        stores=stores
+    )
+    return success(data=detail)
+
+
+@router.get(
+    "/rebuild-jobs/{job_id}/events",
+    summary="订阅KPI重建任务进度（SSE）",
+    description="以 Server-Sent Events 推送任务进度，任务结束后推送 complete 事件并关闭连接（仅创建者或超级管理员）"
+)
+async def stream_rebuild_job_progress(
+    job_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user_short_session)
+):
+    """
+    订阅KPI重建任务进度
+    
+    进度由执行任务的 worker 在写入循环中推送；本进程尚无进度时，
+    先按任务记录推送一次当前状态（已结束的任务直接推送 complete 事件）。
+    任务记录用短会话查询，推送期间不占用数据库连接；长时间没有进度时推送 timeout 事件并关闭。
+    """
+    async with AsyncSessionLocal() as db:
+        job = await KpiRebuildJobService.get_job(db, job_id, current_user)
+    initial_event = {
+        "event": "complete" if job.status in TERMINAL_STATUSES else "progress",
+        "status": job.status.value,
+        "job_id": job.id,
+        "cells_done": job.done_cells,
+        "total_cells": job.total_cells,
+        "percent": job.percent,
+    }
+    
+    return StreamingResponse(
+        stream_progress_events(
+            rebuild_job_progress_key(job_id),
+            request.is_disconnected,
+            initial_event=initial_event
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.post(
+    "/rebuild-jobs/{job_id}/cancel",
+    response_model=Response[KpiRebuildJobOut],
+    summary="取消KPI重建任务",
+    description="已认领的分片执行完毕后停止，未处理的分片标记为已取消（仅创建者或超级管理员）"
+)
+async def cancel_rebuild_job(
+    job_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """取消KPI重建任务"""
+    job = await KpiRebuildJobService.cancel_job(db, job_id, current_user)
+    
+    await create_audit_log(
+        db=db,
+        user=current_user,
+        action="CANCEL_KPI_REBUILD_JOB",
+        resource="kpi",
+        resource_id=str(job_id),
+        detail={"status": job.status.value},
+        request=request,
+        status_code=200
+    )
+    await db.commit()
+    
+    return success(data=KpiRebuildJobOut.model_validate(job), message="已请求取消任务")
+
+
+@router.post(
+    "/rebuild-jobs/{job_id}/resume",
+    response_model=Response[KpiRebuildJobOut],
+    summary="续跑KPI重建任务",
+    description="失败或执行中断（分片租约已过期）的任务重新执行未完成的分片，已完成的分片保留（仅创建者或超级管理员）"
+)
+async def resume_rebuild_job(
+    job_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """续跑KPI重建任务"""
+    job = await KpiRebuildJobService.resume_job(db, job_id, current_user)
+    background_tasks.add_task(KpiRebuildJobService.run_job_in_background, job.id)
+    
+    await create_audit_log(
+        db=db,
+        user=current_user,
+        action="RESUME_KPI_REBUILD_JOB",
+        resource="kpi",
+        resource_id=str(job_id),
+        detail={"done_chunks": job.done_chunks, "total_chunks": job.total_chunks},
+        request=request,
+        status_code=200
+    )
+    await db.commit()
+    
+    return success(data=KpiRebuildJobOut.model_validate(job), message="KPI重建任务已重新开始执行")
@@ -3,15 +3,10 @@
 """
 
 from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, Query, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import date, datetime
-import io
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from urllib.parse import quote
 
 from app.core.database import get_db
 from app.core.exceptions import BusinessException, NotFoundException
@@ -23,7 +18,20 @@ from app.schemas.common import Response, success
 from app.schemas.order import OrderCreate
 from app.services.data_scope_service import assert_store_access
 from app.services.audit import create_audit_log
-from app.services.order_service import get_order_list, get_order_export_rows
+from app.services.export_stream import ExportFormat, XlsxStreamWriter, export_response, stream_export
+from app.services.order_service import (
+    ORDER_EXPORT_COLUMNS,
+    ORDER_EXPORT_XLSX_LIMIT,
+    build_order_export_query,
+    get_order_list,
+    register_order_no,
+)
+from app.services.kpi_refresh_service import (
+    DIRTY_REASON_ORDER,
+    mark_kpi_dirty,
+    refresh_dirty_kpi_in_background,
+)
+from app.services.partition_service import ORDER_TABLES, ensure_partitions
 
 router = APIRouter()
 
@@ -71,7 +79,7 @@ async def list_orders(
 @router.get(
     "/export",
     summary="导出订单",
-    description="导出订单列表为Excel文件"
+    description="导出订单列表，支持 xlsx / csv / parquet / arrow 格式"
 )
 async def export_orders(
     request: Request,
@@ -80,12 +88,13 @@ async def export_orders(
     order_no: str = Query(None, description="订单号"),
     start_date: date = Query(None, description="开始日期"),
     end_date: date = Query(None, description="结束日期"),
+    export_format: ExportFormat = Query("xlsx", alias="format", description="导出格式：xlsx / csv / parquet / arrow"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """导出订单列表"""
+    """导出订单列表（xlsx 最多 10000 条，其余格式不限条数，均流式输出）"""
     await check_permission(current_user, "order:export", db)
-    rows = await get_order_export_rows(
+    query = await build_order_export_query(
         db=db,
         current_user=current_user,
         store_id=store_id,
@@ -95,47 +104,20 @@ async def export_orders(
         end_date=end_date,
     )
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "订单列表"
-
-    header_fill = PatternFill(start_color="4A90E2", end_color="4A90E2", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    header_alignment = Alignment(horizontal="center", vertical="center")
-
-    headers = ["序号", "订单号", "门店", "渠道", "金额", "订单时间", "备注", "状态"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-
-    for idx, row in enumerate(rows, 1):
-        ws.cell(row=idx + 1, column=1, value=idx)
-        ws.cell(row=idx + 1, column=2, value=row.OrderHeader.order_no)
-        ws.cell(row=idx + 1, column=3, value=row.store_name or "未知门店")
-        ws.cell(row=idx + 1, column=4, value=row.OrderHeader.channel or "未知")
-        ws.cell(row=idx + 1, column=5, value=float(row.OrderHeader.net_amount or 0))
-        ws.cell(
-            row=idx + 1,
-            column=6,
-            value=row.OrderHeader.order_time.strftime("%Y-%m-%d %H:%M:%S") if row.OrderHeader.order_time else ""
+    count = None
+    if export_format == "xlsx":
+        writer = XlsxStreamWriter()
+        count = await writer.write_query(
+            db,
+            "订单列表",
+            ORDER_EXPORT_COLUMNS,
+            query.limit(ORDER_EXPORT_XLSX_LIMIT),
+            header_color="4A90E2",
+            row_number_title="序号",
         )
-        ws.cell(row=idx + 1, column=7, value=row.OrderHeader.remark or "")
-        ws.cell(row=idx + 1, column=8, value=row.OrderHeader.status or "completed")
-
-    ws.column_dimensions["A"].width = 8
-    ws.column_dimensions["B"].width = 20
-    ws.column_dimensions["C"].width = 15
-    ws.column_dimensions["D"].width = 12
-    ws.column_dimensions["E"].width = 15
-    ws.column_dimensions["F"].width = 22
-    ws.column_dimensions["G"].width = 30
-    ws.column_dimensions["H"].width = 12
-
-    excel_file = io.BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
+        body = writer.iter_bytes()
+    else:
+        body = stream_export(db, query, ORDER_EXPORT_COLUMNS, export_format)
 
     await create_audit_log(
         db=db,
@@ -149,21 +131,19 @@ async def export_orders(
             "order_no": order_no,
             "start_date": start_date.isoformat() if start_date else None,
             "end_date": end_date.isoformat() if end_date else None,
-            "count": len(rows)
+            "format": export_format,
+            "count": count
         },
         request=request,
         status_code=200
     )
     await db.commit()
 
-    filename = f"订单列表_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    encoded_filename = quote(filename)
-    return StreamingResponse(
-        excel_file,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f"attachment; filename=orders.xlsx; filename*=UTF-8''{encoded_filename}"
-        }
+    return export_response(
+        body,
+        export_format,
+        f"订单列表_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        "orders",
     )
 
 
@@ -208,10 +188,14 @@ async def get_order(
 async def create_order(
     data: OrderCreate,
     request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """创建订单"""
+    # 补建目标月份分区（独立会话提交，须在本事务读取订单表之前）
+    await ensure_partitions(ORDER_TABLES, [data.order_time.date()])
+    
     # 数据权限校验：检查是否有权访问该门店
     await assert_store_access(db, current_user, data.store_id)
     
@@ -220,11 +204,8 @@ async def create_order(
     if not store_result.scalar_one_or_none():
         raise NotFoundException("门店不存在")
     
-    # 检查订单号是否已存在
-    existing_order = await db.execute(
-        select(OrderHeader).where(OrderHeader.order_no == data.order_no)
-    )
-    if existing_order.scalar_one_or_none():
+    # 登记订单号（主键保证全局唯一，并发创建同号订单时只有一个成功）
+    if not await register_order_no(db, data.order_no, data.order_time.date()):
         raise BusinessException("订单号已存在")
     
     # 创建订单
@@ -232,16 +213,20 @@ async def create_order(
         store_id=data.store_id,
         channel=data.channel,
         order_no=data.order_no,
+        biz_date=data.order_time.date(),
         net_amount=data.net_amount,
-        total_amount=data.net_amount,  # 简化处理，实际可能需要加上折扣等
+        gross_amount=data.net_amount,  # 简化处理，实际可能需要加上折扣等
         order_time=data.order_time,
         remark=data.remark,
         status="completed"
     )
     
     db.add(order)
+    # 登记受影响的 KPI 单元（与订单同一事务）
+    await mark_kpi_dirty(db, [(order.store_id, order.biz_date)], DIRTY_REASON_ORDER)
     await db.commit()
     await db.refresh(order)
+    background_tasks.add_task(refresh_dirty_kpi_in_background)
     
     # 记录审计日志
     await create_audit_log(
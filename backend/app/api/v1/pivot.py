@@ -0,0 +1,57 @@
+"""
+透视分析 API
+
+通用 KPI 聚合查询：调用方选择维度、指标和筛选条件，服务端编译为一条 SQL
+"""
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db, get_current_user, check_permission
+from app.models.user import User
+from app.schemas.common import Response
+from app.schemas.pivot import PivotQuery, PivotResult
+from app.services import pivot_service
+from app.services.audit_log_service import log_audit
+
+router = APIRouter()
+
+
+@router.post("/query", response_model=Response[PivotResult])
+async def query_pivot(
+    request: Request,
+    query: PivotQuery,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    透视查询
+
+    - 维度：date（按 grain 截断）/ store / channel，可任意组合
+    - 指标：kpi_daily_store 可加总字段及比率（比率由合计值计算）
+    - 门店范围按数据权限强制过滤，结果最多返回 limit 行（truncated 表示被截断）
+
+    权限: report:view
+    """
+    await check_permission(current_user, "report:view", db)
+
+    data = await pivot_service.query_pivot(db, query, current_user)
+
+    await log_audit(
+        db=db,
+        user=current_user,
+        action="view_pivot",
+        request=request,
+        resource_type="report",
+        detail={
+            "dimensions": query.dimensions,
+            "grain": query.grain,
+            "measures": query.measures,
+            "start_date": query.start_date.isoformat(),
+            "end_date": query.end_date.isoformat(),
+            "store_ids": query.store_ids,
+            "record_count": data.row_count,
+        },
+    )
+
+    return Response(code=200, message="查询成功", data=data)
@@ -7,10 +7,10 @@
 from datetime import date
 from typing import List
 
-from fastapi import APIRouter, Depends, Query, Request
+from fastapi import APIRouter, Depends, Query, Request, Response as HTTPResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_current_user, check_permission
+from app.api.deps import get_db, get_current_user, check_permission, check_not_modified
 from app.models.user import User
 from app.schemas.common import Response
 from app.schemas.product_analysis import (
@@ -21,7 +21,7 @@ from app.schemas.product_analysis import (
     ProductStoreCrossItem,
 )
 from app.services import product_analysis_service
-from app.services.audit_log_service import log_audit
+from app.services.audit_log_service import log_audit, log_not_modified_audit
 from app.services.data_scope_service import filter_stores_by_access
 
 router = APIRouter()
@@ -30,6 +30,7 @@ router = APIRouter()
 @router.get("/sales-ranking", response_model=Response[List[ProductSalesRankingItem]])
 async def get_sales_ranking(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
@@ -47,6 +48,11 @@ async def get_sales_ranking(
 
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
 
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "view_product_sales_ranking", current_user, request, "product_analysis")
+        return not_modified
+
     data = await product_analysis_service.get_product_sales_ranking(
         db=db,
         start_date=date.fromisoformat(start_date),
@@ -78,6 +84,7 @@ async def get_sales_ranking(
 @router.get("/category-distribution", response_model=Response[List[CategorySalesItem]])
 async def get_category_distribution(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
@@ -93,6 +100,11 @@ async def get_category_distribution(
 
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
 
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "view_category_distribution", current_user, request, "product_analysis")
+        return not_modified
+
     data = await product_analysis_service.get_category_sales_distribution(
         db=db,
         start_date=date.fromisoformat(start_date),
@@ -120,6 +132,7 @@ async def get_category_distribution(
 @router.get("/profit-contribution", response_model=Response[List[ProductProfitItem]])
 async def get_profit_contribution(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
@@ -136,6 +149,11 @@ async def get_profit_contribution(
 
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
 
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "view_profit_contribution", current_user, request, "product_analysis")
+        return not_modified
+
     data = await product_analysis_service.get_product_profit_contribution(
         db=db,
         start_date=date.fromisoformat(start_date),
@@ -165,6 +183,7 @@ async def get_profit_contribution(
 @router.get("/abc-classification", response_model=Response[List[ProductABCItem]])
 async def get_abc_classification(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
@@ -184,6 +203,11 @@ async def get_abc_classification(
 
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
 
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "view_abc_classification", current_user, request, "product_analysis")
+        return not_modified
+
     data = await product_analysis_service.get_product_abc_classification(
         db=db,
         start_date=date.fromisoformat(start_date),
@@ -211,6 +235,7 @@ async def get_abc_classification(
 @router.get("/product-store-cross", response_model=Response[List[ProductStoreCrossItem]])
 async def get_product_store_cross(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
@@ -229,6 +254,11 @@ async def get_product_store_cross(
 
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
 
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "view_product_store_cross", current_user, request, "product_analysis")
+        return not_modified
+
     data = await product_analysis_service.get_product_store_cross_analysis(
         db=db,
         start_date=date.fromisoformat(start_date),
@@ -4,16 +4,14 @@
 提供日汇总、月汇总、门店绩效、费用明细等报表查询和导出功能
 """
 from datetime import datetime
-from urllib.parse import quote
 from typing import List
 
-from fastapi import APIRouter, Depends, Query, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Query, Request, Response as HTTPResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_current_user, check_permission
+from app.api.deps import get_db, get_current_user, check_permission, check_not_modified
 from app.models.user import User
-from app.schemas.common import Response
+from app.schemas.common import PaginatedResponse, Response
 from app.schemas.report import (
     DailySummaryRow,
     MonthlySummaryRow,
@@ -22,7 +20,9 @@ from app.schemas.report import (
     ReportQuery
 )
 from app.services import report_service
-from app.services.audit_log_service import log_audit
+from app.services.audit_log_service import log_audit, log_not_modified_audit
+from app.services.data_scope_service import filter_stores_by_access
+from app.services.export_stream import ExportFormat, export_response, stream_export
 
 router = APIRouter()
 
@@ -30,6 +30,7 @@ router = APIRouter()
 @router.get("/daily-summary", response_model=Response[List[DailySummaryRow]])
 async def get_daily_summary_report(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
@@ -52,6 +53,13 @@ async def get_daily_summary_report(
         store_id=store_id
     )
     
+    # 数据未变化时直接返回 304
+    accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "view_daily_summary", current_user, request, "report")
+        return not_modified
+    
     # 查询数据（传入current_user进行数据权限过滤）
     data = await report_service.get_daily_summary(db, filters, current_user)
     
@@ -80,6 +88,7 @@ async def get_daily_summary_report(
 @router.get("/monthly-summary", response_model=Response[List[MonthlySummaryRow]])
 async def get_monthly_summary_report(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
@@ -102,6 +111,13 @@ async def get_monthly_summary_report(
         store_id=store_id
     )
     
+    # 数据未变化时直接返回 304
+    accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "view_monthly_summary", current_user, request, "report")
+        return not_modified
+    
     # 查询数据（传入current_user进行数据权限过滤）
     data = await report_service.get_monthly_summary(db, filters, current_user)
     
@@ -127,19 +143,25 @@ async def get_monthly_summary_report(
     )
 
 
-@router.get("/store-performance", response_model=Response[List[StorePerformanceRow]])
+@router.get("/store-performance", response_model=PaginatedResponse[List[StorePerformanceRow]])
 async def get_store_performance_report(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
     top_n: int | None = Query(None, ge=1, le=100, description="TOP N排名（1-100）"),
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int | None = Query(None, ge=1, le=500, description="每页数量（为空表示不分页）"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取门店绩效报表
     
+    - 排名、百分位、与上一等长期间相比的排名变化在 SQL 中计算
+    - 传入 page_size 时按营收排名分页（有 top_n 时在 TOP N 内分页），total 为参与分页的门店数
+    
     权限: report:view
     """
     # 权限检查
@@ -151,11 +173,28 @@ async def get_store_performance_report(
         start_date=date.fromisoformat(start_date),
         end_date=date.fromisoformat(end_date),
         store_id=store_id,
-        top_n=top_n
+        top_n=top_n,
+        page=page,
+        page_size=page_size
     )
     
+    # 数据未变化时直接返回 304
+    accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "view_store_performance", current_user, request, "report")
+        return not_modified
+    
     # 查询数据（传入current_user进行数据权限过滤）
     data = await report_service.get_store_performance(db, filters, current_user)
+    if data:
+        # store_count 由窗口函数在分页之前统计，与页码无关
+        total = min(data[0].store_count, top_n) if top_n else data[0].store_count
+    elif page_size and page > 1:
+        # 页码超出范围时当前页为空，单独统计总数
+        total = await report_service.count_store_performance(db, filters, current_user)
+    else:
+        total = 0
     
     # 记录审计日志
     await log_audit(
@@ -169,20 +208,27 @@ async def get_store_performance_report(
             "end_date": end_date,
             "store_id": store_id,
             "top_n": top_n,
+            "page": page,
+            "page_size": page_size,
             "record_count": len(data)
         }
     )
     
-    return Response(
+    return PaginatedResponse(
         code=200,
         message="查询成功",
-        data=data
+        data=data,
+        total=total,
+        page=page,
+        # 不分页时全部门店在一页内返回
+        page_size=page_size or max(total, 1)
     )
 
 
 @router.get("/expense-breakdown", response_model=Response[List[ExpenseBreakdownRow]])
 async def get_expense_breakdown_report(
     request: Request,
+    response: HTTPResponse,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
@@ -207,6 +253,13 @@ async def get_expense_breakdown_report(
         top_n=top_n
     )
     
+    # 数据未变化时直接返回 304
+    accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
+    not_modified = await check_not_modified(request, response, db, accessible_store_ids)
+    if not_modified:
+        await log_not_modified_audit(db, "view_expense_breakdown", current_user, request, "report")
+        return not_modified
+    
     # 查询数据（传入current_user进行数据权限过滤）
     data = await report_service.get_expense_breakdown(db, filters, current_user)
     
@@ -239,11 +292,15 @@ async def export_report(
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
     store_id: int | None = Query(None, description="门店ID（为空表示全部门店）"),
+    export_format: ExportFormat = Query("xlsx", alias="format", description="导出格式：xlsx / csv / parquet / arrow"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    导出报表为 Excel 文件
+    导出报表
+    
+    - xlsx：日汇总、门店绩效、费用明细三个 Sheet
+    - csv / parquet / arrow：日汇总明细（列名为字段名，便于 pandas / DuckDB 直接加载）
     
     权限: report:export
     """
@@ -258,8 +315,13 @@ async def export_report(
         store_id=store_id
     )
     
-    # 生成Excel（传入current_user进行数据权限过滤）
-    excel_bytes = await report_service.export_report_excel(db, filters, current_user)
+    # 生成导出内容（传入current_user进行数据权限过滤；行数据分批读取，不在内存中累积）
+    if export_format == "xlsx":
+        writer = await report_service.build_report_workbook(db, filters, current_user)
+        body = writer.iter_bytes()
+    else:
+        query = await report_service.build_daily_summary_export_query(db, filters, current_user)
+        body = stream_export(db, query, report_service.DAILY_SUMMARY_EXPORT_COLUMNS, export_format)
     
     # 记录审计日志
     await log_audit(
@@ -272,6 +334,7 @@ async def export_report(
             "start_date": start_date,
             "end_date": end_date,
             "store_id": store_id,
+            "format": export_format,
             "export_time": datetime.now().isoformat()
         }
     )
@@ -280,14 +343,6 @@ async def export_report(
     filename = f"report_{start_date}_{end_date}"
     if store_id:
         filename += f"_store{store_id}"
-    filename += ".xlsx"
-    encoded_filename = quote(filename)
-    
-    # 返回文件流
-    return StreamingResponse(
-        iter([excel_bytes]),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f"attachment; filename=report.xlsx; filename*=UTF-8''{encoded_filename}"
-        }
-    )
+    
+    # 返回文件流（边生成边发送）
+    return export_response(body, export_format, filename, "report")
@@ -20,6 +20,7 @@ from app.schemas.store import (
     StoreInDB,
     StoreListQuery
 )
+from app.services.report_cache import bump_data_versions
 
 router = APIRouter()
 
@@ -210,6 +211,8 @@ async def update_store(
     for field, value in update_data.items():
         setattr(store, field, value)
     
+    # 报表中包含门店名称，使该门店的报表缓存失效
+    await bump_data_versions(db, [store.id])
     await db.commit()
     await db.refresh(store)
     
@@ -80,6 +80,69 @@ class Settings(BaseSettings):
     default_page_size: int = Field(default=20, description="默认分页大小")
     max_page_size: int = Field(default=100, description="最大分页大小")
     
+    # KPI 重建任务配置
+    kpi_rebuild_workers: int = Field(default=4, description="KPI 重建任务并发 worker 数")
+    kpi_rebuild_chunk_days: int = Field(default=31, description="KPI 重建任务每个分片的天数")
+    kpi_rebuild_chunk_lease_seconds: int = Field(
+        default=300,
+        description="KPI 重建分片执行租约秒数，worker 执行期间定期续约；过期的运行中分片可被重新认领"
+    )
+    kpi_rebuild_concurrency: int = Field(
+        default=4,
+        description="进程内 KPI 重建占用的并发会话数上限（parallel 模式分片与重建任务 worker 共用，需小于连接池 pool_size + max_overflow）"
+    )
+    kpi_business_timezone: str = Field(
+        default="Asia/Shanghai",
+        description="业务时区，小时级 KPI 按该时区切分下单时间的小时"
+    )
+
+    # 分区表配置
+    partition_months_ahead: int = Field(
+        default=3,
+        description="订单、费用分区表预建的未来月份数（启动时自动创建）"
+    )
+
+    # 导出任务配置
+    export_storage_dir: str = Field(default="uploads/exports", description="导出任务文件存储目录")
+    export_job_ttl_hours: int = Field(default=24, description="导出文件保留小时数，过期后删除")
+    export_job_timeout_minutes: int = Field(
+        default=60,
+        description="导出任务生成超时分钟数，超时的待生成/生成中任务视为失败，不再参与去重"
+    )
+    export_cleanup_interval_minutes: int = Field(default=30, description="过期导出文件清理间隔（分钟）")
+
+    # 报表缓存配置
+    report_cache_enabled: bool = Field(default=True, description="是否启用报表结果缓存")
+    report_cache_backend: str = Field(
+        default="memory",
+        description="报表缓存后端：memory（进程内 LRU）/ redis（需配置 REDIS_URL，多进程共享）"
+    )
+    report_cache_max_entries: int = Field(default=256, description="进程内报表缓存最大条目数")
+    report_cache_ttl_seconds: int = Field(
+        default=600,
+        description="报表缓存过期秒数（数据变化由门店数据版本失效，过期只用于回收）"
+    )
+
+    # 数据导入配置
+    import_chunk_size: int = Field(
+        default=5000,
+        description="导入任务每批处理的行数（每批独立事务提交并记录进度）"
+    )
+    import_max_file_mb: int = Field(default=1024, description="导入文件大小上限（MB）")
+    import_worker_enabled: bool = Field(
+        default=True,
+        description="是否在本进程启动导入 worker（多进程部署时可只在部分进程启用）"
+    )
+    import_worker_concurrency: int = Field(
+        default=2,
+        description="同时执行的导入任务数（每个任务占用一个文件解析子进程）"
+    )
+    import_worker_poll_seconds: int = Field(default=5, description="导入 worker 轮询排队任务的间隔（秒）")
+    import_job_lease_seconds: int = Field(
+        default=300,
+        description="导入任务执行租约秒数，worker 定期续约；过期的运行中任务由其他 worker 从检查点续传"
+    )
+    
     @validator('cors_origins', pre=True)
     def parse_cors_origins(cls, v):
         if isinstance(v, str):
@@ -4,7 +4,8 @@ FastAPI 应用主入口
 配置和启动 FastAPI 应用，包含中间件、异常处理器、路由注册等
 """
 
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from typing import AsyncGenerator
 
 from fastapi import FastAPI, Request
@@ -25,6 +26,9 @@ from app.core.exceptions import (
     general_exception_handler,
 )
 from app.api.router import api_router
+from app.services.export_job_service import ExportJobService
+from app.services.import_worker import import_worker_pool
+from app.services.partition_service import ensure_future_partitions
 
 
 @asynccontextmanager
@@ -49,6 +53,21 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         except Exception as e:
             logger.error(f"❌ 数据库表创建失败: {e}")
     
+    # 预建订单、费用分区表的未来月份分区
+    try:
+        created = await ensure_future_partitions()
+        logger.info(f"✅ 分区检查完成，新建分区 {created} 个")
+    except Exception as e:
+        logger.error(f"❌ 分区检查失败: {e}")
+    
+    # 定期清理过期的导出文件
+    export_cleanup_task = asyncio.create_task(ExportJobService.cleanup_loop())
+    
+    # 导入任务后台 worker（认领排队任务，文件在子进程中解析）
+    if settings.import_worker_enabled:
+        import_worker_pool.start()
+        logger.info(f"✅ 导入 worker 已启动，并发数 {settings.import_worker_concurrency}")
+    
     logger.info(f"🎉 应用启动成功！运行环境: {settings.environment}")
     
     yield
@@ -56,6 +75,14 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # 关闭时执行
     logger.info("🔄 应用关闭中...")
     
+    # 停止导出文件清理任务
+    export_cleanup_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await export_cleanup_task
+    
+    # 停止导入 worker
+    await import_worker_pool.stop()
+    
     # 关闭数据库连接
     await engine.dispose()
     logger.info("✅ 数据库连接已关闭")
@@ -12,9 +12,9 @@ from app.models.base import IDMixin, TimestampMixin, SoftDeleteMixin, UserTracki
 from app.models.user import User, Role, Permission, user_role, role_permission
 from app.models.user_store import UserStorePermission
 from app.models.store import Store, ProductCategory, Product
-from app.models.order import OrderHeader, OrderItem
-from app.models.expense import ExpenseType, ExpenseRecord
-from app.models.kpi import KpiDailyStore
+from app.models.order import OrderHeader, OrderItem, OrderNoRegistry
+from app.models.expense import ExpenseType, ExpenseRecord, ExpenseMonthlyCube
+from app.models.kpi import KpiDailyStore, KpiDirtyCell, KpiHourlyStore, KpiWeeklyStore, KpiMonthlyStore, ReportDataVersion
 from app.models.audit_log import AuditLog
 from app.models.budget import Budget
 from app.models.import_job import (
@@ -24,6 +24,16 @@ from app.models.import_job import (
     ImportTargetType,
     ImportJobStatus,
 )
+from app.models.kpi_rebuild_job import (
+    KpiRebuildJob,
+    KpiRebuildJobChunk,
+    KpiRebuildJobStatus,
+)
+from app.models.export_job import (
+    DataExportJob,
+    ExportTargetType,
+    ExportJobStatus,
+)
 
 # 导出所有模型
 __all__ = [
@@ -47,13 +57,20 @@ __all__ = [
     # Order models
     "OrderHeader",
     "OrderItem",
+    "OrderNoRegistry",
     # Expense models
     "ExpenseType",
     "ExpenseRecord",
+    "ExpenseMonthlyCube",
     # Budget models
     "Budget",
     # KPI models
     "KpiDailyStore",
+    "KpiDirtyCell",
+    "KpiWeeklyStore",
+    "KpiMonthlyStore",
+    "KpiHourlyStore",
+    "ReportDataVersion",
     "AuditLog",
     # Import job models
     "DataImportJob",
@@ -61,4 +78,12 @@ __all__ = [
     "ImportSourceType",
     "ImportTargetType",
     "ImportJobStatus",
+    # KPI rebuild job models
+    "KpiRebuildJob",
+    "KpiRebuildJobChunk",
+    "KpiRebuildJobStatus",
+    # Export job models
+    "DataExportJob",
+    "ExportTargetType",
+    "ExportJobStatus",
 ]
\ No newline at end of file
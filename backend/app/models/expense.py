@@ -1,16 +1,16 @@
 """
 费用管理模型
 
-包含费用科目和费用记录
+包含费用科目、费用记录和费用月度汇总
 """
 
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, datetime
 from decimal import Decimal
 from typing import List
 
-from sqlalchemy import Boolean, CheckConstraint, Date, ForeignKey, Integer, Numeric, String, Text, UniqueConstraint
+from sqlalchemy import Boolean, CheckConstraint, Column, Date, DateTime, ForeignKey, Integer, Numeric, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base, IDMixin, TimestampMixin, SoftDeleteMixin
@@ -121,14 +121,19 @@ class ExpenseRecord(Base, IDMixin, TimestampMixin, SoftDeleteMixin):
     """
     费用记录模型
     
-    记录具体的费用支出
+    记录具体的费用支出。按 biz_date 月度范围分区，数据库主键为 (id, biz_date)，ORM 仍以 id 作为标识
     """
     
     __tablename__ = "expense_record"
     __table_args__ = (
         CheckConstraint("amount >= 0", name="ck_expense_record_amount"),
-        {"comment": "费用记录表"}
+        # 导入记录的去重键；手工录入的记录为 NULL，不受约束
+        UniqueConstraint("import_key", "biz_date", name="uq_expense_record_import_key_biz_date"),
+        {"comment": "费用记录表（按 biz_date 月度分区）", "postgresql_partition_by": "RANGE (biz_date)"}
     )
+    __mapper_args__ = {"primary_key": ["id"]}
+    
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True, comment="主键ID")
     
     # 门店关联
     store_id: Mapped[int] = mapped_column(
@@ -151,9 +156,10 @@ class ExpenseRecord(Base, IDMixin, TimestampMixin, SoftDeleteMixin):
     # 业务日期
     biz_date: Mapped[date] = mapped_column(
         Date,
+        primary_key=True,
         nullable=False,
         index=True,
-        comment="业务日期"
+        comment="业务日期（分区键）"
     )
     
     # 金额信息
@@ -183,6 +189,12 @@ class ExpenseRecord(Base, IDMixin, TimestampMixin, SoftDeleteMixin):
         comment="供应商"
     )
     
+    import_key: Mapped[str | None] = mapped_column(
+        String(32),
+        nullable=True,
+        comment="导入去重键（门店、日期、科目、金额、说明的 md5，仅导入的记录有值）"
+    )
+    
     # 支付信息
     payment_method: Mapped[str | None] = mapped_column(
         String(20),
@@ -256,4 +268,71 @@ class ExpenseRecord(Base, IDMixin, TimestampMixin, SoftDeleteMixin):
     )
     
     def __repr__(self) -> str:
-        return f"<ExpenseRecord(id={self.id}, store_id={self.store_id}, amount={self.amount})>"
\ No newline at end of file
+        return f"<ExpenseRecord(id={self.id}, store_id={self.store_id}, amount={self.amount})>"
+
+
+# 计入费用统计的状态（已审批、已支付）
+EXPENSE_EFFECTIVE_STATUSES = ("approved", "paid")
+
+
+class ExpenseMonthlyCube(Base):
+    """
+    费用月度汇总模型
+
+    按 (门店, 费用科目, 月份) 汇总未删除且已审批/已支付的费用记录，
+    费用记录写入时在同一事务内重算受影响的 (门店, 月份)
+    """
+
+    __tablename__ = "expense_monthly_cube"
+    __table_args__ = (
+        {"comment": "费用月度汇总表（门店 × 科目 × 月）"}
+    )
+
+    store_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("store.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="门店ID"
+    )
+
+    expense_type_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("expense_type.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+        comment="费用科目ID"
+    )
+
+    month_start: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+        index=True,
+        comment="月份第一天"
+    )
+
+    total_amount: Mapped[Decimal] = mapped_column(
+        Numeric(14, 2),
+        nullable=False,
+        default=Decimal("0.00"),
+        comment="费用合计"
+    )
+
+    record_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="费用记录数"
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default="now()",
+        comment="最后刷新时间"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<ExpenseMonthlyCube(store_id={self.store_id}, expense_type_id={self.expense_type_id}, "
+            f"month_start={self.month_start})>"
+        )
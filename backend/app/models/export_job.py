@@ -0,0 +1,96 @@
+"""
+数据导出任务模型
+
+记录后台导出任务的参数、状态和生成的文件，文件过期后由清理任务删除
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Text, text, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+from enum import Enum
+
+from app.models.base import Base, IDMixin, TimestampMixin
+
+
+class ExportTargetType(str, Enum):
+    """导出数据类型"""
+    ORDERS = "orders"
+    EXPENSE_RECORDS = "expense_records"
+    REPORT = "report"
+
+
+class ExportJobStatus(str, Enum):
+    """导出任务状态"""
+    PENDING = "pending"   # 待生成
+    RUNNING = "running"   # 生成中
+    SUCCESS = "success"   # 已生成，可下载
+    FAIL = "fail"         # 生成失败
+    EXPIRED = "expired"   # 文件已过期清理
+
+
+class DataExportJob(Base, IDMixin, TimestampMixin):
+    """数据导出任务表"""
+
+    __tablename__ = "data_export_jobs"
+
+    job_name = Column(String(200), nullable=False, comment="任务名称")
+    target_type = Column(
+        SQLEnum(
+            ExportTargetType,
+            name="export_target_type",
+            create_type=False,
+            values_callable=lambda e: [item.value for item in e],
+        ),
+        nullable=False,
+        comment="导出数据类型 (orders/expense_records/report)"
+    )
+    export_format = Column(String(20), nullable=False, default="xlsx", comment="导出格式 (xlsx/csv/parquet/arrow)")
+    status = Column(
+        SQLEnum(
+            ExportJobStatus,
+            name="export_job_status",
+            create_type=False,
+            values_callable=lambda e: [item.value for item in e],
+        ),
+        nullable=False,
+        default=ExportJobStatus.PENDING,
+        comment="任务状态"
+    )
+
+    # 导出参数与去重
+    params = Column(JSONB, nullable=True, comment="导出筛选条件")
+    dedupe_key = Column(String(64), nullable=False, comment="去重键（数据类型、格式、筛选条件、可访问门店的摘要）")
+
+    # 生成结果
+    file_name = Column(String(500), nullable=True, comment="下载文件名")
+    file_path = Column(String(1000), nullable=True, comment="文件存储路径")
+    file_size = Column(BigInteger, nullable=True, comment="文件大小（字节）")
+    row_count = Column(Integer, nullable=True, comment="导出行数（xlsx 格式统计）")
+    error_message = Column(Text, nullable=True, comment="错误信息")
+    started_at = Column(DateTime, nullable=True, comment="开始生成时间")
+    finished_at = Column(DateTime, nullable=True, comment="结束时间")
+    expires_at = Column(DateTime, nullable=True, comment="文件过期时间")
+
+    # 创建用户
+    created_by_id = Column(Integer, ForeignKey("user.id", ondelete="SET NULL"), nullable=True, comment="创建用户ID")
+
+    # 关系
+    created_by = relationship("User", foreign_keys=[created_by_id])
+
+    # 索引
+    __table_args__ = (
+        Index("idx_export_job_status", "status"),
+        Index("idx_export_job_created_by", "created_by_id"),
+        Index("idx_export_job_created_at", "created_at"),
+        Index("idx_export_job_expires_at", "expires_at"),
+        # 同一去重键最多一个待生成/生成中的任务，并发提交时由数据库保证只生成一次
+        Index(
+            "uq_export_job_active_dedupe_key",
+            "dedupe_key",
+            unique=True,
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<DataExportJob(id={self.id}, target_type='{self.target_type}', status='{self.status}')>"
@@ -29,6 +29,7 @@ class ImportTargetType(str, Enum):
 class ImportJobStatus(str, Enum):
     """导入任务状态"""
     PENDING = "pending"           # 待处理
+    QUEUED = "queued"             # 排队中（等待后台 worker 认领）
     RUNNING = "running"           # 运行中
     SUCCESS = "success"           # 全部成功
     PARTIAL_FAIL = "partial_fail" # 部分失败
@@ -67,6 +68,19 @@ class DataImportJob(Base, IDMixin, TimestampMixin):
     success_rows = Column(Integer, nullable=False, default=0, comment="成功行数")
     fail_rows = Column(Integer, nullable=False, default=0, comment="失败行数")
     
+    # 分批导入进度（每批提交后更新）
+    processed_rows = Column(Integer, nullable=False, default=0, server_default="0", comment="已处理行数（进度检查点）")
+    checkpoint_at = Column(DateTime, nullable=True, comment="最近一次批次提交时间")
+    checkpoint_hash = Column(String(64), nullable=True, comment="已处理行内容的 sha256（续传时校验文件未变化）")
+    
+    # 后台执行
+    queued_at = Column(DateTime, nullable=True, comment="加入执行队列时间")
+    started_at = Column(DateTime, nullable=True, comment="开始执行时间")
+    finished_at = Column(DateTime, nullable=True, comment="执行结束时间")
+    error_message = Column(Text, nullable=True, comment="任务失败原因")
+    lease_owner = Column(String(100), nullable=True, comment="执行中任务的 worker 标识")
+    lease_expires_at = Column(DateTime, nullable=True, comment="执行租约到期时间（过期视为执行进程已退出）")
+    
     # 错误报告
     error_report_path = Column(String(1000), nullable=True, comment="错误报告文件路径")
     
@@ -1,7 +1,7 @@
 """
 KPI 和审计日志模型
 
-包含日指标汇总和审计日志
+包含日指标汇总、周/月汇总、小时级指标和审计日志
 """
 
 from __future__ import annotations
@@ -10,7 +10,7 @@ from datetime import date, datetime
 from decimal import Decimal
 
 from sqlalchemy import (
-    CheckConstraint, Date, DateTime, ForeignKey, Integer, 
+    BigInteger, CheckConstraint, Date, DateTime, ForeignKey, Integer, 
     Numeric, String, Text, UniqueConstraint
 )
 from sqlalchemy.dialects.postgresql import JSONB
@@ -216,6 +216,245 @@ class KpiDailyStore(Base, IDMixin, TimestampMixin):
         return f"<KpiDailyStore(id={self.id}, biz_date={self.biz_date}, store_id={self.store_id})>"
 
 
+class KpiRollupMixin:
+    """
+    KPI 汇总（周/月）公共字段
+
+    只保存可加总的指标，比率类指标（利润率、客单价）在查询时由合计值计算；
+    store_id 为空表示全品牌汇总行
+    """
+
+    store_id: Mapped[int | None] = mapped_column(
+        Integer,
+        ForeignKey("store.id", ondelete="CASCADE"),
+        nullable=True,
+        index=True,
+        comment="门店ID（为空表示全品牌汇总）"
+    )
+
+    # 营收指标
+    revenue: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="营业收入（gross）")
+    refund_amount: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="退款金额")
+    discount_amount: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="优惠金额")
+    net_revenue: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="净收入")
+
+    # 成本指标
+    cost_total: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="总成本")
+    cost_material: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="原材料成本")
+    cost_labor: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="人工成本")
+    cost_rent: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="租金成本")
+    cost_utilities: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="水电煤成本")
+    cost_marketing: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="营销成本")
+    cost_other: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="其他成本")
+
+    # 利润指标
+    gross_profit: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="毛利润")
+    operating_profit: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="营业利润")
+
+    # 订单指标
+    order_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="订单数")
+    customer_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="客户数")
+
+    # 渠道分布
+    dine_in_revenue: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="堂食收入")
+    takeout_revenue: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="外带收入")
+    delivery_revenue: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="外卖收入")
+    online_revenue: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=Decimal("0.00"), comment="线上收入")
+
+    # 覆盖的日 KPI 行数
+    day_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="汇总的日 KPI 行数")
+
+
+class KpiWeeklyStore(Base, IDMixin, TimestampMixin, KpiRollupMixin):
+    """
+    门店周度 KPI 汇总模型
+
+    由 kpi_daily_store 按自然周（周一开始）汇总，日 KPI 变化时同步刷新
+    """
+
+    __tablename__ = "kpi_weekly_store"
+    __table_args__ = (
+        UniqueConstraint(
+            "week_start", "store_id",
+            name="uq_kpi_weekly_store_week_store",
+            postgresql_nulls_not_distinct=True
+        ),
+        {"comment": "门店周度 KPI 汇总表"}
+    )
+
+    week_start: Mapped[date] = mapped_column(
+        Date,
+        nullable=False,
+        index=True,
+        comment="周开始日期（周一）"
+    )
+
+    def __repr__(self) -> str:
+        return f"<KpiWeeklyStore(week_start={self.week_start}, store_id={self.store_id})>"
+
+
+class KpiMonthlyStore(Base, IDMixin, TimestampMixin, KpiRollupMixin):
+    """
+    门店月度 KPI 汇总模型
+
+    由 kpi_daily_store 按自然月汇总，日 KPI 变化时同步刷新；
+    年度汇总直接合计 12 个月度行
+    """
+
+    __tablename__ = "kpi_monthly_store"
+    __table_args__ = (
+        UniqueConstraint(
+            "month_start", "store_id",
+            name="uq_kpi_monthly_store_month_store",
+            postgresql_nulls_not_distinct=True
+        ),
+        {"comment": "门店月度 KPI 汇总表"}
+    )
+
+    month_start: Mapped[date] = mapped_column(
+        Date,
+        nullable=False,
+        index=True,
+        comment="月份第一天"
+    )
+
+    def __repr__(self) -> str:
+        return f"<KpiMonthlyStore(month_start={self.month_start}, store_id={self.store_id})>"
+
+
+class KpiHourlyStore(Base, IDMixin, TimestampMixin):
+    """
+    门店小时级 KPI 模型
+
+    按 (业务日期, 门店, 小时) 汇总已完成订单，用于时段分析和热力图；
+    只保存有订单的小时，与日 KPI 同步增量维护
+    """
+
+    __tablename__ = "kpi_hourly_store"
+    __table_args__ = (
+        UniqueConstraint("biz_date", "store_id", "hour", name="uq_kpi_hourly_store_date_store_hour"),
+        CheckConstraint("hour >= 0 AND hour <= 23", name="ck_kpi_hourly_store_hour"),
+        {"comment": "门店小时级 KPI 表"}
+    )
+
+    biz_date: Mapped[date] = mapped_column(
+        Date,
+        nullable=False,
+        index=True,
+        comment="业务日期"
+    )
+
+    store_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("store.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="门店ID"
+    )
+
+    hour: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="小时（0-23，按业务时区）"
+    )
+
+    # 营收与订单
+    revenue: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=Decimal("0.00"), comment="营业收入")
+    order_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="订单数")
+    customer_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="客户数")
+
+    # 渠道分布
+    dine_in_revenue: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=Decimal("0.00"), comment="堂食收入")
+    takeout_revenue: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=Decimal("0.00"), comment="外带收入")
+    delivery_revenue: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=Decimal("0.00"), comment="外卖收入")
+    online_revenue: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=Decimal("0.00"), comment="线上收入")
+
+    def __repr__(self) -> str:
+        return f"<KpiHourlyStore(biz_date={self.biz_date}, store_id={self.store_id}, hour={self.hour})>"
+
+
+class KpiDirtyCell(Base, IDMixin):
+    """
+    KPI 脏单元登记模型
+
+    订单、费用等源数据写入时登记受影响的 (门店, 日期)，
+    由刷新器认领后仅重算这些单元的 kpi_daily_store 记录
+    """
+
+    __tablename__ = "kpi_dirty_cell"
+    __table_args__ = (
+        UniqueConstraint("store_id", "biz_date", name="uq_kpi_dirty_cell_store_date"),
+        {"comment": "KPI 脏单元登记表"}
+    )
+
+    store_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("store.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="门店ID"
+    )
+
+    biz_date: Mapped[date] = mapped_column(
+        Date,
+        nullable=False,
+        comment="业务日期"
+    )
+
+    reason: Mapped[str | None] = mapped_column(
+        String(50),
+        nullable=True,
+        comment="登记来源（order/expense/import/consistency）"
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default="now()",
+        comment="登记时间"
+    )
+
+    def __repr__(self) -> str:
+        return f"<KpiDirtyCell(store_id={self.store_id}, biz_date={self.biz_date})>"
+
+
+class ReportDataVersion(Base):
+    """
+    门店数据版本模型
+
+    门店的源数据或 KPI 写入时版本号 +1（与写入同一事务），
+    报表结果缓存的键包含范围内门店的版本号，数据变化后旧缓存不再命中
+    """
+
+    __tablename__ = "report_data_version"
+    __table_args__ = (
+        {"comment": "门店数据版本表（报表缓存失效）"}
+    )
+
+    store_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("store.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="门店ID"
+    )
+
+    version: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=1,
+        comment="数据版本号"
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default="now()",
+        comment="最后变更时间"
+    )
+
+    def __repr__(self) -> str:
+        return f"<ReportDataVersion(store_id={self.store_id}, version={self.version})>"
+
+
 class AuditLog(Base, IDMixin):
     """
     审计日志模型
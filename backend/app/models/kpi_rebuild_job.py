@@ -0,0 +1,121 @@
+"""
+KPI 重建任务模型
+
+记录后台 KPI 重建任务的状态、进度和分片信息
+"""
+
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, String, Text,
+    Enum as SQLEnum
+)
+from sqlalchemy.orm import relationship
+from enum import Enum
+
+from app.models.base import Base, IDMixin, TimestampMixin
+
+
+class KpiRebuildJobStatus(str, Enum):
+    """KPI 重建任务/分片状态"""
+    PENDING = "pending"       # 待处理
+    RUNNING = "running"       # 运行中
+    SUCCESS = "success"       # 已完成
+    FAIL = "fail"             # 失败
+    CANCELLED = "cancelled"   # 已取消
+
+
+class KpiRebuildJob(Base, IDMixin, TimestampMixin):
+    """KPI 重建任务表"""
+
+    __tablename__ = "kpi_rebuild_jobs"
+
+    start_date = Column(Date, nullable=False, comment="开始日期")
+    end_date = Column(Date, nullable=False, comment="结束日期")
+    store_id = Column(Integer, ForeignKey("store.id", ondelete="SET NULL"), nullable=True, comment="门店ID（为空表示全部门店）")
+    mode = Column(String(20), nullable=False, default="bulk", comment="重建模式 (bulk/per_cell)")
+    status = Column(
+        SQLEnum(
+            KpiRebuildJobStatus,
+            name="kpi_rebuild_job_status",
+            create_type=False,
+            values_callable=lambda e: [item.value for item in e],
+        ),
+        nullable=False,
+        default=KpiRebuildJobStatus.PENDING,
+        comment="任务状态"
+    )
+
+    # 进度统计
+    total_chunks = Column(Integer, nullable=False, default=0, comment="分片总数")
+    done_chunks = Column(Integer, nullable=False, default=0, comment="已完成分片数")
+    failed_chunks = Column(Integer, nullable=False, default=0, comment="失败分片数")
+    total_cells = Column(Integer, nullable=False, default=0, comment="(门店, 日期) 单元总数")
+    done_cells = Column(Integer, nullable=False, default=0, comment="已重算单元数")
+
+    # 取消与结果
+    cancel_requested = Column(Boolean, nullable=False, default=False, comment="是否已请求取消")
+    error_message = Column(Text, nullable=True, comment="错误信息")
+    started_at = Column(DateTime, nullable=True, comment="开始执行时间")
+    finished_at = Column(DateTime, nullable=True, comment="结束时间")
+
+    # 创建用户
+    created_by_id = Column(Integer, ForeignKey("user.id", ondelete="SET NULL"), nullable=True, comment="创建用户ID")
+
+    # 关系
+    created_by = relationship("User", foreign_keys=[created_by_id])
+    chunks = relationship("KpiRebuildJobChunk", back_populates="job", cascade="all, delete-orphan")
+
+    # 索引
+    __table_args__ = (
+        Index("idx_kpi_rebuild_job_status", "status"),
+        Index("idx_kpi_rebuild_job_created_at", "created_at"),
+    )
+
+    @property
+    def percent(self) -> float:
+        """完成百分比（按单元计）"""
+        if not self.total_cells:
+            return 0.0
+        return round(self.done_cells * 100 / self.total_cells, 2)
+
+    def __repr__(self):
+        return f"<KpiRebuildJob(id={self.id}, status='{self.status}', {self.done_cells}/{self.total_cells})>"
+
+
+class KpiRebuildJobChunk(Base, IDMixin, TimestampMixin):
+    """KPI 重建任务分片表（单门店 + 连续日期段）"""
+
+    __tablename__ = "kpi_rebuild_job_chunks"
+
+    job_id = Column(Integer, ForeignKey("kpi_rebuild_jobs.id", ondelete="CASCADE"), nullable=False, comment="任务ID")
+    store_id = Column(Integer, ForeignKey("store.id", ondelete="CASCADE"), nullable=False, comment="门店ID")
+    start_date = Column(Date, nullable=False, comment="分片开始日期")
+    end_date = Column(Date, nullable=False, comment="分片结束日期")
+    status = Column(
+        SQLEnum(
+            KpiRebuildJobStatus,
+            name="kpi_rebuild_job_status",
+            create_type=False,
+            values_callable=lambda e: [item.value for item in e],
+        ),
+        nullable=False,
+        default=KpiRebuildJobStatus.PENDING,
+        comment="分片状态"
+    )
+    cell_count = Column(Integer, nullable=False, default=0, comment="分片单元数")
+    worker = Column(String(100), nullable=True, comment="处理该分片的 worker 标识")
+    lease_expires_at = Column(DateTime, nullable=True, comment="执行租约到期时间（过期视为 worker 已退出，可重新认领）")
+    error_message = Column(Text, nullable=True, comment="错误信息")
+    started_at = Column(DateTime, nullable=True, comment="开始时间")
+    finished_at = Column(DateTime, nullable=True, comment="结束时间")
+
+    # 关系
+    job = relationship("KpiRebuildJob", back_populates="chunks")
+
+    # 索引
+    __table_args__ = (
+        Index("idx_kpi_rebuild_chunk_job_status", "job_id", "status"),
+        Index("idx_kpi_rebuild_chunk_job_store", "job_id", "store_id"),
+    )
+
+    def __repr__(self):
+        return f"<KpiRebuildJobChunk(id={self.id}, job_id={self.job_id}, store_id={self.store_id}, status='{self.status}')>"
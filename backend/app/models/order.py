@@ -9,7 +9,20 @@ from __future__ import annotations
 from datetime import date, datetime
 from decimal import Decimal
 
-from sqlalchemy import Date, DateTime, ForeignKey, Integer, Numeric, String, Text, UniqueConstraint, CheckConstraint
+from sqlalchemy import (
+    CheckConstraint,
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    ForeignKeyConstraint,
+    Integer,
+    Numeric,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base, IDMixin, TimestampMixin
@@ -19,17 +32,21 @@ class OrderHeader(Base, IDMixin, TimestampMixin):
     """
     订单主表
     
-    存储订单汇总信息
+    存储订单汇总信息。按 biz_date 月度范围分区，数据库主键为 (id, biz_date)，
+    ORM 仍以 id 作为标识；订单号唯一约束需包含分区键，跨日期的全局唯一由 order_no_registry 保证
     """
     
     __tablename__ = "order_header"
     __table_args__ = (
-        UniqueConstraint("order_no", name="uq_order_header_order_no"),
+        UniqueConstraint("order_no", "biz_date", name="uq_order_header_order_no_biz_date"),
         CheckConstraint("gross_amount >= 0", name="ck_order_header_gross_amount"),
         CheckConstraint("discount_amount >= 0", name="ck_order_header_discount_amount"),
         CheckConstraint("net_amount >= 0", name="ck_order_header_net_amount"),
-        {"comment": "订单主表"}
+        {"comment": "订单主表（按 biz_date 月度分区）", "postgresql_partition_by": "RANGE (biz_date)"}
     )
+    __mapper_args__ = {"primary_key": ["id"]}
+    
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True, comment="主键ID")
     
     # 订单基本信息
     order_no: Mapped[str] = mapped_column(
@@ -49,9 +66,10 @@ class OrderHeader(Base, IDMixin, TimestampMixin):
     
     biz_date: Mapped[date] = mapped_column(
         Date,
+        primary_key=True,
         nullable=False,
         index=True,
-        comment="业务日期"
+        comment="业务日期（分区键）"
     )
     
     order_time: Mapped[datetime] = mapped_column(
@@ -183,26 +201,41 @@ class OrderItem(Base, IDMixin, TimestampMixin):
     """
     订单明细表
     
-    存储订单商品明细信息
+    存储订单商品明细信息。与订单同按 biz_date 月度分区，
+    通过 (order_id, biz_date) 引用订单，biz_date 由 ORM 关系自动与订单同步
     """
     
     __tablename__ = "order_item"
     __table_args__ = (
+        ForeignKeyConstraint(
+            ["order_id", "biz_date"],
+            ["order_header.id", "order_header.biz_date"],
+            ondelete="CASCADE",
+        ),
         CheckConstraint("quantity > 0", name="ck_order_item_quantity"),
         CheckConstraint("unit_price >= 0", name="ck_order_item_unit_price"),
         CheckConstraint("line_amount >= 0", name="ck_order_item_line_amount"),
-        {"comment": "订单明细表"}
+        {"comment": "订单明细表（按 biz_date 月度分区）", "postgresql_partition_by": "RANGE (biz_date)"}
     )
+    __mapper_args__ = {"primary_key": ["id"]}
+    
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True, comment="主键ID")
     
     # 订单关联
     order_id: Mapped[int] = mapped_column(
         Integer,
-        ForeignKey("order_header.id", ondelete="CASCADE"),
         nullable=False,
         index=True,
         comment="订单ID"
     )
     
+    biz_date: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+        nullable=False,
+        comment="业务日期（分区键，与所属订单一致）"
+    )
+    
     # 产品信息（使用快照）
     product_id: Mapped[int] = mapped_column(
         Integer,
@@ -281,4 +314,39 @@ class OrderItem(Base, IDMixin, TimestampMixin):
     product: Mapped["Product"] = relationship("Product")
     
     def __repr__(self) -> str:
-        return f"<OrderItem(id={self.id}, order_id={self.order_id}, product_name='{self.product_name}')>"
\ No newline at end of file
+        return f"<OrderItem(id={self.id}, order_id={self.order_id}, product_name='{self.product_name}')>"
+
+
+class OrderNoRegistry(Base):
+    """
+    订单号登记表
+
+    分区表上的唯一约束必须包含分区键，order_header 只能保证 (order_no, biz_date) 唯一；
+    该表不分区，以 order_no 为主键，写入订单前先在同一事务内登记订单号，
+    登记失败（已存在）即视为重复订单，并发写入同号订单时由主键冲突串行化
+    """
+
+    __tablename__ = "order_no_registry"
+    __table_args__ = {"comment": "订单号登记表（保证订单号全局唯一）"}
+
+    order_no: Mapped[str] = mapped_column(
+        String(50),
+        primary_key=True,
+        comment="订单号"
+    )
+
+    biz_date: Mapped[date] = mapped_column(
+        Date,
+        nullable=False,
+        comment="订单业务日期"
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default=func.now(),
+        comment="登记时间"
+    )
+
+    def __repr__(self) -> str:
+        return f"<OrderNoRegistry(order_no='{self.order_no}', biz_date={self.biz_date})>"
@@ -0,0 +1,67 @@
+"""
+数据导出任务 Schema
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.models.export_job import ExportJobStatus, ExportTargetType
+from app.services.export_stream import ExportFormat
+
+
+# ==================== 请求 Schema ====================
+
+class ExportJobCreate(BaseModel):
+    """
+    创建导出任务
+
+    筛选条件与同步导出接口一致：
+    - orders：store_id / channel / order_no / start_date / end_date
+    - expense_records：store_id / expense_type_id / start_date / end_date
+    - report：start_date / end_date（必填）/ store_id
+    """
+    target_type: ExportTargetType = Field(..., description="导出数据类型")
+    export_format: ExportFormat = Field("xlsx", alias="format", description="导出格式：xlsx / csv / parquet / arrow")
+    store_id: Optional[int] = Field(None, description="门店ID")
+    channel: Optional[str] = Field(None, description="渠道（订单）")
+    order_no: Optional[str] = Field(None, description="订单号（订单）")
+    expense_type_id: Optional[int] = Field(None, description="费用类型ID（费用记录）")
+    start_date: Optional[date] = Field(None, description="开始日期")
+    end_date: Optional[date] = Field(None, description="结束日期")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+# ==================== 响应 Schema ====================
+
+class ExportJobOut(BaseModel):
+    """导出任务输出"""
+    id: int
+    job_name: str
+    target_type: ExportTargetType
+    export_format: str
+    status: ExportJobStatus
+    params: Optional[Dict[str, Any]]
+    file_name: Optional[str]
+    file_size: Optional[int]
+    row_count: Optional[int]
+    error_message: Optional[str]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    expires_at: Optional[datetime]
+    created_by_id: Optional[int]
+    created_at: datetime
+    updated_at: datetime
+    download_url: Optional[str] = Field(None, description="下载地址（生成成功后可用）")
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def from_job(cls, job, api_prefix: str):
+        """从 ORM 对象转换，生成成功的任务附带下载地址"""
+        data = cls.model_validate(job)
+        if job.status == ExportJobStatus.SUCCESS:
+            data.download_url = f"{api_prefix}/export-jobs/{job.id}/download"
+        return data
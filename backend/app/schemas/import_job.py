@@ -54,6 +54,13 @@ class ImportJobOut(BaseModel):
     total_rows: int
     success_rows: int
     fail_rows: int
+    processed_rows: int = 0
+    checkpoint_at: Optional[datetime] = None
+    lease_expires_at: Optional[datetime] = None
+    queued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error_message: Optional[str] = None
     error_report_path: Optional[str]
     created_by_id: Optional[int]
     created_at: datetime
@@ -82,6 +89,13 @@ class ImportJobDetailOut(ImportJobOut):
             "total_rows": job.total_rows,
             "success_rows": job.success_rows,
             "fail_rows": job.fail_rows,
+            "processed_rows": job.processed_rows,
+            "checkpoint_at": job.checkpoint_at,
+            "lease_expires_at": job.lease_expires_at,
+            "queued_at": job.queued_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "error_message": job.error_message,
             "error_report_path": job.error_report_path,
             "created_by_id": job.created_by_id,
             "created_at": job.created_at,
@@ -111,6 +125,7 @@ class ImportJobListItem(BaseModel):
     total_rows: int
     success_rows: int
     fail_rows: int
+    processed_rows: int = 0
     created_by_id: Optional[int]
     created_at: datetime
     
@@ -4,7 +4,7 @@ KPI 相关 Schema 定义
 包含 KPI 数据的请求和响应模型
 """
 
-from datetime import date
+from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
@@ -17,13 +17,30 @@ class KpiRebuildRequest(BaseModel):
     start_date: date = Field(..., description="开始日期")
     end_date: date = Field(..., description="结束日期")
     store_id: Optional[int] = Field(None, description="门店ID（可选，不填则重建所有门店）")
+    mode: str = Field(
+        "bulk",
+        pattern="^(bulk|per_cell|parallel)$",
+        description="重建模式：bulk（集合式批量 upsert）/per_cell（逐门店逐日）/parallel（多会话并发）"
+    )
+    concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        le=20,
+        description="parallel 模式的并发会话数（可选，默认使用系统配置，超过系统配置时按系统配置执行）"
+    )
+    progress_id: Optional[str] = Field(
+        None,
+        pattern="^[A-Za-z0-9_-]{1,64}$",
+        description="进度订阅标识（可选，由客户端生成；同步重建时可通过 GET /kpi/rebuild-progress/{progress_id}/events 订阅进度）"
+    )
     
     class Config:
         json_schema_extra = {
             "example": {
                 "start_date": "2024-01-01",
                 "end_date": "2024-01-31",
-                "store_id": 1
+                "store_id": 1,
+                "mode": "bulk"
             }
         }
 
@@ -167,6 +184,37 @@ class StoreRankingResponse(BaseModel):
     date_range: Dict[str, str] = Field(..., description="日期范围")
 
 
+class KpiHourHeatmapRow(BaseModel):
+    """小时分布热力图行（单个门店）"""
+    store_id: int = Field(..., description="门店ID")
+    store_name: str = Field("", description="门店名称")
+    values: List[float] = Field(default_factory=list, description="0-23 点各小时的合计值")
+    total: float = Field(0, description="行合计")
+
+
+class KpiHourHeatmapResponse(BaseModel):
+    """小时分布热力图响应（门店 × 小时）"""
+    metric: str = Field(..., description="指标")
+    hours: List[int] = Field(default_factory=list, description="小时列表（0-23）")
+    rows: List[KpiHourHeatmapRow] = Field(default_factory=list, description="门店行")
+    hour_totals: List[float] = Field(default_factory=list, description="各小时合计")
+
+
+class KpiWeekdayHeatmapRow(BaseModel):
+    """星期分布热力图行（单个星期）"""
+    weekday: int = Field(..., description="星期（1=周一 ... 7=周日）")
+    day_count: int = Field(0, description="日期范围内该星期的天数")
+    values: List[float] = Field(default_factory=list, description="0-23 点各小时的日均值")
+    total: float = Field(0, description="行合计（日均）")
+
+
+class KpiWeekdayHeatmapResponse(BaseModel):
+    """星期分布热力图响应（星期 × 小时）"""
+    metric: str = Field(..., description="指标")
+    hours: List[int] = Field(default_factory=list, description="小时列表（0-23）")
+    rows: List[KpiWeekdayHeatmapRow] = Field(default_factory=list, description="星期行")
+
+
 class KpiRebuildResponse(BaseModel):
     """KPI 重建响应"""
     message: str = Field(..., description="操作结果消息")
@@ -185,6 +233,48 @@ class KpiRebuildResponse(BaseModel):
         }
 
 
+
+class KpiRebuildJobOut(BaseModel):
+    """KPI 重建任务输出"""
+    id: int
+    start_date: date = Field(..., description="开始日期")
+    end_date: date = Field(..., description="结束日期")
+    store_id: Optional[int] = Field(None, description="门店ID（为空表示全部门店）")
+    mode: str = Field(..., description="重建模式")
+    status: str = Field(..., description="任务状态 (pending/running/success/fail/cancelled)")
+    total_chunks: int = Field(0, description="分片总数")
+    done_chunks: int = Field(0, description="已完成分片数")
+    failed_chunks: int = Field(0, description="失败分片数")
+    total_cells: int = Field(0, description="(门店, 日期) 单元总数")
+    done_cells: int = Field(0, description="已重算单元数")
+    percent: float = Field(0.0, description="完成百分比")
+    cancel_requested: bool = Field(False, description="是否已请求取消")
+    error_message: Optional[str] = Field(None, description="错误信息")
+    started_at: Optional[datetime] = Field(None, description="开始执行时间")
+    finished_at: Optional[datetime] = Field(None, description="结束时间")
+    created_by_id: Optional[int] = Field(None, description="创建用户ID")
+    created_at: datetime = Field(..., description="创建时间")
+    
+    class Config:
+        from_attributes = True
+
+
+class KpiRebuildStoreProgress(BaseModel):
+    """KPI 重建任务门店进度"""
+    store_id: int = Field(..., description="门店ID")
+    store_name: str = Field(..., description="门店名称")
+    total_chunks: int = Field(0, description="分片总数")
+    done_chunks: int = Field(0, description="已完成分片数")
+    failed_chunks: int = Field(0, description="失败分片数")
+    total_cells: int = Field(0, description="单元总数")
+    done_cells: int = Field(0, description="已重算单元数")
+    percent: float = Field(0.0, description="完成百分比")
+
+
+class KpiRebuildJobDetailOut(KpiRebuildJobOut):
+    """KPI 重建任务详情（含门店进度）"""
+    stores: List[KpiRebuildStoreProgress] = Field(default_factory=list, description="各门店进度")
+
 # ==================== 完整 KPI 数据模型（与数据库模型对应） ====================
 
 class KpiDailyStoreSchema(BaseModel):
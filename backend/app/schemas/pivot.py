@@ -0,0 +1,58 @@
+"""
+透视分析 Schema
+
+定义通用 KPI 聚合查询的请求参数和响应模型
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Dict, List, Literal
+
+from pydantic import BaseModel, Field
+
+
+# 单次查询返回的最大行数
+PIVOT_MAX_ROWS = 5000
+
+PivotDimension = Literal["date", "store", "channel"]
+PivotGrain = Literal["day", "week", "month", "quarter", "year"]
+
+
+class PivotQuery(BaseModel):
+    """透视查询参数"""
+
+    dimensions: List[PivotDimension] = Field(
+        default_factory=list,
+        description="维度：date=日期（按 grain 截断）, store=门店, channel=渠道；为空表示只返回合计行",
+    )
+    grain: PivotGrain = Field("day", description="日期粒度：day/week/month/quarter/year（维度含 date 时生效）")
+    measures: List[str] = Field(
+        ...,
+        min_length=1,
+        description="指标：KPI 可加总字段（如 revenue、gross_profit、order_count）或比率（如 gross_profit_rate）",
+    )
+    start_date: date = Field(..., description="开始日期")
+    end_date: date = Field(..., description="结束日期")
+    store_ids: List[int] | None = Field(None, description="门店ID筛选（为空表示全部可访问门店）")
+    channels: List[str] | None = Field(None, description="渠道筛选（维度含 channel 时生效）")
+    sort_by: str | None = Field(None, description="排序字段（维度或指标名），为空时按维度排序")
+    descending: bool = Field(False, description="是否倒序")
+    limit: int = Field(1000, ge=1, le=PIVOT_MAX_ROWS, description=f"返回行数上限（1-{PIVOT_MAX_ROWS}）")
+
+
+class PivotColumn(BaseModel):
+    """结果列"""
+
+    name: str = Field(..., description="字段名")
+    label: str = Field(..., description="中文名")
+    kind: Literal["dimension", "measure"] = Field(..., description="列类型")
+
+
+class PivotResult(BaseModel):
+    """透视查询结果"""
+
+    columns: List[PivotColumn] = Field(..., description="结果列（维度在前，指标在后）")
+    rows: List[Dict[str, Any]] = Field(..., description="结果行")
+    row_count: int = Field(..., description="返回行数")
+    truncated: bool = Field(False, description="是否因超过 limit 被截断")
@@ -17,6 +17,8 @@ class ReportQuery(BaseModel):
     store_id: Optional[int] = Field(None, description="门店ID（为空表示全部门店）")
     top_n: Optional[int] = Field(None, ge=1, le=100, description="TOP N排名（1-100）")
     group_by: Optional[str] = Field(None, description="分组字段（day/week/month/store）")
+    page: int = Field(1, ge=1, description="页码（门店绩效分页）")
+    page_size: Optional[int] = Field(None, ge=1, le=500, description="每页数量（门店绩效分页，为空表示不分页）")
 
 
 # ==================== 响应模型 ====================
@@ -112,6 +114,13 @@ class StorePerformanceRow(BaseModel):
     # 排名
     revenue_rank: Optional[int] = Field(None, description="营收排名")
     profit_rank: Optional[int] = Field(None, description="利润排名")
+    revenue_percentile: Optional[Decimal] = Field(None, description="营收百分位（%，不高于该门店的门店占比）")
+    profit_percentile: Optional[Decimal] = Field(None, description="利润百分位（%）")
+    prev_revenue_rank: Optional[int] = Field(None, description="上期营收排名（上一等长期间，无数据为空）")
+    prev_profit_rank: Optional[int] = Field(None, description="上期利润排名")
+    revenue_rank_change: Optional[int] = Field(None, description="营收排名变化（正数表示上升）")
+    profit_rank_change: Optional[int] = Field(None, description="利润排名变化（正数表示上升）")
+    store_count: Optional[int] = Field(None, description="参与排名的门店数")
     
     class Config:
         from_attributes = True
@@ -345,3 +345,26 @@ async def log_audit(
         status=status,
         error_message=error_message,
     )
+
+
+async def log_not_modified_audit(
+    db: AsyncSession,
+    action: str,
+    user: User,
+    request: Request,
+    resource_type: Optional[str] = None,
+) -> AuditLog:
+    """
+    记录条件请求命中（304）的查看审计
+
+    304 响应不执行查询，详情只记录请求参数并标记 not_modified，
+    与正常查看使用同一 action，保证轮询也有查看记录。
+    """
+    return await log_audit(
+        db=db,
+        user=user,
+        action=action,
+        request=request,
+        resource_type=resource_type,
+        detail={**dict(request.query_params), "not_modified": True},
+    )
@@ -1,13 +1,14 @@
 from datetime import date
 import calendar
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select
 from decimal import Decimal
 
 from app.models.budget import Budget
-from app.models.expense import ExpenseRecord, ExpenseType
+from app.models.expense import ExpenseType
 from app.models.user import User
 from app.schemas.budget import BudgetAnalysisResponse, BudgetAnalysisItem, BudgetItemCreate
+from app.services.expense_cube_service import sum_expenses_by_type
 
 async def batch_save_budgets(
     db: AsyncSession, 
@@ -78,24 +79,12 @@ async def get_budget_analysis(
     result = await db.execute(stmt)
     budgets = {b.expense_type_id: b.amount for b in result.scalars().all()}
     
-    # 3. 获取实际费用数据 (Approved/Paid)
+    # 3. 获取实际费用数据（读取费用月度汇总，口径为已审批/已支付且未删除）
     _, last_day = calendar.monthrange(year, month)
     start_date = date(year, month, 1)
     end_date = date(year, month, last_day)
     
-    stmt = select(
-        ExpenseRecord.expense_type_id,
-        func.sum(ExpenseRecord.amount)
-    ).where(
-        ExpenseRecord.store_id == store_id,
-        ExpenseRecord.biz_date >= start_date,
-        ExpenseRecord.biz_date <= end_date,
-        ExpenseRecord.status.in_(['approved', 'paid']), # 仅统计已审批和已支付
-        ExpenseRecord.is_deleted == False
-    ).group_by(ExpenseRecord.expense_type_id)
-    
-    result = await db.execute(stmt)
-    actuals = {row[0]: row[1] for row in result.all()}
+    actuals = await sum_expenses_by_type(db, start_date, end_date, [store_id])
     
     # 4. 组合数据
     items = []
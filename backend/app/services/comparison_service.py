@@ -24,6 +24,7 @@ from app.schemas.comparison import (
     TrendComparisonResponse,
     StoreComparisonItem,
 )
+from app.services.kpi_rollup_service import aggregate_kpi_buckets
 
 
 # ──────────────────── 工具函数 ────────────────────
@@ -108,39 +109,41 @@ _METRIC_DEFS: list[tuple[str, str, Any]] = [
 ]
 
 
-async def _aggregate_period(
+async def _aggregate_periods(
     db: AsyncSession,
-    start: date,
-    end: date,
+    periods: dict[str, tuple[date, date]],
     accessible_store_ids: list[int] | None = None,
-) -> dict[str, float]:
-    """对指定期间进行汇总聚合，返回各指标值的字典"""
-    # 构造聚合列 (排除 avg_order_value，单独处理)
-    agg_columns = [
-        col for name, _, col in _METRIC_DEFS if col is not None
-    ]
-    query = select(*agg_columns)
-    query = query.select_from(KpiDailyStore)
-    query = _kpi_base_filter(query, start, end, accessible_store_ids)
-
-    result = await db.execute(query)
-    row = result.one()
-
-    values: dict[str, float] = {}
-    idx = 0
-    for name, _, col in _METRIC_DEFS:
-        if col is not None:
-            values[name] = _to_float(row[idx])
-            idx += 1
-
-    # 计算客单价 = 净收入 / 订单数
-    order_count = values.get("order_count", 0)
-    if order_count > 0:
-        values["avg_order_value"] = round(values.get("net_revenue", 0) / order_count, 2)
-    else:
-        values["avg_order_value"] = 0.0
+) -> dict[str, dict[str, float]]:
+    """
+    对多个期间进行汇总聚合（一条 SQL），返回 {期间标识: 各指标值}
+
+    完整月/周读取 kpi_monthly_store / kpi_weekly_store，边缘零散日期读取日表；
+    不限门店时直接使用全品牌汇总行。
+    """
+    totals = await aggregate_kpi_buckets(
+        db,
+        [(label, start, end) for label, (start, end) in periods.items()],
+        accessible_store_ids,
+        by_store=False,
+    )
+
+    result: dict[str, dict[str, float]] = {}
+    for label in periods:
+        row = totals.get((label, None), {})
+        values: dict[str, float] = {
+            name: _to_float(row.get(name)) for name, _, col in _METRIC_DEFS if col is not None
+        }
 
-    return values
+        # 计算客单价 = 净收入 / 订单数
+        order_count = values.get("order_count", 0)
+        if order_count > 0:
+            values["avg_order_value"] = round(values.get("net_revenue", 0) / order_count, 2)
+        else:
+            values["avg_order_value"] = 0.0
+
+        result[label] = values
+
+    return result
 
 
 # ──────────────── 核心服务函数 ────────────────
@@ -164,13 +167,14 @@ async def get_period_comparison(
         start_date, end_date, compare_type, compare_start_date, compare_end_date
     )
 
-    # 并行聚合当期和对比期
-    current_vals = await _aggregate_period(
-        db, start_date, end_date, accessible_store_ids
-    )
-    previous_vals = await _aggregate_period(
-        db, prev_start, prev_end, accessible_store_ids
+    # 一次聚合当期和对比期
+    period_vals = await _aggregate_periods(
+        db,
+        {"current": (start_date, end_date), "previous": (prev_start, prev_end)},
+        accessible_store_ids,
     )
+    current_vals = period_vals["current"]
+    previous_vals = period_vals["previous"]
 
     # 构造指标对比列表
     metrics: list[MetricComparison] = []
@@ -3,9 +3,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from decimal import Decimal
 
-from app.models.expense import ExpenseType, ExpenseRecord
+from app.models.expense import ExpenseType
 from app.models.kpi import KpiDailyStore
 from app.schemas.cvp import CVPAnalysisResult, CVPSimulationResult
+from app.services.expense_cube_service import sum_expenses_by_type
 
 async def update_cost_behavior(
     db: AsyncSession,
@@ -70,32 +71,21 @@ async def calculate_cvp(
     result = await db.execute(stmt)
     cost_behaviors = {row[0]: row[1] for row in result.all()}
     
-    # 查询费用记录
-    expense_query = select(
-        ExpenseRecord.expense_type_id,
-        func.sum(ExpenseRecord.amount)
-    ).where(
-        ExpenseRecord.biz_date >= start_date,
-        ExpenseRecord.biz_date <= end_date,
-        ExpenseRecord.status.in_(['approved', 'paid']),
-        ExpenseRecord.is_deleted == False
-    )
-    
+    # 查询费用（读取费用月度汇总，口径为已审批/已支付且未删除）
     if store_id:
-        expense_query = expense_query.where(ExpenseRecord.store_id == store_id)
+        expense_store_ids = [store_id]
     elif accessible_store_ids:
-        expense_query = expense_query.where(ExpenseRecord.store_id.in_(accessible_store_ids))
-    
-    expense_query = expense_query.group_by(ExpenseRecord.expense_type_id)
+        expense_store_ids = accessible_store_ids
+    else:
+        expense_store_ids = None
     
-    result = await db.execute(expense_query)
-    expense_data = result.all()
+    expense_totals = await sum_expenses_by_type(db, start_date, end_date, expense_store_ids)
     
     # 分类汇总
     fixed_cost_from_expense = Decimal('0.00')
     variable_cost_from_expense = Decimal('0.00')
     
-    for etype_id, amount in expense_data:
+    for etype_id, amount in expense_totals.items():
         behavior = cost_behaviors.get(etype_id, 'variable')
         if behavior == 'fixed':
             fixed_cost_from_expense += amount
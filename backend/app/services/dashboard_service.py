@@ -15,7 +15,7 @@ from dateutil.relativedelta import relativedelta
 from sqlalchemy import select, func, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.expense import ExpenseRecord, ExpenseType
+from app.models.expense import ExpenseType
 from app.models.kpi import KpiDailyStore
 from app.models.store import Store
 from app.schemas.dashboard import (
@@ -26,6 +26,7 @@ from app.schemas.dashboard import (
     ChannelDistribution,
     DashboardOverview,
 )
+from app.services.expense_cube_service import expense_fact_subquery
 
 
 def _to_float(val: Any) -> float:
@@ -226,24 +227,18 @@ async def get_dashboard_overview(
         for row in rank_result.all()
     ]
 
-    # ── 4. 费用结构 ──
+    # ── 4. 费用结构（读取费用月度汇总） ──
+    expense_fact = expense_fact_subquery(start_date, end_date, accessible_store_ids)
     expense_query = (
         select(
             ExpenseType.name,
-            func.sum(ExpenseRecord.amount).label("total"),
+            func.sum(expense_fact.c.total_amount).label("total"),
         )
-        .select_from(ExpenseRecord)
-        .join(ExpenseType, ExpenseRecord.expense_type_id == ExpenseType.id)
-        .where(ExpenseRecord.biz_date >= start_date)
-        .where(ExpenseRecord.biz_date <= end_date)
-        .where(ExpenseRecord.status == "approved")
+        .select_from(expense_fact)
+        .join(ExpenseType, expense_fact.c.expense_type_id == ExpenseType.id)
         .group_by(ExpenseType.name)
         .order_by(desc("total"))
     )
-    if accessible_store_ids is not None:
-        expense_query = expense_query.where(
-            ExpenseRecord.store_id.in_(accessible_store_ids)
-        )
     expense_result = await db.execute(expense_query)
 
     expense_structure: list[ExpenseStructureItem] = [
@@ -0,0 +1,203 @@
+"""
+费用月度汇总服务
+
+- 口径：未删除且状态为已审批/已支付的费用记录（EXPENSE_EFFECTIVE_STATUSES），只在此处定义
+- 刷新：费用记录新增、修改、删除、导入时，在同一事务内按受影响的 (门店, 月份)
+  从 expense_record 重新汇总 expense_monthly_cube
+- 查询：日期范围中的完整自然月读取汇总表，首尾零散日期读取明细表，合并为一个子查询
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, and_, cast, delete, func, literal_column, or_, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.expense import EXPENSE_EFFECTIVE_STATUSES, ExpenseMonthlyCube, ExpenseRecord
+from app.services.kpi_rollup_service import month_start_of, next_month_start
+
+
+def effective_expense_conditions() -> List[Any]:
+    """计入费用统计的记录条件（未删除、已审批或已支付）"""
+    return [
+        ExpenseRecord.is_deleted.is_(False),
+        ExpenseRecord.status.in_(EXPENSE_EFFECTIVE_STATUSES),
+    ]
+
+
+# ──────────────────── 刷新 ────────────────────
+
+
+async def refresh_expense_cube(db: AsyncSession, cells: Iterable[Tuple[int, date]]) -> None:
+    """
+    重算受影响 (门店, 月份) 的汇总行（不提交）
+
+    需在费用记录变更之后、mark_kpi_dirty 之前于同一事务内调用：
+    按 (门店, 月份) 顺序加事务级咨询锁，并发写入同一门店月份时串行重算，
+    后提交的事务能读到先提交的记录；先于版本号加锁，避免与其他写入互相等待。
+
+    Args:
+        db: 数据库会话
+        cells: 发生变化的 (store_id, biz_date)，修改记录时应同时包含修改前后的单元
+    """
+    months = sorted({
+        (store_id, month_start_of(biz_date))
+        for store_id, biz_date in cells
+        if store_id is not None and biz_date is not None
+    })
+    if not months:
+        return
+
+    # 会话未开启自动 flush，先写出待提交的记录变更
+    await db.flush()
+
+    for store_id, month_start in months:
+        await db.execute(select(func.pg_advisory_xact_lock(
+            store_id, month_start.year * 12 + month_start.month
+        )))
+
+    await db.execute(
+        delete(ExpenseMonthlyCube).where(
+            tuple_(ExpenseMonthlyCube.store_id, ExpenseMonthlyCube.month_start).in_(months)
+        )
+    )
+
+    # 月份以字面量渲染，保证 SELECT 与 GROUP BY 中的表达式完全一致
+    month_expr = cast(func.date_trunc(literal_column("'month'"), ExpenseRecord.biz_date), Date)
+    source = (
+        select(
+            ExpenseRecord.store_id,
+            ExpenseRecord.expense_type_id,
+            month_expr.label("month_start"),
+            func.sum(ExpenseRecord.amount).label("total_amount"),
+            func.count(ExpenseRecord.id).label("record_count"),
+        )
+        .where(
+            ExpenseRecord.store_id.in_(sorted({store_id for store_id, _ in months})),
+            ExpenseRecord.biz_date >= min(m for _, m in months),
+            ExpenseRecord.biz_date < next_month_start(max(m for _, m in months)),
+            tuple_(ExpenseRecord.store_id, month_expr).in_(months),
+            *effective_expense_conditions(),
+        )
+        .group_by(ExpenseRecord.store_id, ExpenseRecord.expense_type_id, month_expr)
+    )
+    await db.execute(
+        ExpenseMonthlyCube.__table__.insert().from_select(
+            ["store_id", "expense_type_id", "month_start", "total_amount", "record_count"],
+            source,
+        )
+    )
+
+
+# ──────────────────── 查询 ────────────────────
+
+
+def split_month_range(
+    start_date: date,
+    end_date: date
+) -> Tuple[Optional[Tuple[date, date]], List[Tuple[date, date]]]:
+    """
+    将闭区间切分为完整月份段和零散日期段
+
+    Returns:
+        (完整月份 [首月第一天, 末月之后的月份第一天)，无完整月时为 None；
+         [(零散段开始, 零散段结束)] 闭区间列表)
+    """
+    if start_date > end_date:
+        return None, []
+
+    cube_from = start_date if start_date.day == 1 else next_month_start(start_date)
+    cube_to = month_start_of(end_date + timedelta(days=1))
+    if cube_from >= cube_to:
+        return None, [(start_date, end_date)]
+
+    day_ranges = []
+    if start_date < cube_from:
+        day_ranges.append((start_date, cube_from - timedelta(days=1)))
+    if cube_to <= end_date:
+        day_ranges.append((cube_to, end_date))
+    return (cube_from, cube_to), day_ranges
+
+
+def expense_fact_subquery(
+    start_date: date,
+    end_date: date,
+    store_ids: Optional[Sequence[int]] = None
+) -> Any:
+    """
+    日期范围内的费用事实子查询
+
+    列：store_id, expense_type_id, total_amount, record_count（同一门店科目可能有多行，
+    调用方按需要的维度再次汇总）。
+
+    Args:
+        start_date: 开始日期
+        end_date: 结束日期
+        store_ids: 门店范围，None 表示全部门店
+    """
+    month_range, day_ranges = split_month_range(start_date, end_date)
+    selects = []
+
+    if month_range is not None:
+        cube_conditions = [
+            ExpenseMonthlyCube.month_start >= month_range[0],
+            ExpenseMonthlyCube.month_start < month_range[1],
+        ]
+        if store_ids is not None:
+            cube_conditions.append(ExpenseMonthlyCube.store_id.in_(store_ids))
+        selects.append(
+            select(
+                ExpenseMonthlyCube.store_id,
+                ExpenseMonthlyCube.expense_type_id,
+                ExpenseMonthlyCube.total_amount,
+                ExpenseMonthlyCube.record_count,
+            ).where(and_(*cube_conditions))
+        )
+
+    if day_ranges:
+        record_conditions = [
+            or_(*[ExpenseRecord.biz_date.between(d_start, d_end) for d_start, d_end in day_ranges]),
+            *effective_expense_conditions(),
+        ]
+        if store_ids is not None:
+            record_conditions.append(ExpenseRecord.store_id.in_(store_ids))
+        selects.append(
+            select(
+                ExpenseRecord.store_id,
+                ExpenseRecord.expense_type_id,
+                func.sum(ExpenseRecord.amount).label("total_amount"),
+                func.count(ExpenseRecord.id).label("record_count"),
+            )
+            .where(and_(*record_conditions))
+            .group_by(ExpenseRecord.store_id, ExpenseRecord.expense_type_id)
+        )
+
+    if not selects:
+        # 空范围：返回无行的子查询，调用方无需特殊处理
+        selects.append(
+            select(
+                ExpenseMonthlyCube.store_id,
+                ExpenseMonthlyCube.expense_type_id,
+                ExpenseMonthlyCube.total_amount,
+                ExpenseMonthlyCube.record_count,
+            ).where(ExpenseMonthlyCube.store_id.is_(None))
+        )
+
+    if len(selects) == 1:
+        return selects[0].subquery("expense_fact")
+    return union_all(*selects).subquery("expense_fact")
+
+
+async def sum_expenses_by_type(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    store_ids: Optional[Sequence[int]] = None
+) -> Dict[int, Decimal]:
+    """按费用科目汇总日期范围内的费用 {expense_type_id: 合计}"""
+    fact = expense_fact_subquery(start_date, end_date, store_ids)
+    result = await db.execute(
+        select(fact.c.expense_type_id, func.sum(fact.c.total_amount))
+        .group_by(fact.c.expense_type_id)
+    )
+    return {row[0]: row[1] or Decimal("0.00") for row in result.all()}
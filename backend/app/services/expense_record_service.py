@@ -5,13 +5,14 @@
 from datetime import date
 from typing import Any
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import Select, and_, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.expense import ExpenseRecord, ExpenseType
 from app.models.store import Store
 from app.models.user import User
 from app.services.data_scope_service import filter_stores_by_access
+from app.services.export_stream import ExportColumn
 
 
 def _build_expense_conditions(
@@ -98,15 +99,29 @@ async def get_expense_record_list(
     }
 
 
-async def get_expense_record_export_rows(
+# 费用记录导出列（与 build_expense_record_export_query 的列顺序一致）
+EXPENSE_RECORD_EXPORT_COLUMNS = [
+    ExportColumn("store_name", "门店"),
+    ExportColumn("expense_type_name", "费用类型", width=18),
+    ExportColumn("expense_type_category", "费用分类"),
+    ExportColumn("amount", "金额", "decimal"),
+    ExportColumn("biz_date", "费用日期", "date"),
+    ExportColumn("remark", "备注", width=30),
+]
+
+# xlsx 导出最大行数（csv / parquet / arrow 不限制）
+EXPENSE_RECORD_EXPORT_XLSX_LIMIT = 10000
+
+
+async def build_expense_record_export_query(
     db: AsyncSession,
     current_user: User,
     store_id: int | None,
     expense_type_id: int | None,
     start_date: date | None,
     end_date: date | None,
-) -> list[Any]:
-    """获取费用记录导出数据（最多10000条）"""
+) -> Select:
+    """构建费用记录导出查询（带数据权限过滤），列与 EXPENSE_RECORD_EXPORT_COLUMNS 一致"""
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
     conditions = _build_expense_conditions(
         accessible_store_ids=accessible_store_ids,
@@ -117,10 +132,12 @@ async def get_expense_record_export_rows(
 
     query = (
         select(
-            ExpenseRecord,
-            Store.name.label("store_name"),
-            ExpenseType.name.label("expense_type_name"),
-            ExpenseType.category.label("expense_type_category"),
+            func.coalesce(Store.name, "未知门店").label("store_name"),
+            func.coalesce(ExpenseType.name, "未知类型").label("expense_type_name"),
+            func.coalesce(ExpenseType.category, "未分类").label("expense_type_category"),
+            func.coalesce(ExpenseRecord.amount, 0).label("amount"),
+            ExpenseRecord.biz_date,
+            func.coalesce(ExpenseRecord.remark, "").label("remark"),
         )
         .join(Store, ExpenseRecord.store_id == Store.id, isouter=True)
         .join(ExpenseType, ExpenseRecord.expense_type_id == ExpenseType.id, isouter=True)
@@ -129,6 +146,4 @@ async def get_expense_record_export_rows(
     if conditions:
         query = query.where(and_(*conditions))
 
-    query = query.order_by(ExpenseRecord.biz_date.desc()).limit(10000)
-    result = await db.execute(query)
-    return result.all()
+    return query.order_by(ExpenseRecord.biz_date.desc())
@@ -0,0 +1,415 @@
+"""
+数据导出任务服务
+
+大批量导出改为后台任务：提交后立即返回任务ID，后台生成文件写入本地存储，
+生成成功后通过下载地址获取；文件超过保留时长后由清理任务删除。
+
+去重：数据类型、格式、筛选条件、提交用户可访问门店相同的请求共用一个去重键，
+同一去重键最多一个待生成/生成中的任务（部分唯一索引保证），并发的相同请求返回同一任务。
+"""
+import asyncio
+import hashlib
+import json
+import shutil
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import check_permission
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.exceptions import AuthorizationException, NotFoundException, ValidationException
+from app.models.export_job import DataExportJob, ExportJobStatus, ExportTargetType
+from app.models.user import User
+from app.schemas.export_job import ExportJobCreate
+from app.schemas.report import ReportQuery
+from app.services import report_service
+from app.services.data_scope_service import filter_stores_by_access
+from app.services.expense_record_service import (
+    EXPENSE_RECORD_EXPORT_COLUMNS,
+    EXPENSE_RECORD_EXPORT_XLSX_LIMIT,
+    build_expense_record_export_query,
+)
+from app.services.export_stream import XlsxStreamWriter, stream_export
+from app.services.order_service import (
+    ORDER_EXPORT_COLUMNS,
+    ORDER_EXPORT_XLSX_LIMIT,
+    build_order_export_query,
+)
+
+
+# 各数据类型的导出权限和筛选条件字段
+EXPORT_PERMISSIONS: Dict[ExportTargetType, str] = {
+    ExportTargetType.ORDERS: "order:export",
+    ExportTargetType.EXPENSE_RECORDS: "expense:export",
+    ExportTargetType.REPORT: "report:export",
+}
+
+_PARAM_FIELDS: Dict[ExportTargetType, Tuple[str, ...]] = {
+    ExportTargetType.ORDERS: ("store_id", "channel", "order_no", "start_date", "end_date"),
+    ExportTargetType.EXPENSE_RECORDS: ("store_id", "expense_type_id", "start_date", "end_date"),
+    ExportTargetType.REPORT: ("store_id", "start_date", "end_date"),
+}
+
+# 下载文件名（不含时间戳和扩展名）
+_FILE_TITLES: Dict[ExportTargetType, str] = {
+    ExportTargetType.ORDERS: "订单列表",
+    ExportTargetType.EXPENSE_RECORDS: "费用记录",
+    ExportTargetType.REPORT: "报表",
+}
+
+ACTIVE_STATUSES = (ExportJobStatus.PENDING, ExportJobStatus.RUNNING)
+
+
+def _storage_dir() -> Path:
+    return Path(settings.export_storage_dir)
+
+
+def _dedupe_key(
+    target_type: ExportTargetType,
+    export_format: str,
+    params: Dict[str, Any],
+    accessible_store_ids: Optional[List[int]],
+) -> str:
+    """去重键：数据类型、格式、筛选条件、可访问门店（None 表示全部门店）的摘要"""
+    payload = {
+        "target_type": target_type.value,
+        "format": export_format,
+        "params": params,
+        "stores": sorted(accessible_store_ids) if accessible_store_ids is not None else None,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+
+async def _write_chunks(body: AsyncIterator[bytes], path: Path) -> None:
+    with open(path, "wb") as f:
+        async for chunk in body:
+            f.write(chunk)
+
+
+class ExportJobService:
+    """数据导出任务服务"""
+
+    @staticmethod
+    async def create_job(db: AsyncSession, data: ExportJobCreate, user: User) -> Tuple[DataExportJob, bool]:
+        """
+        创建导出任务（已有相同的待生成/生成中任务时直接返回该任务）
+
+        Returns:
+            (任务, 是否新建)；新建的任务需由调用方安排后台生成
+        """
+        fields = _PARAM_FIELDS[data.target_type]
+        params = {
+            field: value.isoformat() if isinstance(value, date) else value
+            for field in fields
+            if (value := getattr(data, field)) is not None
+        }
+        if data.start_date and data.end_date and data.start_date > data.end_date:
+            raise ValidationException("开始日期不能大于结束日期")
+        if data.target_type == ExportTargetType.REPORT and not (data.start_date and data.end_date):
+            raise ValidationException("报表导出必须指定开始日期和结束日期")
+
+        # 校验门店权限并确定数据范围
+        accessible_store_ids = await filter_stores_by_access(db, user, data.store_id)
+        dedupe_key = _dedupe_key(data.target_type, data.export_format, params, accessible_store_ids)
+
+        existing = await ExportJobService._find_active_job(db, dedupe_key)
+        if existing:
+            return existing, False
+
+        now = datetime.now()
+        job = DataExportJob(
+            job_name=f"{_FILE_TITLES[data.target_type]}_导出_{now.strftime('%Y%m%d_%H%M%S')}",
+            target_type=data.target_type,
+            export_format=data.export_format,
+            status=ExportJobStatus.PENDING,
+            params=params,
+            dedupe_key=dedupe_key,
+            file_name=f"{_FILE_TITLES[data.target_type]}_{now.strftime('%Y%m%d_%H%M%S')}.{data.export_format}",
+            created_by_id=user.id,
+        )
+        db.add(job)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # 并发提交的相同请求已先创建任务
+            await db.rollback()
+            existing = await ExportJobService._find_active_job(db, dedupe_key)
+            if existing:
+                return existing, False
+            raise
+        await db.refresh(job)
+        return job, True
+
+    @staticmethod
+    async def _find_active_job(db: AsyncSession, dedupe_key: str) -> Optional[DataExportJob]:
+        """查找去重键相同的待生成/生成中任务，超时的任务标记失败后不再复用"""
+        job = (await db.execute(
+            select(DataExportJob).where(
+                DataExportJob.dedupe_key == dedupe_key,
+                DataExportJob.status.in_(ACTIVE_STATUSES),
+            )
+        )).scalar_one_or_none()
+        if job is None:
+            return None
+
+        deadline = datetime.now() - timedelta(minutes=settings.export_job_timeout_minutes)
+        if (job.started_at or job.created_at) < deadline:
+            job.status = ExportJobStatus.FAIL
+            job.error_message = "生成超时"
+            job.finished_at = datetime.now()
+            await db.commit()
+            return None
+        return job
+
+    @staticmethod
+    async def run_job(job_id: int) -> None:
+        """
+        生成导出文件
+
+        先以条件更新认领任务（pending -> running），同一任务只会被生成一次；
+        文件先写入临时文件，完成后重命名，下载方不会读到不完整的文件。
+        完成时仅在任务仍为生成中时写入结果，已被清理任务判定超时的任务丢弃生成的文件。
+        """
+        async with AsyncSessionLocal() as session:
+            claimed = (await session.execute(
+                update(DataExportJob)
+                .where(DataExportJob.id == job_id, DataExportJob.status == ExportJobStatus.PENDING)
+                .values(status=ExportJobStatus.RUNNING, started_at=func.now())
+                .returning(DataExportJob.id)
+            )).scalar()
+            await session.commit()
+            if claimed is None:
+                return
+
+            job = await session.get(DataExportJob, job_id)
+            user = await session.get(User, job.created_by_id) if job.created_by_id else None
+            if user is None or not user.is_active:
+                raise ValidationException("导出任务的创建用户不存在或已被禁用")
+
+            job_dir = _storage_dir() / str(job.id)
+            job_dir.mkdir(parents=True, exist_ok=True)
+            file_path = job_dir / f"{job.target_type.value}_{job.id}.{job.export_format}"
+            part_path = file_path.with_name(file_path.name + ".part")
+
+            row_count = await ExportJobService._generate(session, job, user, part_path)
+            part_path.replace(file_path)
+
+            finished_at = datetime.now()
+            completed = (await session.execute(
+                update(DataExportJob)
+                .where(DataExportJob.id == job_id, DataExportJob.status == ExportJobStatus.RUNNING)
+                .values(
+                    status=ExportJobStatus.SUCCESS,
+                    file_path=str(file_path),
+                    file_size=file_path.stat().st_size,
+                    row_count=row_count,
+                    finished_at=finished_at,
+                    expires_at=finished_at + timedelta(hours=settings.export_job_ttl_hours),
+                )
+                .returning(DataExportJob.id)
+            )).scalar()
+            await session.commit()
+            if completed is None:
+                logger.warning(f"导出任务 {job_id} 已不在生成中（可能已超时），丢弃生成的文件")
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+    @staticmethod
+    async def _generate(session: AsyncSession, job: DataExportJob, user: User, path: Path) -> Optional[int]:
+        """按数据类型和格式生成文件，返回导出行数（非 xlsx 格式不统计，返回 None）"""
+        params = job.params or {}
+        export_format = job.export_format
+        start_date = _parse_date(params.get("start_date"))
+        end_date = _parse_date(params.get("end_date"))
+
+        if job.target_type == ExportTargetType.REPORT:
+            filters = ReportQuery(start_date=start_date, end_date=end_date, store_id=params.get("store_id"))
+            if export_format == "xlsx":
+                writer = await report_service.build_report_workbook(session, filters, user)
+                await writer.save(path)
+                return None
+            query = await report_service.build_daily_summary_export_query(session, filters, user)
+            await _write_chunks(
+                stream_export(session, query, report_service.DAILY_SUMMARY_EXPORT_COLUMNS, export_format), path
+            )
+            return None
+
+        if job.target_type == ExportTargetType.ORDERS:
+            query = await build_order_export_query(
+                db=session,
+                current_user=user,
+                store_id=params.get("store_id"),
+                channel=params.get("channel"),
+                order_no=params.get("order_no"),
+                start_date=start_date,
+                end_date=end_date,
+            )
+            columns, xlsx_limit, sheet_title, header_color = ORDER_EXPORT_COLUMNS, ORDER_EXPORT_XLSX_LIMIT, "订单列表", "4A90E2"
+        else:
+            query = await build_expense_record_export_query(
+                db=session,
+                current_user=user,
+                store_id=params.get("store_id"),
+                expense_type_id=params.get("expense_type_id"),
+                start_date=start_date,
+                end_date=end_date,
+            )
+            columns, xlsx_limit, sheet_title, header_color = (
+                EXPENSE_RECORD_EXPORT_COLUMNS, EXPENSE_RECORD_EXPORT_XLSX_LIMIT, "费用记录", "E67E22"
+            )
+
+        if export_format == "xlsx":
+            writer = XlsxStreamWriter()
+            row_count = await writer.write_query(
+                session, sheet_title, columns, query.limit(xlsx_limit),
+                header_color=header_color, row_number_title="序号",
+            )
+            await writer.save(path)
+            return row_count
+
+        await _write_chunks(stream_export(session, query, columns, export_format), path)
+        return None
+
+    @staticmethod
+    async def run_job_in_background(job_id: int) -> None:
+        """后台生成导出文件（供 BackgroundTasks 调用），异常只记录日志"""
+        try:
+            await ExportJobService.run_job(job_id)
+        except Exception as e:
+            logger.error(f"导出任务 {job_id} 生成失败: {e}")
+            shutil.rmtree(_storage_dir() / str(job_id), ignore_errors=True)
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(DataExportJob)
+                    .where(DataExportJob.id == job_id, DataExportJob.status.in_(ACTIVE_STATUSES))
+                    .values(
+                        status=ExportJobStatus.FAIL,
+                        error_message=str(e),
+                        finished_at=datetime.now(),
+                    )
+                )
+                await session.commit()
+
+    @staticmethod
+    async def get_job(db: AsyncSession, job_id: int, user: User) -> DataExportJob:
+        """
+        获取任务（校验访问权限）
+
+        创建者可访问；其他用户需具有该数据类型的导出权限，
+        且按任务的筛选条件计算的去重键与任务一致（即数据范围相同、因去重共用该任务）。
+        """
+        job = await db.get(DataExportJob, job_id)
+        if not job:
+            raise NotFoundException(f"导出任务 {job_id} 不存在")
+        if job.created_by_id == user.id or user.is_superuser:
+            return job
+
+        await check_permission(user, EXPORT_PERMISSIONS[job.target_type], db)
+        params = job.params or {}
+        accessible_store_ids = await filter_stores_by_access(db, user, params.get("store_id"))
+        if _dedupe_key(job.target_type, job.export_format, params, accessible_store_ids) != job.dedupe_key:
+            raise AuthorizationException("无权访问该导出任务")
+        return job
+
+    @staticmethod
+    async def get_download_path(db: AsyncSession, job_id: int, user: User) -> Tuple[DataExportJob, Path]:
+        """获取可下载的文件路径"""
+        job = await ExportJobService.get_job(db, job_id, user)
+        if job.status == ExportJobStatus.EXPIRED:
+            raise NotFoundException("导出文件已过期，请重新导出")
+        if job.status != ExportJobStatus.SUCCESS or not job.file_path:
+            raise NotFoundException("导出文件尚未生成")
+
+        path = Path(job.file_path)
+        if not path.exists():
+            raise NotFoundException("导出文件不存在")
+        return job, path
+
+    @staticmethod
+    async def list_jobs(
+        db: AsyncSession,
+        user: User,
+        page: int,
+        page_size: int,
+    ) -> Tuple[List[DataExportJob], int]:
+        """分页查询当前用户创建的导出任务（按创建时间倒序）"""
+        conditions = [DataExportJob.created_by_id == user.id]
+        total = (await db.execute(
+            select(func.count(DataExportJob.id)).where(*conditions)
+        )).scalar() or 0
+
+        result = await db.execute(
+            select(DataExportJob)
+            .where(*conditions)
+            .order_by(DataExportJob.created_at.desc())
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        )
+        return list(result.scalars().all()), total
+
+    @staticmethod
+    async def cleanup_expired(db: AsyncSession) -> int:
+        """
+        清理过期文件并标记超时任务
+
+        - 已过期的任务删除文件目录，状态改为 expired
+        - 超过生成超时时间仍未结束的任务标记失败（进程退出等原因遗留）
+
+        Returns:
+            清理的文件数
+        """
+        now = datetime.now()
+        expired_jobs = (await db.execute(
+            select(DataExportJob).where(
+                DataExportJob.status.in_((ExportJobStatus.SUCCESS, ExportJobStatus.FAIL)),
+                DataExportJob.expires_at.is_not(None),
+                DataExportJob.expires_at < now,
+            )
+        )).scalars().all()
+        for job in expired_jobs:
+            shutil.rmtree(_storage_dir() / str(job.id), ignore_errors=True)
+            job.status = ExportJobStatus.EXPIRED
+            job.file_path = None
+
+        deadline = now - timedelta(minutes=settings.export_job_timeout_minutes)
+        await db.execute(
+            update(DataExportJob)
+            .where(
+                DataExportJob.status.in_(ACTIVE_STATUSES),
+                or_(
+                    DataExportJob.started_at < deadline,
+                    DataExportJob.started_at.is_(None) & (DataExportJob.created_at < deadline),
+                ),
+            )
+            .values(
+                status=ExportJobStatus.FAIL,
+                error_message="生成超时",
+                finished_at=now,
+                expires_at=now,
+            )
+        )
+        await db.commit()
+        return len(expired_jobs)
+
+    @staticmethod
+    async def cleanup_loop() -> None:
+        """定期清理过期导出文件（应用启动时创建，关闭时取消）"""
+        interval = max(settings.export_cleanup_interval_minutes, 1) * 60
+        while True:
+            try:
+                async with AsyncSessionLocal() as session:
+                    removed = await ExportJobService.cleanup_expired(session)
+                if removed:
+                    logger.info(f"已清理过期导出文件 {removed} 个")
+            except Exception as e:
+                logger.error(f"清理过期导出文件失败: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,414 @@
+"""
+流式导出工具
+
+- 查询结果以服务端游标分批读取，内存中只保留一批行
+- XlsxStreamWriter：openpyxl write-only 工作簿，逐行写入工作表临时文件；
+  生成 xlsx（zip）时在线程中按块写入有界队列，边生成边发送给客户端
+- stream_export：csv / parquet / arrow 格式的流式导出
+  - csv：PostgreSQL COPY ... TO STDOUT，数据库直接输出 CSV 字节，不在 Python 中逐格处理
+  - parquet / arrow：按批读取后转为列式 RecordBatch 写出（需安装可选依赖 pyarrow）
+
+峰值内存与导出行数无关，只取决于批大小和发送块大小。
+"""
+import asyncio
+import io
+from contextlib import suppress
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Literal, NamedTuple, Optional, Sequence
+from urllib.parse import quote
+
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+from sqlalchemy import Select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions import BusinessException
+
+
+# 服务端游标每批读取的行数
+EXPORT_FETCH_SIZE = 1000
+
+# 列式格式每批行数（parquet 每批为一个 row group）
+COLUMNAR_BATCH_SIZE = 10000
+
+# 发送给客户端的块大小（字节）
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# 生产者与发送协程之间最多缓存的块数（客户端慢时生产者等待）
+_MAX_PENDING_CHUNKS = 8
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# 导出格式
+ExportFormat = Literal["xlsx", "csv", "parquet", "arrow"]
+
+EXPORT_MEDIA_TYPES: Dict[str, str] = {
+    "xlsx": XLSX_MEDIA_TYPE,
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+# 表头样式
+_HEADER_FONT = Font(bold=True, color="FFFFFF")
+_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+
+
+class ExportColumn(NamedTuple):
+    """
+    导出列定义
+
+    field 与查询结果列名一致（csv / parquet / arrow 以 field 为列名），
+    title 为 xlsx 表头；kind 决定列式格式的数据类型：str / int / decimal / date / datetime
+    """
+    field: str
+    title: str
+    kind: str = "str"
+    width: int = 15
+
+
+async def _stream_partitions(
+    db: AsyncSession,
+    query: Select,
+    fetch_size: int,
+    fields: Optional[Sequence[str]] = None,
+) -> AsyncIterator[List[Row]]:
+    """以服务端游标分批读取，fields 指定时按该顺序取列"""
+    result = await db.stream(query.execution_options(yield_per=fetch_size))
+    if fields is not None:
+        result = result.columns(*fields)
+    async for partition in result.partitions(fetch_size):
+        yield partition
+
+
+def export_value(value: Any) -> Any:
+    """xlsx 单元格取值：Decimal 转 float，日期时间转字符串"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+async def _drain_queue(
+    queue: "asyncio.Queue[Optional[bytes]]",
+    producer: "asyncio.Future[Any]",
+) -> AsyncIterator[bytes]:
+    """产出队列中的块，直到收到结束标记；生产者失败时抛出其异常"""
+    while True:
+        chunk = await queue.get()
+        if chunk is None:
+            break
+        yield chunk
+    await producer
+
+
+class _ChunkQueueWriter:
+    """
+    供 zipfile 写入的只追加文件对象（不可 seek）
+
+    在生成线程中调用：累积到 EXPORT_CHUNK_SIZE 后放入事件循环中的有界队列，
+    队列满时阻塞生成线程；客户端断开后丢弃后续数据，让生成线程尽快结束并清理临时文件
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: "asyncio.Queue[Optional[bytes]]") -> None:
+        self._loop = loop
+        self._queue = queue
+        self._buffer = bytearray()
+        self.aborted = False
+
+    def write(self, data: bytes) -> int:
+        self._buffer.extend(data)
+        if len(self._buffer) >= EXPORT_CHUNK_SIZE:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def finish(self) -> None:
+        """发送剩余数据和结束标记"""
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        self._put(None)
+
+    def _put(self, chunk: Optional[bytes]) -> None:
+        if self.aborted:
+            return
+        asyncio.run_coroutine_threadsafe(self._queue.put(chunk), self._loop).result()
+
+
+class XlsxStreamWriter:
+    """
+    流式 XLSX 写入器
+
+    用法：
+        writer = XlsxStreamWriter()
+        await writer.write_query(db, "订单列表", columns, query)
+        return StreamingResponse(writer.iter_bytes(), media_type=XLSX_MEDIA_TYPE)
+    """
+
+    def __init__(self) -> None:
+        self._workbook = Workbook(write_only=True)
+
+    def add_sheet(
+        self,
+        title: str,
+        columns: Sequence[ExportColumn],
+        header_color: str = "4472C4",
+        row_number_title: Optional[str] = None,
+    ):
+        """新建工作表并写入带样式的表头（row_number_title 不为空时首列为序号列）"""
+        sheet = self._workbook.create_sheet(title)
+        headers = [column.title for column in columns]
+        widths = [column.width for column in columns]
+        if row_number_title:
+            headers.insert(0, row_number_title)
+            widths.insert(0, 8)
+
+        # write-only 模式下列宽须在写入第一行之前设置
+        for col_num, width in enumerate(widths, start=1):
+            sheet.column_dimensions[get_column_letter(col_num)].width = width
+
+        header_fill = PatternFill(start_color=header_color, end_color=header_color, fill_type="solid")
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(sheet, value=header)
+            cell.font = _HEADER_FONT
+            cell.fill = header_fill
+            cell.alignment = _HEADER_ALIGNMENT
+            header_cells.append(cell)
+        sheet.append(header_cells)
+        return sheet
+
+    @staticmethod
+    def append(sheet, values: Iterable[Any]) -> None:
+        """追加一行（写入工作表临时文件，不在内存中保留）"""
+        sheet.append([export_value(value) for value in values])
+
+    async def write_query(
+        self,
+        db: AsyncSession,
+        title: str,
+        columns: Sequence[ExportColumn],
+        query: Select,
+        header_color: str = "4472C4",
+        row_number_title: Optional[str] = None,
+    ) -> int:
+        """以服务端游标读取查询结果写入新工作表，返回写入行数"""
+        sheet = self.add_sheet(title, columns, header_color, row_number_title)
+        count = 0
+        fields = [column.field for column in columns]
+        async for partition in _stream_partitions(db, query, EXPORT_FETCH_SIZE, fields):
+            for row in partition:
+                count += 1
+                self.append(sheet, (count, *row) if row_number_title else row)
+        return count
+
+    async def save(self, path: Path) -> None:
+        """在线程中生成 xlsx 并写入文件"""
+        await asyncio.to_thread(self._workbook.save, path)
+
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        """在线程中生成 xlsx，按块产出字节"""
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=_MAX_PENDING_CHUNKS)
+        writer = _ChunkQueueWriter(loop, queue)
+
+        def _save() -> None:
+            try:
+                self._workbook.save(writer)
+            finally:
+                writer.finish()
+
+        task = loop.run_in_executor(None, _save)
+        try:
+            async for chunk in _drain_queue(queue, task):
+                yield chunk
+        finally:
+            if not task.done():
+                # 客户端中途断开：丢弃后续数据，并取走队列中的块以解除生成线程的等待
+                writer.aborted = True
+                while not task.done():
+                    try:
+                        queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        await asyncio.sleep(0.01)
+
+
+async def _stream_copy_csv(db: AsyncSession, query: Select) -> AsyncIterator[bytes]:
+    """COPY (query) TO STDOUT WITH CSV HEADER，数据库输出的字节直接转发给客户端"""
+    connection = await db.connection()
+    compiled = query.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    args = [compiled.params[name] for name in compiled.positiontup or []]
+    raw_connection = await connection.get_raw_connection()
+
+    queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=_MAX_PENDING_CHUNKS)
+
+    async def _output(data: bytes) -> None:
+        await queue.put(bytes(data))
+
+    async def _copy() -> None:
+        try:
+            await raw_connection.driver_connection.copy_from_query(
+                compiled.string, *args, output=_output, format="csv", header=True
+            )
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(_copy())
+    try:
+        async for chunk in _drain_queue(queue, task):
+            yield chunk
+    finally:
+        if not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+
+class _BufferSink(io.RawIOBase):
+    """pyarrow 写出目标：累积写入的字节，每批写完后取走发送"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise BusinessException("服务器未安装 pyarrow，暂不支持 parquet / arrow 格式导出")
+    return pyarrow
+
+
+def _arrow_schema(pa, columns: Sequence[ExportColumn]):
+    types = {
+        "str": pa.string(),
+        "int": pa.int64(),
+        "decimal": pa.float64(),
+        "date": pa.date32(),
+        "datetime": pa.timestamp("us"),
+    }
+    return pa.schema([pa.field(column.field, types[column.kind]) for column in columns])
+
+
+def _record_batch(pa, schema, columns: Sequence[ExportColumn], rows: List[Row]):
+    """按列构建 RecordBatch（金额列由 Decimal 转为 float64）"""
+    arrays = []
+    for column, values in zip(columns, zip(*rows)):
+        if column.kind == "decimal":
+            values = [float(value) if value is not None else None for value in values]
+        arrays.append(pa.array(values, type=schema.field(column.field).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+async def _stream_columnar(
+    db: AsyncSession,
+    query: Select,
+    columns: Sequence[ExportColumn],
+    export_format: str,
+) -> AsyncIterator[bytes]:
+    """按批读取并写出 parquet（每批一个 row group）或 Arrow IPC 文件（Feather v2）"""
+    pa = _import_pyarrow()
+    schema = _arrow_schema(pa, columns)
+    sink = _BufferSink()
+    if export_format == "parquet":
+        writer = pa.parquet.ParquetWriter(sink, schema, compression="snappy")
+        write_batch = writer.write_batch
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+        write_batch = writer.write_batch
+
+    def _encode(rows: List[Row]) -> bytes:
+        write_batch(_record_batch(pa, schema, columns, rows))
+        return sink.take()
+
+    def _close() -> bytes:
+        writer.close()
+        return sink.take()
+
+    fields = [column.field for column in columns]
+    async for partition in _stream_partitions(db, query, COLUMNAR_BATCH_SIZE, fields):
+        chunk = await asyncio.to_thread(_encode, partition)
+        if chunk:
+            yield chunk
+    yield await asyncio.to_thread(_close)
+
+
+def stream_export(
+    db: AsyncSession,
+    query: Select,
+    columns: Sequence[ExportColumn],
+    export_format: ExportFormat,
+) -> AsyncIterator[bytes]:
+    """
+    csv / parquet / arrow 流式导出
+
+    查询结果列名须与 columns 的 field 一致、顺序相同。
+    在返回前检查格式依赖，缺少 pyarrow 时抛出业务异常（响应开始前即可返回错误）。
+    """
+    if export_format == "csv":
+        return _stream_copy_csv(db, query)
+    if export_format in ("parquet", "arrow"):
+        _import_pyarrow()
+        return _stream_columnar(db, query, columns, export_format)
+    raise BusinessException(f"不支持的导出格式: {export_format}")
+
+
+def export_response(
+    body: AsyncIterator[bytes],
+    export_format: ExportFormat,
+    filename: str,
+    fallback_filename: str,
+) -> StreamingResponse:
+    """
+    导出文件响应
+
+    Args:
+        body: 文件内容块
+        export_format: 导出格式（决定扩展名和 Content-Type）
+        filename: 文件名（不含扩展名，可含中文）
+        fallback_filename: ASCII 文件名（不含扩展名，兼容不支持 filename* 的客户端）
+    """
+    encoded_filename = quote(f"{filename}.{export_format}")
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename={fallback_filename}.{export_format}; "
+                f"filename*=UTF-8''{encoded_filename}"
+            )
+        }
+    )
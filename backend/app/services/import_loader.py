@@ -0,0 +1,247 @@
+"""
+导入批量写入
+
+校验通过的行先经 asyncpg 二进制 COPY 写入事务级临时表（提交或回滚时删除），
+再用一条 INSERT ... SELECT 合并到目标表，不再逐行构造 ORM 对象：
+- 订单：先按订单号顺序登记到 order_no_registry（主键冲突即为重复），只写入登记成功的订单
+- 费用：排除 (门店, 日期, 科目, 金额, 描述) 完全相同的已有记录，
+  并写入 import_key 以 ON CONFLICT (import_key, biz_date) DO NOTHING 兜底
+唯一约束保证并发或重复执行同一批数据时不会重复写入。
+合并语句 RETURNING 实际写入的行，未写入的暂存行由调用方记为错误行。
+暂存表列类型与目标表一致，调用方需先校验长度和金额范围，否则整批 COPY 失败。
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, NamedTuple, Sequence, Set, Tuple, Type
+
+from sqlalchemy import Column, Integer, MetaData, Table, func, insert, literal, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateTable, DropTable
+
+from app.models.expense import ExpenseRecord
+from app.models.import_job import DataImportJobError
+from app.models.order import OrderHeader, OrderNoRegistry
+
+
+class StagedOrder(NamedTuple):
+    """校验通过、待写入的订单行（字段顺序即暂存表列顺序）"""
+    row_no: int
+    order_no: str
+    store_id: int
+    biz_date: date
+    channel: str
+    gross_amount: Decimal
+    discount_amount: Decimal
+    net_amount: Decimal
+    payment_method: str
+
+
+class StagedExpense(NamedTuple):
+    """校验通过、待写入的费用记录行（字段顺序即暂存表列顺序）"""
+    row_no: int
+    store_id: int
+    expense_type_id: int
+    biz_date: date
+    amount: Decimal
+    description: str
+
+    @property
+    def dedup_key(self) -> Tuple[int, date, int, Decimal, str]:
+        """去重键：门店、日期、科目、金额、描述"""
+        return (self.store_id, self.biz_date, self.expense_type_id, self.amount, self.description)
+
+
+def _staging_table(name: str, staged_type: Type[NamedTuple], target: Table) -> Table:
+    """按暂存行字段构造临时表，列类型取目标表同名列"""
+    return Table(
+        name,
+        MetaData(),
+        Column("row_no", Integer),
+        *[Column(field, target.c[field].type) for field in staged_type._fields if field != "row_no"],
+        prefixes=["TEMPORARY"],
+        postgresql_on_commit="DROP",
+    )
+
+
+async def _copy_to_staging(db: AsyncSession, table: Table, records: Sequence[NamedTuple]) -> None:
+    """创建临时表并以二进制 COPY 写入暂存行"""
+    # 先执行 DDL：会话在此开启事务，随后的 COPY 与合并语句处于同一事务
+    await db.execute(DropTable(table, if_exists=True))
+    await db.execute(CreateTable(table))
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        table.name,
+        records=records,
+        columns=[column.name for column in table.c],
+    )
+    # 临时表不会被自动 ANALYZE，补充统计信息以便合并语句选择合适的计划
+    await db.execute(text(f"ANALYZE {table.name}"))
+
+
+async def load_orders(db: AsyncSession, staged: List[StagedOrder]) -> Set[str]:
+    """
+    暂存并合并订单（不提交）
+
+    Args:
+        db: 数据库会话
+        staged: 校验通过的订单行，订单号在批内不重复
+
+    Returns:
+        实际写入的订单号
+    """
+    if not staged:
+        return set()
+
+    orders = OrderHeader.__table__
+    staging = _staging_table("tmp_import_orders", StagedOrder, orders)
+    await _copy_to_staging(db, staging, staged)
+
+    # 订单号全局唯一：先登记订单号，主键冲突（含其他业务日期下的同号订单、并发写入的同号订单）即跳过；
+    # 按订单号顺序登记，并发导入之间等待唯一索引时不会互相死锁
+    registry = OrderNoRegistry.__table__
+    claimed = (
+        pg_insert(registry)
+        .from_select(
+            ["order_no", "biz_date"],
+            select(staging.c.order_no, staging.c.biz_date).order_by(staging.c.order_no),
+        )
+        .on_conflict_do_nothing(index_elements=["order_no"])
+        .returning(registry.c.order_no)
+        .cte("claimed")
+    )
+    now = func.now()
+    stmt = (
+        pg_insert(orders)
+        .from_select(
+            [
+                "order_no", "store_id", "biz_date", "order_time", "channel",
+                "gross_amount", "discount_amount", "service_charge", "delivery_fee", "net_amount",
+                "payment_method", "status", "created_at", "updated_at",
+            ],
+            select(
+                staging.c.order_no,
+                staging.c.store_id,
+                staging.c.biz_date,
+                now,  # 导入文件不含下单时间，以导入时间写入（小时级 KPI 不统计下单时间与业务日期不在同一天的订单）
+                staging.c.channel,
+                staging.c.gross_amount,
+                staging.c.discount_amount,
+                literal(0),
+                literal(0),
+                staging.c.net_amount,
+                staging.c.payment_method,
+                literal("completed"),  # 导入的订单默认为已完成
+                now,
+                now,
+            ).join_from(staging, claimed, staging.c.order_no == claimed.c.order_no),
+        )
+        .returning(orders.c.order_no)
+    )
+    result = await db.execute(stmt)
+    return {row[0] for row in result.all()}
+
+
+async def load_expense_records(
+    db: AsyncSession,
+    staged: List[StagedExpense],
+    created_by: int
+) -> Set[Tuple[int, date, int, Decimal, str]]:
+    """
+    暂存并合并费用记录（不提交），导入的记录为草稿状态
+
+    去重键同时写入 import_key（md5），由 (import_key, biz_date) 唯一约束在数据库层去重；
+    手工录入的记录没有 import_key，仍通过 NOT EXISTS 比较字段排除。
+
+    Args:
+        db: 数据库会话
+        staged: 校验通过的费用行，去重键在批内不重复（金额已按两位小数取整）
+        created_by: 创建人（导入任务的发起人）
+
+    Returns:
+        实际写入记录的去重键
+    """
+    if not staged:
+        return set()
+
+    records = ExpenseRecord.__table__
+    staging = _staging_table("tmp_import_expenses", StagedExpense, records)
+    await _copy_to_staging(db, staging, staged)
+
+    duplicate = select(records.c.id).where(
+        records.c.store_id == staging.c.store_id,
+        records.c.biz_date == staging.c.biz_date,
+        records.c.expense_type_id == staging.c.expense_type_id,
+        records.c.amount == staging.c.amount,
+        func.coalesce(records.c.description, "") == func.coalesce(staging.c.description, ""),
+    ).exists()
+    import_key = func.md5(func.concat_ws(
+        "|",
+        staging.c.store_id,
+        staging.c.biz_date,
+        staging.c.expense_type_id,
+        staging.c.amount,
+        func.coalesce(staging.c.description, ""),
+    ))
+    now = func.now()
+    stmt = (
+        pg_insert(records)
+        .from_select(
+            [
+                "store_id", "expense_type_id", "biz_date", "amount", "description", "import_key",
+                "status", "created_by", "is_deleted", "created_at", "updated_at",
+            ],
+            select(
+                staging.c.store_id,
+                staging.c.expense_type_id,
+                staging.c.biz_date,
+                staging.c.amount,
+                staging.c.description,
+                import_key,
+                literal("draft"),
+                literal(created_by),
+                literal(False),
+                now,
+                now,
+            ).where(~duplicate),
+        )
+        .on_conflict_do_nothing(index_elements=["import_key", "biz_date"])
+        .returning(
+            records.c.store_id,
+            records.c.biz_date,
+            records.c.expense_type_id,
+            records.c.amount,
+            records.c.description,
+        )
+    )
+    result = await db.execute(stmt)
+    return {
+        (row.store_id, row.biz_date, row.expense_type_id, row.amount, row.description or "")
+        for row in result.all()
+    }
+
+
+async def write_import_errors(
+    db: AsyncSession,
+    job_id: int,
+    errors: List[Tuple[int, str, str, Dict[str, Any]]]
+) -> None:
+    """
+    批量写入错误行（不提交）
+
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+        errors: [(行号, 字段, 错误信息, 原始行数据)]
+    """
+    if not errors:
+        return
+    await db.execute(
+        insert(DataImportJobError),
+        [
+            {"job_id": job_id, "row_no": row_no, "field": field, "message": message, "raw_data": raw_data}
+            for row_no, field, message, raw_data in sorted(errors, key=lambda error: error[0])
+        ],
+    )
@@ -4,22 +4,22 @@
 处理 Excel/CSV 文件导入，包括文件解析、数据校验、批量写入和错误处理
 """
 
-import os
 import csv
-import shutil
-from datetime import datetime, date
-from decimal import Decimal, InvalidOperation
-from typing import Optional, Dict, Any, List, Tuple
+import math
+from datetime import datetime, date, time, timedelta
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator, Iterator
 from pathlib import Path
 
 import pandas as pd
 from fastapi import UploadFile
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, update, delete, and_, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.exceptions import (
     ValidationException,
     BusinessException,
+    ConflictException,
     NotFoundException,
 )
 from app.models.import_job import (
@@ -29,18 +29,104 @@ from app.models.import_job import (
     ImportTargetType,
     ImportJobStatus,
 )
-from app.models.order import OrderHeader, OrderItem
-from app.models.expense import ExpenseType, ExpenseRecord
+from app.models.order import OrderItem
+from app.models.expense import ExpenseType
 from app.models.store import Store
 from app.models.user import User
 from app.schemas.import_job import ImportJobFilter
+from app.services.expense_cube_service import refresh_expense_cube
+from app.services.import_loader import load_expense_records, load_orders, write_import_errors
+from app.services.import_validation import validate_expense_records, validate_orders
+from app.services.kpi_refresh_service import DIRTY_REASON_IMPORT, mark_kpi_dirty
+from app.services.partition_service import EXPENSE_TABLES, ORDER_TABLES, ensure_partitions
 
 
 # 上传文件配置
 UPLOAD_BASE_DIR = Path("backend/uploads/imports")
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 ALLOWED_EXTENSIONS = {".xlsx", ".xls", ".csv"}
-MAX_ROWS_PER_JOB = 10000  # 单次导入最大行数
+UPLOAD_COPY_BYTES = 1024 * 1024  # 上传文件分块写盘大小
+
+
+def _normalize_cell(value: Any) -> str:
+    """单元格值统一转为字符串（与 CSV 按文本读取一致，日期转为 YYYY-MM-DD）"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == time.min else value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        return str(int(value)) if value.is_integer() else str(value)
+    return str(value)
+
+
+def iter_file_chunks(
+    file_path: Path,
+    source_type: ImportSourceType,
+    chunk_size: int
+) -> Iterator[pd.DataFrame]:
+    """
+    按批读取导入文件，每批最多 chunk_size 行（同步生成器，由 import_worker 在解析子进程中执行）
+
+    - CSV：pandas 分块读取，所有列按文本读取
+    - xlsx：openpyxl 只读模式逐行读取第一个工作表
+    - xls：格式本身最多 65536 行，整表读取后分批
+    空行跳过，单元格统一转为字符串；每批为行索引从 0 开始的 DataFrame。
+    """
+    if source_type == ImportSourceType.CSV:
+        reader = pd.read_csv(
+            file_path,
+            encoding="utf-8-sig",
+            dtype=str,
+            keep_default_na=False,
+            chunksize=chunk_size,
+        )
+        with reader:
+            for df in reader:
+                yield df.reset_index(drop=True)
+        return
+
+    if file_path.suffix.lower() == ".xls":
+        df = pd.read_excel(file_path)
+        columns = [str(column) for column in df.columns]
+        for start in range(0, len(df), chunk_size):
+            yield pd.DataFrame(
+                [
+                    [_normalize_cell(value) for value in values]
+                    for values in df.iloc[start:start + chunk_size].itertuples(index=False, name=None)
+                ],
+                columns=columns,
+            )
+        return
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        values_iter = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(values_iter, None)
+        if header is None:
+            return
+        columns = [
+            _normalize_cell(name) or f"Unnamed: {index}" for index, name in enumerate(header)
+        ]
+
+        width = len(columns)
+        chunk: List[List[str]] = []
+        for values in values_iter:
+            if all(value is None or value == "" for value in values):
+                continue
+            cells = [_normalize_cell(value) for value in values[:width]]
+            chunk.append(cells + [""] * (width - len(cells)))
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
 
 
 class ImportService:
@@ -79,13 +165,6 @@ class ImportService:
         if file_ext not in ALLOWED_EXTENSIONS:
             raise ValidationException(f"不支持的文件格式，仅支持: {', '.join(ALLOWED_EXTENSIONS)}")
         
-        # 检查文件大小
-        content = await upload_file.read()
-        await upload_file.seek(0)  # 重置文件指针
-        
-        if len(content) > MAX_FILE_SIZE:
-            raise ValidationException(f"文件大小超过限制 ({MAX_FILE_SIZE // 1024 // 1024}MB)")
-        
         # 2. 业务校验
         if target_type in [ImportTargetType.ORDERS, ImportTargetType.EXPENSE_RECORDS]:
             if not store_id:
@@ -120,13 +199,26 @@ class ImportService:
         db.add(job)
         await db.flush()  # 获取 job.id
         
-        # 5. 保存文件
+        # 5. 保存文件（分块写盘，不把整个文件读入内存；超过大小限制时删除已写部分）
         job_dir = UPLOAD_BASE_DIR / str(job.id)
         job_dir.mkdir(parents=True, exist_ok=True)
         
         file_path = job_dir / upload_file.filename
+        max_bytes = settings.import_max_file_mb * 1024 * 1024
+        written = 0
         with open(file_path, "wb") as f:
-            f.write(content)
+            while True:
+                block = await upload_file.read(UPLOAD_COPY_BYTES)
+                if not block:
+                    break
+                written += len(block)
+                if written > max_bytes:
+                    break
+                f.write(block)
+        
+        if written > max_bytes:
+            file_path.unlink(missing_ok=True)
+            raise ValidationException(f"文件大小超过限制 ({settings.import_max_file_mb}MB)")
         
         job.file_path = str(file_path)
         await db.commit()
@@ -135,9 +227,54 @@ class ImportService:
         return job
     
     @staticmethod
-    async def run_job(db: AsyncSession, job_id: int, user: User) -> DataImportJob:
+    def _get_importer(target_type: ImportTargetType):
+        """按目标类型选择导入方法"""
+        importers = {
+            ImportTargetType.ORDERS: ImportService._import_orders,
+            ImportTargetType.EXPENSE_RECORDS: ImportService._import_expense_records,
+            ImportTargetType.STORES: ImportService._import_stores,
+            ImportTargetType.EXPENSE_TYPES: ImportService._import_expense_types,
+        }
+        importer = importers.get(target_type)
+        if importer is None:
+            raise BusinessException(f"不支持的导入类型: {target_type}")
+        return importer
+    
+    @staticmethod
+    def is_lease_expired(job: DataImportJob) -> bool:
+        """运行中任务的执行租约是否已过期（执行进程已退出）"""
+        return (
+            job.status == ImportJobStatus.RUNNING
+            and (job.lease_expires_at is None or job.lease_expires_at < datetime.now())
+        )
+    
+    @staticmethod
+    async def _queue(db: AsyncSession, job: DataImportJob) -> DataImportJob:
+        """校验文件并把任务置为排队中（提交）"""
+        ImportService._get_importer(job.target_type)
+        
+        if not Path(job.file_path).exists():
+            raise BusinessException(f"文件不存在: {job.file_path}")
+        
+        job.status = ImportJobStatus.QUEUED
+        job.queued_at = datetime.now()
+        job.started_at = None
+        job.finished_at = None
+        job.error_message = None
+        job.lease_owner = None
+        job.lease_expires_at = None
+        await db.commit()
+        await db.refresh(job)
+        
+        return job
+    
+    @staticmethod
+    async def enqueue_job(db: AsyncSession, job_id: int, user: User) -> DataImportJob:
         """
-        执行导入任务
+        提交导入任务到执行队列（从头执行）
+        
+        只做状态校验并把任务置为排队中后立即返回，由后台 worker（import_worker）认领执行。
+        失败的任务重新执行时清空进度、检查点和错误记录；需要保留已导入部分时使用 resume_job。
         
         Args:
             db: 数据库会话
@@ -153,48 +290,205 @@ class ImportService:
             raise NotFoundException(f"导入任务 {job_id} 不存在")
         
         # 2. 状态校验（防止重复执行）
-        if job.status == ImportJobStatus.RUNNING:
-            raise BusinessException("任务正在运行中，请勿重复执行")
+        if job.status in [ImportJobStatus.QUEUED, ImportJobStatus.RUNNING]:
+            raise BusinessException("任务正在排队或运行中，请勿重复执行")
         
         if job.status in [ImportJobStatus.SUCCESS, ImportJobStatus.PARTIAL_FAIL]:
             raise BusinessException("任务已执行完成，不可重复执行")
         
-        # 3. 更新状态为运行中
-        job.status = ImportJobStatus.RUNNING
+        # 3. 重置进度和检查点
+        await db.execute(delete(DataImportJobError).where(DataImportJobError.job_id == job_id))
+        job.total_rows = 0
+        job.success_rows = 0
+        job.fail_rows = 0
+        job.processed_rows = 0
+        job.checkpoint_at = None
+        job.checkpoint_hash = None
+        job.error_report_path = None
+        
+        # 4. 加入队列
+        return await ImportService._queue(db, job)
+    
+    @staticmethod
+    async def resume_job(db: AsyncSession, job_id: int, user: User) -> DataImportJob:
+        """
+        从检查点续传导入任务
+        
+        适用于执行失败的任务，以及执行租约已过期（执行进程已退出）的运行中任务。
+        保留已提交的批次、进度和错误记录，worker 跳过检查点之前的行（校验文件内容未变化），
+        从下一行继续导入。
+        
+        Args:
+            db: 数据库会话
+            job_id: 任务ID
+            user: 当前用户
+        
+        Returns:
+            更新后的任务对象
+        """
+        job = await db.get(DataImportJob, job_id)
+        if not job:
+            raise NotFoundException(f"导入任务 {job_id} 不存在")
+        
+        if job.status != ImportJobStatus.FAIL and not ImportService.is_lease_expired(job):
+            raise BusinessException("只有执行失败或执行中断的任务可以续传")
+        
+        return await ImportService._queue(db, job)
+    
+    @staticmethod
+    async def claim_next_job(db: AsyncSession, worker_name: str) -> Optional[int]:
+        """
+        认领一个任务并置为运行中（提交）
+        
+        认领最早排队的任务，以及执行租约已过期的运行中任务（执行进程已退出，从检查点续传）。
+        FOR UPDATE SKIP LOCKED：多个 worker、多个进程同时认领时互不阻塞，也不会认领到同一任务。
+        
+        Args:
+            db: 数据库会话
+            worker_name: worker 标识（写入 lease_owner）
+        
+        Returns:
+            任务ID，没有可认领的任务时返回 None
+        """
+        now = datetime.now()
+        claimable_job_id = (
+            select(DataImportJob.id)
+            .where(or_(
+                DataImportJob.status == ImportJobStatus.QUEUED,
+                and_(
+                    DataImportJob.status == ImportJobStatus.RUNNING,
+                    or_(DataImportJob.lease_expires_at.is_(None), DataImportJob.lease_expires_at < now),
+                ),
+            ))
+            .order_by(DataImportJob.queued_at, DataImportJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(DataImportJob)
+            .where(DataImportJob.id == claimable_job_id)
+            .values(
+                status=ImportJobStatus.RUNNING,
+                started_at=now,
+                lease_owner=worker_name,
+                lease_expires_at=now + timedelta(seconds=settings.import_job_lease_seconds),
+            )
+            .returning(DataImportJob.id)
+        )
+        job_id = result.scalar()
+        await db.commit()
+        return job_id
+    
+    @staticmethod
+    async def renew_lease(db: AsyncSession, job_id: int, worker_name: str) -> bool:
+        """
+        续约执行租约（提交）
+        
+        Returns:
+            是否仍持有租约（任务已被其他 worker 接管或已结束时返回 False）
+        """
+        result = await db.execute(
+            update(DataImportJob)
+            .where(
+                DataImportJob.id == job_id,
+                DataImportJob.status == ImportJobStatus.RUNNING,
+                DataImportJob.lease_owner == worker_name,
+            )
+            .values(lease_expires_at=datetime.now() + timedelta(seconds=settings.import_job_lease_seconds))
+            .returning(DataImportJob.id)
+        )
+        renewed = result.scalar() is not None
         await db.commit()
+        return renewed
+    
+    @staticmethod
+    async def _update_if_owner(db: AsyncSession, job: DataImportJob, worker_name: str, **values: Any) -> bool:
+        """
+        仅在本 worker 仍持有执行租约时更新任务（不提交）
+        
+        租约过期后任务可能已被其他 worker 认领，此时不应再写入进度或状态。
+        
+        Returns:
+            是否更新成功（同步更新会话中的任务对象）
+        """
+        result = await db.execute(
+            update(DataImportJob)
+            .where(
+                DataImportJob.id == job.id,
+                DataImportJob.status == ImportJobStatus.RUNNING,
+                DataImportJob.lease_owner == worker_name,
+            )
+            .values(**values)
+            .returning(DataImportJob.id)
+            .execution_options(synchronize_session="fetch")
+        )
+        return result.scalar() is not None
+    
+    @staticmethod
+    async def execute_job(
+        db: AsyncSession,
+        job_id: int,
+        worker_name: str,
+        chunks: AsyncIterator[Tuple[pd.DataFrame, str]],
+    ) -> DataImportJob:
+        """
+        执行已认领的导入任务（由 import_worker 调用）
+        
+        chunks 按批（settings.import_chunk_size 行）提供检查点之后的文件内容和截至该批的内容哈希。
+        每批校验、写入，并与 processed_rows / checkpoint_hash / checkpoint_at 在同一事务中提交，
+        进程在任意时刻退出后都可以从检查点续传，已提交的批次不会重复写入或重复校验。
+        检查点只在本 worker 仍持有租约时写入，否则回滚该批并停止（任务已由其他 worker 接管）。
+        某批出错时该批回滚，之前已提交的批次保留，任务标记为失败并记录原因。
+        
+        Args:
+            db: 数据库会话
+            job_id: 任务ID
+            worker_name: 认领任务的 worker 标识（lease_owner）
+            chunks: (批数据, 截至该批的已处理行内容哈希)
+        
+        Returns:
+            更新后的任务对象
+        """
+        job = await db.get(DataImportJob, job_id)
+        if not job:
+            raise NotFoundException(f"导入任务 {job_id} 不存在")
+        lease_lost_message = f"导入任务 {job_id} 的执行租约已失效，已由其他 worker 接管"
         
         try:
-            # 4. 解析文件
-            rows = await ImportService._parse_file(job)
-            job.total_rows = len(rows)
+            importer = ImportService._get_importer(job.target_type)
             
-            # 检查行数限制
-            if len(rows) > MAX_ROWS_PER_JOB:
-                raise ValidationException(
-                    f"数据行数超过限制 (最大 {MAX_ROWS_PER_JOB} 行，当前 {len(rows)} 行)，请分批导入"
-                )
+            # 1. 按批导入，每批与检查点一起提交
+            async for frame, checkpoint_hash in chunks:
+                success_count, fail_count = await importer(db, job, frame, job.processed_rows + 1)
+                processed_rows = job.processed_rows + len(frame)
+                if not await ImportService._update_if_owner(
+                    db, job, worker_name,
+                    success_rows=job.success_rows + success_count,
+                    fail_rows=job.fail_rows + fail_count,
+                    processed_rows=processed_rows,
+                    total_rows=processed_rows,
+                    checkpoint_hash=checkpoint_hash,
+                    checkpoint_at=datetime.now(),
+                ):
+                    await db.rollback()
+                    raise ConflictException(lease_lost_message)
+                await db.commit()
             
-            # 5. 根据目标类型执行导入
-            if job.target_type == ImportTargetType.ORDERS:
-                await ImportService._import_orders(db, job, rows)
-            elif job.target_type == ImportTargetType.EXPENSE_RECORDS:
-                await ImportService._import_expense_records(db, job, rows)
-            elif job.target_type == ImportTargetType.STORES:
-                await ImportService._import_stores(db, job, rows)
-            elif job.target_type == ImportTargetType.EXPENSE_TYPES:
-                await ImportService._import_expense_types(db, job, rows)
-            else:
-                raise BusinessException(f"不支持的导入类型: {job.target_type}")
-            
-            # 6. 更新任务状态
+            # 2. 更新任务状态
             if job.fail_rows == 0:
-                job.status = ImportJobStatus.SUCCESS
+                status = ImportJobStatus.SUCCESS
             elif job.success_rows > 0:
-                job.status = ImportJobStatus.PARTIAL_FAIL
+                status = ImportJobStatus.PARTIAL_FAIL
             else:
-                job.status = ImportJobStatus.FAIL
+                status = ImportJobStatus.FAIL
+            if not await ImportService._update_if_owner(
+                db, job, worker_name, status=status, finished_at=datetime.now(), lease_expires_at=None
+            ):
+                await db.rollback()
+                raise ConflictException(lease_lost_message)
             
-            # 7. 生成错误报告
+            # 3. 生成错误报告
             if job.fail_rows > 0:
                 await ImportService.build_error_report(db, job_id)
             
@@ -203,249 +497,136 @@ class ImportService:
             
             return job
         
+        except ConflictException:
+            raise
+        
         except Exception as e:
-            # 任务失败
-            job.status = ImportJobStatus.FAIL
-            await db.commit()
+            # 任务失败：回滚当前批次，已提交的批次和检查点保留，可续传
+            await db.rollback()
+            await db.refresh(job)
+            if await ImportService._update_if_owner(
+                db, job, worker_name,
+                status=ImportJobStatus.FAIL,
+                error_message=str(e),
+                finished_at=datetime.now(),
+                lease_expires_at=None,
+            ):
+                await db.commit()
+            else:
+                await db.rollback()
             raise
     
     @staticmethod
-    async def _parse_file(job: DataImportJob) -> List[Dict[str, Any]]:
-        """解析文件内容"""
-        file_path = Path(job.file_path)
-        
-        if not file_path.exists():
-            raise BusinessException(f"文件不存在: {job.file_path}")
+    async def _import_orders(
+        db: AsyncSession,
+        job: DataImportJob,
+        frame: pd.DataFrame,
+        start_row_no: int = 1,
+    ) -> Tuple[int, int]:
+        """
+        导入一批订单数据（不提交）
         
-        try:
-            if job.source_type == ImportSourceType.CSV:
-                # CSV 文件
-                df = pd.read_csv(file_path, encoding="utf-8")
-            else:
-                # Excel 文件
-                df = pd.read_excel(file_path, engine="openpyxl")
-            
-            # 转换为字典列表
-            df = df.fillna("")  # 填充空值
-            rows = df.to_dict(orient="records")
-            
-            return rows
+        按列校验后，通过的行经 COPY 暂存并一次合并写入；已存在的订单号在合并时排除，记为错误行。
         
-        except Exception as e:
-            raise ValidationException(f"文件解析失败: {str(e)}")
-    
-    @staticmethod
-    async def _import_orders(db: AsyncSession, job: DataImportJob, rows: List[Dict[str, Any]]):
-        """导入订单数据"""
-        store_id = job.config.get("store_id")
-        mapping = job.config.get("mapping", {})
-        
-        # 字段映射（支持自定义）
-        def get_field(row: dict, field: str, default=None):
-            mapped_field = mapping.get(field, field)
-            return row.get(mapped_field, default)
-        
-        # 批量查询已存在的订单号
-        order_nos = [get_field(row, "order_no", "") for row in rows if get_field(row, "order_no")]
-        existing_orders = await db.execute(
-            select(OrderHeader.order_no).where(OrderHeader.order_no.in_(order_nos))
+        Returns:
+            (成功行数, 失败行数)
+        """
+        staged, errors = validate_orders(
+            frame,
+            job.config.get("mapping", {}),
+            job.config.get("store_id"),
+            start_row_no,
         )
-        existing_order_nos = set(result[0] for result in existing_orders.all())
-        
-        success_count = 0
-        fail_count = 0
-        
-        for idx, row in enumerate(rows, start=1):
-            try:
-                # 1. 提取字段
-                order_no = get_field(row, "order_no", "").strip()
-                biz_date_str = get_field(row, "biz_date", "").strip()
-                gross_amount_str = get_field(row, "gross_amount", "")
-                discount_amount_str = get_field(row, "discount_amount", "0")
-                net_amount_str = get_field(row, "net_amount", "")
-                customer_count_str = get_field(row, "customer_count", "1")
-                
-                # 2. 必填字段校验
-                if not order_no:
-                    raise ValueError("订单号不能为空")
-                
-                if not biz_date_str:
-                    raise ValueError("业务日期不能为空")
-                
-                if not net_amount_str and not gross_amount_str:
-                    raise ValueError("交易金额不能为空")
-                
-                # 3. 幂等性检查：订单号唯一
-                if order_no in existing_order_nos:
-                    raise ValueError(f"订单号 {order_no} 已存在，不可重复导入")
-                
-                # 4. 数据转换
-                try:
-                    biz_date = datetime.strptime(str(biz_date_str), "%Y-%m-%d").date()
-                except ValueError:
-                    raise ValueError(f"业务日期格式错误，应为 YYYY-MM-DD: {biz_date_str}")
-                
-                try:
-                    gross_amount = Decimal(str(gross_amount_str)) if gross_amount_str else Decimal("0")
-                    discount_amount = Decimal(str(discount_amount_str)) if discount_amount_str else Decimal("0")
-                    net_amount = Decimal(str(net_amount_str)) if net_amount_str else gross_amount - discount_amount
-                except (InvalidOperation, ValueError) as e:
-                    raise ValueError(f"金额格式错误: {e}")
-                
-                # 金额校验
-                if gross_amount < 0 or discount_amount < 0 or net_amount < 0:
-                    raise ValueError("金额不能为负数")
-                
-                # 5. 创建订单（使用模型必需字段）
-                # order_time默认为当前时间，channel默认为dine_in，payment_method默认为cash
-                order = OrderHeader(
-                    order_no=order_no,
-                    store_id=store_id,
-                    biz_date=biz_date,
-                    order_time=datetime.now(),  # 默认当前时间
-                    channel=get_field(row, "channel", "dine_in"),  # 默认堂食
-                    gross_amount=gross_amount,
-                    discount_amount=discount_amount,
-                    net_amount=net_amount,
-                    payment_method=get_field(row, "payment_method", "cash"),  # 默认现金
-                    status="completed",  # 导入的订单默认为已完成
-                )
-                
-                db.add(order)
-                existing_order_nos.add(order_no)  # 加入去重集合
-                success_count += 1
-            
-            except Exception as e:
-                # 记录错误
-                error = DataImportJobError(
-                    job_id=job.id,
-                    row_no=idx,
-                    field="",
-                    message=str(e),
-                    raw_data=row,
-                )
-                db.add(error)
-                fail_count += 1
-        
-        # 批量提交
-        await db.flush()
-        
-        job.success_rows = success_count
-        job.fail_rows = fail_count
+        
+        # 补建目标月份分区（独立会话提交，须在本批读写订单表前），再 COPY 暂存并合并
+        await ensure_partitions(ORDER_TABLES, {order.biz_date for order in staged})
+        inserted_order_nos = await load_orders(db, staged)
+        
+        touched_cells = set()  # 受影响的 (门店, 日期)
+        for order in staged:
+            if order.order_no in inserted_order_nos:
+                touched_cells.add((order.store_id, order.biz_date))
+            else:
+                errors.append((
+                    order.row_no,
+                    "order_no",
+                    f"订单号 {order.order_no} 已存在，不可重复导入",
+                    frame.iloc[order.row_no - start_row_no].to_dict(),
+                ))
+        
+        # 登记受影响的 KPI 单元、写入错误行，与导入数据同一事务提交（由 run_job 提交）
+        await mark_kpi_dirty(db, touched_cells, DIRTY_REASON_IMPORT)
+        await write_import_errors(db, job.id, errors)
+        
+        return len(inserted_order_nos), len(errors)
     
     @staticmethod
-    async def _import_expense_records(db: AsyncSession, job: DataImportJob, rows: List[Dict[str, Any]]):
-        """导入费用记录"""
-        store_id = job.config.get("store_id")
-        mapping = job.config.get("mapping", {})
+    async def _import_expense_records(
+        db: AsyncSession,
+        job: DataImportJob,
+        frame: pd.DataFrame,
+        start_row_no: int = 1,
+    ) -> Tuple[int, int]:
+        """
+        导入一批费用记录（不提交）
         
-        def get_field(row: dict, field: str, default=None):
-            mapped_field = mapping.get(field, field)
-            return row.get(mapped_field, default)
+        按列校验后，通过的行经 COPY 暂存并一次合并写入；
+        与已有记录完全相同（门店、日期、科目、金额、描述）的行在合并时排除，记为错误行。
         
+        Returns:
+            (成功行数, 失败行数)
+        """
         # 预加载费用科目
-        expense_types_result = await db.execute(select(ExpenseType))
-        expense_types = {et.type_code: et.id for et in expense_types_result.scalars().all()}
-        
-        # 构建去重键集合（store_id, biz_date, expense_type_id, amount, description）
-        existing_records = await db.execute(
-            select(
-                ExpenseRecord.store_id,
-                ExpenseRecord.biz_date,
-                ExpenseRecord.expense_type_id,
-                ExpenseRecord.amount,
-                ExpenseRecord.description
-            ).where(ExpenseRecord.store_id == store_id)
+        expense_types_result = await db.execute(select(ExpenseType.type_code, ExpenseType.id))
+        expense_types = {type_code: type_id for type_code, type_id in expense_types_result.all()}
+        
+        staged, errors = validate_expense_records(
+            frame,
+            job.config.get("mapping", {}),
+            job.config.get("store_id"),
+            expense_types,
+            start_row_no,
         )
         
-        existing_keys = set()
-        for rec in existing_records.all():
-            key = (rec.store_id, rec.biz_date, rec.expense_type_id, float(rec.amount), rec.description or "")
-            existing_keys.add(key)
-        
-        success_count = 0
-        fail_count = 0
-        
-        for idx, row in enumerate(rows, start=1):
-            try:
-                # 1. 提取字段
-                expense_type_code = get_field(row, "expense_type_code", "").strip()
-                biz_date_str = get_field(row, "biz_date", "").strip()
-                amount_str = get_field(row, "amount", "")
-                description = get_field(row, "description", "").strip()
-                
-                # 2. 必填校验
-                if not expense_type_code:
-                    raise ValueError("费用科目编码不能为空")
-                
-                if not biz_date_str:
-                    raise ValueError("业务日期不能为空")
-                
-                if not amount_str:
-                    raise ValueError("金额不能为空")
-                
-                # 3. 费用科目校验
-                if expense_type_code not in expense_types:
-                    raise ValueError(f"费用科目编码 {expense_type_code} 不存在")
-                
-                expense_type_id = expense_types[expense_type_code]
-                
-                # 4. 数据转换
-                try:
-                    biz_date = datetime.strptime(str(biz_date_str), "%Y-%m-%d").date()
-                except ValueError:
-                    raise ValueError(f"业务日期格式错误: {biz_date_str}")
-                
-                try:
-                    amount = Decimal(str(amount_str))
-                except (InvalidOperation, ValueError):
-                    raise ValueError(f"金额格式错误: {amount_str}")
-                
-                if amount < 0:
-                    raise ValueError("金额不能为负数")
-                
-                # 5. 幂等性检查
-                dup_key = (store_id, biz_date, expense_type_id, float(amount), description)
-                if dup_key in existing_keys:
-                    raise ValueError("记录已存在（门店、日期、科目、金额、描述完全相同）")
-                
-                # 6. 创建记录
-                record = ExpenseRecord(
-                    store_id=store_id,
-                    expense_type_id=expense_type_id,
-                    biz_date=biz_date,
-                    amount=amount,
-                    description=description,
-                )
-                
-                db.add(record)
-                existing_keys.add(dup_key)
-                success_count += 1
-            
-            except Exception as e:
-                error = DataImportJobError(
-                    job_id=job.id,
-                    row_no=idx,
-                    field="",
-                    message=str(e),
-                    raw_data=row,
-                )
-                db.add(error)
-                fail_count += 1
-        
-        await db.flush()
-        
-        job.success_rows = success_count
-        job.fail_rows = fail_count
+        await ensure_partitions(EXPENSE_TABLES, {record.biz_date for record in staged})
+        inserted_keys = await load_expense_records(db, staged, job.created_by_id)
+        
+        touched_cells = set()  # 受影响的 (门店, 日期)
+        for record in staged:
+            if record.dedup_key in inserted_keys:
+                touched_cells.add((record.store_id, record.biz_date))
+            else:
+                errors.append((
+                    record.row_no,
+                    "",
+                    "记录已存在（门店、日期、科目、金额、描述完全相同）",
+                    frame.iloc[record.row_no - start_row_no].to_dict(),
+                ))
+        
+        await refresh_expense_cube(db, touched_cells)
+        await mark_kpi_dirty(db, touched_cells, DIRTY_REASON_IMPORT)
+        await write_import_errors(db, job.id, errors)
+        
+        return len(inserted_keys), len(errors)
     
     @staticmethod
-    async def _import_stores(db: AsyncSession, job: DataImportJob, rows: List[Dict[str, Any]]):
+    async def _import_stores(
+        db: AsyncSession,
+        job: DataImportJob,
+        frame: pd.DataFrame,
+        start_row_no: int = 1,
+    ) -> Tuple[int, int]:
         """导入门店数据"""
         # TODO: 实现门店导入逻辑
         raise BusinessException("门店导入功能暂未实现")
     
     @staticmethod
-    async def _import_expense_types(db: AsyncSession, job: DataImportJob, rows: List[Dict[str, Any]]):
+    async def _import_expense_types(
+        db: AsyncSession,
+        job: DataImportJob,
+        frame: pd.DataFrame,
+        start_row_no: int = 1,
+    ) -> Tuple[int, int]:
         """导入费用科目数据"""
         # TODO: 实现费用科目导入逻辑
         raise BusinessException("费用科目导入功能暂未实现")
@@ -541,26 +722,29 @@ class ImportService:
         """生成错误报告文件"""
         job = await ImportService.get_job_detail(db, job_id)
         
-        # 查询所有错误
-        result = await db.execute(
-            select(DataImportJobError)
+        # 生成错误报告文件（服务端游标分批读取错误记录，逐行写入）
+        job_dir = Path(job.file_path).parent
+        report_path = job_dir / f"error_report_{job_id}.csv"
+        
+        errors = await db.stream(
+            select(
+                DataImportJobError.row_no,
+                DataImportJobError.field,
+                DataImportJobError.message,
+                DataImportJobError.raw_data,
+            )
             .where(DataImportJobError.job_id == job_id)
             .order_by(DataImportJobError.row_no)
+            .execution_options(yield_per=settings.import_chunk_size)
         )
-        errors = result.scalars().all()
-        
-        if not errors:
-            return ""
-        
-        # 生成错误报告文件
-        job_dir = Path(job.file_path).parent
-        report_path = job_dir / f"error_report_{job_id}.csv"
         
+        error_count = 0
         with open(report_path, "w", newline="", encoding="utf-8-sig") as f:
             writer = csv.writer(f)
             writer.writerow(["行号", "错误字段", "错误信息", "原始数据"])
             
-            for error in errors:
+            async for error in errors:
+                error_count += 1
                 raw_data_str = str(error.raw_data) if error.raw_data else ""
                 writer.writerow([
                     error.row_no,
@@ -569,6 +753,10 @@ class ImportService:
                     raw_data_str,
                 ])
         
+        if not error_count:
+            report_path.unlink(missing_ok=True)
+            return ""
+        
         # 更新任务记录
         job.error_report_path = str(report_path)
         await db.commit()
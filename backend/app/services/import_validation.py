@@ -0,0 +1,271 @@
+"""
+导入数据校验（按列向量化）
+
+每批数据是全部列按文本读取的 DataFrame：
+- 日期、金额按列解析，必填、格式、非负、范围、实收不大于商品总额、批内重复等规则生成布尔掩码
+- 每行只报告第一条不通过的规则（按规则顺序），错误信息按列拼接
+- 只有失败行转换为原始数据字典；通过的行直接组装为暂存行，交给 import_loader 写入
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from app.services.import_loader import StagedExpense, StagedOrder
+
+
+# 错误行：(行号, 字段, 错误信息, 原始行数据)
+ImportErrorRow = Tuple[int, str, str, Dict[str, Any]]
+
+# 字段范围（与目标表列定义一致，超出时整批 COPY 会失败，需在校验阶段拦截）
+MAX_AMOUNT = Decimal("99999999.99")  # Numeric(10, 2)
+MAX_ORDER_NO_LENGTH = 50
+MAX_CODE_LENGTH = 20
+
+# 四舍五入到两位小数后会超过 MAX_AMOUNT 的下界
+_AMOUNT_OVERFLOW = float(MAX_AMOUNT + Decimal("0.005"))
+
+
+def to_money(value: Any) -> Decimal:
+    """金额转为两位小数（与数据库四舍五入规则一致，去重比较使用入库后的值）"""
+    return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+class _RowErrors:
+    """按规则顺序记录每行第一条错误"""
+
+    def __init__(self, index: pd.Index):
+        self.field = pd.Series(None, index=index, dtype=object)
+        self.message = pd.Series(None, index=index, dtype=object)
+
+    @property
+    def passed(self) -> pd.Series:
+        """目前为止通过全部规则的行"""
+        return self.message.isna()
+
+    def add(self, mask: pd.Series, field: str, message: Union[str, pd.Series]) -> None:
+        """mask 为 True 且尚无错误的行记为该规则的错误；message 可为与行对齐的 Series"""
+        new = mask & self.passed
+        if not new.any():
+            return
+        self.field.loc[new] = field
+        self.message.loc[new] = message[new] if isinstance(message, pd.Series) else message
+
+    def rows(self, frame: pd.DataFrame, start_row_no: int) -> List[ImportErrorRow]:
+        """失败行转为错误行列表（只对失败行逐行转换原始数据）"""
+        failed = ~self.passed
+        if not failed.any():
+            return []
+        raw_rows = frame.loc[failed].to_dict(orient="records")
+        return [
+            (int(index) + start_row_no, field, message, raw)
+            for index, field, message, raw in zip(
+                frame.index[failed], self.field[failed], self.message[failed], raw_rows
+            )
+        ]
+
+
+def _text_column(frame: pd.DataFrame, mapping: Dict[str, str], field: str) -> pd.Series:
+    """按字段映射取列并去除首尾空白，缺少的列视为全空"""
+    column = mapping.get(field, field)
+    if column not in frame.columns:
+        return pd.Series("", index=frame.index, dtype=object)
+    return frame[column].fillna("").astype(str).str.strip()
+
+
+def _parse_amount(text: pd.Series) -> pd.Series:
+    """文本金额转为浮点数，空值和无法解析的值为 NaN（仅用于校验，入库值另行精确转换）"""
+    return pd.to_numeric(text.where(text != ""), errors="coerce").astype(float)
+
+
+def _parse_date(text: pd.Series) -> pd.Series:
+    """YYYY-MM-DD 文本转为日期，无法解析的值为 NaT"""
+    return pd.to_datetime(text.where(text != ""), format="%Y-%m-%d", errors="coerce")
+
+
+def _with_default(text: pd.Series, default: str) -> pd.Series:
+    return text.where(text != "", default)
+
+
+def _prepare(frame: pd.DataFrame) -> pd.DataFrame:
+    """行索引重置为 0..n-1，行号 = 索引 + 起始行号"""
+    return frame.reset_index(drop=True)
+
+
+def validate_orders(
+    frame: pd.DataFrame,
+    mapping: Dict[str, str],
+    store_id: int,
+    start_row_no: int = 1,
+) -> Tuple[List[StagedOrder], List[ImportErrorRow]]:
+    """
+    校验一批订单
+
+    商品总额为空时取实收金额，实收金额为空时取商品总额 - 优惠金额。
+
+    Returns:
+        (通过校验的暂存行, 错误行)
+    """
+    frame = _prepare(frame)
+    order_no = _text_column(frame, mapping, "order_no")
+    biz_date_text = _text_column(frame, mapping, "biz_date")
+    gross_text = _text_column(frame, mapping, "gross_amount")
+    discount_text = _text_column(frame, mapping, "discount_amount")
+    net_text = _text_column(frame, mapping, "net_amount")
+    channel = _with_default(_text_column(frame, mapping, "channel"), "dine_in")
+    payment_method = _with_default(_text_column(frame, mapping, "payment_method"), "cash")
+
+    biz_date = _parse_date(biz_date_text)
+    gross_given = _parse_amount(gross_text)
+    discount = _parse_amount(discount_text)
+    net_given = _parse_amount(net_text)
+    gross = gross_given.where(gross_text != "", net_given)
+    net = net_given.where(net_text != "", gross - discount.fillna(0))
+
+    errors = _RowErrors(frame.index)
+    # 1. 必填与长度
+    errors.add(order_no == "", "order_no", "订单号不能为空")
+    errors.add(biz_date_text == "", "biz_date", "业务日期不能为空")
+    errors.add((net_text == "") & (gross_text == ""), "net_amount", "交易金额不能为空")
+    errors.add(
+        order_no.str.len() > MAX_ORDER_NO_LENGTH,
+        "order_no", f"订单号长度不能超过 {MAX_ORDER_NO_LENGTH} 个字符",
+    )
+    errors.add(channel.str.len() > MAX_CODE_LENGTH, "channel", f"渠道长度不能超过 {MAX_CODE_LENGTH} 个字符")
+    errors.add(
+        payment_method.str.len() > MAX_CODE_LENGTH,
+        "payment_method", f"支付方式长度不能超过 {MAX_CODE_LENGTH} 个字符",
+    )
+
+    # 2. 格式
+    errors.add(biz_date.isna(), "biz_date", "业务日期格式错误，应为 YYYY-MM-DD: " + biz_date_text)
+    for field, text, values in (
+        ("gross_amount", gross_text, gross_given),
+        ("discount_amount", discount_text, discount),
+        ("net_amount", net_text, net_given),
+    ):
+        errors.add((text != "") & ~np.isfinite(values), field, "金额格式错误: " + text)
+
+    # 3. 金额范围与勾稽关系
+    for field, values in (("gross_amount", gross), ("discount_amount", discount), ("net_amount", net)):
+        errors.add(values < 0, field, "金额不能为负数")
+        errors.add(values >= _AMOUNT_OVERFLOW, field, f"金额不能超过 {MAX_AMOUNT}")
+    errors.add(net.round(2) > gross.round(2), "net_amount", "实收金额不能大于商品总额")
+
+    # 4. 幂等性检查：订单号批内唯一（与已有数据的去重在合并写入时完成）
+    passed = errors.passed
+    errors.add(
+        passed & order_no.where(passed).duplicated(),
+        "order_no", "订单号 " + order_no + " 已存在，不可重复导入",
+    )
+
+    ok = errors.passed
+    gross_values = [to_money(value) for value in gross_text.where(gross_text != "", net_text)[ok]]
+    discount_values = [to_money(value) for value in _with_default(discount_text, "0")[ok]]
+    net_values = [
+        to_money(value) if value else gross_value - discount_value
+        for value, gross_value, discount_value in zip(net_text[ok], gross_values, discount_values)
+    ]
+    staged = [
+        StagedOrder(
+            row_no=int(index) + start_row_no,
+            order_no=order_number,
+            store_id=store_id,
+            biz_date=order_date,
+            channel=order_channel,
+            gross_amount=gross_value,
+            discount_amount=discount_value,
+            net_amount=net_value,
+            payment_method=order_payment_method,
+        )
+        for index, order_number, order_date, order_channel, gross_value, discount_value, net_value,
+        order_payment_method in zip(
+            frame.index[ok],
+            order_no[ok],
+            biz_date[ok].dt.date,
+            channel[ok],
+            gross_values,
+            discount_values,
+            net_values,
+            payment_method[ok],
+        )
+    ]
+    return staged, errors.rows(frame, start_row_no)
+
+
+def validate_expense_records(
+    frame: pd.DataFrame,
+    mapping: Dict[str, str],
+    store_id: int,
+    expense_types: Dict[str, int],
+    start_row_no: int = 1,
+) -> Tuple[List[StagedExpense], List[ImportErrorRow]]:
+    """
+    校验一批费用记录
+
+    Args:
+        expense_types: 费用科目 {编码: ID}
+
+    Returns:
+        (通过校验的暂存行, 错误行)
+    """
+    frame = _prepare(frame)
+    type_code = _text_column(frame, mapping, "expense_type_code")
+    biz_date_text = _text_column(frame, mapping, "biz_date")
+    amount_text = _text_column(frame, mapping, "amount")
+    description = _text_column(frame, mapping, "description")
+
+    expense_type_id = type_code.map(expense_types)
+    biz_date = _parse_date(biz_date_text)
+    amount = _parse_amount(amount_text)
+
+    errors = _RowErrors(frame.index)
+    # 1. 必填
+    errors.add(type_code == "", "expense_type_code", "费用科目编码不能为空")
+    errors.add(biz_date_text == "", "biz_date", "业务日期不能为空")
+    errors.add(amount_text == "", "amount", "金额不能为空")
+
+    # 2. 费用科目与格式
+    errors.add(expense_type_id.isna(), "expense_type_code", "费用科目编码 " + type_code + " 不存在")
+    errors.add(biz_date.isna(), "biz_date", "业务日期格式错误: " + biz_date_text)
+    errors.add(~np.isfinite(amount), "amount", "金额格式错误: " + amount_text)
+
+    # 3. 金额范围
+    errors.add(amount < 0, "amount", "金额不能为负数")
+    errors.add(amount >= _AMOUNT_OVERFLOW, "amount", f"金额不能超过 {MAX_AMOUNT}")
+
+    # 4. 幂等性检查：去重键批内唯一（与已有数据的去重在合并写入时完成）
+    passed = errors.passed
+    amount_values: pd.Series = pd.Series(None, index=frame.index, dtype=object)
+    amount_values.loc[passed] = [to_money(value) for value in amount_text[passed]]
+    keys = pd.DataFrame({
+        "expense_type_id": expense_type_id,
+        "biz_date": biz_date,
+        "amount": amount_values,
+        "description": description,
+    })
+    errors.add(
+        keys[passed].duplicated().reindex(frame.index, fill_value=False),
+        "", "记录已存在（门店、日期、科目、金额、描述完全相同）",
+    )
+
+    ok = errors.passed
+    staged = [
+        StagedExpense(
+            row_no=int(index) + start_row_no,
+            store_id=store_id,
+            expense_type_id=int(type_id),
+            biz_date=record_date,
+            amount=record_amount,
+            description=record_description,
+        )
+        for index, type_id, record_date, record_amount, record_description in zip(
+            frame.index[ok],
+            expense_type_id[ok],
+            biz_date[ok].dt.date,
+            amount_values[ok],
+            description[ok],
+        )
+    ]
+    return staged, errors.rows(frame, start_row_no)
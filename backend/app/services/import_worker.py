@@ -0,0 +1,293 @@
+"""
+导入任务后台 worker
+
+- POST /import-jobs/{id}/run 只把任务置为排队中（queued）后立即返回
+- 应用启动时创建 worker 池：IMPORT_WORKER_CONCURRENCY 个协程循环认领排队任务
+  （UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED)），多进程部署时互不重复认领
+- 文件解析（pandas / openpyxl，CPU 密集）在进程池中执行，每个执行中的任务占用一个子进程，
+  解析结果按批经有界队列交给 worker 校验、写入，不占用事件循环
+- 执行租约：执行中的 worker 每 IMPORT_JOB_LEASE_SECONDS / 3 秒续约一次，
+  进程退出后租约过期，任务由其他 worker 认领或经 POST /import-jobs/{id}/resume 从检查点续传；
+  检查点和任务状态只在仍持有租约时写入，续约失败（已被接管）时取消执行
+- 续传时解析进程跳过已提交的 processed_rows 行，并用这些行内容的哈希与 checkpoint_hash 比对，
+  文件被替换或修改时拒绝续传
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import queue
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, AsyncIterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.exceptions import BusinessException, ValidationException
+from app.models.import_job import DataImportJob, ImportSourceType
+from app.services.import_service import ImportService, iter_file_chunks
+from app.services.kpi_refresh_service import refresh_dirty_kpi_in_background
+
+
+# 解析子进程最多领先 worker 的批数（控制内存占用）
+PARSE_QUEUE_SIZE = 2
+# 队列读写的等待间隔（秒），用于检查对方是否已退出
+_QUEUE_POLL_SECONDS = 1
+
+
+class _ParseFailure(NamedTuple):
+    """解析子进程中的异常（以消息形式传回）"""
+    message: str
+
+
+def _put(chunks: Any, item: Any, stop: Any) -> bool:
+    """放入队列；队列满时等待，消费方已停止则放弃"""
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=_QUEUE_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _hash_rows(digest: Any, frame: pd.DataFrame) -> None:
+    """把一批行的内容计入哈希（与分批大小无关）"""
+    digest.update(frame.to_csv(index=False, header=False).encode("utf-8"))
+
+
+def parse_file_chunks(
+    file_path: str,
+    source_type: ImportSourceType,
+    chunk_size: int,
+    skip_rows: int,
+    expected_hash: Optional[str],
+    chunks: Any,
+    stop: Any,
+) -> None:
+    """
+    解析子进程入口：按批读取文件放入队列，结束时放入 None
+
+    每批以 (批数据, 截至该批的已处理行内容哈希) 放入队列；续传时前 skip_rows 行只计入哈希，
+    与 expected_hash 不一致说明文件已变化，放入解析失败。
+
+    Args:
+        file_path: 文件路径
+        source_type: 源文件类型
+        chunk_size: 每批行数
+        skip_rows: 已提交的行数（续传检查点）
+        expected_hash: 已提交行内容的哈希，为空时不校验
+        chunks: 结果队列（Manager.Queue）
+        stop: 消费方停止标记（Manager.Event），置位后提前退出
+    """
+    digest = hashlib.sha256()
+    skipped = 0
+    try:
+        for frame in iter_file_chunks(Path(file_path), source_type, chunk_size):
+            if skipped < skip_rows:
+                # 检查点之前的行已提交，只计入哈希，不再交给 worker 校验
+                head = frame.iloc[:skip_rows - skipped]
+                _hash_rows(digest, head)
+                skipped += len(head)
+                if skipped < skip_rows:
+                    continue
+                if expected_hash and digest.hexdigest() != expected_hash:
+                    raise ValueError("文件内容与检查点不一致，无法续传")
+                frame = frame.iloc[len(head):].reset_index(drop=True)
+                if frame.empty:
+                    continue
+            _hash_rows(digest, frame)
+            if not _put(chunks, (frame, digest.hexdigest()), stop):
+                return
+        if skipped < skip_rows:
+            raise ValueError("文件行数少于已处理行数，无法续传")
+    except Exception as e:
+        _put(chunks, _ParseFailure(str(e)), stop)
+        return
+    _put(chunks, None, stop)
+
+
+class ImportWorkerPool:
+    """导入任务 worker 池（应用启动时 start，关闭时 stop）"""
+
+    def __init__(self) -> None:
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager: Any = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def start(self, concurrency: Optional[int] = None) -> None:
+        """创建解析进程池并启动 worker 协程"""
+        if self._tasks:
+            return
+        concurrency = max(1, concurrency or settings.import_worker_concurrency)
+        # spawn：子进程不继承事件循环、数据库连接和线程锁
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._executor = ProcessPoolExecutor(max_workers=concurrency, mp_context=context)
+        self._tasks = [
+            asyncio.create_task(self._worker(f"import-worker-{idx}"))
+            for idx in range(concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """停止 worker 协程并关闭进程池（执行中的任务被中断，已提交的批次保留）"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def notify(self) -> None:
+        """有新任务排队，唤醒空闲的 worker（未唤醒时按轮询间隔认领）"""
+        self._wakeup.set()
+
+    async def _worker(self, worker_name: str) -> None:
+        """循环认领并执行排队任务（以及租约过期、需要续传的任务）"""
+        interval = max(settings.import_worker_poll_seconds, 1)
+        # 租约持有者：多进程、多主机部署时可区分
+        owner = f"{socket.gethostname()}:{os.getpid()}:{worker_name}"
+        while True:
+            try:
+                async with AsyncSessionLocal() as session:
+                    job_id = await ImportService.claim_next_job(session, owner)
+            except Exception as e:
+                logger.error(f"{worker_name} 认领导入任务失败: {e}")
+                job_id = None
+
+            if job_id is None:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+                self._wakeup.clear()
+                continue
+
+            logger.info(f"{worker_name} 开始执行导入任务 {job_id}")
+            try:
+                await self._run(job_id, owner)
+            except Exception as e:
+                logger.error(f"导入任务 {job_id} 执行失败: {e}")
+
+    async def _run(self, job_id: int, owner: str) -> None:
+        """执行一个已认领的任务（从检查点开始），完成后刷新受影响的 KPI"""
+        execution = asyncio.create_task(self._execute(job_id, owner))
+        lease_lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._renew_lease(job_id, owner, execution, lease_lost))
+        try:
+            await execution
+        except asyncio.CancelledError:
+            # 租约失效时由续约协程取消执行；其他情况（应用关闭）继续向上抛出
+            if not lease_lost.is_set():
+                raise
+            logger.warning(f"导入任务 {job_id} 的执行租约已失效，停止执行")
+        finally:
+            heartbeat.cancel()
+            with suppress(asyncio.CancelledError):
+                await heartbeat
+        await refresh_dirty_kpi_in_background()
+
+    async def _execute(self, job_id: int, owner: str) -> None:
+        """解析文件并执行导入"""
+        async with AsyncSessionLocal() as session:
+            job = await session.get(DataImportJob, job_id)
+            if job is None:
+                return
+            if job.processed_rows:
+                logger.info(f"导入任务 {job_id} 从第 {job.processed_rows + 1} 行续传")
+            frames = self._parse_in_process(
+                job.file_path,
+                job.source_type,
+                settings.import_chunk_size,
+                job.processed_rows,
+                job.checkpoint_hash,
+            )
+            try:
+                await ImportService.execute_job(session, job_id, owner, frames)
+            finally:
+                await frames.aclose()
+
+    async def _renew_lease(
+        self,
+        job_id: int,
+        owner: str,
+        execution: asyncio.Task,
+        lease_lost: asyncio.Event,
+    ) -> None:
+        """
+        执行期间定期续约（单独的会话，不与批次事务交错）
+
+        租约已被其他 worker 接管或任务已结束时取消执行，未提交的批次随会话关闭回滚。
+        """
+        interval = max(settings.import_job_lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with AsyncSessionLocal() as session:
+                    renewed = await ImportService.renew_lease(session, job_id, owner)
+            except Exception as e:
+                logger.error(f"导入任务 {job_id} 续约失败: {e}")
+                continue
+            if not renewed:
+                lease_lost.set()
+                execution.cancel()
+                return
+
+    async def _parse_in_process(
+        self,
+        file_path: str,
+        source_type: ImportSourceType,
+        chunk_size: int,
+        skip_rows: int = 0,
+        expected_hash: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[pd.DataFrame, str]]:
+        """在解析进程池中按批读取文件（跳过检查点之前的行）"""
+        if not Path(file_path).exists():
+            raise BusinessException(f"文件不存在: {file_path}")
+
+        loop = asyncio.get_running_loop()
+        chunks = self._manager.Queue(maxsize=PARSE_QUEUE_SIZE)
+        stop = self._manager.Event()
+        parsing = loop.run_in_executor(
+            self._executor,
+            parse_file_chunks,
+            file_path,
+            source_type,
+            max(chunk_size, 1),
+            skip_rows,
+            expected_hash,
+            chunks,
+            stop,
+        )
+        try:
+            while True:
+                try:
+                    item = await asyncio.to_thread(chunks.get, True, _QUEUE_POLL_SECONDS)
+                except queue.Empty:
+                    if parsing.done() and chunks.empty():
+                        parsing.result()  # 子进程异常退出时抛出
+                        raise BusinessException("文件解析进程意外退出")
+                    continue
+                if item is None:
+                    return
+                if isinstance(item, _ParseFailure):
+                    raise ValidationException(f"文件解析失败: {item.message}")
+                yield item
+        finally:
+            # 提前结束（导入失败、应用关闭）时通知子进程退出，释放进程池名额
+            stop.set()
+            with suppress(Exception):
+                await parsing
+
+
+import_worker_pool = ImportWorkerPool()
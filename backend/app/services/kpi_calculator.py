@@ -1,30 +1,187 @@
 """
 KPI 计算服务
 使用 SQL 聚合进行高性能计算,避免大量数据传输
+
+重建模式：
+- bulk（默认）：按 (门店, 日期) 分组一次性聚合订单和费用，
+  再以 INSERT ... ON CONFLICT 批量写回，整个范围只提交一次
+- per_cell：逐门店逐日计算并提交（旧实现，保留用于对比和排障）
+- parallel：将门店/日期切分为分片，在多个独立会话（连接）上并发执行 bulk 计算，
+  并发数由 settings.kpi_rebuild_concurrency 控制，每个分片单独提交
+
+parallel 模式的分片与重建任务的 worker 共用进程级的会话配额（rebuild_session_slots），
+多个重建同时进行时总连接数仍不超过 settings.kpi_rebuild_concurrency，不会耗尽连接池。
+
+各模式在写入日 KPI 的同一事务内刷新周/月汇总和小时级 KPI。
 """
-from datetime import date
+import asyncio
+import math
+from datetime import date, timedelta
 from decimal import Decimal
-from typing import Optional, List, Tuple
-from sqlalchemy import select, func, and_, case, text
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Iterable, Optional, List, Tuple
+from sqlalchemy import select, func, and_, case, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
 from app.models.order import OrderHeader
-from app.models.expense import ExpenseRecord, ExpenseType
+from app.models.expense import ExpenseRecord
 from app.models.kpi import KpiDailyStore
 from app.models.store import Store
+from app.services.kpi_catalog import (
+    CHANNEL_REVENUE_COLUMNS,
+    COST_COLUMNS,
+    COST_OTHER_COLUMN,
+    load_cost_column_map,
+)
+from app.services.kpi_hourly_service import refresh_hourly
+from app.services.kpi_progress import KpiRebuildProgress
+from app.services.kpi_rollup_service import refresh_rollups
+
+
+# 重建模式
+REBUILD_MODE_BULK = "bulk"
+REBUILD_MODE_PER_CELL = "per_cell"
+REBUILD_MODE_PARALLEL = "parallel"
+
+# 进程内重建占用的独立会话数上限（parallel 分片与重建任务 worker 共用）
+rebuild_session_slots = asyncio.Semaphore(max(1, settings.kpi_rebuild_concurrency))
+
+# 单条 INSERT 的最大行数（每行约 25 个参数，需低于 asyncpg 的 32767 参数上限）
+UPSERT_BATCH_SIZE = 1000
+
+# upsert 冲突时需要覆盖的 KPI 字段（日 KPI 表的全部指标列）
+KPI_UPSERT_COLUMNS = [
+    "revenue",
+    *CHANNEL_REVENUE_COLUMNS.values(),
+    "refund_amount",
+    "discount_amount",
+    "net_revenue",
+    "order_count",
+    "customer_count",
+    "avg_order_value",
+    *COST_COLUMNS,
+    "cost_total",
+    "gross_profit",
+    "operating_profit",
+    "profit_rate",
+]
+
+# 利润率字段为 Numeric(5, 4)，超出范围时截断
+_PROFIT_RATE_LIMIT = Decimal("9.9999")
+
+
+def _empty_order_stats() -> dict:
+    """无订单时的默认订单指标"""
+    return {
+        "revenue_total": Decimal("0"),
+        **{column: Decimal("0") for column in CHANNEL_REVENUE_COLUMNS.values()},
+        "refund_amount": Decimal("0"),
+        "discount_amount": Decimal("0"),
+        "order_count": 0,
+        "customer_count": 0
+    }
+
+
+def _empty_cost_stats() -> dict:
+    """无费用时的默认成本指标"""
+    return {column: Decimal("0") for column in COST_COLUMNS}
+
+
+def _build_kpi_values(order_stats: dict, cost_stats: dict) -> dict:
+    """由订单和费用聚合结果计算单个 (门店, 日期) 的 KPI 字段值"""
+    net_revenue = order_stats["revenue_total"] - order_stats["refund_amount"]
+    cost_total = sum(cost_stats[column] for column in COST_COLUMNS)
+    operating_profit = net_revenue - cost_total
+    order_count = order_stats["order_count"]
+    
+    avg_order_value = Decimal("0")
+    if order_count:
+        avg_order_value = (net_revenue / order_count).quantize(Decimal("0.01"))
+    
+    profit_rate = Decimal("0")
+    if net_revenue > 0:
+        profit_rate = (operating_profit / net_revenue).quantize(Decimal("0.0001"))
+        profit_rate = max(-_PROFIT_RATE_LIMIT, min(_PROFIT_RATE_LIMIT, profit_rate))
+    
+    return {
+        "revenue": order_stats["revenue_total"],
+        **{column: order_stats[column] for column in CHANNEL_REVENUE_COLUMNS.values()},
+        "refund_amount": order_stats["refund_amount"],
+        "discount_amount": order_stats["discount_amount"],
+        "net_revenue": net_revenue,
+        "order_count": order_count,
+        "customer_count": order_stats["customer_count"],
+        "avg_order_value": avg_order_value,
+        **{column: cost_stats[column] for column in COST_COLUMNS},
+        "cost_total": cost_total,
+        "gross_profit": net_revenue - cost_stats["cost_material"],
+        "operating_profit": operating_profit,
+        "profit_rate": profit_rate,
+    }
+
+
+def _date_range(start_date: date, end_date: date) -> List[date]:
+    """生成闭区间日期列表"""
+    dates = []
+    current = start_date
+    while current <= end_date:
+        dates.append(current)
+        current += timedelta(days=1)
+    return dates
+
+
+def _plan_shards(
+    store_ids: List[int],
+    start_date: date,
+    end_date: date,
+    concurrency: int
+) -> List[Tuple[int, date, date]]:
+    """
+    规划并行分片 (store_id, start_date, end_date)
+    
+    门店数不少于并发数时按门店切分；门店较少时再把日期范围切开，
+    保证分片数至少等于并发数，使所有会话都有活干。
+    """
+    total_days = (end_date - start_date).days + 1
+    windows_per_store = min(total_days, max(1, math.ceil(concurrency / len(store_ids))))
+    window_days = math.ceil(total_days / windows_per_store)
+    
+    shards = []
+    for sid in store_ids:
+        current = start_date
+        while current <= end_date:
+            window_end = min(current + timedelta(days=window_days - 1), end_date)
+            shards.append((sid, current, window_end))
+            current = window_end + timedelta(days=1)
+    return shards
 
 
 class KpiCalculator:
     """KPI 计算器"""
     
-    def __init__(self, db: AsyncSession):
+    def __init__(
+        self,
+        db: AsyncSession,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        progress: Optional[KpiRebuildProgress] = None
+    ):
         self.db = db
+        # parallel 模式下为每个分片创建独立会话
+        self.session_factory = session_factory
+        # 重建进度（可选），每批 upsert 后累加并推送给 SSE 订阅者
+        self.progress = progress
+        # 费用科目目录映射 {expense_type_id: 成本字段}，首次聚合费用时加载
+        self._cost_column_map: Optional[dict] = None
     
     async def rebuild_daily_kpi(
         self,
         start_date: date,
         end_date: date,
-        store_id: Optional[int] = None
+        store_id: Optional[int] = None,
+        mode: str = REBUILD_MODE_BULK,
+        concurrency: Optional[int] = None
     ) -> Tuple[int, int, int]:
         """
         重建日指标数据（upsert 模式）
@@ -33,38 +190,192 @@ class KpiCalculator:
             start_date: 开始日期
             end_date: 结束日期
             store_id: 可选的门店ID，如果不提供则计算所有门店
+            mode: 重建模式，bulk（集合式批量）、per_cell（逐门店逐日）或 parallel（多会话并发）
+            concurrency: parallel 模式的并发会话数，默认且最多为 settings.kpi_rebuild_concurrency
         
         Returns:
             (affected_dates, affected_stores, total_records)
         """
-        # 获取需要计算的门店列表
+        store_ids = await self._get_active_store_ids(store_id)
+        
+        if not store_ids:
+            return (0, 0, 0)
+        
+        dates = _date_range(start_date, end_date)
+        if self.progress:
+            self.progress.start(store_ids, start_date, end_date)
+        
+        try:
+            if mode == REBUILD_MODE_PER_CELL:
+                total_records = 0
+                # 对每个门店和日期组合计算KPI
+                for sid in store_ids:
+                    for biz_date in dates:
+                        await self._calculate_and_upsert_kpi(sid, biz_date)
+                        total_records += 1
+            elif mode == REBUILD_MODE_PARALLEL:
+                total_records = await self._rebuild_parallel(
+                    store_ids,
+                    start_date,
+                    end_date,
+                    concurrency or settings.kpi_rebuild_concurrency
+                )
+            else:
+                total_records = await self._rebuild_bulk(store_ids, start_date, end_date)
+        except Exception as e:
+            if self.progress:
+                self.progress.finish("fail", str(e))
+            raise
+        
+        if self.progress:
+            self.progress.finish("success")
+        return (len(dates), len(store_ids), total_records)
+    
+    async def rebuild_cells(self, cells: Iterable[Tuple[int, date]]) -> int:
+        """
+        仅重算指定的 (门店, 日期) 单元（增量刷新使用）
+        
+        与 bulk 模式共用分组聚合与 upsert，但不提交事务，
+        由调用方与脏单元认领放在同一事务中提交。
+        
+        Returns:
+            写入的 KPI 行数
+        """
+        cell_list = sorted(set(cells))
+        if not cell_list:
+            return 0
+        
+        store_ids = sorted({sid for sid, _ in cell_list})
+        start_date = min(d for _, d in cell_list)
+        end_date = max(d for _, d in cell_list)
+        
+        rows = await self.calculate_rows(store_ids, start_date, end_date, cells=cell_list)
+        await self._upsert_kpi_rows(rows)
+        # 同一事务内刷新小时级 KPI 和所在周/月的汇总行（汇总行加锁，放在最后）
+        await refresh_hourly(self.db, store_ids, start_date, end_date, cells=cell_list)
+        await refresh_rollups(self.db, [(row["store_id"], row["biz_date"]) for row in rows])
+        return len(rows)
+    
+    async def _get_active_store_ids(self, store_id: Optional[int] = None) -> List[int]:
+        """获取需要计算的门店列表"""
         store_query = select(Store.id).where(Store.is_active == True)
         if store_id:
             store_query = store_query.where(Store.id == store_id)
         
         store_result = await self.db.execute(store_query)
-        store_ids = [row[0] for row in store_result.all()]
+        return [row[0] for row in store_result.all()]
+    
+    async def _rebuild_bulk(
+        self,
+        store_ids: List[int],
+        start_date: date,
+        end_date: date
+    ) -> int:
+        """
+        集合式重建：分组聚合 + 批量 upsert，单事务提交
+        """
+        total_records = await self.upsert_range(store_ids, start_date, end_date)
+        await self.db.commit()
+        return total_records
+    
+    async def _rebuild_parallel(
+        self,
+        store_ids: List[int],
+        start_date: date,
+        end_date: date,
+        concurrency: int
+    ) -> int:
+        """
+        并行重建：分片在独立会话上并发执行 bulk 计算
         
-        if not store_ids:
-            return (0, 0, 0)
+        每个分片单独提交，整体不再是单事务；任一分片失败时异常向上抛出，
+        已提交的分片结果保留（重建是幂等的，重跑即可）。
+        分片会话占用进程级配额，并发数不超过 settings.kpi_rebuild_concurrency。
+        """
+        concurrency = max(1, min(concurrency, settings.kpi_rebuild_concurrency))
         
-        # 生成日期范围
-        dates = []
-        current = start_date
-        while current <= end_date:
-            dates.append(current)
-            from datetime import timedelta
-            current += timedelta(days=1)
+        async def _run_shard(sid: int, shard_start: date, shard_end: date) -> int:
+            async with rebuild_session_slots:
+                async with self.session_factory() as session:
+                    count = await KpiCalculator(session, progress=self.progress).upsert_range(
+                        [sid], shard_start, shard_end
+                    )
+                    await session.commit()
+                    return count
         
-        total_records = 0
+        results = await asyncio.gather(*[
+            _run_shard(sid, shard_start, shard_end)
+            for sid, shard_start, shard_end in _plan_shards(store_ids, start_date, end_date, concurrency)
+        ])
+        return sum(results)
+    
+    async def upsert_range(
+        self,
+        store_ids: List[int],
+        start_date: date,
+        end_date: date
+    ) -> int:
+        """
+        重算门店列表在日期范围内的全部单元并 upsert（不提交）
         
-        # 对每个门店和日期组合计算KPI
-        for sid in store_ids:
-            for biz_date in dates:
-                await self._calculate_and_upsert_kpi(sid, biz_date)
-                total_records += 1
+        无订单/费用的 (门店, 日期) 也会写入全 0 记录，与逐日模式结果一致。
         
-        return (len(dates), len(store_ids), total_records)
+        Returns:
+            写入的 KPI 行数
+        """
+        rows = await self.calculate_rows(store_ids, start_date, end_date)
+        await self._upsert_kpi_rows(rows)
+        # 同一事务内刷新小时级 KPI 和所在周/月的汇总行（汇总行加锁，放在最后）
+        await refresh_hourly(self.db, store_ids, start_date, end_date)
+        await refresh_rollups(self.db, [(row["store_id"], row["biz_date"]) for row in rows])
+        return len(rows)
+    
+    async def calculate_rows(
+        self,
+        store_ids: List[int],
+        start_date: date,
+        end_date: date,
+        cells: Optional[List[Tuple[int, date]]] = None
+    ) -> List[dict]:
+        """
+        由源数据计算 KPI 行（只读，不写入）
+        
+        订单、费用各分组聚合一次；cells 为空时返回 门店 × 日期 的全部单元
+        （无订单/费用的单元为全 0 记录），否则只返回指定单元。
+        
+        Returns:
+            [{"biz_date", "store_id", 各 KPI 字段...}]
+        """
+        order_map = await self._aggregate_orders_grouped(store_ids, start_date, end_date, cells=cells)
+        cost_map = await self._aggregate_costs_grouped(store_ids, start_date, end_date, cells=cells)
+        
+        keys = cells if cells else [
+            (sid, biz_date) for sid in store_ids for biz_date in _date_range(start_date, end_date)
+        ]
+        rows = []
+        for key in keys:
+            values = _build_kpi_values(
+                order_map.get(key) or _empty_order_stats(),
+                cost_map.get(key) or _empty_cost_stats()
+            )
+            rows.append({"biz_date": key[1], "store_id": key[0], **values})
+        return rows
+    
+    async def _upsert_kpi_rows(self, rows: List[dict]) -> None:
+        """批量 INSERT ... ON CONFLICT (biz_date, store_id) DO UPDATE（不提交）"""
+        for offset in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[offset:offset + UPSERT_BATCH_SIZE]
+            stmt = pg_insert(KpiDailyStore).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[KpiDailyStore.biz_date, KpiDailyStore.store_id],
+                set_={
+                    **{col: stmt.excluded[col] for col in KPI_UPSERT_COLUMNS},
+                    "updated_at": func.now(),
+                }
+            )
+            await self.db.execute(stmt)
+            if self.progress:
+                self.progress.record_rows((row["store_id"], row["biz_date"]) for row in batch)
     
     async def _calculate_and_upsert_kpi(self, store_id: int, biz_date: date):
         """
@@ -78,16 +389,7 @@ class KpiCalculator:
         cost_stats = await self._aggregate_costs(store_id, biz_date)
         
         # 3. 计算利润指标
-        net_revenue = order_stats["revenue_total"] - order_stats["refund_amount"]
-        cost_total = sum([
-            cost_stats["cost_material"],
-            cost_stats["cost_labor"],
-            cost_stats["cost_rent"],
-            cost_stats["cost_utilities"],
-            cost_stats["cost_other"]
-        ])
-        profit_gross = net_revenue - cost_stats["cost_material"]
-        profit_net = net_revenue - cost_total
+        values = _build_kpi_values(order_stats, cost_stats)
         
         # 4. 查找是否已存在记录
         existing = await self.db.execute(
@@ -103,137 +405,67 @@ class KpiCalculator:
         # 5. Upsert 操作
         if kpi_record:
             # 更新现有记录
-            kpi_record.revenue = order_stats["revenue_total"]
-            kpi_record.dine_in_revenue = order_stats["revenue_dine_in"]
-            kpi_record.takeout_revenue = order_stats["revenue_takeout"]
-            kpi_record.delivery_revenue = order_stats["revenue_delivery"]
-            kpi_record.refund_amount = order_stats["refund_amount"]
-            kpi_record.net_revenue = net_revenue
-            kpi_record.order_count = order_stats["order_count"]
-            kpi_record.customer_count = order_stats["customer_count"]
-            kpi_record.cost_material = cost_stats["cost_material"]
-            kpi_record.cost_labor = cost_stats["cost_labor"]
-            kpi_record.cost_rent = cost_stats["cost_rent"]
-            kpi_record.cost_utilities = cost_stats["cost_utilities"]
-            kpi_record.cost_other = cost_stats["cost_other"]
-            kpi_record.cost_total = cost_total
-            kpi_record.gross_profit = profit_gross
-            kpi_record.operating_profit = profit_net
+            for field, value in values.items():
+                setattr(kpi_record, field, value)
         else:
             # 插入新记录
             kpi_record = KpiDailyStore(
                 biz_date=biz_date,
                 store_id=store_id,
-                revenue=order_stats["revenue_total"],
-                dine_in_revenue=order_stats["revenue_dine_in"],
-                takeout_revenue=order_stats["revenue_takeout"],
-                delivery_revenue=order_stats["revenue_delivery"],
-                refund_amount=order_stats["refund_amount"],
-                net_revenue=net_revenue,
-                order_count=order_stats["order_count"],
-                customer_count=order_stats["customer_count"],
-                cost_material=cost_stats["cost_material"],
-                cost_labor=cost_stats["cost_labor"],
-                cost_rent=cost_stats["cost_rent"],
-                cost_utilities=cost_stats["cost_utilities"],
-                cost_other=cost_stats["cost_other"],
-                cost_total=cost_total,
-                gross_profit=profit_gross,
-                operating_profit=profit_net
+                **values
             )
             self.db.add(kpi_record)
         
+        await self.db.flush()
+        await refresh_hourly(self.db, [store_id], biz_date, biz_date)
+        await refresh_rollups(self.db, [(store_id, biz_date)])
         await self.db.commit()
+        if self.progress:
+            self.progress.record_rows([(store_id, biz_date)])
     
-    async def _aggregate_orders(self, store_id: int, biz_date: date) -> dict:
+    @staticmethod
+    def _order_aggregate_columns() -> List[Any]:
         """
-        使用 SQL 聚合订单数据（一次查询获取所有指标）
+        订单聚合列（单日与分组聚合共用）
+        
+        渠道收入列按渠道目录生成，一次扫描得到全部订单指标。
         """
-        # 构建 SQL 聚合查询
-        query = select(
-            # 总营收（已完成订单）
-            func.coalesce(
-                func.sum(
-                    case(
-                        (OrderHeader.status == "completed", OrderHeader.net_amount),
-                        else_=Decimal("0")
-                    )
-                ),
-                Decimal("0")
-            ).label("revenue_total"),
-            # 堂食营收
-            func.coalesce(
-                func.sum(
-                    case(
-                        (
-                            and_(
-                                OrderHeader.status == "completed",
-                                OrderHeader.channel == "dine_in"
-                            ),
-                            OrderHeader.net_amount
-                        ),
-                        else_=Decimal("0")
-                    )
-                ),
-                Decimal("0")
-            ).label("revenue_dine_in"),
-            # 外卖营收
-            func.coalesce(
-                func.sum(
-                    case(
-                        (
-                            and_(
-                                OrderHeader.status == "completed",
-                                OrderHeader.channel == "takeout"
-                            ),
-                            OrderHeader.net_amount
-                        ),
-                        else_=Decimal("0")
-                    )
-                ),
-                Decimal("0")
-            ).label("revenue_takeout"),
-            # 配送营收
-            func.coalesce(
-                func.sum(
-                    case(
-                        (
-                            and_(
-                                OrderHeader.status == "completed",
-                                OrderHeader.channel == "delivery"
-                            ),
-                            OrderHeader.net_amount
-                        ),
-                        else_=Decimal("0")
-                    )
-                ),
+        completed = OrderHeader.status == "completed"
+        
+        def _sum_if(condition: Any, value: Any, label: str) -> Any:
+            return func.coalesce(
+                func.sum(case((condition, value), else_=Decimal("0"))),
                 Decimal("0")
-            ).label("revenue_delivery"),
+            ).label(label)
+        
+        return [
+            # 总营收（已完成订单）
+            _sum_if(completed, OrderHeader.net_amount, "revenue_total"),
+            # 各渠道营收
+            *[
+                _sum_if(and_(completed, OrderHeader.channel == channel), OrderHeader.net_amount, column)
+                for channel, column in CHANNEL_REVENUE_COLUMNS.items()
+            ],
             # 退款金额（refunded状态的订单金额）
-            func.coalesce(
-                func.sum(
-                    case(
-                        (OrderHeader.status == "refunded", OrderHeader.net_amount),
-                        else_=Decimal("0")
-                    )
-                ),
-                Decimal("0")
-            ).label("refund_amount"),
+            _sum_if(OrderHeader.status == "refunded", OrderHeader.net_amount, "refund_amount"),
+            # 优惠金额（已完成订单）
+            _sum_if(completed, OrderHeader.discount_amount, "discount_amount"),
             # 订单数（已完成）
-            func.count(
-                case(
-                    (OrderHeader.status == "completed", OrderHeader.id),
-                    else_=None
-                )
-            ).label("order_count"),
+            func.count(case((completed, OrderHeader.id), else_=None)).label("order_count"),
             # 客流量（简化：使用订单数）
-            func.count(
-                case(
-                    (OrderHeader.status == "completed", OrderHeader.id),
-                    else_=None
-                )
-            ).label("customer_count")
-        ).where(
+            func.count(case((completed, OrderHeader.id), else_=None)).label("customer_count")
+        ]
+    
+    @staticmethod
+    def _order_stats_from_row(row: Any) -> dict:
+        """将订单聚合结果行转换为指标字典"""
+        return {key: getattr(row, key) for key in _empty_order_stats()}
+    
+    async def _aggregate_orders(self, store_id: int, biz_date: date) -> dict:
+        """
+        使用 SQL 聚合订单数据（一次查询获取所有指标）
+        """
+        query = select(*self._order_aggregate_columns()).where(
             and_(
                 OrderHeader.store_id == store_id,
                 OrderHeader.biz_date == biz_date
@@ -244,77 +476,107 @@ class KpiCalculator:
         row = result.first()
         
         if row:
-            return {
-                "revenue_total": row.revenue_total,
-                "revenue_dine_in": row.revenue_dine_in,
-                "revenue_takeout": row.revenue_takeout,
-                "revenue_delivery": row.revenue_delivery,
-                "refund_amount": row.refund_amount,
-                "order_count": row.order_count,
-                "customer_count": row.customer_count
-            }
-        else:
-            return {
-                "revenue_total": Decimal("0"),
-                "revenue_dine_in": Decimal("0"),
-                "revenue_takeout": Decimal("0"),
-                "revenue_delivery": Decimal("0"),
-                "refund_amount": Decimal("0"),
-                "order_count": 0,
-                "customer_count": 0
-            }
+            return self._order_stats_from_row(row)
+        return _empty_order_stats()
+    
+    async def _aggregate_orders_grouped(
+        self,
+        store_ids: List[int],
+        start_date: date,
+        end_date: date,
+        cells: Optional[List[Tuple[int, date]]] = None
+    ) -> dict:
+        """
+        按 (门店, 日期) 分组聚合订单数据（整个范围一次查询）
+        
+        cells 不为空时只聚合这些 (门店, 日期) 单元。
+        
+        Returns:
+            {(store_id, biz_date): 订单指标字典}
+        """
+        query = select(
+            OrderHeader.store_id,
+            OrderHeader.biz_date,
+            *self._order_aggregate_columns()
+        ).where(
+            and_(
+                OrderHeader.store_id.in_(store_ids),
+                OrderHeader.biz_date >= start_date,
+                OrderHeader.biz_date <= end_date
+            )
+        ).group_by(OrderHeader.store_id, OrderHeader.biz_date)
+        if cells:
+            query = query.where(tuple_(OrderHeader.store_id, OrderHeader.biz_date).in_(cells))
+        
+        result = await self.db.execute(query)
+        return {
+            (row.store_id, row.biz_date): self._order_stats_from_row(row)
+            for row in result.all()
+        }
+    
+    async def _get_cost_column_map(self) -> dict:
+        """获取费用科目 -> 成本字段映射（同一计算器内只加载一次）"""
+        if self._cost_column_map is None:
+            self._cost_column_map = await load_cost_column_map(self.db)
+        return self._cost_column_map
     
     async def _aggregate_costs(self, store_id: int, biz_date: date) -> dict:
         """
-        使用 SQL 聚合费用数据（按科目映射分类）
+        使用 SQL 聚合费用数据（按科目目录归类）
         只统计已审批的费用
         """
-        # JOIN expense_record 和 expense_type，按 type_code 分组聚合
+        cost_map = await self._aggregate_costs_grouped(
+            [store_id], biz_date, biz_date
+        )
+        return cost_map.get((store_id, biz_date)) or _empty_cost_stats()
+    
+    async def _aggregate_costs_grouped(
+        self,
+        store_ids: List[int],
+        start_date: date,
+        end_date: date,
+        cells: Optional[List[Tuple[int, date]]] = None
+    ) -> dict:
+        """
+        按 (门店, 日期, 科目) 分组聚合已审批费用（整个范围一次查询）
+        
+        科目按费用科目目录归入成本字段，子科目随上级科目归类。
+        cells 不为空时只聚合这些 (门店, 日期) 单元。
+        
+        Returns:
+            {(store_id, biz_date): 成本指标字典}
+        """
+        column_map = await self._get_cost_column_map()
+        
         query = select(
-            ExpenseType.type_code,
+            ExpenseRecord.store_id,
+            ExpenseRecord.biz_date,
+            ExpenseRecord.expense_type_id,
             func.sum(ExpenseRecord.amount).label("total_amount")
-        ).select_from(ExpenseRecord).join(
-            ExpenseType,
-            ExpenseRecord.expense_type_id == ExpenseType.id
         ).where(
             and_(
-                ExpenseRecord.store_id == store_id,
-                ExpenseRecord.biz_date == biz_date,
+                ExpenseRecord.store_id.in_(store_ids),
+                ExpenseRecord.biz_date >= start_date,
+                ExpenseRecord.biz_date <= end_date,
                 ExpenseRecord.status == "approved"  # 只统计已审批的
             )
-        ).group_by(ExpenseType.type_code)
+        ).group_by(
+            ExpenseRecord.store_id,
+            ExpenseRecord.biz_date,
+            ExpenseRecord.expense_type_id
+        )
+        if cells:
+            query = query.where(tuple_(ExpenseRecord.store_id, ExpenseRecord.biz_date).in_(cells))
         
         result = await self.db.execute(query)
-        rows = result.all()
-        
-        # 初始化成本字典
-        costs = {
-            "cost_material": Decimal("0"),
-            "cost_labor": Decimal("0"),
-            "cost_rent": Decimal("0"),
-            "cost_utilities": Decimal("0"),
-            "cost_other": Decimal("0")
-        }
         
-        # 按 type_code 前缀映射到 KPI 成本类别
-        for row in rows:
-            type_code = row.type_code
-            amount = row.total_amount or Decimal("0")
-            
-            # 根据科目代码前缀映射到成本类别
-            if type_code.startswith("EXP_MATERIAL"):
-                costs["cost_material"] += amount
-            elif type_code.startswith("EXP_LABOR"):
-                costs["cost_labor"] += amount
-            elif type_code.startswith("EXP_RENT"):
-                costs["cost_rent"] += amount
-            elif type_code.startswith("EXP_UTILITIES"):
-                costs["cost_utilities"] += amount
-            else:
-                # 其他费用（包括营销、杂项等）
-                costs["cost_other"] += amount
+        cost_map: dict = {}
+        for row in result.all():
+            costs = cost_map.setdefault((row.store_id, row.biz_date), _empty_cost_stats())
+            column = column_map.get(row.expense_type_id, COST_OTHER_COLUMN)
+            costs[column] += row.total_amount or Decimal("0")
         
-        return costs
+        return cost_map
     
     async def get_daily_trend(
         self,
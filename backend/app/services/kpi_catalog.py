@@ -0,0 +1,84 @@
+"""
+KPI 口径目录
+
+- 渠道目录：订单渠道代码 -> KPI 渠道收入字段
+- 成本目录：费用科目代码 -> KPI 成本字段；子科目沿 parent_id 归入上级科目的类别
+
+KPI 计算、小时级 KPI 等按目录生成聚合列，新增渠道或成本类别只需修改这里
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.expense import ExpenseType
+
+
+# 订单渠道 -> KPI 渠道收入字段
+CHANNEL_REVENUE_COLUMNS: Dict[str, str] = {
+    "dine_in": "dine_in_revenue",
+    "takeout": "takeout_revenue",
+    "delivery": "delivery_revenue",
+    "online": "online_revenue",
+}
+
+# 费用科目代码（一级科目或前缀）-> KPI 成本字段
+COST_TYPE_COLUMNS: Dict[str, str] = {
+    "EXP_MATERIAL": "cost_material",
+    "EXP_LABOR": "cost_labor",
+    "EXP_RENT": "cost_rent",
+    "EXP_UTILITIES": "cost_utilities",
+    "EXP_MARKETING": "cost_marketing",
+    "EXP_MKT": "cost_marketing",
+}
+
+# 未匹配目录的科目归入其他成本
+COST_OTHER_COLUMN = "cost_other"
+
+# 全部成本字段（cost_total 为其合计）
+COST_COLUMNS: List[str] = [
+    "cost_material",
+    "cost_labor",
+    "cost_rent",
+    "cost_utilities",
+    "cost_marketing",
+    COST_OTHER_COLUMN,
+]
+
+
+def _match_cost_column(type_code: str) -> Optional[str]:
+    """按科目代码匹配成本字段（精确匹配优先，其次最长前缀）"""
+    if type_code in COST_TYPE_COLUMNS:
+        return COST_TYPE_COLUMNS[type_code]
+    prefixes = [code for code in COST_TYPE_COLUMNS if type_code.startswith(f"{code}_")]
+    if prefixes:
+        return COST_TYPE_COLUMNS[max(prefixes, key=len)]
+    return None
+
+
+async def load_cost_column_map(db: AsyncSession) -> Dict[int, str]:
+    """
+    读取费用科目目录，返回 {expense_type_id: KPI 成本字段}
+
+    从科目自身开始沿 parent_id 向上查找，第一个匹配目录的科目决定类别，
+    都不匹配时归入 cost_other。
+    """
+    result = await db.execute(
+        select(ExpenseType.id, ExpenseType.type_code, ExpenseType.parent_id)
+    )
+    types = {row.id: (row.type_code, row.parent_id) for row in result.all()}
+
+    column_map: Dict[int, str] = {}
+    for type_id in types:
+        column = None
+        current: Optional[int] = type_id
+        visited = set()
+        while current is not None and current in types and current not in visited:
+            visited.add(current)
+            type_code, parent_id = types[current]
+            column = _match_cost_column(type_code)
+            if column:
+                break
+            current = parent_id
+        column_map[type_id] = column or COST_OTHER_COLUMN
+    return column_map
@@ -0,0 +1,300 @@
+"""
+KPI 一致性校验服务
+
+校验 kpi_daily_store 是否仍与 order_header / expense_record 一致：
+1. 按 (门店, 月) 分别从源表和 KPI 表计算校验和（各指标合计 + 按日序号加权合计，
+   加权项可发现同月内日期错位的数据）
+2. 只对校验和不一致的 (门店, 月) 逐日比对，定位差异单元
+3. 可选将差异单元登记为脏单元，由增量刷新重算
+"""
+import hashlib
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, and_, case, cast, extract, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.expense import ExpenseRecord
+from app.models.kpi import KpiDailyStore
+from app.models.order import OrderHeader
+from app.services.kpi_calculator import KpiCalculator
+from app.services.kpi_catalog import CHANNEL_REVENUE_COLUMNS, COST_COLUMNS, COST_OTHER_COLUMN, load_cost_column_map
+from app.services.kpi_refresh_service import DIRTY_REASON_CONSISTENCY, mark_kpi_dirty
+from app.services.kpi_rollup_service import next_month_start
+
+
+# 参与校验的 KPI 指标（源数据可直接得到的指标，派生指标随之一致）
+CHECK_MEASURES = [
+    "revenue",
+    *CHANNEL_REVENUE_COLUMNS.values(),
+    "refund_amount",
+    "discount_amount",
+    "order_count",
+    "customer_count",
+    *COST_COLUMNS,
+]
+
+# 按日序号加权的指标
+WEIGHTED_MEASURES = ["revenue", "order_count", "cost_total"]
+
+# 逐日比对时输出的差异单元数量上限
+MAX_REPORTED_CELLS = 1000
+
+_ZERO = Decimal("0")
+
+
+def _month_expr(column: Any) -> Any:
+    """所在月份第一天（单位以字面量渲染，保证 SELECT 与 GROUP BY 表达式一致）"""
+    return cast(func.date_trunc(literal_column("'month'"), column), Date)
+
+
+def _empty_bucket() -> Dict[str, Decimal]:
+    bucket = {m: _ZERO for m in CHECK_MEASURES}
+    bucket.update({f"weighted_{m}": _ZERO for m in WEIGHTED_MEASURES})
+    return bucket
+
+
+def _checksum(values: Dict[str, Decimal]) -> str:
+    """指标值的校验和（金额统一保留两位小数后计算）"""
+    canonical = "|".join(
+        f"{key}={Decimal(values[key]).quantize(Decimal('0.01'))}" for key in sorted(values)
+    )
+    return hashlib.md5(canonical.encode("utf-8")).hexdigest()
+
+
+# ──────────────────── 月度校验和 ────────────────────
+
+
+async def _source_buckets(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    store_ids: Optional[Sequence[int]],
+) -> Dict[Tuple[int, date], Dict[str, Decimal]]:
+    """由订单和费用按 (门店, 月) 计算源数据指标（订单、费用各扫描一次）"""
+    buckets: Dict[Tuple[int, date], Dict[str, Decimal]] = {}
+
+    # 订单：与 KPI 计算共用聚合列
+    order_month = _month_expr(OrderHeader.biz_date)
+    order_day = extract("day", OrderHeader.biz_date)
+    completed = OrderHeader.status == "completed"
+    order_conditions = [OrderHeader.biz_date >= start_date, OrderHeader.biz_date <= end_date]
+    if store_ids is not None:
+        order_conditions.append(OrderHeader.store_id.in_(store_ids))
+
+    order_result = await db.execute(
+        select(
+            OrderHeader.store_id,
+            order_month.label("month_start"),
+            *KpiCalculator._order_aggregate_columns(),
+            func.coalesce(
+                func.sum(case((completed, OrderHeader.net_amount * order_day), else_=_ZERO)), _ZERO
+            ).label("weighted_revenue"),
+            func.coalesce(
+                func.sum(case((completed, order_day), else_=0)), 0
+            ).label("weighted_order_count"),
+        )
+        .where(and_(*order_conditions))
+        .group_by(OrderHeader.store_id, order_month)
+    )
+    for row in order_result.all():
+        bucket = buckets.setdefault((row.store_id, row.month_start), _empty_bucket())
+        stats = KpiCalculator._order_stats_from_row(row)
+        bucket["revenue"] = stats["revenue_total"]
+        for key in ("refund_amount", "discount_amount", "order_count", "customer_count",
+                    *CHANNEL_REVENUE_COLUMNS.values()):
+            bucket[key] = Decimal(stats[key] or 0)
+        bucket["weighted_revenue"] = Decimal(row.weighted_revenue or 0)
+        bucket["weighted_order_count"] = Decimal(row.weighted_order_count or 0)
+
+    # 费用：按科目分组后经科目目录归类
+    column_map = await load_cost_column_map(db)
+    expense_month = _month_expr(ExpenseRecord.biz_date)
+    expense_conditions = [
+        ExpenseRecord.biz_date >= start_date,
+        ExpenseRecord.biz_date <= end_date,
+        ExpenseRecord.status == "approved",
+    ]
+    if store_ids is not None:
+        expense_conditions.append(ExpenseRecord.store_id.in_(store_ids))
+
+    expense_result = await db.execute(
+        select(
+            ExpenseRecord.store_id,
+            expense_month.label("month_start"),
+            ExpenseRecord.expense_type_id,
+            func.sum(ExpenseRecord.amount).label("amount"),
+            func.sum(ExpenseRecord.amount * extract("day", ExpenseRecord.biz_date)).label("weighted_amount"),
+        )
+        .where(and_(*expense_conditions))
+        .group_by(ExpenseRecord.store_id, expense_month, ExpenseRecord.expense_type_id)
+    )
+    for row in expense_result.all():
+        bucket = buckets.setdefault((row.store_id, row.month_start), _empty_bucket())
+        column = column_map.get(row.expense_type_id, COST_OTHER_COLUMN)
+        bucket[column] += Decimal(row.amount or 0)
+        bucket["weighted_cost_total"] += Decimal(row.weighted_amount or 0)
+
+    return buckets
+
+
+async def _kpi_buckets(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    store_ids: Optional[Sequence[int]],
+) -> Dict[Tuple[int, date], Dict[str, Decimal]]:
+    """由 kpi_daily_store 按 (门店, 月) 计算已存储指标"""
+    month = _month_expr(KpiDailyStore.biz_date)
+    day = extract("day", KpiDailyStore.biz_date)
+    conditions = [KpiDailyStore.biz_date >= start_date, KpiDailyStore.biz_date <= end_date]
+    if store_ids is not None:
+        conditions.append(KpiDailyStore.store_id.in_(store_ids))
+
+    result = await db.execute(
+        select(
+            KpiDailyStore.store_id,
+            month.label("month_start"),
+            *[func.sum(getattr(KpiDailyStore, m)).label(m) for m in CHECK_MEASURES],
+            *[
+                func.sum(getattr(KpiDailyStore, m) * day).label(f"weighted_{m}")
+                for m in WEIGHTED_MEASURES
+            ],
+        )
+        .where(and_(*conditions))
+        .group_by(KpiDailyStore.store_id, month)
+    )
+
+    buckets: Dict[Tuple[int, date], Dict[str, Decimal]] = {}
+    for row in result.all():
+        bucket = _empty_bucket()
+        for key in bucket:
+            bucket[key] = Decimal(getattr(row, key) or 0)
+        buckets[(row.store_id, row.month_start)] = bucket
+    return buckets
+
+
+# ──────────────────── 逐日比对 ────────────────────
+
+
+async def _drill_down(
+    db: AsyncSession,
+    store_id: int,
+    month_start: date,
+    start_date: date,
+    end_date: date,
+) -> List[Dict[str, Any]]:
+    """逐日比对单个 (门店, 月)，返回差异单元及差异指标"""
+    range_start = max(month_start, start_date)
+    range_end = min(next_month_start(month_start) - timedelta(days=1), end_date)
+
+    expected_rows = await KpiCalculator(db).calculate_rows([store_id], range_start, range_end)
+
+    stored_result = await db.execute(
+        select(KpiDailyStore).where(
+            KpiDailyStore.store_id == store_id,
+            KpiDailyStore.biz_date >= range_start,
+            KpiDailyStore.biz_date <= range_end,
+        )
+    )
+    stored = {row.biz_date: row for row in stored_result.scalars().all()}
+
+    cells = []
+    for expected in expected_rows:
+        row = stored.get(expected["biz_date"])
+        diffs = {}
+        for measure in CHECK_MEASURES:
+            actual = Decimal(getattr(row, measure) or 0) if row else _ZERO
+            if Decimal(expected[measure]) != actual:
+                diffs[measure] = {"expected": expected[measure], "actual": actual}
+        # 无 KPI 行且源数据为空时不算差异
+        if not diffs:
+            continue
+        cells.append({
+            "store_id": store_id,
+            "biz_date": expected["biz_date"],
+            "missing": row is None,
+            "diffs": diffs,
+        })
+    return cells
+
+
+# ──────────────────── 入口 ────────────────────
+
+
+async def check_kpi_consistency(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    store_ids: Optional[Sequence[int]] = None,
+    drill_down: bool = True,
+    enqueue: bool = False,
+) -> Dict[str, Any]:
+    """
+    校验日期范围内的 KPI 与源数据是否一致
+
+    Args:
+        db: 数据库会话
+        start_date: 开始日期
+        end_date: 结束日期
+        store_ids: 门店范围，None 表示全部门店
+        drill_down: 是否对不一致的 (门店, 月) 逐日定位差异单元
+        enqueue: 是否将差异单元登记为脏单元（需 drill_down，调用方负责提交）
+
+    Returns:
+        {
+            "checked_buckets": 校验的 (门店, 月) 数,
+            "mismatched_buckets": [{"store_id", "month", "source_checksum", "kpi_checksum", "diffs"}],
+            "mismatched_cells": [{"store_id", "biz_date", "missing", "diffs"}],
+            "queued_cells": 登记的脏单元数,
+        }
+    """
+    source = await _source_buckets(db, start_date, end_date, store_ids)
+    stored = await _kpi_buckets(db, start_date, end_date, store_ids)
+
+    mismatched_buckets = []
+    for key in sorted(set(source) | set(stored)):
+        source_values = source.get(key) or _empty_bucket()
+        kpi_values = stored.get(key) or _empty_bucket()
+        source_checksum = _checksum(source_values)
+        kpi_checksum = _checksum(kpi_values)
+        if source_checksum == kpi_checksum:
+            continue
+
+        store_id, month_start = key
+        mismatched_buckets.append({
+            "store_id": store_id,
+            "month": month_start.strftime("%Y-%m"),
+            "month_start": month_start,
+            "source_checksum": source_checksum,
+            "kpi_checksum": kpi_checksum,
+            "diffs": {
+                name: {"expected": source_values[name], "actual": kpi_values[name]}
+                for name in source_values
+                if source_values[name] != kpi_values[name]
+            },
+        })
+
+    mismatched_cells: List[Dict[str, Any]] = []
+    if drill_down:
+        for bucket in mismatched_buckets:
+            mismatched_cells.extend(await _drill_down(
+                db, bucket["store_id"], bucket["month_start"], start_date, end_date
+            ))
+
+    queued_cells = 0
+    if enqueue and mismatched_cells:
+        queued_cells = await mark_kpi_dirty(
+            db,
+            [(cell["store_id"], cell["biz_date"]) for cell in mismatched_cells],
+            DIRTY_REASON_CONSISTENCY,
+        )
+
+    return {
+        "checked_buckets": len(set(source) | set(stored)),
+        "mismatched_buckets": mismatched_buckets,
+        "mismatched_cells": mismatched_cells[:MAX_REPORTED_CELLS],
+        "mismatched_cell_count": len(mismatched_cells),
+        "queued_cells": queued_cells,
+    }
@@ -0,0 +1,267 @@
+"""
+小时级 KPI 服务
+
+- 刷新：日 KPI 重算时，同一事务内按相同的 (门店, 日期) 范围从订单重新汇总 kpi_hourly_store
+  导入的订单没有下单时间（以导入时间写入 order_time），只统计下单时间（业务时区）
+  落在业务日期当天的订单，历史导入数据不会集中到导入时刻所在的小时
+  （业务日期为导入当天的订单仍计入导入时刻）；
+  因此小时分布的合计可能小于日 KPI
+- 查询：小时分布（门店 × 小时）、星期分布（星期 × 小时）热力图，只读取 kpi_hourly_store
+  （门店名称除外）
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, Integer, and_, case, cast, delete, extract, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.kpi import KpiHourlyStore
+from app.models.order import OrderHeader
+from app.models.store import Store
+from app.services.kpi_catalog import CHANNEL_REVENUE_COLUMNS
+
+
+# 热力图可选指标
+HOURLY_METRICS = [
+    "revenue",
+    "order_count",
+    "customer_count",
+    *CHANNEL_REVENUE_COLUMNS.values(),
+]
+
+HOURS = list(range(24))
+WEEKDAYS = list(range(1, 8))  # ISO 星期：1=周一 ... 7=周日
+
+
+# ──────────────────── 刷新 ────────────────────
+
+
+async def refresh_hourly(
+    db: AsyncSession,
+    store_ids: Sequence[int],
+    start_date: date,
+    end_date: date,
+    cells: Optional[Sequence[Tuple[int, date]]] = None,
+) -> None:
+    """
+    重算指定范围内的小时 KPI（不提交）
+
+    先删除范围内的旧小时行，再从已完成订单按 (日期, 门店, 小时) 分组写入，
+    订单被删除或改期后不会残留旧的小时行。
+
+    Args:
+        db: 数据库会话
+        store_ids: 门店ID列表
+        start_date: 开始日期
+        end_date: 结束日期
+        cells: 不为空时只重算这些 (门店, 日期) 单元
+    """
+    if not store_ids:
+        return
+
+    delete_stmt = delete(KpiHourlyStore).where(
+        KpiHourlyStore.store_id.in_(store_ids),
+        KpiHourlyStore.biz_date >= start_date,
+        KpiHourlyStore.biz_date <= end_date,
+    )
+    if cells:
+        delete_stmt = delete_stmt.where(
+            tuple_(KpiHourlyStore.store_id, KpiHourlyStore.biz_date).in_(list(cells))
+        )
+    await db.execute(delete_stmt)
+
+    # 内层计算业务时区下的小时，外层按列分组，避免分组表达式中的绑定参数不一致
+    local_time = func.timezone(settings.kpi_business_timezone, OrderHeader.order_time)
+    local_hour = cast(extract("hour", local_time), Integer)
+    conditions = [
+        OrderHeader.status == "completed",
+        # 下单时间不在业务日期当天（导入的历史订单）的订单没有有效的小时信息
+        cast(local_time, Date) == OrderHeader.biz_date,
+        OrderHeader.store_id.in_(store_ids),
+        OrderHeader.biz_date >= start_date,
+        OrderHeader.biz_date <= end_date,
+    ]
+    if cells:
+        conditions.append(tuple_(OrderHeader.store_id, OrderHeader.biz_date).in_(list(cells)))
+
+    detail = select(
+        OrderHeader.biz_date,
+        OrderHeader.store_id,
+        local_hour.label("hour"),
+        OrderHeader.channel,
+        OrderHeader.net_amount,
+    ).where(and_(*conditions)).subquery()
+
+    source = select(
+        detail.c.biz_date,
+        detail.c.store_id,
+        detail.c.hour,
+        func.sum(detail.c.net_amount).label("revenue"),
+        func.count().label("order_count"),
+        # 客流量（简化：与日 KPI 一致，使用订单数）
+        func.count().label("customer_count"),
+        *[
+            func.coalesce(
+                func.sum(case((detail.c.channel == channel, detail.c.net_amount), else_=Decimal("0"))),
+                Decimal("0"),
+            ).label(column)
+            for channel, column in CHANNEL_REVENUE_COLUMNS.items()
+        ],
+    ).group_by(detail.c.biz_date, detail.c.store_id, detail.c.hour)
+
+    value_columns = ["revenue", "order_count", "customer_count", *CHANNEL_REVENUE_COLUMNS.values()]
+    stmt = pg_insert(KpiHourlyStore).from_select(
+        ["biz_date", "store_id", "hour", *value_columns], source
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_kpi_hourly_store_date_store_hour",
+        set_={
+            **{col: stmt.excluded[col] for col in value_columns},
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
+
+
+# ──────────────────── 查询 ────────────────────
+
+
+def _hourly_conditions(
+    start_date: date,
+    end_date: date,
+    store_ids: Optional[Sequence[int]],
+) -> List[Any]:
+    conditions = [
+        KpiHourlyStore.biz_date >= start_date,
+        KpiHourlyStore.biz_date <= end_date,
+    ]
+    if store_ids is not None:
+        conditions.append(KpiHourlyStore.store_id.in_(store_ids))
+    return conditions
+
+
+def _to_number(metric: str, value: Any) -> float:
+    if value is None:
+        return 0 if metric in ("order_count", "customer_count") else 0.0
+    if metric in ("order_count", "customer_count"):
+        return int(value)
+    return float(value)
+
+
+async def get_hour_of_day_heatmap(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    metric: str = "revenue",
+    store_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """
+    小时分布热力图：门店 × 小时（0-23），值为日期范围内的合计
+
+    Returns:
+        {"metric", "hours", "rows": [{"store_id", "store_name", "values": [24 个值], "total"}], "hour_totals"}
+    """
+    metric_col = getattr(KpiHourlyStore, metric)
+    result = await db.execute(
+        select(
+            KpiHourlyStore.store_id,
+            KpiHourlyStore.hour,
+            func.sum(metric_col).label("value"),
+        )
+        .where(and_(*_hourly_conditions(start_date, end_date, store_ids)))
+        .group_by(KpiHourlyStore.store_id, KpiHourlyStore.hour)
+    )
+
+    matrix: Dict[int, List[float]] = {}
+    for row in result.all():
+        values = matrix.setdefault(row.store_id, [_to_number(metric, None)] * 24)
+        values[row.hour] = _to_number(metric, row.value)
+
+    store_names: Dict[int, str] = {}
+    if matrix:
+        name_result = await db.execute(
+            select(Store.id, Store.name).where(Store.id.in_(list(matrix)))
+        )
+        store_names = {row.id: row.name for row in name_result.all()}
+
+    rows = [
+        {
+            "store_id": store_id,
+            "store_name": store_names.get(store_id, ""),
+            "values": values,
+            "total": sum(values),
+        }
+        for store_id, values in sorted(matrix.items())
+    ]
+    hour_totals = [sum(row["values"][h] for row in rows) for h in HOURS]
+
+    return {
+        "metric": metric,
+        "hours": HOURS,
+        "rows": rows,
+        "hour_totals": hour_totals,
+    }
+
+
+def _count_weekdays(start_date: date, end_date: date) -> Dict[int, int]:
+    """统计日期范围内每个 ISO 星期出现的天数"""
+    total_days = (end_date - start_date).days + 1
+    full_weeks, remainder = divmod(max(total_days, 0), 7)
+    counts = {weekday: full_weeks for weekday in WEEKDAYS}
+    for offset in range(remainder):
+        counts[(start_date + timedelta(days=offset)).isoweekday()] += 1
+    return counts
+
+
+async def get_day_of_week_heatmap(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    metric: str = "revenue",
+    store_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """
+    星期分布热力图：星期（1=周一 ... 7=周日）× 小时（0-23）
+
+    值为该星期、该小时的日均值（合计 / 范围内该星期的天数），
+    便于比较天数不同的星期。
+
+    Returns:
+        {"metric", "hours", "rows": [{"weekday", "day_count", "values": [24 个值], "total"}]}
+    """
+    metric_col = getattr(KpiHourlyStore, metric)
+    weekday_expr = cast(extract("isodow", KpiHourlyStore.biz_date), Integer)
+    result = await db.execute(
+        select(
+            weekday_expr.label("weekday"),
+            KpiHourlyStore.hour,
+            func.sum(metric_col).label("value"),
+        )
+        .where(and_(*_hourly_conditions(start_date, end_date, store_ids)))
+        .group_by(weekday_expr, KpiHourlyStore.hour)
+    )
+
+    sums: Dict[int, List[float]] = {weekday: [0.0] * 24 for weekday in WEEKDAYS}
+    for row in result.all():
+        sums[row.weekday][row.hour] = float(row.value or 0)
+
+    day_counts = _count_weekdays(start_date, end_date)
+    rows = []
+    for weekday in WEEKDAYS:
+        day_count = day_counts[weekday]
+        values = [round(v / day_count, 2) if day_count else 0.0 for v in sums[weekday]]
+        rows.append({
+            "weekday": weekday,
+            "day_count": day_count,
+            "values": values,
+            "total": round(sum(values), 2),
+        })
+
+    return {
+        "metric": metric,
+        "hours": HOURS,
+        "rows": rows,
+    }
@@ -0,0 +1,242 @@
+"""
+KPI 重建进度推送
+
+重建引擎在写入循环中直接累加进度（已完成门店数、已完成日期数、upsert 行数、吞吐量），
+通过进程内发布/订阅分发给 SSE 订阅者，不额外查询数据库。
+
+说明：进度只在执行重建的进程内可见，多进程部署时 SSE 请求需与重建在同一进程
+（同步重建为同一请求所在进程，后台任务为创建任务的进程）。
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+# 事件类型
+EVENT_PROGRESS = "progress"
+EVENT_COMPLETE = "complete"
+# 订阅超时（长时间没有进度或连接超过最长时长），推送后关闭连接，客户端可重新订阅
+EVENT_TIMEOUT = "timeout"
+
+# 同一重建两次进度事件的最小间隔（秒），完成事件不受限制
+PUBLISH_INTERVAL_SECONDS = 0.5
+
+# SSE 心跳间隔（秒），防止代理断开空闲连接
+SSE_HEARTBEAT_SECONDS = 15
+
+# 连续无进度事件的最长时间（秒）：任务卡住、在其他进程执行或进度标识不存在时不会一直占用连接
+SSE_MAX_IDLE_SECONDS = 300
+
+# 单个 SSE 连接的最长时长（秒）
+SSE_MAX_LIFETIME_SECONDS = 3600
+
+# 订阅者队列长度，消费过慢时丢弃最旧的事件（进度事件是累计值，丢弃不影响正确性）
+_QUEUE_SIZE = 100
+
+# 保留最近事件的重建数量上限
+_LATEST_LIMIT = 500
+
+
+class KpiProgressBroker:
+    """进程内进度事件发布/订阅"""
+
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._latest: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def publish(self, key: str, event: Dict[str, Any]) -> None:
+        """发布事件（非阻塞）"""
+        self._latest[key] = event
+        self._latest.move_to_end(key)
+        while len(self._latest) > _LATEST_LIMIT:
+            self._latest.popitem(last=False)
+
+        for queue in self._subscribers.get(key, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def subscribe(self, key: str) -> asyncio.Queue:
+        """订阅重建进度，已有事件时先收到最近一次事件"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+        self._subscribers.setdefault(key, set()).add(queue)
+        latest = self._latest.get(key)
+        if latest is not None:
+            queue.put_nowait(latest)
+        return queue
+
+    def unsubscribe(self, key: str, queue: asyncio.Queue) -> None:
+        """取消订阅"""
+        queues = self._subscribers.get(key)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            self._subscribers.pop(key, None)
+
+    def latest(self, key: str) -> Optional[Dict[str, Any]]:
+        """最近一次事件"""
+        return self._latest.get(key)
+
+
+progress_broker = KpiProgressBroker()
+
+
+class KpiRebuildProgress:
+    """
+    单次重建的进度统计
+
+    由重建引擎在写入循环中调用 record_rows（每批 upsert 后），
+    按批内 (门店, 日期) 单元累加写入行数和门店/日期完成数；
+    同一 (门店, 日期) 只计一次完成，重复写入只累加行数
+    """
+
+    def __init__(self, key: str, broker: KpiProgressBroker = progress_broker) -> None:
+        self.key = key
+        self.broker = broker
+        self.total_stores = 0
+        self.total_dates = 0
+        self.total_cells = 0
+        self.done_cells = 0
+        self.rows_upserted = 0
+        self.stores_done = 0
+        self.dates_done = 0
+        self._start_date: Optional[date] = None
+        self._store_remaining: Dict[int, int] = {}
+        self._date_remaining: List[int] = []
+        self._started_at = time.monotonic()
+        self._last_publish = 0.0
+
+    def start(self, store_ids: Iterable[int], start_date: date, end_date: date) -> None:
+        """设置重建范围并发布初始事件"""
+        store_list = sorted(set(store_ids))
+        self._start_date = start_date
+        self.total_stores = len(store_list)
+        self.total_dates = (end_date - start_date).days + 1
+        self.total_cells = self.total_stores * self.total_dates
+        self._store_remaining = {sid: self.total_dates for sid in store_list}
+        self._date_remaining = [self.total_stores] * self.total_dates
+        self._started_at = time.monotonic()
+        self._publish(force=True)
+
+    def record_rows(self, cells: Iterable[Tuple[int, date]]) -> None:
+        """每批 upsert 后调用：累加写入行数，并将对应 (门店, 日期) 单元标记为完成"""
+        count = 0
+        for sid, biz_date in cells:
+            count += 1
+            self._mark_cell(sid, biz_date)
+        self.rows_upserted += count
+        self._publish()
+
+    def mark_done(self, store_id: int, start_date: date, end_date: date) -> None:
+        """将门店的一段日期标记为已完成（不计写入行数，用于恢复已完成分片的进度）"""
+        current = max(start_date, self._start_date) if self._start_date else start_date
+        while current <= end_date:
+            self._mark_cell(store_id, current)
+            current += timedelta(days=1)
+
+    def _mark_cell(self, store_id: int, biz_date: date) -> None:
+        if self._start_date is None:
+            return
+        offset = (biz_date - self._start_date).days
+        remaining = self._store_remaining.get(store_id)
+        if remaining is None or remaining <= 0 or not 0 <= offset < self.total_dates:
+            return
+
+        self.done_cells += 1
+        self._store_remaining[store_id] = remaining - 1
+        if remaining == 1:
+            self.stores_done += 1
+        self._date_remaining[offset] -= 1
+        if self._date_remaining[offset] == 0:
+            self.dates_done += 1
+
+    def finish(self, status: str, message: Optional[str] = None) -> None:
+        """发布完成事件（status 为 success/fail/cancelled 等）"""
+        event = self.snapshot(EVENT_COMPLETE)
+        event["status"] = status
+        if message:
+            event["message"] = message
+        self.broker.publish(self.key, event)
+
+    def snapshot(self, event: str = EVENT_PROGRESS) -> Dict[str, Any]:
+        """当前进度"""
+        elapsed = time.monotonic() - self._started_at
+        return {
+            "event": event,
+            "status": "running",
+            "stores_done": self.stores_done,
+            "total_stores": self.total_stores,
+            "dates_done": self.dates_done,
+            "total_dates": self.total_dates,
+            "cells_done": self.done_cells,
+            "total_cells": self.total_cells,
+            "rows_upserted": self.rows_upserted,
+            "percent": round(self.done_cells * 100 / self.total_cells, 2) if self.total_cells else 0.0,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(self.rows_upserted / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def _publish(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_publish < PUBLISH_INTERVAL_SECONDS:
+            return
+        self._last_publish = now
+        self.broker.publish(self.key, self.snapshot())
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """格式化为 SSE 消息"""
+    payload = json.dumps(event, ensure_ascii=False, default=str)
+    return f"event: {event.get('event', EVENT_PROGRESS)}\ndata: {payload}\n\n"
+
+
+async def stream_progress_events(
+    key: str,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    initial_event: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    """
+    SSE 事件流：持续推送进度，收到完成事件或客户端断开后结束
+
+    超过 SSE_MAX_IDLE_SECONDS 没有进度事件，或连接超过 SSE_MAX_LIFETIME_SECONDS 时，
+    推送 timeout 事件后结束。
+
+    Args:
+        key: 进度标识
+        is_disconnected: 检测客户端是否断开
+        initial_event: 尚无进度事件时先推送的事件（为完成事件时直接结束）
+    """
+    queue = progress_broker.subscribe(key)
+    try:
+        if initial_event is not None and progress_broker.latest(key) is None:
+            yield format_sse(initial_event)
+            if initial_event.get("event") == EVENT_COMPLETE:
+                return
+
+        started_at = last_event_at = time.monotonic()
+        while True:
+            if await is_disconnected():
+                return
+            now = time.monotonic()
+            if now - last_event_at >= SSE_MAX_IDLE_SECONDS:
+                yield format_sse({"event": EVENT_TIMEOUT, "reason": "idle", "message": "长时间没有进度更新，连接已关闭"})
+                return
+            if now - started_at >= SSE_MAX_LIFETIME_SECONDS:
+                yield format_sse({"event": EVENT_TIMEOUT, "reason": "lifetime", "message": "连接时间过长，请重新订阅"})
+                return
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            last_event_at = time.monotonic()
+            yield format_sse(event)
+            if event.get("event") == EVENT_COMPLETE:
+                return
+    finally:
+        progress_broker.unsubscribe(key, queue)
@@ -0,0 +1,659 @@
+"""
+KPI 重建任务服务
+
+将 KPI 重建拆分为 (门店, 日期段) 分片持久化为后台任务，
+多个 worker 通过 FOR UPDATE SKIP LOCKED 并发认领分片，支持进度查询、取消和续跑；
+认领的分片带执行租约（worker + lease_expires_at），执行期间定期续约，
+进程退出后租约过期的分片可被重新认领；
+执行中的进度通过 kpi_progress 推送给 SSE 订阅者
+"""
+import asyncio
+import os
+import socket
+import uuid
+from contextlib import suppress
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.exceptions import AuthorizationException, BusinessException, NotFoundException, ValidationException
+from app.models.kpi_rebuild_job import KpiRebuildJob, KpiRebuildJobChunk, KpiRebuildJobStatus
+from app.models.store import Store
+from app.models.user import User
+from app.schemas.kpi import KpiRebuildRequest
+from app.services.data_scope_service import filter_stores_by_access
+from app.services.kpi_calculator import REBUILD_MODE_PER_CELL, KpiCalculator, rebuild_session_slots
+from app.services.kpi_progress import KpiRebuildProgress
+
+
+# 终态（不可再执行/取消）
+TERMINAL_STATUSES = (
+    KpiRebuildJobStatus.SUCCESS,
+    KpiRebuildJobStatus.FAIL,
+    KpiRebuildJobStatus.CANCELLED,
+)
+
+
+def rebuild_job_progress_key(job_id: int) -> str:
+    """重建任务的进度推送标识"""
+    return f"kpi-rebuild-job-{job_id}"
+
+
+def _new_run_id() -> str:
+    """一次执行的标识（主机:进程:随机串），worker 名以此为前缀，多进程部署时可区分"""
+    return f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _lease_deadline() -> datetime:
+    """新的分片租约到期时间"""
+    return datetime.now() + timedelta(seconds=settings.kpi_rebuild_chunk_lease_seconds)
+
+
+def _lease_expired():
+    """分片租约已过期（或没有租约）的条件"""
+    return or_(
+        KpiRebuildJobChunk.lease_expires_at.is_(None),
+        KpiRebuildJobChunk.lease_expires_at < datetime.now(),
+    )
+
+
+def _split_date_range(start_date: date, end_date: date, chunk_days: int) -> List[Tuple[date, date]]:
+    """将闭区间日期范围按固定天数切分"""
+    windows = []
+    current = start_date
+    while current <= end_date:
+        window_end = min(current + timedelta(days=chunk_days - 1), end_date)
+        windows.append((current, window_end))
+        current = window_end + timedelta(days=1)
+    return windows
+
+
+class KpiRebuildJobService:
+    """KPI 重建任务服务"""
+
+    @staticmethod
+    async def create_job(db: AsyncSession, data: KpiRebuildRequest, user: User) -> KpiRebuildJob:
+        """
+        创建重建任务并生成分片
+
+        每个分片为单个门店的一段连续日期（settings.kpi_rebuild_chunk_days 天）。
+        """
+        if data.start_date > data.end_date:
+            raise ValidationException("开始日期不能大于结束日期")
+
+        store_query = select(Store.id).where(Store.is_active == True).order_by(Store.id)
+        if data.store_id:
+            store_query = store_query.where(Store.id == data.store_id)
+        store_ids = [row[0] for row in (await db.execute(store_query)).all()]
+        if not store_ids:
+            raise BusinessException("没有需要重建的门店")
+
+        windows = _split_date_range(
+            data.start_date, data.end_date, max(settings.kpi_rebuild_chunk_days, 1)
+        )
+
+        job = KpiRebuildJob(
+            start_date=data.start_date,
+            end_date=data.end_date,
+            store_id=data.store_id,
+            mode=data.mode,
+            status=KpiRebuildJobStatus.PENDING,
+            created_by_id=user.id,
+        )
+        db.add(job)
+        await db.flush()  # 获取 job.id
+
+        total_cells = 0
+        for store_id in store_ids:
+            for window_start, window_end in windows:
+                cell_count = (window_end - window_start).days + 1
+                db.add(KpiRebuildJobChunk(
+                    job_id=job.id,
+                    store_id=store_id,
+                    start_date=window_start,
+                    end_date=window_end,
+                    status=KpiRebuildJobStatus.PENDING,
+                    cell_count=cell_count,
+                ))
+                total_cells += cell_count
+
+        job.total_chunks = len(store_ids) * len(windows)
+        job.total_cells = total_cells
+        await db.commit()
+        await db.refresh(job)
+
+        return job
+
+    @staticmethod
+    async def run_job(job_id: int, workers: Optional[int] = None, run_id: Optional[str] = None) -> None:
+        """
+        执行重建任务
+
+        启动多个 worker（各自独立会话）并发认领分片，全部结束后汇总任务状态。
+        其他进程对同一任务调用本方法时同样只会认领未处理或租约已过期的分片。
+
+        Args:
+            job_id: 任务ID
+            workers: worker 数，默认 settings.kpi_rebuild_workers
+            run_id: 本次执行标识（worker 名前缀），默认自动生成
+        """
+        run_id = run_id or _new_run_id()
+        async with AsyncSessionLocal() as session:
+            job = await session.get(KpiRebuildJob, job_id)
+            if not job:
+                raise NotFoundException(f"KPI 重建任务 {job_id} 不存在")
+            if job.status in TERMINAL_STATUSES:
+                return
+
+            if job.status == KpiRebuildJobStatus.PENDING:
+                job.status = KpiRebuildJobStatus.RUNNING
+                job.started_at = datetime.now()
+                await session.commit()
+            worker_count = max(1, min(workers or settings.kpi_rebuild_workers, job.total_chunks or 1))
+            mode = job.mode
+            progress = await KpiRebuildJobService._init_progress(session, job)
+
+        tasks = [
+            asyncio.create_task(
+                KpiRebuildJobService._worker(job_id, mode, f"{run_id}:worker-{idx}", progress)
+            )
+            for idx in range(worker_count)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+
+            final_status = await KpiRebuildJobService._finalize_job(job_id)
+        except Exception as e:
+            # 一个 worker 异常退出时停止其余 worker，未完成的分片由调用方标记失败
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            progress.finish(KpiRebuildJobStatus.FAIL.value, str(e))
+            raise
+
+        if final_status is not None:
+            progress.finish(final_status.value)
+
+    @staticmethod
+    async def _init_progress(session: AsyncSession, job: KpiRebuildJob) -> KpiRebuildProgress:
+        """创建任务进度统计，已完成的分片（任务恢复执行时）计入初始进度"""
+        chunks = (await session.execute(
+            select(
+                KpiRebuildJobChunk.store_id,
+                KpiRebuildJobChunk.start_date,
+                KpiRebuildJobChunk.end_date,
+                KpiRebuildJobChunk.status,
+            ).where(KpiRebuildJobChunk.job_id == job.id)
+        )).all()
+
+        progress = KpiRebuildProgress(rebuild_job_progress_key(job.id))
+        progress.start([chunk.store_id for chunk in chunks], job.start_date, job.end_date)
+        for chunk in chunks:
+            if chunk.status == KpiRebuildJobStatus.SUCCESS:
+                progress.mark_done(chunk.store_id, chunk.start_date, chunk.end_date)
+        return progress
+
+    @staticmethod
+    async def run_job_in_background(job_id: int) -> None:
+        """
+        后台执行重建任务（供 BackgroundTasks 调用），异常只记录日志
+
+        执行失败时本次执行中未完成的分片标记为失败，任务可经 resume_job 续跑。
+        """
+        run_id = _new_run_id()
+        try:
+            await KpiRebuildJobService.run_job(job_id, run_id=run_id)
+        except Exception as e:
+            logger.error(f"KPI 重建任务 {job_id} 执行失败: {e}")
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    update(KpiRebuildJobChunk)
+                    .where(
+                        KpiRebuildJobChunk.job_id == job_id,
+                        KpiRebuildJobChunk.status == KpiRebuildJobStatus.RUNNING,
+                        KpiRebuildJobChunk.worker.startswith(f"{run_id}:", autoescape=True),
+                    )
+                    .values(
+                        status=KpiRebuildJobStatus.FAIL,
+                        error_message=str(e),
+                        finished_at=func.now(),
+                        lease_expires_at=None,
+                    )
+                    .returning(KpiRebuildJobChunk.id)
+                )
+                failed_count = len(result.all())
+                await session.execute(
+                    update(KpiRebuildJob)
+                    .where(KpiRebuildJob.id == job_id)
+                    .values(
+                        status=KpiRebuildJobStatus.FAIL,
+                        error_message=str(e),
+                        finished_at=datetime.now(),
+                        failed_chunks=KpiRebuildJob.failed_chunks + failed_count,
+                    )
+                )
+                await session.commit()
+
+    @staticmethod
+    async def _worker(
+        job_id: int,
+        mode: str,
+        worker_name: str,
+        progress: Optional[KpiRebuildProgress] = None,
+    ) -> None:
+        """
+        循环认领并处理分片，直到没有待处理分片或任务被取消
+
+        worker 会话占用进程级重建会话配额，与 parallel 模式重建共享连接上限。
+        """
+        async with rebuild_session_slots, AsyncSessionLocal() as session:
+            calculator = KpiCalculator(session, progress=progress)
+
+            while True:
+                cancel_requested = (await session.execute(
+                    select(KpiRebuildJob.cancel_requested).where(KpiRebuildJob.id == job_id)
+                )).scalar()
+                if cancel_requested:
+                    break
+
+                chunk = await KpiRebuildJobService._claim_chunk(session, job_id, worker_name)
+                if chunk is None:
+                    break
+
+                heartbeat = asyncio.create_task(
+                    KpiRebuildJobService._renew_chunk_lease(chunk.id, worker_name)
+                )
+                try:
+                    if mode == REBUILD_MODE_PER_CELL:
+                        biz_date = chunk.start_date
+                        while biz_date <= chunk.end_date:
+                            await calculator._calculate_and_upsert_kpi(chunk.store_id, biz_date)
+                            biz_date += timedelta(days=1)
+                    else:
+                        await calculator.upsert_range([chunk.store_id], chunk.start_date, chunk.end_date)
+
+                    # 分片完成与任务计数同一事务提交；租约已被接管时丢弃本次结果
+                    if await KpiRebuildJobService._complete_chunk(
+                        session, job_id, chunk.id, worker_name, chunk.cell_count
+                    ):
+                        await session.commit()
+                    else:
+                        await session.rollback()
+                        logger.warning(f"KPI 重建任务 {job_id} 分片 {chunk.id} 的执行租约已失效，结果已丢弃")
+                except Exception as e:
+                    await session.rollback()
+                    logger.error(f"KPI 重建任务 {job_id} 分片 {chunk.id} 失败: {e}")
+                    if await KpiRebuildJobService._fail_chunk(session, job_id, chunk.id, worker_name, str(e)):
+                        await session.commit()
+                    else:
+                        await session.rollback()
+                finally:
+                    heartbeat.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await heartbeat
+
+    @staticmethod
+    async def _claim_chunk(session: AsyncSession, job_id: int, worker_name: str) -> Optional[Any]:
+        """
+        认领一个待处理分片（FOR UPDATE SKIP LOCKED，多 worker 互不阻塞）
+
+        租约已过期的运行中分片（执行进程已退出）同样可被认领。
+        """
+        pending_chunk_id = (
+            select(KpiRebuildJobChunk.id)
+            .where(
+                KpiRebuildJobChunk.job_id == job_id,
+                or_(
+                    KpiRebuildJobChunk.status == KpiRebuildJobStatus.PENDING,
+                    (KpiRebuildJobChunk.status == KpiRebuildJobStatus.RUNNING) & _lease_expired(),
+                ),
+            )
+            .order_by(KpiRebuildJobChunk.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await session.execute(
+            update(KpiRebuildJobChunk)
+            .where(KpiRebuildJobChunk.id == pending_chunk_id)
+            .values(
+                status=KpiRebuildJobStatus.RUNNING,
+                worker=worker_name,
+                started_at=func.now(),
+                lease_expires_at=_lease_deadline(),
+            )
+            .returning(
+                KpiRebuildJobChunk.id,
+                KpiRebuildJobChunk.store_id,
+                KpiRebuildJobChunk.start_date,
+                KpiRebuildJobChunk.end_date,
+                KpiRebuildJobChunk.cell_count,
+            )
+        )
+        chunk = result.first()
+        await session.commit()
+        return chunk
+
+    @staticmethod
+    async def _renew_chunk_lease(chunk_id: int, worker_name: str) -> None:
+        """分片执行期间定期续约（单独的会话，不与分片事务交错），租约已被接管时停止"""
+        interval = max(settings.kpi_rebuild_chunk_lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        update(KpiRebuildJobChunk)
+                        .where(*KpiRebuildJobService._owned_chunk(chunk_id, worker_name))
+                        .values(lease_expires_at=_lease_deadline())
+                        .returning(KpiRebuildJobChunk.id)
+                    )
+                    renewed = result.scalar() is not None
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"KPI 重建分片 {chunk_id} 续约失败: {e}")
+                continue
+            if not renewed:
+                return
+
+    @staticmethod
+    def _owned_chunk(chunk_id: int, worker_name: str) -> Tuple[Any, ...]:
+        """分片仍由该 worker 执行中的条件"""
+        return (
+            KpiRebuildJobChunk.id == chunk_id,
+            KpiRebuildJobChunk.status == KpiRebuildJobStatus.RUNNING,
+            KpiRebuildJobChunk.worker == worker_name,
+        )
+
+    @staticmethod
+    async def _count_live_chunks(session: AsyncSession, job_id: int) -> int:
+        """租约未过期的运行中分片数（仍有 worker 在执行）"""
+        return (await session.execute(
+            select(func.count(KpiRebuildJobChunk.id)).where(
+                KpiRebuildJobChunk.job_id == job_id,
+                KpiRebuildJobChunk.status == KpiRebuildJobStatus.RUNNING,
+                KpiRebuildJobChunk.lease_expires_at >= datetime.now(),
+            )
+        )).scalar() or 0
+
+    @staticmethod
+    async def _complete_chunk(
+        session: AsyncSession,
+        job_id: int,
+        chunk_id: int,
+        worker_name: str,
+        cell_count: int,
+    ) -> bool:
+        """
+        标记分片完成并累加任务进度（不提交）
+
+        Returns:
+            分片是否仍由该 worker 持有（否则不做任何更新）
+        """
+        result = await session.execute(
+            update(KpiRebuildJobChunk)
+            .where(*KpiRebuildJobService._owned_chunk(chunk_id, worker_name))
+            .values(status=KpiRebuildJobStatus.SUCCESS, finished_at=func.now(), lease_expires_at=None)
+            .returning(KpiRebuildJobChunk.id)
+        )
+        if result.scalar() is None:
+            return False
+        await session.execute(
+            update(KpiRebuildJob)
+            .where(KpiRebuildJob.id == job_id)
+            .values(
+                done_chunks=KpiRebuildJob.done_chunks + 1,
+                done_cells=KpiRebuildJob.done_cells + cell_count,
+            )
+        )
+        return True
+
+    @staticmethod
+    async def _fail_chunk(session: AsyncSession, job_id: int, chunk_id: int, worker_name: str, message: str) -> bool:
+        """
+        标记分片失败并累加失败计数（不提交）
+
+        Returns:
+            分片是否仍由该 worker 持有（否则不做任何更新）
+        """
+        result = await session.execute(
+            update(KpiRebuildJobChunk)
+            .where(*KpiRebuildJobService._owned_chunk(chunk_id, worker_name))
+            .values(
+                status=KpiRebuildJobStatus.FAIL,
+                error_message=message,
+                finished_at=func.now(),
+                lease_expires_at=None,
+            )
+            .returning(KpiRebuildJobChunk.id)
+        )
+        if result.scalar() is None:
+            return False
+        await session.execute(
+            update(KpiRebuildJob)
+            .where(KpiRebuildJob.id == job_id)
+            .values(failed_chunks=KpiRebuildJob.failed_chunks + 1)
+        )
+        return True
+
+    @staticmethod
+    async def _finalize_job(job_id: int) -> Optional[KpiRebuildJobStatus]:
+        """
+        所有 worker 结束后汇总任务状态
+
+        租约已过期的运行中分片（执行进程已退出）标记为失败（执行中断），任务可经 resume_job 续跑。
+
+        Returns:
+            任务终态；仍有分片在其他进程中执行时返回 None
+        """
+        async with AsyncSessionLocal() as session:
+            job = await session.get(KpiRebuildJob, job_id)
+            if not job:
+                return None
+            if job.status in TERMINAL_STATUSES:
+                return job.status
+
+            # 仍有分片在其他进程中执行，由最后结束的执行方汇总
+            if await KpiRebuildJobService._count_live_chunks(session, job_id):
+                return None
+
+            if job.cancel_requested:
+                await KpiRebuildJobService._cancel_remaining_chunks(session, job_id)
+                job.status = KpiRebuildJobStatus.CANCELLED
+            else:
+                # 剩余的运行中分片租约均已过期，执行进程已退出
+                result = await session.execute(
+                    update(KpiRebuildJobChunk)
+                    .where(
+                        KpiRebuildJobChunk.job_id == job_id,
+                        KpiRebuildJobChunk.status == KpiRebuildJobStatus.RUNNING,
+                        _lease_expired(),
+                    )
+                    .values(
+                        status=KpiRebuildJobStatus.FAIL,
+                        error_message="执行中断（租约过期）",
+                        finished_at=func.now(),
+                        lease_expires_at=None,
+                    )
+                    .returning(KpiRebuildJobChunk.id)
+                )
+                failed_chunks = job.failed_chunks + len(result.all())
+                job.failed_chunks = failed_chunks
+                if failed_chunks > 0:
+                    job.status = KpiRebuildJobStatus.FAIL
+                    job.error_message = f"{failed_chunks} 个分片执行失败"
+                else:
+                    job.status = KpiRebuildJobStatus.SUCCESS
+
+            job.finished_at = datetime.now()
+            await session.commit()
+            return job.status
+
+    @staticmethod
+    async def _cancel_remaining_chunks(session: AsyncSession, job_id: int) -> None:
+        """未处理和租约已过期的分片标记为已取消（不提交）"""
+        await session.execute(
+            update(KpiRebuildJobChunk)
+            .where(
+                KpiRebuildJobChunk.job_id == job_id,
+                or_(
+                    KpiRebuildJobChunk.status == KpiRebuildJobStatus.PENDING,
+                    (KpiRebuildJobChunk.status == KpiRebuildJobStatus.RUNNING) & _lease_expired(),
+                ),
+            )
+            .values(status=KpiRebuildJobStatus.CANCELLED, lease_expires_at=None)
+        )
+
+    @staticmethod
+    async def cancel_job(db: AsyncSession, job_id: int, user: User) -> KpiRebuildJob:
+        """
+        取消任务（仅创建者或超级管理员）
+
+        已认领的分片会执行完毕，worker 不再认领新的分片；
+        没有分片在执行（执行进程已退出）时直接取消剩余分片。
+        """
+        job = await KpiRebuildJobService.get_job(db, job_id, user)
+
+        if job.status in TERMINAL_STATUSES:
+            raise BusinessException("任务已结束，无法取消")
+
+        job.cancel_requested = True
+        if job.status == KpiRebuildJobStatus.PENDING:
+            # 尚未开始执行，直接取消
+            await db.execute(
+                update(KpiRebuildJobChunk)
+                .where(KpiRebuildJobChunk.job_id == job_id)
+                .values(status=KpiRebuildJobStatus.CANCELLED)
+            )
+            job.status = KpiRebuildJobStatus.CANCELLED
+            job.finished_at = datetime.now()
+        elif not await KpiRebuildJobService._count_live_chunks(db, job_id):
+            await KpiRebuildJobService._cancel_remaining_chunks(db, job_id)
+            job.status = KpiRebuildJobStatus.CANCELLED
+            job.finished_at = datetime.now()
+
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    async def resume_job(db: AsyncSession, job_id: int, user: User) -> KpiRebuildJob:
+        """
+        续跑任务（仅创建者或超级管理员）
+
+        适用于执行失败，或执行进程退出后停留在运行中的任务：失败和租约已过期的分片重置为待处理，
+        已完成的分片保留，由调用方重新启动 run_job。
+        """
+        job = await KpiRebuildJobService.get_job(db, job_id, user)
+
+        if job.status not in (KpiRebuildJobStatus.FAIL, KpiRebuildJobStatus.RUNNING) or job.cancel_requested:
+            raise BusinessException("只有执行失败或执行中断的任务可以续跑")
+        if await KpiRebuildJobService._count_live_chunks(db, job_id):
+            raise BusinessException("任务仍有分片在执行中，请稍后再试")
+
+        await db.execute(
+            update(KpiRebuildJobChunk)
+            .where(
+                KpiRebuildJobChunk.job_id == job_id,
+                or_(
+                    KpiRebuildJobChunk.status == KpiRebuildJobStatus.FAIL,
+                    (KpiRebuildJobChunk.status == KpiRebuildJobStatus.RUNNING) & _lease_expired(),
+                ),
+            )
+            .values(
+                status=KpiRebuildJobStatus.PENDING,
+                worker=None,
+                error_message=None,
+                started_at=None,
+                finished_at=None,
+                lease_expires_at=None,
+            )
+        )
+        job.status = KpiRebuildJobStatus.RUNNING
+        job.failed_chunks = 0
+        job.error_message = None
+        job.finished_at = None
+
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    async def get_job(db: AsyncSession, job_id: int, user: User) -> KpiRebuildJob:
+        """获取任务（校验访问权限：仅创建者或超级管理员可访问）"""
+        job = await db.get(KpiRebuildJob, job_id)
+        if not job:
+            raise NotFoundException(f"KPI 重建任务 {job_id} 不存在")
+        if job.created_by_id != user.id and not user.is_superuser:
+            raise AuthorizationException("无权访问该重建任务")
+        return job
+
+    @staticmethod
+    async def get_store_progress(db: AsyncSession, job_id: int, user: User) -> List[Dict[str, Any]]:
+        """按门店汇总分片进度（只返回用户可访问的门店）"""
+        done = KpiRebuildJobChunk.status == KpiRebuildJobStatus.SUCCESS
+        failed = KpiRebuildJobChunk.status == KpiRebuildJobStatus.FAIL
+        query = (
+            select(
+                KpiRebuildJobChunk.store_id,
+                Store.name.label("store_name"),
+                func.count(KpiRebuildJobChunk.id).label("total_chunks"),
+                func.count(case((done, KpiRebuildJobChunk.id), else_=None)).label("done_chunks"),
+                func.count(case((failed, KpiRebuildJobChunk.id), else_=None)).label("failed_chunks"),
+                func.sum(KpiRebuildJobChunk.cell_count).label("total_cells"),
+                func.coalesce(
+                    func.sum(case((done, KpiRebuildJobChunk.cell_count), else_=0)), 0
+                ).label("done_cells"),
+            )
+            .join(Store, Store.id == KpiRebuildJobChunk.store_id)
+            .where(KpiRebuildJobChunk.job_id == job_id)
+            .group_by(KpiRebuildJobChunk.store_id, Store.name)
+            .order_by(KpiRebuildJobChunk.store_id)
+        )
+        accessible_store_ids = await filter_stores_by_access(db, user)
+        if accessible_store_ids is not None:
+            query = query.where(KpiRebuildJobChunk.store_id.in_(accessible_store_ids))
+        result = await db.execute(query)
+
+        progress = []
+        for row in result.all():
+            total_cells = int(row.total_cells or 0)
+            done_cells = int(row.done_cells or 0)
+            progress.append({
+                "store_id": row.store_id,
+                "store_name": row.store_name,
+                "total_chunks": row.total_chunks,
+                "done_chunks": row.done_chunks,
+                "failed_chunks": row.failed_chunks,
+                "total_cells": total_cells,
+                "done_cells": done_cells,
+                "percent": round(done_cells * 100 / total_cells, 2) if total_cells else 0.0,
+            })
+        return progress
+
+    @staticmethod
+    async def list_jobs(
+        db: AsyncSession,
+        user: User,
+        page: int = 1,
+        page_size: int = 20,
+    ) -> Tuple[List[KpiRebuildJob], int]:
+        """分页查询重建任务（按创建时间倒序，非超级管理员只能看到自己创建的任务）"""
+        conditions = []
+        if not user.is_superuser:
+            conditions.append(KpiRebuildJob.created_by_id == user.id)
+
+        total = (await db.execute(select(func.count(KpiRebuildJob.id)).where(*conditions))).scalar() or 0
+        result = await db.execute(
+            select(KpiRebuildJob)
+            .where(*conditions)
+            .order_by(KpiRebuildJob.created_at.desc())
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        )
+        return list(result.scalars().all()), total
@@ -0,0 +1,140 @@
+"""
+KPI 增量刷新服务
+
+源数据（订单、费用、导入）写入时登记受影响的 (门店, 日期) 脏单元，
+刷新器认领脏单元后只重算这些单元的日 KPI，避免全范围重建
+"""
+from datetime import date
+from typing import Iterable, List, Tuple
+
+from loguru import logger
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.models.kpi import KpiDirtyCell
+from app.services.kpi_calculator import KpiCalculator
+from app.services.report_cache import bump_data_versions
+
+
+# 每批认领的脏单元数量
+REFRESH_BATCH_SIZE = 500
+
+# 脏单元来源
+DIRTY_REASON_ORDER = "order"
+DIRTY_REASON_EXPENSE = "expense"
+DIRTY_REASON_IMPORT = "import"
+DIRTY_REASON_CONSISTENCY = "consistency"
+
+
+async def mark_kpi_dirty(
+    db: AsyncSession,
+    cells: Iterable[Tuple[int, date]],
+    reason: str
+) -> int:
+    """
+    登记脏单元（不提交，与源数据写入处于同一事务）
+
+    已登记的单元通过 ON CONFLICT DO NOTHING 跳过；同时递增相关门店的数据版本号，
+    使报表缓存失效。每个事务只调用一次（先登记再加版本锁，避免与刷新器互相等待）。
+
+    Args:
+        db: 数据库会话
+        cells: (store_id, biz_date) 列表
+        reason: 登记来源
+
+    Returns:
+        去重后的单元数量
+    """
+    unique_cells = {
+        (store_id, biz_date)
+        for store_id, biz_date in cells
+        if store_id is not None and biz_date is not None
+    }
+    if not unique_cells:
+        return 0
+
+    stmt = pg_insert(KpiDirtyCell).values([
+        {"store_id": store_id, "biz_date": biz_date, "reason": reason}
+        for store_id, biz_date in sorted(unique_cells)
+    ]).on_conflict_do_nothing(index_elements=["store_id", "biz_date"])
+    await db.execute(stmt)
+    await bump_data_versions(db, [store_id for store_id, _ in unique_cells])
+
+    return len(unique_cells)
+
+
+async def count_dirty_cells(db: AsyncSession) -> int:
+    """统计待刷新的脏单元数量"""
+    result = await db.execute(select(func.count(KpiDirtyCell.id)))
+    return result.scalar() or 0
+
+
+async def _claim_dirty_cells(db: AsyncSession, limit: int) -> List[Tuple[int, date]]:
+    """
+    认领一批脏单元（DELETE ... RETURNING）
+
+    使用 FOR UPDATE SKIP LOCKED，多个刷新器并发时互不阻塞；
+    删除与重算在同一事务内，失败回滚后单元仍保留为脏。
+    """
+    claimed_ids = (
+        select(KpiDirtyCell.id)
+        .order_by(KpiDirtyCell.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        delete(KpiDirtyCell)
+        .where(KpiDirtyCell.id.in_(claimed_ids))
+        .returning(KpiDirtyCell.store_id, KpiDirtyCell.biz_date)
+    )
+    return [(row.store_id, row.biz_date) for row in result.all()]
+
+
+async def refresh_dirty_kpi(
+    db: AsyncSession,
+    batch_size: int = REFRESH_BATCH_SIZE
+) -> int:
+    """
+    刷新全部脏单元
+
+    每批认领 + 重算 + 提交为一个事务，直到没有脏单元。
+
+    Returns:
+        重算的单元数量
+    """
+    calculator = KpiCalculator(db)
+    total = 0
+
+    while True:
+        cells = await _claim_dirty_cells(db, batch_size)
+        if not cells:
+            break
+
+        try:
+            await calculator.rebuild_cells(cells)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+        total += len(cells)
+
+    return total
+
+
+async def refresh_dirty_kpi_in_background() -> None:
+    """
+    后台刷新脏单元（供 BackgroundTasks 调用）
+
+    使用独立会话，异常只记录日志，单元保留待下次刷新。
+    """
+    try:
+        async with AsyncSessionLocal() as session:
+            refreshed = await refresh_dirty_kpi(session)
+        if refreshed:
+            logger.info(f"KPI 增量刷新完成，重算 {refreshed} 个单元")
+    except Exception as e:
+        logger.error(f"KPI 增量刷新失败: {e}")
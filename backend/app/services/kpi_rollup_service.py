@@ -0,0 +1,365 @@
+"""
+KPI 周/月汇总服务
+
+- 刷新：日 KPI 写入后，按受影响的 (门店, 周) / (门店, 月) 从 kpi_daily_store 重新汇总，
+  再由门店行汇总出全品牌行（store_id 为空）
+- 查询：把日期范围切分为完整月、完整周和零散日期段，
+  完整段读取汇总表，只有边缘零散日期读取日表，一条 SQL 完成合计
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, Integer, String, cast, func, literal, literal_column, null, select, text, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.kpi import KpiDailyStore, KpiMonthlyStore, KpiWeeklyStore
+from app.services.report_cache import bump_data_versions
+
+
+# 可加总的汇总指标（与 KpiRollupMixin 字段一致）
+ROLLUP_MEASURES = [
+    "revenue",
+    "refund_amount",
+    "discount_amount",
+    "net_revenue",
+    "cost_total",
+    "cost_material",
+    "cost_labor",
+    "cost_rent",
+    "cost_utilities",
+    "cost_marketing",
+    "cost_other",
+    "gross_profit",
+    "operating_profit",
+    "order_count",
+    "customer_count",
+    "dine_in_revenue",
+    "takeout_revenue",
+    "delivery_revenue",
+    "online_revenue",
+]
+
+# 整数型指标（其余为金额）
+_INT_MEASURES = {"order_count", "customer_count", "day_count"}
+
+# 切分粒度
+GRAIN_MONTH = "month"
+GRAIN_WEEK = "week"
+GRAIN_DAY = "day"
+
+# 汇总刷新使用的事务级咨询锁命名空间：每个 (粒度, 门店, 周期) 汇总行一个键，全品牌行门店位为 0。
+# 只有刷新同一汇总行的事务互相等待，全品牌行由最后拿到锁的事务基于已提交的门店行重新汇总
+_ROLLUP_LOCK_NAMESPACE = 728
+
+# (汇总模型, 周期字段名, date_trunc 单位, 唯一约束名)
+_ROLLUP_TABLES = [
+    (KpiWeeklyStore, "week_start", "week", "uq_kpi_weekly_store_week_store"),
+    (KpiMonthlyStore, "month_start", "month", "uq_kpi_monthly_store_month_store"),
+]
+
+
+def week_start_of(d: date) -> date:
+    """所在自然周的周一"""
+    return d - timedelta(days=d.weekday())
+
+
+def month_start_of(d: date) -> date:
+    """所在月份的第一天"""
+    return d.replace(day=1)
+
+
+def next_month_start(d: date) -> date:
+    """下个月的第一天"""
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _period_start_of(grain: str, d: date) -> date:
+    return week_start_of(d) if grain == "week" else month_start_of(d)
+
+
+def _rollup_lock_key(grain_index: int, store_id: Optional[int], period_start: date) -> int:
+    """
+    汇总行的咨询锁键（bigint）：命名空间 | 粒度 | 门店ID 低 19 位 | 周期开始日序号
+
+    门店ID 超过 19 位时不同门店可能共用一个键，只会多等待，不影响正确性。
+    """
+    return (
+        (_ROLLUP_LOCK_NAMESPACE << 40)
+        | (grain_index << 39)
+        | (((store_id or 0) & 0x7FFFF) << 20)
+        | period_start.toordinal()
+    )
+
+
+async def _lock_rollup_rows(db: AsyncSession, keys: Iterable[int]) -> None:
+    """按键升序加事务级咨询锁（持有到事务结束）"""
+    await db.execute(
+        text("SELECT pg_advisory_xact_lock(key) FROM unnest(CAST(:keys AS bigint[])) AS key"),
+        {"keys": sorted(set(keys))},
+    )
+
+
+# ──────────────────── 刷新 ────────────────────
+
+
+async def refresh_rollups(db: AsyncSession, cells: Iterable[Tuple[int, date]]) -> None:
+    """
+    刷新受影响单元所在周、月的汇总行（不提交）
+
+    需在日 KPI 及小时级 KPI 写入之后、同一事务内最后调用（每个事务一次）：
+    只锁受影响的汇总行，且锁持有到提交，放在最后可缩短持锁时间。
+    加锁顺序固定为 周门店行 → 周全品牌行 → 月门店行 → 月全品牌行，同类按键升序，
+    并发事务之间不会互相死锁。
+
+    Args:
+        db: 数据库会话
+        cells: 发生变化的 (store_id, biz_date)
+    """
+    cell_list = list(set(cells))
+    if not cell_list:
+        return
+
+    store_ids = sorted({sid for sid, _ in cell_list})
+    for grain_index, (model, period_field, trunc_unit, constraint) in enumerate(_ROLLUP_TABLES):
+        periods = sorted({(sid, _period_start_of(trunc_unit, d)) for sid, d in cell_list})
+        period_starts = sorted({p for _, p in periods})
+
+        # 同一 (门店, 周期) 串行重算，后提交的事务能读到先提交的日 KPI
+        await _lock_rollup_rows(db, [_rollup_lock_key(grain_index, sid, p) for sid, p in periods])
+        await _refresh_store_rows(
+            db, model, period_field, trunc_unit, constraint, store_ids, periods
+        )
+
+        # 全品牌行汇总所有门店行，同一周期串行重算，保证基于已提交的门店行
+        await _lock_rollup_rows(db, [_rollup_lock_key(grain_index, None, p) for p in period_starts])
+        await _refresh_brand_rows(db, model, period_field, constraint, period_starts)
+
+    # KPI 已变化，使相关门店的报表缓存失效
+    await bump_data_versions(db, store_ids)
+
+
+async def _refresh_store_rows(
+    db: AsyncSession,
+    model: Any,
+    period_field: str,
+    trunc_unit: str,
+    constraint: str,
+    store_ids: List[int],
+    periods: List[Tuple[int, date]],
+) -> None:
+    """从日表重新汇总指定 (门店, 周期) 的门店行"""
+    # 单位以字面量渲染，保证 SELECT 与 GROUP BY 中的表达式完全一致
+    period_expr = cast(
+        func.date_trunc(literal_column(f"'{trunc_unit}'"), KpiDailyStore.biz_date), Date
+    )
+    min_start = min(p for _, p in periods)
+    max_start = max(p for _, p in periods)
+    max_end = max_start + timedelta(days=7) if trunc_unit == "week" else next_month_start(max_start)
+
+    source = (
+        select(
+            period_expr.label(period_field),
+            KpiDailyStore.store_id,
+            *[func.sum(getattr(KpiDailyStore, m)).label(m) for m in ROLLUP_MEASURES],
+            func.count(KpiDailyStore.id).label("day_count"),
+        )
+        .where(
+            KpiDailyStore.store_id.in_(store_ids),
+            KpiDailyStore.biz_date >= min_start,
+            KpiDailyStore.biz_date < max_end,
+            tuple_(KpiDailyStore.store_id, period_expr).in_(periods),
+        )
+        .group_by(period_expr, KpiDailyStore.store_id)
+    )
+    await _upsert_from_select(db, model, period_field, constraint, source)
+
+
+async def _refresh_brand_rows(
+    db: AsyncSession,
+    model: Any,
+    period_field: str,
+    constraint: str,
+    period_starts: List[date],
+) -> None:
+    """由门店行汇总出全品牌行（store_id 为空）"""
+    period_col = getattr(model, period_field)
+    source = (
+        select(
+            period_col.label(period_field),
+            null().label("store_id"),
+            *[func.sum(getattr(model, m)).label(m) for m in ROLLUP_MEASURES],
+            func.sum(model.day_count).label("day_count"),
+        )
+        .where(model.store_id.isnot(None), period_col.in_(period_starts))
+        .group_by(period_col)
+    )
+    await _upsert_from_select(db, model, period_field, constraint, source)
+
+
+async def _upsert_from_select(
+    db: AsyncSession,
+    model: Any,
+    period_field: str,
+    constraint: str,
+    source: Any,
+) -> None:
+    columns = [period_field, "store_id", *ROLLUP_MEASURES, "day_count"]
+    stmt = pg_insert(model).from_select(columns, source)
+    stmt = stmt.on_conflict_do_update(
+        constraint=constraint,
+        set_={
+            **{col: stmt.excluded[col] for col in [*ROLLUP_MEASURES, "day_count"]},
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
+
+
+# ──────────────────── 查询 ────────────────────
+
+
+def plan_segments(start_date: date, end_date: date) -> List[Tuple[str, date, date]]:
+    """
+    将闭区间日期范围切分为 (粒度, 开始, 结束) 段
+
+    优先使用完整自然月，其次完整自然周，剩余的零散日期合并为连续的日段。
+    """
+    segments: List[Tuple[str, date, date]] = []
+    current = start_date
+    day_run_start: Optional[date] = None
+
+    def _flush_days(until: date) -> None:
+        nonlocal day_run_start
+        if day_run_start is not None:
+            segments.append((GRAIN_DAY, day_run_start, until))
+            day_run_start = None
+
+    while current <= end_date:
+        if current.day == 1 and next_month_start(current) - timedelta(days=1) <= end_date:
+            _flush_days(current - timedelta(days=1))
+            month_end = next_month_start(current) - timedelta(days=1)
+            segments.append((GRAIN_MONTH, current, month_end))
+            current = month_end + timedelta(days=1)
+        elif current.weekday() == 0 and current + timedelta(days=6) <= end_date:
+            _flush_days(current - timedelta(days=1))
+            week_end = current + timedelta(days=6)
+            segments.append((GRAIN_WEEK, current, week_end))
+            current = week_end + timedelta(days=1)
+        else:
+            if day_run_start is None:
+                day_run_start = current
+            current += timedelta(days=1)
+
+    _flush_days(end_date)
+    return segments
+
+
+def _segment_select(
+    bucket: str,
+    grain: str,
+    seg_start: date,
+    seg_end: date,
+    store_ids: Optional[Sequence[int]],
+    brand: bool,
+) -> Any:
+    """单个切分段的明细查询（列：bucket, store_id, 指标..., day_count）"""
+    if grain == GRAIN_DAY:
+        model = KpiDailyStore
+        conditions = [KpiDailyStore.biz_date >= seg_start, KpiDailyStore.biz_date <= seg_end]
+        day_count = cast(literal(1), Integer)
+    else:
+        model = KpiMonthlyStore if grain == GRAIN_MONTH else KpiWeeklyStore
+        period_col = model.month_start if grain == GRAIN_MONTH else model.week_start
+        conditions = [period_col == seg_start]
+        day_count = model.day_count
+        if brand:
+            conditions.append(model.store_id.is_(None))
+        else:
+            conditions.append(model.store_id.isnot(None))
+
+    if store_ids is not None:
+        conditions.append(model.store_id.in_(store_ids))
+
+    return select(
+        cast(literal(bucket), String).label("bucket"),
+        model.store_id.label("store_id"),
+        *[getattr(model, m).label(m) for m in ROLLUP_MEASURES],
+        day_count.label("day_count"),
+    ).where(*conditions)
+
+
+async def aggregate_kpi_buckets(
+    db: AsyncSession,
+    buckets: Sequence[Tuple[str, date, date]],
+    store_ids: Optional[Sequence[int]] = None,
+    by_store: bool = True,
+) -> Dict[Tuple[str, Optional[int]], Dict[str, Any]]:
+    """
+    按桶汇总 KPI（一条 SQL）
+
+    每个桶的日期范围先经 plan_segments 切分，完整月/周读取汇总表，零散日期读取日表。
+
+    Args:
+        db: 数据库会话
+        buckets: [(桶标识, 开始日期, 结束日期)]
+        store_ids: 门店范围，None 表示全部门店
+        by_store: 是否按门店分组；为 False 且不限门店时直接使用全品牌行
+
+    Returns:
+        {(桶标识, store_id 或 None): {指标: 合计值, "day_count": 行数}}
+    """
+    brand = not by_store and store_ids is None
+    selects = [
+        _segment_select(bucket, grain, seg_start, seg_end, store_ids, brand)
+        for bucket, start_date, end_date in buckets
+        if start_date <= end_date
+        for grain, seg_start, seg_end in plan_segments(start_date, end_date)
+    ]
+    if not selects:
+        return {}
+
+    detail = union_all(*selects).subquery() if len(selects) > 1 else selects[0].subquery()
+    group_cols = [detail.c.bucket, detail.c.store_id] if by_store else [detail.c.bucket]
+    query = select(
+        *group_cols,
+        *[func.coalesce(func.sum(detail.c[m]), 0).label(m) for m in [*ROLLUP_MEASURES, "day_count"]],
+    ).group_by(*group_cols)
+
+    result = await db.execute(query)
+
+    totals: Dict[Tuple[str, Optional[int]], Dict[str, Any]] = {}
+    for row in result.all():
+        key = (row.bucket, row.store_id if by_store else None)
+        totals[key] = {
+            m: int(getattr(row, m) or 0) if m in _INT_MEASURES else Decimal(getattr(row, m) or 0)
+            for m in [*ROLLUP_MEASURES, "day_count"]
+        }
+    return totals
+
+
+async def aggregate_kpi_range(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    store_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """汇总单个日期范围的全部门店合计（无数据时各指标为 0）"""
+    totals = await aggregate_kpi_buckets(
+        db, [("total", start_date, end_date)], store_ids, by_store=False
+    )
+    empty = {m: 0 if m in _INT_MEASURES else Decimal("0") for m in [*ROLLUP_MEASURES, "day_count"]}
+    return totals.get(("total", None), empty)
+
+
+def month_buckets(start_date: date, end_date: date) -> List[Tuple[str, date, date]]:
+    """按自然月切分日期范围，桶标识为 YYYY-MM"""
+    buckets = []
+    current = month_start_of(start_date)
+    while current <= end_date:
+        bucket_start = max(current, start_date)
+        bucket_end = min(next_month_start(current) - timedelta(days=1), end_date)
+        buckets.append((current.strftime("%Y-%m"), bucket_start, bucket_end))
+        current = next_month_start(current)
+    return buckets
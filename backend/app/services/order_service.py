@@ -5,13 +5,33 @@
 from datetime import date
 from typing import Any
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import Select, and_, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.order import OrderHeader
+from app.models.order import OrderHeader, OrderNoRegistry
 from app.models.store import Store
 from app.models.user import User
 from app.services.data_scope_service import filter_stores_by_access
+from app.services.export_stream import ExportColumn
+
+
+async def register_order_no(db: AsyncSession, order_no: str, biz_date: date) -> bool:
+    """
+    登记订单号（不提交），须与订单写入处于同一事务
+
+    并发登记同一订单号时，后到的事务等待先到的事务结束，先到者提交后返回 False。
+
+    Returns:
+        是否登记成功（False 表示订单号已存在）
+    """
+    result = await db.execute(
+        pg_insert(OrderNoRegistry)
+        .values(order_no=order_no, biz_date=biz_date)
+        .on_conflict_do_nothing(index_elements=["order_no"])
+        .returning(OrderNoRegistry.order_no)
+    )
+    return result.scalar_one_or_none() is not None
 
 
 def _build_order_conditions(
@@ -28,10 +48,11 @@ def _build_order_conditions(
         conditions.append(OrderHeader.channel == channel)
     if order_no:
         conditions.append(OrderHeader.order_no.ilike(f"%{order_no}%"))
+    # 按业务日期（分区键）过滤，只扫描覆盖日期范围的月度分区
     if start_date:
-        conditions.append(func.date(OrderHeader.order_time) >= start_date)
+        conditions.append(OrderHeader.biz_date >= start_date)
     if end_date:
-        conditions.append(func.date(OrderHeader.order_time) <= end_date)
+        conditions.append(OrderHeader.biz_date <= end_date)
     return conditions
 
 
@@ -98,7 +119,22 @@ async def get_order_list(
     }
 
 
-async def get_order_export_rows(
+# 订单导出列（与 build_order_export_query 的列顺序一致）
+ORDER_EXPORT_COLUMNS = [
+    ExportColumn("order_no", "订单号", width=20),
+    ExportColumn("store_name", "门店"),
+    ExportColumn("channel", "渠道", width=12),
+    ExportColumn("amount", "金额", "decimal"),
+    ExportColumn("order_time", "订单时间", "datetime", width=22),
+    ExportColumn("remark", "备注", width=30),
+    ExportColumn("status", "状态", width=12),
+]
+
+# xlsx 导出最大行数（csv / parquet / arrow 不限制）
+ORDER_EXPORT_XLSX_LIMIT = 10000
+
+
+async def build_order_export_query(
     db: AsyncSession,
     current_user: User,
     store_id: int | None,
@@ -106,8 +142,8 @@ async def get_order_export_rows(
     order_no: str | None,
     start_date: date | None,
     end_date: date | None,
-) -> list[Any]:
-    """获取订单导出数据（最多10000条）"""
+) -> Select:
+    """构建订单导出查询（带数据权限过滤），列与 ORDER_EXPORT_COLUMNS 一致"""
     accessible_store_ids = await filter_stores_by_access(db, current_user, store_id)
     conditions = _build_order_conditions(
         accessible_store_ids=accessible_store_ids,
@@ -117,13 +153,19 @@ async def get_order_export_rows(
         end_date=end_date,
     )
 
-    query = select(OrderHeader, Store.name.label("store_name")).join(
+    query = select(
+        OrderHeader.order_no,
+        func.coalesce(Store.name, "未知门店").label("store_name"),
+        func.coalesce(OrderHeader.channel, "未知").label("channel"),
+        func.coalesce(OrderHeader.net_amount, 0).label("amount"),
+        OrderHeader.order_time,
+        func.coalesce(OrderHeader.remark, "").label("remark"),
+        func.coalesce(OrderHeader.status, "completed").label("status"),
+    ).join(
         Store, OrderHeader.store_id == Store.id, isouter=True
     )
 
     if conditions:
         query = query.where(and_(*conditions))
 
-    query = query.order_by(OrderHeader.order_time.desc()).limit(10000)
-    result = await db.execute(query)
-    return result.all()
+    return query.order_by(OrderHeader.order_time.desc())
@@ -0,0 +1,130 @@
+"""
+分区表维护服务
+
+order_header、order_item、expense_record 按 biz_date 做月度范围分区（不设默认分区）：
+- 启动时预建当前月至未来 N 个月（settings.partition_months_ahead）的分区
+- 写入路径在业务事务开始前按业务日期补建将要写入的表的缺失月份（历史数据导入等）
+- 已确认存在（已提交）的分区缓存在进程内，正常写入不产生额外查询
+
+建分区（CREATE TABLE ... PARTITION OF）会对父表加 ACCESS EXCLUSIVE 锁，
+因此在独立的短会话中执行并立即提交，不与业务写入处于同一事务，
+也不会长时间阻塞这些表上的查询；调用方须在本事务读取目标表之前调用，
+否则建分区会等待调用方自身持有的锁（以 lock_timeout 兜底报错，不会无限等待）。
+
+说明：order_item 通过 (order_id, biz_date) 外键引用 order_header，
+两张表同月分区一起创建，保证明细始终能落到对应月份的分区。
+"""
+from datetime import date
+from typing import Iterable, Iterator, List, Sequence, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services.kpi_rollup_service import month_start_of, next_month_start
+
+
+# 按月分区的表（被引用的表在前）
+PARTITIONED_TABLES: Tuple[str, ...] = ("order_header", "order_item", "expense_record")
+
+# 写入订单 / 费用时需要的分区（订单明细引用订单，两者同月分区一起创建）
+ORDER_TABLES: Tuple[str, ...] = ("order_header", "order_item")
+EXPENSE_TABLES: Tuple[str, ...] = ("expense_record",)
+
+# 建分区等待表锁的上限，超时报错而不是长时间排队阻塞其他查询
+_PARTITION_LOCK_TIMEOUT = "5s"
+
+# 建分区时使用的事务级 advisory lock 键，避免多进程同时建同一分区
+_PARTITION_LOCK_KEY = 7_310_210
+
+# 已确认存在的 (表, 月份第一天)
+_known_partitions: Set[Tuple[str, date]] = set()
+
+
+def partition_name(table: str, month_start: date) -> str:
+    """分区表名，如 order_header_p202610"""
+    return f"{table}_p{month_start.strftime('%Y%m')}"
+
+
+def partition_ddl(table: str, month_start: date) -> str:
+    """创建单个月度分区的 DDL"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month_start)} "
+        f"PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{next_month_start(month_start).isoformat()}')"
+    )
+
+
+def iter_months(start_date: date, end_date: date) -> Iterator[date]:
+    """遍历日期范围覆盖的每个月（返回月份第一天）"""
+    current = month_start_of(start_date)
+    while current <= end_date:
+        yield current
+        current = next_month_start(current)
+
+
+def add_months(value: date, months: int) -> date:
+    """月份第一天加若干个月"""
+    current = month_start_of(value)
+    for _ in range(months):
+        current = next_month_start(current)
+    return current
+
+
+async def ensure_partitions(tables: Sequence[str], biz_dates: Iterable[date]) -> int:
+    """
+    确保业务日期所在月份的分区存在（独立会话，建好后立即提交）
+
+    须在业务事务读取或写入这些表之前调用。
+
+    Args:
+        tables: 将要写入的分区表（ORDER_TABLES / EXPENSE_TABLES）
+        biz_dates: 将要写入的业务日期
+
+    Returns:
+        新建的分区数
+    """
+    months = sorted({month_start_of(d) for d in biz_dates})
+    # 按 PARTITIONED_TABLES 的顺序建表，被引用的表在前
+    ordered_tables = [table for table in PARTITIONED_TABLES if table in tables]
+    missing: List[Tuple[str, date]] = [
+        (table, month)
+        for month in months
+        for table in ordered_tables
+        if (table, month) not in _known_partitions
+    ]
+    if not missing:
+        return 0
+
+    async with AsyncSessionLocal() as session:
+        # 先按名称检查，已存在的分区不加锁
+        result = await session.execute(
+            text("SELECT relname FROM pg_class WHERE relname = ANY(:names)"),
+            {"names": [partition_name(table, month) for table, month in missing]},
+        )
+        existing = {row.relname for row in result.all()}
+
+        to_create = [(table, month) for table, month in missing if partition_name(table, month) not in existing]
+        if to_create:
+            await session.execute(text(f"SET LOCAL lock_timeout = '{_PARTITION_LOCK_TIMEOUT}'"))
+            await session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PARTITION_LOCK_KEY})
+            for table, month in to_create:
+                await session.execute(text(partition_ddl(table, month)))
+            await session.commit()
+            for table, month in to_create:
+                logger.info(f"已创建分区 {partition_name(table, month)}")
+
+    # 已提交，全部缓存
+    _known_partitions.update(missing)
+    return len(to_create)
+
+
+async def ensure_future_partitions(months_ahead: int | None = None) -> int:
+    """预建全部分区表当前月至未来 months_ahead 个月的分区"""
+    if months_ahead is None:
+        months_ahead = settings.partition_months_ahead
+    current = month_start_of(date.today())
+    return await ensure_partitions(
+        PARTITIONED_TABLES, (add_months(current, n) for n in range(months_ahead + 1))
+    )
@@ -0,0 +1,244 @@
+"""
+透视分析服务 - 通用 KPI 聚合查询
+
+调用方选择维度（日期粒度、门店、渠道）、指标（kpi_daily_store 可加总字段及比率）和筛选条件，
+编译为一条 GROUP BY SQL：
+- 比率类指标（毛利率、客单价等）由合计值计算，不对日比率求平均
+- 门店范围按数据权限强制过滤，门店列表以数组参数传入（= ANY），
+  不同门店范围生成相同的 SQL 文本，可复用 asyncpg 的预编译语句
+- 多取一行判断是否超过行数上限
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, Integer, Numeric, String, and_, any_, bindparam, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions import AuthorizationException, ValidationException
+from app.models.kpi import KpiDailyStore
+from app.models.store import Store
+from app.models.user import User
+from app.schemas.pivot import PivotColumn, PivotQuery, PivotResult
+from app.services.data_scope_service import get_accessible_store_ids
+from app.services.kpi_catalog import CHANNEL_REVENUE_COLUMNS
+from app.services.kpi_rollup_service import ROLLUP_MEASURES
+
+
+# 可加总指标：字段名 -> 中文名（取 KPI 表字段注释）
+ADDITIVE_MEASURES: Dict[str, str] = {
+    name: KpiDailyStore.__table__.c[name].comment or name for name in ROLLUP_MEASURES
+}
+
+# 比率指标：字段名 -> (中文名, 分子, 分母, 倍数)，按合计值计算
+RATIO_MEASURES: Dict[str, Tuple[str, str, str, int]] = {
+    "gross_profit_rate": ("毛利率(%)", "gross_profit", "revenue", 100),
+    "operating_profit_rate": ("营业利润率(%)", "operating_profit", "revenue", 100),
+    "cost_rate": ("成本率(%)", "cost_total", "revenue", 100),
+    "discount_rate": ("优惠率(%)", "discount_amount", "revenue", 100),
+    "avg_order_value": ("客单价", "net_revenue", "order_count", 1),
+}
+
+# 渠道维度只能拆分渠道收入，对应指标 revenue
+CHANNEL_MEASURES = {"revenue"}
+
+DIMENSION_LABELS: Dict[str, str] = {
+    "period": "日期",
+    "store_id": "门店ID",
+    "store_name": "门店名称",
+    "channel": "渠道",
+}
+
+
+def _validate(query: PivotQuery) -> None:
+    """校验维度、指标和排序字段"""
+    if query.start_date > query.end_date:
+        raise ValidationException("开始日期不能晚于结束日期")
+    if len(set(query.dimensions)) != len(query.dimensions):
+        raise ValidationException("维度不能重复")
+    if len(set(query.measures)) != len(query.measures):
+        raise ValidationException("指标不能重复")
+
+    unknown = [m for m in query.measures if m not in ADDITIVE_MEASURES and m not in RATIO_MEASURES]
+    if unknown:
+        raise ValidationException(
+            f"不支持的指标: {', '.join(unknown)}",
+            detail=f"可用指标: {', '.join([*ADDITIVE_MEASURES, *RATIO_MEASURES])}",
+        )
+
+    if "channel" in query.dimensions:
+        invalid = [m for m in query.measures if m not in CHANNEL_MEASURES]
+        if invalid:
+            raise ValidationException(f"按渠道拆分时只支持指标: {', '.join(sorted(CHANNEL_MEASURES))}")
+        unknown_channels = [c for c in query.channels or [] if c not in CHANNEL_REVENUE_COLUMNS]
+        if unknown_channels:
+            raise ValidationException(f"不支持的渠道: {', '.join(unknown_channels)}")
+
+    if query.sort_by and query.sort_by not in _output_names(query):
+        raise ValidationException(f"排序字段 {query.sort_by} 不在结果列中")
+
+
+def _dimension_names(query: PivotQuery) -> List[str]:
+    """结果中的维度列（store 维度同时返回门店ID和名称）"""
+    names: List[str] = []
+    for dimension in query.dimensions:
+        if dimension == "date":
+            names.append("period")
+        elif dimension == "store":
+            names.extend(["store_id", "store_name"])
+        else:
+            names.append("channel")
+    return names
+
+
+def _output_names(query: PivotQuery) -> List[str]:
+    return [*_dimension_names(query), *query.measures]
+
+
+async def _resolve_store_scope(
+    db: AsyncSession,
+    user: User,
+    requested_store_ids: Optional[List[int]]
+) -> Optional[List[int]]:
+    """请求的门店与可访问门店求交集；请求了无权门店时报错（None 表示全部门店）"""
+    accessible_store_ids = await get_accessible_store_ids(db, user)
+    if not requested_store_ids:
+        return accessible_store_ids
+
+    requested = sorted(set(requested_store_ids))
+    if accessible_store_ids is not None:
+        denied = [store_id for store_id in requested if store_id not in accessible_store_ids]
+        if denied:
+            raise AuthorizationException(f"您无权访问门店ID={', '.join(map(str, denied))}的数据")
+    return requested
+
+
+def build_pivot_query(query: PivotQuery, store_ids: Optional[List[int]]):
+    """
+    编译透视 SQL
+
+    事实子查询从 kpi_daily_store 取需要的字段（按日期、门店范围过滤）；
+    含渠道维度时用并行 unnest 把各渠道收入列展开为 (channel, revenue) 行，
+    外层按维度分组汇总并计算比率。
+    """
+    conditions = [
+        KpiDailyStore.biz_date >= query.start_date,
+        KpiDailyStore.biz_date <= query.end_date,
+    ]
+    if store_ids is not None:
+        conditions.append(
+            KpiDailyStore.store_id == any_(bindparam("store_ids", store_ids, type_=ARRAY(Integer)))
+        )
+
+    # 比率依赖的分子/分母字段也需要汇总
+    base_measures = sorted({
+        field
+        for m in query.measures
+        for field in ((m,) if m in ADDITIVE_MEASURES else RATIO_MEASURES[m][1:3])
+    })
+
+    if "channel" in query.dimensions:
+        channels = list(CHANNEL_REVENUE_COLUMNS)
+        fact = select(
+            KpiDailyStore.biz_date,
+            KpiDailyStore.store_id,
+            func.unnest(array(channels, type_=String)).label("channel"),
+            func.unnest(array(
+                [getattr(KpiDailyStore, CHANNEL_REVENUE_COLUMNS[c]) for c in channels],
+                type_=Numeric(14, 2),
+            )).label("revenue"),
+        ).where(and_(*conditions)).subquery("fact")
+    else:
+        fact = select(
+            KpiDailyStore.biz_date,
+            KpiDailyStore.store_id,
+            *[getattr(KpiDailyStore, m) for m in base_measures],
+        ).where(and_(*conditions)).subquery("fact")
+
+    # 维度列
+    dimension_columns = []
+    for dimension in query.dimensions:
+        if dimension == "date":
+            if query.grain == "day":
+                period = fact.c.biz_date
+            else:
+                # 粒度为白名单字面量，同一粒度的 SELECT 与 GROUP BY 表达式一致
+                period = cast(func.date_trunc(literal_column(f"'{query.grain}'"), fact.c.biz_date), Date)
+            dimension_columns.append(period.label("period"))
+        elif dimension == "store":
+            dimension_columns.extend([fact.c.store_id.label("store_id"), Store.name.label("store_name")])
+        else:
+            dimension_columns.append(fact.c.channel.label("channel"))
+
+    # 指标列
+    sums = {field: func.coalesce(func.sum(fact.c[field]), 0) for field in base_measures}
+    measure_columns = []
+    for m in query.measures:
+        if m in ADDITIVE_MEASURES:
+            measure_columns.append(sums[m].label(m))
+        else:
+            _, numerator, denominator, scale = RATIO_MEASURES[m]
+            measure_columns.append(
+                func.round(sums[numerator] * scale / func.nullif(sums[denominator], 0), 2).label(m)
+            )
+
+    stmt = select(*dimension_columns, *measure_columns).select_from(fact)
+    if "store" in query.dimensions:
+        stmt = stmt.join(Store, Store.id == fact.c.store_id)
+    if "channel" in query.dimensions and query.channels:
+        stmt = stmt.where(fact.c.channel == any_(bindparam("channels", query.channels, type_=ARRAY(String))))
+    if dimension_columns:
+        stmt = stmt.group_by(*[column.element for column in dimension_columns])
+
+    # 排序：指定字段优先，其余按维度
+    columns_by_name = {column.name: column for column in [*dimension_columns, *measure_columns]}
+    order_columns = []
+    if query.sort_by:
+        column = columns_by_name[query.sort_by]
+        order_columns.append(column.desc().nulls_last() if query.descending else column.asc().nulls_last())
+    order_columns.extend(
+        column for column in dimension_columns if column.name != query.sort_by
+    )
+    if order_columns:
+        stmt = stmt.order_by(*order_columns)
+
+    return stmt.limit(query.limit + 1)
+
+
+async def query_pivot(
+    db: AsyncSession,
+    query: PivotQuery,
+    current_user: User
+) -> PivotResult:
+    """
+    执行透视查询
+
+    Raises:
+        ValidationException: 维度、指标、排序字段不合法
+        AuthorizationException: 请求了无权访问的门店
+    """
+    _validate(query)
+    store_ids = await _resolve_store_scope(db, current_user, query.store_ids)
+
+    result = await db.execute(build_pivot_query(query, store_ids))
+    rows = result.all()
+    truncated = len(rows) > query.limit
+    rows = rows[:query.limit]
+
+    columns = [
+        PivotColumn(name=name, label=DIMENSION_LABELS[name], kind="dimension")
+        for name in _dimension_names(query)
+    ] + [
+        PivotColumn(
+            name=m,
+            label=ADDITIVE_MEASURES[m] if m in ADDITIVE_MEASURES else RATIO_MEASURES[m][0],
+            kind="measure",
+        )
+        for m in query.measures
+    ]
+
+    return PivotResult(
+        columns=columns,
+        rows=[dict(row._mapping) for row in rows],
+        row_count=len(rows),
+        truncated=truncated,
+    )
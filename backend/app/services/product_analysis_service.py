@@ -11,7 +11,7 @@ from datetime import date
 from decimal import Decimal
 from typing import Any
 
-from sqlalchemy import select, func, desc
+from sqlalchemy import and_, select, func, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.order import OrderHeader, OrderItem
@@ -34,15 +34,24 @@ def _to_float(val: Any) -> float:
     return float(val)
 
 
+# 明细与订单按 (order_id, biz_date) 关联，两张分区表可按月份分区逐一对应连接
+_ORDER_JOIN = and_(
+    OrderItem.order_id == OrderHeader.id,
+    OrderItem.biz_date == OrderHeader.biz_date,
+)
+
+
 def _base_query_filter(
     query: Any,
     start_date: date,
     end_date: date,
     accessible_store_ids: list[int] | None = None,
 ) -> Any:
-    """为查询添加日期范围和门店权限过滤"""
+    """为明细查询添加日期范围和门店权限过滤（日期条件同时作用于两张分区表以裁剪分区）"""
     query = query.where(OrderHeader.biz_date >= start_date)
     query = query.where(OrderHeader.biz_date <= end_date)
+    query = query.where(OrderItem.biz_date >= start_date)
+    query = query.where(OrderItem.biz_date <= end_date)
     query = query.where(OrderHeader.status != "cancelled")
     if accessible_store_ids is not None:
         query = query.where(OrderHeader.store_id.in_(accessible_store_ids))
@@ -74,7 +83,7 @@ async def get_product_sales_ranking(
             ).label("net_revenue"),
             func.count(func.distinct(OrderHeader.id)).label("order_count"),
         )
-        .join(OrderHeader, OrderItem.order_id == OrderHeader.id)
+        .join(OrderHeader, _ORDER_JOIN)
     )
 
     query = _base_query_filter(query, start_date, end_date, accessible_store_ids)
@@ -145,7 +154,7 @@ async def get_category_sales_distribution(
             func.sum(OrderItem.line_amount).label("revenue"),
             func.sum(OrderItem.quantity).label("quantity"),
         )
-        .join(OrderHeader, OrderItem.order_id == OrderHeader.id)
+        .join(OrderHeader, _ORDER_JOIN)
     )
 
     query = _base_query_filter(query, start_date, end_date, accessible_store_ids)
@@ -197,7 +206,7 @@ async def get_product_profit_contribution(
                 OrderItem.quantity * func.coalesce(Product.cost_price, 0)
             ).label("total_cost"),
         )
-        .join(OrderHeader, OrderItem.order_id == OrderHeader.id)
+        .join(OrderHeader, _ORDER_JOIN)
         .outerjoin(Product, OrderItem.product_id == Product.id)
     )
 
@@ -253,7 +262,7 @@ async def get_product_abc_classification(
             OrderItem.product_name,
             func.sum(OrderItem.line_amount).label("total_revenue"),
         )
-        .join(OrderHeader, OrderItem.order_id == OrderHeader.id)
+        .join(OrderHeader, _ORDER_JOIN)
     )
 
     query = _base_query_filter(query, start_date, end_date, accessible_store_ids)
@@ -308,7 +317,7 @@ async def get_product_store_cross_analysis(
     # 先找出 Top N 菜品（按总销售额）
     top_products_query = (
         select(OrderItem.product_name)
-        .join(OrderHeader, OrderItem.order_id == OrderHeader.id)
+        .join(OrderHeader, _ORDER_JOIN)
     )
     top_products_query = _base_query_filter(
         top_products_query, start_date, end_date, accessible_store_ids
@@ -334,7 +343,7 @@ async def get_product_store_cross_analysis(
             func.sum(OrderItem.quantity).label("quantity"),
             func.sum(OrderItem.line_amount).label("revenue"),
         )
-        .join(OrderHeader, OrderItem.order_id == OrderHeader.id)
+        .join(OrderHeader, _ORDER_JOIN)
         .join(Store, OrderHeader.store_id == Store.id)
         .where(OrderItem.product_name.in_(top_product_names))
     )
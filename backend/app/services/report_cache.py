@@ -0,0 +1,192 @@
+"""
+报表结果缓存
+
+缓存键 = 报表名 + 规范化的筛选条件 + 门店范围 + 范围内各门店的数据版本号。
+源数据（订单、费用、导入）登记脏单元、KPI 重算、门店信息修改时，
+在同一事务内递增相关门店的版本号（bump_data_versions），提交后新请求的键随之变化，
+不会读到修改前的结果；旧条目由 LRU 淘汰或 TTL 过期回收。
+
+后端：
+- memory：进程内 LRU（默认）
+- redis：多进程共享，需配置 REDIS_URL 并安装 redis；不可用时退回进程内 LRU
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple, Type, TypeVar
+
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.kpi import ReportDataVersion
+
+
+RowT = TypeVar("RowT", bound=BaseModel)
+
+CACHE_KEY_PREFIX = "report"
+
+
+class _MemoryBackend:
+    """进程内 LRU（条目为行模型列表，按插入时间判断过期）"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, list]]" = OrderedDict()
+
+    async def get(self, key: str, row_model: Type[RowT]) -> Optional[List[RowT]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, rows = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return list(rows)
+
+    async def set(self, key: str, rows: list) -> None:
+        self._entries[key] = (time.monotonic(), list(rows))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class _RedisBackend:
+    """Redis 后端（行序列化为 JSON，读写失败视为未命中）"""
+
+    def __init__(self, client: Any, ttl_seconds: int):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    async def get(self, key: str, row_model: Type[RowT]) -> Optional[List[RowT]]:
+        try:
+            payload = await self.client.get(key)
+        except Exception as e:
+            logger.warning(f"读取报表缓存失败: {e}")
+            return None
+        if payload is None:
+            return None
+        return [row_model.model_validate(item) for item in json.loads(payload)]
+
+    async def set(self, key: str, rows: list) -> None:
+        payload = json.dumps([row.model_dump(mode="json") for row in rows], ensure_ascii=False)
+        try:
+            await self.client.set(key, payload, ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"写入报表缓存失败: {e}")
+
+
+_backend: Optional[Any] = None
+
+
+def get_cache_backend():
+    """按配置创建缓存后端（进程内单例）"""
+    global _backend
+    if _backend is not None:
+        return _backend
+
+    if settings.report_cache_backend == "redis":
+        if not settings.redis_url:
+            logger.warning("REPORT_CACHE_BACKEND=redis 但未配置 REDIS_URL，报表缓存使用进程内 LRU")
+        else:
+            try:
+                from redis import asyncio as redis_asyncio
+            except ImportError:
+                logger.warning("未安装 redis，报表缓存使用进程内 LRU")
+            else:
+                _backend = _RedisBackend(
+                    redis_asyncio.from_url(settings.redis_url),
+                    settings.report_cache_ttl_seconds,
+                )
+                return _backend
+
+    _backend = _MemoryBackend(settings.report_cache_max_entries, settings.report_cache_ttl_seconds)
+    return _backend
+
+
+async def bump_data_versions(db: AsyncSession, store_ids: Sequence[int]) -> None:
+    """
+    递增门店数据版本号（不提交，与数据写入处于同一事务）
+
+    按门店ID顺序加锁，并发写入同一门店时在提交前串行。
+    """
+    unique_ids = sorted({store_id for store_id in store_ids if store_id is not None})
+    if not unique_ids:
+        return
+
+    stmt = pg_insert(ReportDataVersion).values([
+        {"store_id": store_id, "version": 1} for store_id in unique_ids
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["store_id"],
+        set_={"version": ReportDataVersion.version + 1, "updated_at": func.now()},
+    )
+    await db.execute(stmt)
+
+
+async def get_data_versions(
+    db: AsyncSession,
+    accessible_store_ids: Optional[List[int]]
+) -> List[Tuple[int, int]]:
+    """查询范围内门店的数据版本号（None 表示全部门店）"""
+    query = select(ReportDataVersion.store_id, ReportDataVersion.version)
+    if accessible_store_ids is not None:
+        if not accessible_store_ids:
+            return []
+        query = query.where(ReportDataVersion.store_id.in_(accessible_store_ids))
+    result = await db.execute(query.order_by(ReportDataVersion.store_id))
+    return [(row.store_id, row.version) for row in result.all()]
+
+
+def build_cache_key(
+    name: str,
+    filters: BaseModel,
+    accessible_store_ids: Optional[List[int]],
+    versions: List[Tuple[int, int]]
+) -> str:
+    """缓存键：报表名 + 筛选条件、门店范围、数据版本的摘要"""
+    payload = {
+        "filters": filters.model_dump(mode="json"),
+        "stores": sorted(accessible_store_ids) if accessible_store_ids is not None else None,
+        "versions": versions,
+    }
+    digest = hashlib.sha256(
+        json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{name}:{digest}"
+
+
+async def cached_report(
+    db: AsyncSession,
+    name: str,
+    filters: BaseModel,
+    accessible_store_ids: Optional[List[int]],
+    row_model: Type[RowT],
+    compute: Callable[[], Awaitable[List[RowT]]],
+) -> List[RowT]:
+    """
+    读取报表缓存，未命中时计算并写入
+
+    先读版本号再计算：计算期间有写入提交时，结果以旧版本号为键写入，
+    之后的请求使用新版本号，不会命中该条目。
+    """
+    if not settings.report_cache_enabled:
+        return await compute()
+
+    versions = await get_data_versions(db, accessible_store_ids)
+    key = build_cache_key(name, filters, accessible_store_ids, versions)
+
+    backend = get_cache_backend()
+    rows = await backend.get(key, row_model)
+    if rows is not None:
+        return rows
+
+    rows = await compute()
+    await backend.set(key, rows)
+    return rows
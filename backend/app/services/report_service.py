@@ -2,17 +2,17 @@
 报表服务 - 数据聚合和导出
 
 所有聚合必须在数据库端完成（使用 SQL），不允许拉取全量数据到 Python 循环。
-已集成数据权限控制。
+已集成数据权限控制。查询结果经 report_cache 缓存（键含筛选条件、门店范围和门店数据版本）。
 """
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
-from io import BytesIO
-from typing import List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
-from sqlalchemy import func, select, extract, case, and_
+from sqlalchemy import (
+    BigInteger, Column, Integer, MetaData, Numeric, Select, Table,
+    cast, func, select, extract, case, and_, text
+)
+from sqlalchemy.schema import CreateTable, DropTable
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 
@@ -29,6 +29,205 @@ from app.schemas.report import (
     ReportQuery
 )
 from app.services.data_scope_service import filter_stores_by_access
+from app.services.expense_cube_service import effective_expense_conditions, expense_fact_subquery
+from app.services.export_stream import ExportColumn, XlsxStreamWriter
+from app.services.kpi_rollup_service import aggregate_kpi_buckets, month_buckets
+from app.services.report_cache import cached_report
+
+
+def _scope_conditions(model, filters: ReportQuery, accessible_store_ids: Optional[List[int]]) -> list:
+    """按 biz_date / store_id 的日期范围 + 门店范围条件（门店范围为 None 表示不限制）"""
+    conditions = [model.biz_date >= filters.start_date, model.biz_date <= filters.end_date]
+    if accessible_store_ids is not None:
+        conditions.append(model.store_id.in_(accessible_store_ids))
+    return conditions
+
+
+def _period_conditions(columns, start_date: date, end_date: date) -> list:
+    """数据源列上的日期范围条件（门店范围已在数据源中过滤）"""
+    return [columns.biz_date >= start_date, columns.biz_date <= end_date]
+
+
+def _profit_rate(profit, revenue):
+    """利润率（%，两位小数），收入为 0 时为 NULL"""
+    return case(
+        (revenue > 0, func.round(profit / revenue * 100, 2)),
+        else_=None
+    )
+
+
+class ReportSources(NamedTuple):
+    """
+    报表共享数据源（列相同的 (日期, 门店) 粒度事实）
+
+    - kpi: biz_date, store_id, REPORT_KPI_MEASURES
+    - orders: biz_date, store_id, order_count, net_amount_total（不含已取消订单）
+    - expense: biz_date, store_id, expense_type_id, total_amount（全部记录）,
+      effective_amount / effective_count（计入费用统计的记录）
+    """
+    kpi: Any
+    orders: Any
+    expense: Any
+
+
+# 报表使用的日 KPI 字段
+REPORT_KPI_MEASURES = [
+    "revenue",
+    "net_revenue",
+    "discount_amount",
+    "refund_amount",
+    "cost_total",
+    "cost_material",
+    "cost_labor",
+    "gross_profit",
+    "operating_profit",
+]
+
+
+def _previous_period(filters: ReportQuery) -> Tuple[date, date]:
+    """上一等长期间（闭区间）"""
+    period_days = (filters.end_date - filters.start_date).days
+    prev_end = filters.start_date - timedelta(days=1)
+    return prev_end - timedelta(days=period_days), prev_end
+
+
+def _report_source_selects(
+    filters: ReportQuery,
+    accessible_store_ids: Optional[List[int]],
+    kpi_start: date
+) -> Dict[str, Select]:
+    """报表数据源查询，每张源表一条（KPI 从 kpi_start 开始，可覆盖上一期间）"""
+    kpi_filters = filters.model_copy(update={"start_date": kpi_start})
+    effective = and_(*effective_expense_conditions())
+    return {
+        "kpi": select(
+            KpiDailyStore.biz_date,
+            KpiDailyStore.store_id,
+            *[getattr(KpiDailyStore, m) for m in REPORT_KPI_MEASURES],
+        ).where(
+            and_(*_scope_conditions(KpiDailyStore, kpi_filters, accessible_store_ids))
+        ),
+        "orders": select(
+            OrderHeader.biz_date,
+            OrderHeader.store_id,
+            func.count(OrderHeader.id).label("order_count"),
+            func.sum(OrderHeader.net_amount).label("net_amount_total"),
+        ).where(
+            and_(
+                *_scope_conditions(OrderHeader, filters, accessible_store_ids),
+                OrderHeader.status != "cancelled"
+            )
+        ).group_by(OrderHeader.biz_date, OrderHeader.store_id),
+        "expense": select(
+            ExpenseRecord.biz_date,
+            ExpenseRecord.store_id,
+            ExpenseRecord.expense_type_id,
+            func.sum(ExpenseRecord.amount).label("total_amount"),
+            func.sum(ExpenseRecord.amount).filter(effective).label("effective_amount"),
+            func.count(ExpenseRecord.id).filter(effective).label("effective_count"),
+        ).where(
+            and_(*_scope_conditions(ExpenseRecord, filters, accessible_store_ids))
+        ).group_by(ExpenseRecord.biz_date, ExpenseRecord.store_id, ExpenseRecord.expense_type_id),
+    }
+
+
+def report_sources(
+    filters: ReportQuery,
+    accessible_store_ids: Optional[List[int]],
+    kpi_start: Optional[date] = None
+) -> ReportSources:
+    """以 CTE 形式引用的报表数据源（单个报表查询使用）"""
+    selects = _report_source_selects(filters, accessible_store_ids, kpi_start or filters.start_date)
+    return ReportSources(**{name: query.cte(f"{name}_day") for name, query in selects.items()})
+
+
+def _scan_column_type(column_type):
+    """共享扫描临时表的列类型（合计值放宽精度，计数用 BIGINT）"""
+    if isinstance(column_type, Numeric):
+        return Numeric(18, 2)
+    if isinstance(column_type, Integer):
+        return BigInteger()
+    return column_type
+
+
+async def materialize_report_sources(
+    db: AsyncSession,
+    filters: ReportQuery,
+    accessible_store_ids: Optional[List[int]]
+) -> ReportSources:
+    """
+    每张源表扫描一次，写入事务级临时表（提交或回滚时删除）
+
+    KPI 覆盖上一等长期间，供门店绩效计算排名变化；
+    多个 Sheet 在同一事务内读取这些临时表，不再重复扫描源表。
+    """
+    prev_start, _ = _previous_period(filters)
+    tables = {}
+    for name, query in _report_source_selects(filters, accessible_store_ids, prev_start).items():
+        table = Table(
+            f"tmp_report_scan_{name}",
+            MetaData(),
+            *[Column(column.name, _scan_column_type(column.type)) for column in query.selected_columns],
+            prefixes=["TEMPORARY"],
+            postgresql_on_commit="DROP",
+        )
+        await db.execute(DropTable(table, if_exists=True))
+        await db.execute(CreateTable(table))
+        await db.execute(table.insert().from_select([column.name for column in table.c], query))
+        # 临时表不会被自动 ANALYZE，补充统计信息以便后续查询选择合适的计划
+        await db.execute(text(f"ANALYZE {table.name}"))
+        tables[name] = table
+    return ReportSources(**tables)
+
+
+def build_daily_summary_query(
+    filters: ReportQuery,
+    accessible_store_ids: Optional[List[int]],
+    sources: Optional[ReportSources] = None
+):
+    """
+    日汇总单条 SQL
+
+    - kpi / expense / orders 三个数据源均为 (日期, 门店) 粒度，带日期和门店范围条件
+    - 以 KPI 为主表 LEFT JOIN 费用和订单数，利润率在 SQL 中计算
+    - sources 为空时直接读取源表，导出时传入共享扫描的临时表
+    """
+    sources = sources or report_sources(filters, accessible_store_ids)
+    kpi = sources.kpi
+    orders = sources.orders
+
+    expense = select(
+        sources.expense.c.biz_date,
+        sources.expense.c.store_id,
+        func.sum(sources.expense.c.total_amount).label("expense_total")
+    ).group_by(sources.expense.c.biz_date, sources.expense.c.store_id).cte("expense")
+
+    return select(
+        kpi.c.biz_date,
+        kpi.c.store_id,
+        Store.name.label("store_name"),
+        kpi.c.revenue,
+        kpi.c.net_revenue,
+        kpi.c.discount_amount,
+        kpi.c.refund_amount,
+        kpi.c.cost_total,
+        kpi.c.cost_material,
+        kpi.c.cost_labor,
+        func.coalesce(expense.c.expense_total, 0).label("expense_total"),
+        func.coalesce(orders.c.order_count, 0).label("order_count"),
+        kpi.c.gross_profit,
+        kpi.c.operating_profit,
+        _profit_rate(kpi.c.gross_profit, kpi.c.revenue).label("gross_profit_rate"),
+        _profit_rate(kpi.c.operating_profit, kpi.c.revenue).label("operating_profit_rate"),
+    ).select_from(kpi).join(
+        Store, kpi.c.store_id == Store.id
+    ).outerjoin(
+        expense, and_(expense.c.biz_date == kpi.c.biz_date, expense.c.store_id == kpi.c.store_id)
+    ).outerjoin(
+        orders, and_(orders.c.biz_date == kpi.c.biz_date, orders.c.store_id == kpi.c.store_id)
+    ).where(
+        and_(*_period_conditions(kpi.c, filters.start_date, filters.end_date))
+    ).order_by(kpi.c.biz_date.desc(), Store.name)
 
 
 async def get_daily_summary(
@@ -39,140 +238,30 @@ async def get_daily_summary(
     """
     获取日汇总报表
     
-    SQL 聚合逻辑：
+    SQL 聚合逻辑（一条 SQL，见 build_daily_summary_query）：
     - 从 kpi_daily_store 获取基础指标
     - 从 expense_record 聚合费用
     - 从 order_header 聚合订单数
     - 计算利润率
+    三部分都按用户可访问的门店过滤，只扫描范围内门店的数据
     """
-    # 构建基础查询 - 从 KPI 表
-    query = select(
-        KpiDailyStore.biz_date,
-        KpiDailyStore.store_id,
-        Store.name.label("store_name"),
-        
-        # 营收指标
-        func.sum(KpiDailyStore.revenue).label("revenue"),
-        func.sum(KpiDailyStore.net_revenue).label("net_revenue"),
-        func.sum(KpiDailyStore.discount_amount).label("discount_amount"),
-        func.sum(KpiDailyStore.refund_amount).label("refund_amount"),
-        
-        # 成本指标
-        func.sum(KpiDailyStore.cost_total).label("cost_total"),
-        func.sum(KpiDailyStore.cost_material).label("cost_material"),
-        func.sum(KpiDailyStore.cost_labor).label("cost_labor"),
-        
-        # 利润指标（从 KPI 表计算）
-        func.sum(KpiDailyStore.gross_profit).label("gross_profit"),
-        func.sum(KpiDailyStore.operating_profit).label("operating_profit"),
-    ).select_from(KpiDailyStore).join(
-        Store, KpiDailyStore.store_id == Store.id
-    ).where(
-        and_(
-            KpiDailyStore.biz_date >= filters.start_date,
-            KpiDailyStore.biz_date <= filters.end_date
-        )
-    )
-    
     # 数据权限过滤：限制可访问的门店
     accessible_store_ids = await filter_stores_by_access(db, current_user, filters.store_id)
-    if accessible_store_ids is not None:
-        query = query.where(KpiDailyStore.store_id.in_(accessible_store_ids))
-    
-    # 分组
-    if filters.group_by == "day":
-        query = query.group_by(
-            KpiDailyStore.biz_date,
-            KpiDailyStore.store_id,
-            Store.name
-        ).order_by(KpiDailyStore.biz_date.desc(), Store.name)
-    else:
-        # 默认按日期+门店分组
-        query = query.group_by(
-            KpiDailyStore.biz_date,
-            KpiDailyStore.store_id,
-            Store.name
-        ).order_by(KpiDailyStore.biz_date.desc(), Store.name)
-    
-    result = await db.execute(query)
-    rows = result.all()
-    
-    # 查询费用（单独查询后合并）
-    expense_query = select(
-        ExpenseRecord.biz_date,
-        ExpenseRecord.store_id,
-        func.sum(ExpenseRecord.amount).label("expense_total")
-    ).where(
-        and_(
-            ExpenseRecord.biz_date >= filters.start_date,
-            ExpenseRecord.biz_date <= filters.end_date
-        )
-    ).group_by(ExpenseRecord.biz_date, ExpenseRecord.store_id)
-    
-    if filters.store_id:
-        expense_query = expense_query.where(ExpenseRecord.store_id == filters.store_id)
-    
-    expense_result = await db.execute(expense_query)
-    expense_dict = {
-        (row.biz_date, row.store_id): row.expense_total
-        for row in expense_result.all()
-    }
-    
-    # 查询订单数（单独查询后合并）
-    order_query = select(
-        OrderHeader.biz_date,
-        OrderHeader.store_id,
-        func.count(OrderHeader.id).label("order_count")
-    ).where(
-        and_(
-            OrderHeader.biz_date >= filters.start_date,
-            OrderHeader.biz_date <= filters.end_date,
-            OrderHeader.status != "cancelled"
-        )
-    ).group_by(OrderHeader.biz_date, OrderHeader.store_id)
-    
-    if filters.store_id:
-        order_query = order_query.where(OrderHeader.store_id == filters.store_id)
-    
-    order_result = await db.execute(order_query)
-    order_dict = {
-        (row.biz_date, row.store_id): row.order_count
-        for row in order_result.all()
-    }
-    
-    # 组装结果
-    result_list = []
-    for row in rows:
-        expense_total = expense_dict.get((row.biz_date, row.store_id), Decimal("0.00"))
-        order_count = order_dict.get((row.biz_date, row.store_id), 0)
-        
-        # 计算利润率
-        gross_profit_rate = None
-        operating_profit_rate = None
-        if row.revenue and row.revenue > 0:
-            gross_profit_rate = (row.gross_profit / row.revenue * 100).quantize(Decimal("0.01"))
-            operating_profit_rate = (row.operating_profit / row.revenue * 100).quantize(Decimal("0.01"))
-        
-        result_list.append(DailySummaryRow(
-            biz_date=row.biz_date,
-            store_id=row.store_id,
-            store_name=row.store_name,
-            revenue=row.revenue,
-            net_revenue=row.net_revenue,
-            discount_amount=row.discount_amount,
-            refund_amount=row.refund_amount,
-            cost_total=row.cost_total,
-            cost_material=row.cost_material,
-            cost_labor=row.cost_labor,
-            expense_total=expense_total,
-            order_count=order_count,
-            gross_profit=row.gross_profit,
-            operating_profit=row.operating_profit,
-            gross_profit_rate=gross_profit_rate,
-            operating_profit_rate=operating_profit_rate
-        ))
     
-    return result_list
+    return await cached_report(
+        db, "daily_summary", filters, accessible_store_ids, DailySummaryRow,
+        lambda: _query_daily_summary(db, filters, accessible_store_ids)
+    )
+
+
+async def _query_daily_summary(
+    db: AsyncSession,
+    filters: ReportQuery,
+    accessible_store_ids: Optional[List[int]]
+) -> List[DailySummaryRow]:
+    """日汇总查询（门店范围已按数据权限确定）"""
+    result = await db.execute(build_daily_summary_query(filters, accessible_store_ids))
+    return [DailySummaryRow(**row._mapping) for row in result.all()]
 
 
 async def get_monthly_summary(
@@ -184,71 +273,49 @@ async def get_monthly_summary(
     获取月汇总报表
     
     SQL 聚合逻辑：
-    - 按年月分组聚合 kpi_daily_store
+    - 完整月份读取 kpi_monthly_store，月内完整周读取 kpi_weekly_store，
+      只有范围边缘的零散日期读取 kpi_daily_store（一条 SQL）
     - 计算日均指标
     """
-    # 构建查询 - 按年月分组
-    query = select(
-        extract('year', KpiDailyStore.biz_date).label("year"),
-        extract('month', KpiDailyStore.biz_date).label("month"),
-        KpiDailyStore.store_id,
-        Store.name.label("store_name"),
-        
-        # 营收指标
-        func.sum(KpiDailyStore.revenue).label("revenue"),
-        func.sum(KpiDailyStore.net_revenue).label("net_revenue"),
-        func.sum(KpiDailyStore.discount_amount).label("discount_amount"),
-        func.sum(KpiDailyStore.refund_amount).label("refund_amount"),
-        
-        # 成本指标
-        func.sum(KpiDailyStore.cost_total).label("cost_total"),
-        
-        # 利润指标
-        func.sum(KpiDailyStore.gross_profit).label("gross_profit"),
-        func.sum(KpiDailyStore.operating_profit).label("operating_profit"),
-        
-        # 天数
-        func.count(func.distinct(KpiDailyStore.biz_date)).label("day_count")
-    ).select_from(KpiDailyStore).join(
-        Store, KpiDailyStore.store_id == Store.id
-    ).where(
-        and_(
-            KpiDailyStore.biz_date >= filters.start_date,
-            KpiDailyStore.biz_date <= filters.end_date
-        )
-    )
-    
     # 数据权限过滤
     accessible_store_ids = await filter_stores_by_access(db, current_user, filters.store_id)
-    if accessible_store_ids is not None:
-        query = query.where(KpiDailyStore.store_id.in_(accessible_store_ids))
     
-    if filters.store_id:
-        # 单门店：只按年月分组
-        query = query.group_by(
-            extract('year', KpiDailyStore.biz_date),
-            extract('month', KpiDailyStore.biz_date),
-            KpiDailyStore.store_id,
-            Store.name
-        ).order_by(
-            extract('year', KpiDailyStore.biz_date).desc(),
-            extract('month', KpiDailyStore.biz_date).desc()
-        )
-    else:
-        # 多门店：按年月+门店分组
-        query = query.group_by(
-            extract('year', KpiDailyStore.biz_date),
-            extract('month', KpiDailyStore.biz_date),
-            KpiDailyStore.store_id,
-            Store.name
-        ).order_by(
-            extract('year', KpiDailyStore.biz_date).desc(),
-            extract('month', KpiDailyStore.biz_date).desc(),
-            Store.name
-        )
+    return await cached_report(
+        db, "monthly_summary", filters, accessible_store_ids, MonthlySummaryRow,
+        lambda: _query_monthly_summary(db, filters, accessible_store_ids)
+    )
+
+
+async def _query_monthly_summary(
+    db: AsyncSession,
+    filters: ReportQuery,
+    accessible_store_ids: Optional[List[int]]
+) -> List[MonthlySummaryRow]:
+    """月汇总查询（门店范围已按数据权限确定）"""
+    # 按年月 + 门店汇总
+    kpi_totals = await aggregate_kpi_buckets(
+        db,
+        month_buckets(filters.start_date, filters.end_date),
+        accessible_store_ids,
+        by_store=True
+    )
     
-    result = await db.execute(query)
-    rows = result.all()
+    store_ids = {store_id for _, store_id in kpi_totals.keys()}
+    store_names = {}
+    if store_ids:
+        store_result = await db.execute(
+            select(Store.id, Store.name).where(Store.id.in_(store_ids))
+        )
+        store_names = {row.id: row.name for row in store_result.all()}
+    
+    # 按年月倒序、门店名称排序
+    rows = sorted(
+        (
+            (int(bucket[:4]), int(bucket[5:7]), store_id, store_names.get(store_id), totals)
+            for (bucket, store_id), totals in kpi_totals.items()
+        ),
+        key=lambda item: (-item[0], -item[1], item[3] or "")
+    )
     
     # 查询每月费用
     expense_query = select(
@@ -305,37 +372,35 @@ async def get_monthly_summary(
     
     # 组装结果
     result_list = []
-    for row in rows:
-        year = int(row.year)
-        month = int(row.month)
-        expense_total = expense_dict.get((year, month, row.store_id), Decimal("0.00"))
-        order_count = order_dict.get((year, month, row.store_id), 0)
-        day_count = row.day_count or 1
+    for year, month, store_id, store_name, row in rows:
+        expense_total = expense_dict.get((year, month, store_id), Decimal("0.00"))
+        order_count = order_dict.get((year, month, store_id), 0)
+        day_count = row["day_count"] or 1
         
         # 计算利润率和日均指标
         gross_profit_rate = None
         operating_profit_rate = None
-        if row.revenue and row.revenue > 0:
-            gross_profit_rate = (row.gross_profit / row.revenue * 100).quantize(Decimal("0.01"))
-            operating_profit_rate = (row.operating_profit / row.revenue * 100).quantize(Decimal("0.01"))
+        if row["revenue"] and row["revenue"] > 0:
+            gross_profit_rate = (row["gross_profit"] / row["revenue"] * 100).quantize(Decimal("0.01"))
+            operating_profit_rate = (row["operating_profit"] / row["revenue"] * 100).quantize(Decimal("0.01"))
         
-        avg_daily_revenue = (row.revenue / day_count).quantize(Decimal("0.01"))
+        avg_daily_revenue = (row["revenue"] / day_count).quantize(Decimal("0.01"))
         avg_daily_order_count = Decimal(order_count) / day_count
         
         result_list.append(MonthlySummaryRow(
             year=year,
             month=month,
-            store_id=row.store_id,
-            store_name=row.store_name,
-            revenue=row.revenue,
-            net_revenue=row.net_revenue,
-            discount_amount=row.discount_amount,
-            refund_amount=row.refund_amount,
-            cost_total=row.cost_total,
+            store_id=store_id,
+            store_name=store_name,
+            revenue=row["revenue"],
+            net_revenue=row["net_revenue"],
+            discount_amount=row["discount_amount"],
+            refund_amount=row["refund_amount"],
+            cost_total=row["cost_total"],
             expense_total=expense_total,
             order_count=order_count,
-            gross_profit=row.gross_profit,
-            operating_profit=row.operating_profit,
+            gross_profit=row["gross_profit"],
+            operating_profit=row["operating_profit"],
             gross_profit_rate=gross_profit_rate,
             operating_profit_rate=operating_profit_rate,
             avg_daily_revenue=avg_daily_revenue,
@@ -353,107 +418,137 @@ async def get_store_performance(
     """
     获取门店绩效报表
     
-    SQL 聚合逻辑：
-    - 按门店分组聚合
-    - 计算排名（使用窗口函数）
-    - 支持 TOP N 筛选
+    SQL 聚合逻辑（一条 SQL，见 build_store_performance_query）：
+    - 按门店分组聚合 KPI 和订单统计
+    - 窗口函数计算营收/利润排名、百分位及与上一等长期间相比的排名变化
+    - 支持 TOP N 筛选，filters.page_size 不为空时在 TOP N 内分页
     """
-    # 构建查询 - 按门店分组
-    query = select(
-        KpiDailyStore.store_id,
-        Store.name.label("store_name"),
-        
-        # 营收指标
-        func.sum(KpiDailyStore.revenue).label("revenue"),
-        func.sum(KpiDailyStore.net_revenue).label("net_revenue"),
-        
-        # 利润指标
-        func.sum(KpiDailyStore.gross_profit).label("gross_profit"),
-        func.sum(KpiDailyStore.operating_profit).label("operating_profit"),
-    ).select_from(KpiDailyStore).join(
-        Store, KpiDailyStore.store_id == Store.id
-    ).where(
-        and_(
-            KpiDailyStore.biz_date >= filters.start_date,
-            KpiDailyStore.biz_date <= filters.end_date
-        )
-    )
-    
     # 数据权限过滤
     accessible_store_ids = await filter_stores_by_access(db, current_user, filters.store_id)
-    if accessible_store_ids is not None:
-        query = query.where(KpiDailyStore.store_id.in_(accessible_store_ids))
-    
-    query = query.group_by(
-        KpiDailyStore.store_id,
-        Store.name
-    ).order_by(func.sum(KpiDailyStore.revenue).desc())
     
-    # TOP N 限制
-    if filters.top_n:
-        query = query.limit(filters.top_n)
-    
-    result = await db.execute(query)
-    rows = result.all()
-    
-    # 查询订单统计
-    order_query = select(
-        OrderHeader.store_id,
-        func.count(OrderHeader.id).label("order_count"),
-        func.avg(OrderHeader.net_amount).label("avg_order_amount")
+    return await cached_report(
+        db, "store_performance", filters, accessible_store_ids, StorePerformanceRow,
+        lambda: _query_store_performance(db, filters, accessible_store_ids)
+    )
+
+
+async def count_store_performance(
+    db: AsyncSession,
+    filters: ReportQuery,
+    current_user: User
+) -> int:
+    """
+    门店绩效参与分页的门店数（有 top_n 时不超过 N），与页码无关
+
+    正常页直接使用结果行的 store_count；页码超出范围、当前页为空时由本函数单独统计。
+    """
+    accessible_store_ids = await filter_stores_by_access(db, current_user, filters.store_id)
+    query = build_store_performance_query(filters.model_copy(update={"page_size": None}), accessible_store_ids)
+    result = await db.execute(select(func.count()).select_from(query.subquery()))
+    return result.scalar() or 0
+
+
+async def _query_store_performance(
+    db: AsyncSession,
+    filters: ReportQuery,
+    accessible_store_ids: Optional[List[int]],
+    sources: Optional[ReportSources] = None
+) -> List[StorePerformanceRow]:
+    """门店绩效查询（门店范围已按数据权限确定）"""
+    result = await db.execute(build_store_performance_query(filters, accessible_store_ids, sources))
+    return [StorePerformanceRow(**row._mapping) for row in result.all()]
+
+
+def build_store_performance_query(
+    filters: ReportQuery,
+    accessible_store_ids: Optional[List[int]],
+    sources: Optional[ReportSources] = None
+):
+    """
+    门店绩效单条 SQL
+
+    - cur / prev：当期与上一等长期间按门店汇总 KPI（同一 KPI 数据源），prev 中用窗口函数计算上期排名
+    - orders：当期按门店统计订单数和客单价
+    - ranked：合并后用窗口函数计算营收/利润排名（并列时按门店ID）、百分位和参与排名的门店数
+    - 外层计算排名变化（正数表示上升），按营收排名取 TOP N 并分页，只返回当前页的门店
+    - sources 为空时直接读取源表，导出时传入共享扫描的临时表
+    """
+    prev_start, prev_end = _previous_period(filters)
+    sources = sources or report_sources(filters, accessible_store_ids, kpi_start=prev_start)
+    kpi = sources.kpi
+
+    cur = select(
+        kpi.c.store_id,
+        func.sum(kpi.c.revenue).label("revenue"),
+        func.sum(kpi.c.net_revenue).label("net_revenue"),
+        func.sum(kpi.c.gross_profit).label("gross_profit"),
+        func.sum(kpi.c.operating_profit).label("operating_profit"),
     ).where(
-        and_(
-            OrderHeader.biz_date >= filters.start_date,
-            OrderHeader.biz_date <= filters.end_date,
-            OrderHeader.status != "cancelled"
-        )
-    ).group_by(OrderHeader.store_id)
-    
-    if accessible_store_ids is not None:
-        order_query = order_query.where(OrderHeader.store_id.in_(accessible_store_ids))
-    
-    order_result = await db.execute(order_query)
-    order_dict = {
-        row.store_id: (row.order_count, row.avg_order_amount or Decimal("0.00"))
-        for row in order_result.all()
-    }
-    
-    # 组装结果并计算排名
-    result_list = []
-    for idx, row in enumerate(rows, start=1):
-        order_count, avg_order_amount = order_dict.get(row.store_id, (0, Decimal("0.00")))
-        
-        # 计算利润率
-        gross_profit_rate = None
-        operating_profit_rate = None
-        if row.revenue and row.revenue > 0:
-            gross_profit_rate = (row.gross_profit / row.revenue * 100).quantize(Decimal("0.01"))
-            operating_profit_rate = (row.operating_profit / row.revenue * 100).quantize(Decimal("0.01"))
-        
-        result_list.append(StorePerformanceRow(
-            store_id=row.store_id,
-            store_name=row.store_name,
-            revenue=row.revenue,
-            net_revenue=row.net_revenue,
-            order_count=order_count,
-            avg_order_amount=avg_order_amount,
-            gross_profit=row.gross_profit,
-            operating_profit=row.operating_profit,
-            gross_profit_rate=gross_profit_rate,
-            operating_profit_rate=operating_profit_rate,
-            revenue_rank=idx,
-            profit_rank=None  # 可后续按利润重新排名
-        ))
-    
-    # 按利润重新排名
-    sorted_by_profit = sorted(result_list, key=lambda x: x.operating_profit, reverse=True)
-    for idx, item in enumerate(sorted_by_profit, start=1):
-        item.profit_rank = idx
-    
-    # 恢复按营收排序
-    result_list.sort(key=lambda x: x.revenue, reverse=True)
-    
-    return result_list
+        and_(*_period_conditions(kpi.c, filters.start_date, filters.end_date))
+    ).group_by(kpi.c.store_id).cte("cur")
+
+    prev = select(
+        kpi.c.store_id,
+        func.row_number().over(
+            order_by=(func.sum(kpi.c.revenue).desc(), kpi.c.store_id)
+        ).label("prev_revenue_rank"),
+        func.row_number().over(
+            order_by=(func.sum(kpi.c.operating_profit).desc(), kpi.c.store_id)
+        ).label("prev_profit_rank"),
+    ).where(
+        and_(*_period_conditions(kpi.c, prev_start, prev_end))
+    ).group_by(kpi.c.store_id).cte("prev")
+
+    order_count = func.sum(sources.orders.c.order_count)
+    orders = select(
+        sources.orders.c.store_id,
+        order_count.label("order_count"),
+        (func.sum(sources.orders.c.net_amount_total) / func.nullif(order_count, 0)).label("avg_order_amount"),
+    ).group_by(sources.orders.c.store_id).cte("orders")
+
+    def _percentile(column):
+        """百分位（%）：不高于该门店的门店占比"""
+        return func.round(cast(func.cume_dist().over(order_by=column), Numeric) * 100, 2)
+
+    ranked = select(
+        cur.c.store_id,
+        Store.name.label("store_name"),
+        cur.c.revenue,
+        cur.c.net_revenue,
+        func.coalesce(orders.c.order_count, 0).label("order_count"),
+        func.round(func.coalesce(orders.c.avg_order_amount, 0), 2).label("avg_order_amount"),
+        cur.c.gross_profit,
+        cur.c.operating_profit,
+        _profit_rate(cur.c.gross_profit, cur.c.revenue).label("gross_profit_rate"),
+        _profit_rate(cur.c.operating_profit, cur.c.revenue).label("operating_profit_rate"),
+        func.row_number().over(order_by=(cur.c.revenue.desc(), cur.c.store_id)).label("revenue_rank"),
+        func.row_number().over(order_by=(cur.c.operating_profit.desc(), cur.c.store_id)).label("profit_rank"),
+        _percentile(cur.c.revenue).label("revenue_percentile"),
+        _percentile(cur.c.operating_profit).label("profit_percentile"),
+        prev.c.prev_revenue_rank,
+        prev.c.prev_profit_rank,
+        func.count().over().label("store_count"),
+    ).select_from(cur).join(
+        Store, cur.c.store_id == Store.id
+    ).outerjoin(
+        orders, orders.c.store_id == cur.c.store_id
+    ).outerjoin(
+        prev, prev.c.store_id == cur.c.store_id
+    ).cte("ranked")
+
+    query = select(
+        *ranked.c,
+        (ranked.c.prev_revenue_rank - ranked.c.revenue_rank).label("revenue_rank_change"),
+        (ranked.c.prev_profit_rank - ranked.c.profit_rank).label("profit_rank_change"),
+    ).order_by(ranked.c.revenue_rank)
+
+    # TOP N 限制，在 TOP N 内分页
+    if filters.top_n:
+        query = query.where(ranked.c.revenue_rank <= filters.top_n)
+    if filters.page_size:
+        query = query.offset((filters.page - 1) * filters.page_size).limit(filters.page_size)
+
+    return query
 
 
 async def get_expense_breakdown(
@@ -472,88 +567,82 @@ async def get_expense_breakdown(
     # 数据权限过滤
     accessible_store_ids = await filter_stores_by_access(db, current_user, filters.store_id)
     
+    return await cached_report(
+        db, "expense_breakdown", filters, accessible_store_ids, ExpenseBreakdownRow,
+        lambda: _query_expense_breakdown(db, filters, accessible_store_ids)
+    )
+
+
+async def _query_expense_breakdown(
+    db: AsyncSession,
+    filters: ReportQuery,
+    accessible_store_ids: Optional[List[int]],
+    fact=None
+) -> List[ExpenseBreakdownRow]:
+    """
+    费用明细查询（门店范围已按数据权限确定）
+
+    fact 为空时读取 expense_monthly_cube（见 expense_fact_subquery），
+    导出时传入由共享扫描临时表得到的同结构子查询
+    """
+    if fact is None:
+        fact = expense_fact_subquery(filters.start_date, filters.end_date, accessible_store_ids)
+    total_amount = func.sum(fact.c.total_amount)
+    record_count = func.sum(fact.c.record_count)
+    avg_amount = func.round(total_amount / func.nullif(record_count, 0), 2)
+    
     # 构建查询
     if accessible_store_ids and len(accessible_store_ids) == 1:
         # 单门店：按费用科目分组
         query = select(
-            ExpenseRecord.expense_type_id,
+            fact.c.expense_type_id,
             ExpenseType.type_code,
             ExpenseType.name.label("expense_type_name"),
             ExpenseType.category,
-            ExpenseRecord.store_id,
+            fact.c.store_id,
             Store.name.label("store_name"),
-            func.sum(ExpenseRecord.amount).label("total_amount"),
-            func.count(ExpenseRecord.id).label("record_count"),
-            func.avg(ExpenseRecord.amount).label("avg_amount")
-        ).select_from(ExpenseRecord).join(
-            ExpenseType, ExpenseRecord.expense_type_id == ExpenseType.id
+            total_amount.label("total_amount"),
+            record_count.label("record_count"),
+            avg_amount.label("avg_amount")
+        ).select_from(fact).join(
+            ExpenseType, fact.c.expense_type_id == ExpenseType.id
         ).join(
-            Store, ExpenseRecord.store_id == Store.id
-        ).where(
-            and_(
-                ExpenseRecord.biz_date >= filters.start_date,
-                ExpenseRecord.biz_date <= filters.end_date,
-                ExpenseRecord.store_id == accessible_store_ids[0]
-            )
+            Store, fact.c.store_id == Store.id
         ).group_by(
-            ExpenseRecord.expense_type_id,
+            fact.c.expense_type_id,
             ExpenseType.type_code,
             ExpenseType.name,
             ExpenseType.category,
-            ExpenseRecord.store_id,
+            fact.c.store_id,
             Store.name
-        ).order_by(func.sum(ExpenseRecord.amount).desc())
+        )
     else:
         # 多门店：只按费用科目分组
         query = select(
-            ExpenseRecord.expense_type_id,
+            fact.c.expense_type_id,
             ExpenseType.type_code,
             ExpenseType.name.label("expense_type_name"),
             ExpenseType.category,
-            func.sum(ExpenseRecord.amount).label("total_amount"),
-            func.count(ExpenseRecord.id).label("record_count"),
-            func.avg(ExpenseRecord.amount).label("avg_amount")
-        ).select_from(ExpenseRecord).join(
-            ExpenseType, ExpenseRecord.expense_type_id == ExpenseType.id
-        ).where(
-            and_(
-                ExpenseRecord.biz_date >= filters.start_date,
-                ExpenseRecord.biz_date <= filters.end_date
-            )
-        )
-        
-        if accessible_store_ids is not None:
-            query = query.where(ExpenseRecord.store_id.in_(accessible_store_ids))
-        
-        query = query.group_by(
-            ExpenseRecord.expense_type_id,
+            total_amount.label("total_amount"),
+            record_count.label("record_count"),
+            avg_amount.label("avg_amount")
+        ).select_from(fact).join(
+            ExpenseType, fact.c.expense_type_id == ExpenseType.id
+        ).group_by(
+            fact.c.expense_type_id,
             ExpenseType.type_code,
             ExpenseType.name,
             ExpenseType.category
-        ).order_by(func.sum(ExpenseRecord.amount).desc())
-    
-    # TOP N 限制
-    if filters.top_n:
-        query = query.limit(filters.top_n)
-    
-    result = await db.execute(query)
-    rows = result.all()
-    
-    # 计算总费用（用于占比计算）
-    total_query = select(
-        func.sum(ExpenseRecord.amount).label("grand_total")
-    ).where(
-        and_(
-            ExpenseRecord.biz_date >= filters.start_date,
-            ExpenseRecord.biz_date <= filters.end_date
         )
-    )
     
-    if accessible_store_ids is not None:
-        total_query = total_query.where(ExpenseRecord.store_id.in_(accessible_store_ids))
+    # 科目数量有限，取全部分组行：总费用由分组合计得出，无需再扫描一次费用表
+    result = await db.execute(query.order_by(total_amount.desc()))
+    rows = result.all()
+    grand_total = sum((row.total_amount for row in rows), Decimal("0.00"))
     
-    total_result = await db.execute(total_query)
-    grand_total = total_result.scalar() or Decimal("0.00")
+    # TOP N 限制
+    if filters.top_n:
+        rows = rows[:filters.top_n]
     
     # 组装结果
     result_list = []
@@ -591,132 +680,118 @@ async def get_expense_breakdown(
     return result_list
 
 
-async def export_report_excel(
+# 导出列定义（日汇总列顺序与 build_daily_summary_query 一致）
+DAILY_SUMMARY_EXPORT_COLUMNS = [
+    ExportColumn("biz_date", "业务日期", "date"),
+    ExportColumn("store_id", "门店ID", "int"),
+    ExportColumn("store_name", "门店名称"),
+    ExportColumn("revenue", "营业收入", "decimal"),
+    ExportColumn("net_revenue", "净收入", "decimal"),
+    ExportColumn("discount_amount", "优惠金额", "decimal"),
+    ExportColumn("refund_amount", "退款金额", "decimal"),
+    ExportColumn("cost_total", "总成本", "decimal"),
+    ExportColumn("cost_material", "原材料成本", "decimal"),
+    ExportColumn("cost_labor", "人工成本", "decimal"),
+    ExportColumn("expense_total", "总费用", "decimal"),
+    ExportColumn("order_count", "订单数", "int"),
+    ExportColumn("gross_profit", "毛利润", "decimal"),
+    ExportColumn("operating_profit", "净利润", "decimal"),
+    ExportColumn("gross_profit_rate", "毛利率(%)", "decimal"),
+    ExportColumn("operating_profit_rate", "净利率(%)", "decimal"),
+]
+
+STORE_PERFORMANCE_EXPORT_COLUMNS = [
+    ExportColumn("store_id", "门店ID", "int"),
+    ExportColumn("store_name", "门店名称"),
+    ExportColumn("revenue", "营业收入", "decimal"),
+    ExportColumn("net_revenue", "净收入", "decimal"),
+    ExportColumn("order_count", "订单数", "int"),
+    ExportColumn("avg_order_amount", "客单价", "decimal"),
+    ExportColumn("gross_profit", "毛利润", "decimal"),
+    ExportColumn("operating_profit", "净利润", "decimal"),
+    ExportColumn("gross_profit_rate", "毛利率(%)", "decimal"),
+    ExportColumn("operating_profit_rate", "净利率(%)", "decimal"),
+    ExportColumn("revenue_rank", "营收排名", "int"),
+    ExportColumn("profit_rank", "利润排名", "int"),
+    ExportColumn("revenue_percentile", "营收百分位(%)", "decimal"),
+    ExportColumn("profit_percentile", "利润百分位(%)", "decimal"),
+    ExportColumn("revenue_rank_change", "营收排名变化", "int"),
+    ExportColumn("profit_rank_change", "利润排名变化", "int"),
+]
+
+EXPENSE_BREAKDOWN_EXPORT_COLUMNS = [
+    ExportColumn("expense_type_id", "费用科目ID", "int"),
+    ExportColumn("expense_type_code", "科目编码"),
+    ExportColumn("expense_type_name", "科目名称"),
+    ExportColumn("category", "费用类别"),
+    ExportColumn("store_id", "门店ID", "int"),
+    ExportColumn("store_name", "门店名称"),
+    ExportColumn("total_amount", "费用总额", "decimal"),
+    ExportColumn("record_count", "记录笔数", "int"),
+    ExportColumn("avg_amount", "平均单笔", "decimal"),
+    ExportColumn("percentage", "占比(%)", "decimal"),
+]
+
+
+async def build_daily_summary_export_query(
+    db: AsyncSession,
+    filters: ReportQuery,
+    current_user: User
+):
+    """日汇总导出查询（带数据权限过滤），列与 DAILY_SUMMARY_EXPORT_COLUMNS 一致"""
+    accessible_store_ids = await filter_stores_by_access(db, current_user, filters.store_id)
+    return build_daily_summary_query(filters, accessible_store_ids)
+
+
+def _expense_fact_from_sources(sources: ReportSources):
+    """由共享费用数据源得到费用明细所需的 (门店, 科目) 事实子查询（只含计入统计的记录）"""
+    expense = sources.expense
+    return select(
+        expense.c.store_id,
+        expense.c.expense_type_id,
+        func.sum(expense.c.effective_amount).label("total_amount"),
+        func.sum(expense.c.effective_count).label("record_count"),
+    ).group_by(
+        expense.c.store_id, expense.c.expense_type_id
+    ).having(func.sum(expense.c.effective_count) > 0).subquery("expense_fact")
+
+
+async def build_report_workbook(
     db: AsyncSession,
     filters: ReportQuery,
     current_user: User
-) -> bytes:
+) -> XlsxStreamWriter:
     """
-    导出报表为 Excel 文件
-    
-    包含多个 Sheet:
-    - DailySummary: 日汇总
-    - StorePerformance: 门店绩效
-    - ExpenseBreakdown: 费用明细
+    生成报表 Excel（流式写入，返回待发送的写入器）
+
+    先由 materialize_report_sources 对 kpi_daily_store、order_header、expense_record
+    各扫描一次写入临时表，三个 Sheet 均从临时表派生:
+    - DailySummary: 日汇总（服务端游标分批读取，逐行写入工作表临时文件）
+    - StorePerformance: 门店绩效（行数受门店数限制）
+    - ExpenseBreakdown: 费用明细（行数受门店数 × 科目数限制）
+
+    数据库读取在返回前全部完成，查询出错时仍可返回正常的错误响应；
+    调用方通过 writer.iter_bytes() 边生成边发送文件内容。临时表在事务提交时删除。
     """
-    # 获取数据（带数据权限过滤）
-    daily_data = await get_daily_summary(db, filters, current_user)
-    store_data = await get_store_performance(db, filters, current_user)
-    expense_data = await get_expense_breakdown(db, filters, current_user)
-    
-    # 创建工作簿
-    wb = Workbook()
-    
-    # 样式定义
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
+    accessible_store_ids = await filter_stores_by_access(db, current_user, filters.store_id)
+    sources = await materialize_report_sources(db, filters, accessible_store_ids)
+    writer = XlsxStreamWriter()
+
     # Sheet 1: 日汇总
-    ws1 = wb.active
-    ws1.title = "DailySummary"
-    
-    # 写入表头
-    headers1 = [
-        "业务日期", "门店ID", "门店名称", "营业收入", "净收入", "优惠金额", "退款金额",
-        "总成本", "原材料成本", "人工成本", "总费用", "订单数",
-        "毛利润", "净利润", "毛利率(%)", "净利率(%)"
-    ]
-    for col_num, header in enumerate(headers1, start=1):
-        cell = ws1.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # 写入数据
-    for row_num, data in enumerate(daily_data, start=2):
-        ws1.cell(row=row_num, column=1, value=data.biz_date.strftime("%Y-%m-%d"))
-        ws1.cell(row=row_num, column=2, value=data.store_id)
-        ws1.cell(row=row_num, column=3, value=data.store_name)
-        ws1.cell(row=row_num, column=4, value=float(data.revenue))
-        ws1.cell(row=row_num, column=5, value=float(data.net_revenue))
-        ws1.cell(row=row_num, column=6, value=float(data.discount_amount))
-        ws1.cell(row=row_num, column=7, value=float(data.refund_amount))
-        ws1.cell(row=row_num, column=8, value=float(data.cost_total))
-        ws1.cell(row=row_num, column=9, value=float(data.cost_material))
-        ws1.cell(row=row_num, column=10, value=float(data.cost_labor))
-        ws1.cell(row=row_num, column=11, value=float(data.expense_total))
-        ws1.cell(row=row_num, column=12, value=data.order_count)
-        ws1.cell(row=row_num, column=13, value=float(data.gross_profit))
-        ws1.cell(row=row_num, column=14, value=float(data.net_profit))
-        ws1.cell(row=row_num, column=15, value=float(data.gross_profit_rate) if data.gross_profit_rate else None)
-        ws1.cell(row=row_num, column=16, value=float(data.net_profit_rate) if data.net_profit_rate else None)
-    
-    # 自动调整列宽
-    for col in range(1, len(headers1) + 1):
-        ws1.column_dimensions[get_column_letter(col)].width = 15
-    
+    daily_query = build_daily_summary_query(filters, accessible_store_ids, sources)
+    await writer.write_query(db, "DailySummary", DAILY_SUMMARY_EXPORT_COLUMNS, daily_query)
+
     # Sheet 2: 门店绩效
-    ws2 = wb.create_sheet("StorePerformance")
-    
-    headers2 = [
-        "门店ID", "门店名称", "营业收入", "净收入", "订单数", "客单价",
-        "毛利润", "净利润", "毛利率(%)", "净利率(%)", "营收排名", "利润排名"
-    ]
-    for col_num, header in enumerate(headers2, start=1):
-        cell = ws2.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    for row_num, data in enumerate(store_data, start=2):
-        ws2.cell(row=row_num, column=1, value=data.store_id)
-        ws2.cell(row=row_num, column=2, value=data.store_name)
-        ws2.cell(row=row_num, column=3, value=float(data.revenue))
-        ws2.cell(row=row_num, column=4, value=float(data.net_revenue))
-        ws2.cell(row=row_num, column=5, value=data.order_count)
-        ws2.cell(row=row_num, column=6, value=float(data.avg_order_amount))
-        ws2.cell(row=row_num, column=7, value=float(data.gross_profit))
-        ws2.cell(row=row_num, column=8, value=float(data.net_profit))
-        ws2.cell(row=row_num, column=9, value=float(data.gross_profit_rate) if data.gross_profit_rate else None)
-        ws2.cell(row=row_num, column=10, value=float(data.net_profit_rate) if data.net_profit_rate else None)
-        ws2.cell(row=row_num, column=11, value=data.revenue_rank)
-        ws2.cell(row=row_num, column=12, value=data.profit_rank)
-    
-    for col in range(1, len(headers2) + 1):
-        ws2.column_dimensions[get_column_letter(col)].width = 15
-    
+    store_sheet = writer.add_sheet("StorePerformance", STORE_PERFORMANCE_EXPORT_COLUMNS)
+    for data in await _query_store_performance(db, filters, accessible_store_ids, sources):
+        writer.append(store_sheet, (getattr(data, c.field) for c in STORE_PERFORMANCE_EXPORT_COLUMNS))
+
     # Sheet 3: 费用明细
-    ws3 = wb.create_sheet("ExpenseBreakdown")
-    
-    headers3 = [
-        "费用科目ID", "科目编码", "科目名称", "费用类别", "门店ID", "门店名称",
-        "费用总额", "记录笔数", "平均单笔", "占比(%)"
-    ]
-    for col_num, header in enumerate(headers3, start=1):
-        cell = ws3.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    for row_num, data in enumerate(expense_data, start=2):
-        ws3.cell(row=row_num, column=1, value=data.expense_type_id)
-        ws3.cell(row=row_num, column=2, value=data.expense_type_code)
-        ws3.cell(row=row_num, column=3, value=data.expense_type_name)
-        ws3.cell(row=row_num, column=4, value=data.category)
-        ws3.cell(row=row_num, column=5, value=data.store_id)
-        ws3.cell(row=row_num, column=6, value=data.store_name)
-        ws3.cell(row=row_num, column=7, value=float(data.total_amount))
-        ws3.cell(row=row_num, column=8, value=data.record_count)
-        ws3.cell(row=row_num, column=9, value=float(data.avg_amount))
-        ws3.cell(row=row_num, column=10, value=float(data.percentage) if data.percentage else None)
-    
-    for col in range(1, len(headers3) + 1):
-        ws3.column_dimensions[get_column_letter(col)].width = 15
-    
-    # 保存到内存
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return output.getvalue()
+    expense_sheet = writer.add_sheet("ExpenseBreakdown", EXPENSE_BREAKDOWN_EXPORT_COLUMNS)
+    expense_rows = await _query_expense_breakdown(
+        db, filters, accessible_store_ids, _expense_fact_from_sources(sources)
+    )
+    for data in expense_rows:
+        writer.append(expense_sheet, (getattr(data, c.field) for c in EXPENSE_BREAKDOWN_EXPORT_COLUMNS))
+
+    return writer
@@ -0,0 +1,403 @@
+"""
+导入数据校验单元测试
+
+直接调用 validate_orders / validate_expense_records，不需要数据库：
+- tests/fixtures/import 下的示例文件全部通过校验
+- 边界行：空值、非法日期、非数值、inf、负数、超出范围、实收大于商品总额、批内重复
+- 每行只报告第一条不通过的规则，行号 = 索引 + 起始行号
+"""
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app.services.import_validation import (
+    MAX_AMOUNT,
+    to_money,
+    validate_expense_records,
+    validate_orders,
+)
+
+
+pytestmark = pytest.mark.unit
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "import"
+
+STORE_ID = 1
+
+# 示例费用文件使用的系统费用科目
+EXPENSE_TYPES = {
+    "EXP_RENT": 1,
+    "EXP_MATERIAL_FOOD": 2,
+    "EXP_MATERIAL_BEV": 3,
+    "EXP_LABOR_SALARY": 4,
+    "EXP_UTILITIES_ELEC": 5,
+    "EXP_UTILITIES_WATER": 6,
+    "EXP_MARKETING_AD": 7,
+}
+
+ORDER_COLUMNS = ["order_no", "biz_date", "gross_amount", "discount_amount", "net_amount", "channel", "payment_method"]
+EXPENSE_COLUMNS = ["expense_type_code", "biz_date", "amount", "description"]
+
+
+def read_fixture(name: str) -> pd.DataFrame:
+    """与导入解析一致：全部列按文本读取，空单元格为空字符串"""
+    return pd.read_csv(FIXTURE_DIR / name, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+
+
+def order_frame(*rows: dict) -> pd.DataFrame:
+    """构造订单批次，未给出的列为空字符串"""
+    return pd.DataFrame([{column: row.get(column, "") for column in ORDER_COLUMNS} for row in rows])
+
+
+def expense_frame(*rows: dict) -> pd.DataFrame:
+    """构造费用批次，未给出的列为空字符串"""
+    return pd.DataFrame([{column: row.get(column, "") for column in EXPENSE_COLUMNS} for row in rows])
+
+
+def order(order_no: str = "T001", biz_date: str = "2026-01-02", **values: str) -> dict:
+    return {"order_no": order_no, "biz_date": biz_date, "gross_amount": "100.00", "net_amount": "100.00", **values}
+
+
+def expense(
+    code: str = "EXP_RENT",
+    biz_date: str = "2026-01-02",
+    amount: str = "100.00",
+    description: str = "房租",
+) -> dict:
+    return {"expense_type_code": code, "biz_date": biz_date, "amount": amount, "description": description}
+
+
+def error_summary(errors):
+    """错误行只比较 (行号, 字段, 错误信息)"""
+    return [(row_no, field, message) for row_no, field, message, _ in errors]
+
+
+# ──────────────────── 订单 ────────────────────
+
+
+def test_orders_fixture_all_pass():
+    frame = read_fixture("orders_import_test.csv")
+
+    staged, errors = validate_orders(frame, {}, STORE_ID, start_row_no=2)
+
+    assert errors == []
+    assert len(staged) == len(frame)
+    first = staged[0]
+    assert first.row_no == 2
+    assert first.order_no == "TEST010000"
+    assert first.store_id == STORE_ID
+    assert first.biz_date == date(2026, 1, 2)
+    assert first.channel == "delivery"
+    assert first.payment_method == "bank"
+    assert first.gross_amount == Decimal("233.49")
+    assert first.discount_amount == Decimal("0.00")
+    assert first.net_amount == Decimal("233.49")
+    discounted = next(row for row in staged if row.order_no == "TEST010006")
+    assert (discounted.gross_amount, discounted.discount_amount, discounted.net_amount) == (
+        Decimal("112.92"), Decimal("15.64"), Decimal("97.28"),
+    )
+
+
+def test_orders_mapping_renames_columns():
+    frame = order_frame(order()).rename(columns={"order_no": "单号", "biz_date": "日期"})
+
+    staged, errors = validate_orders(frame, {"order_no": "单号", "biz_date": "日期"}, STORE_ID)
+
+    assert errors == []
+    assert [(row.order_no, row.biz_date) for row in staged] == [("T001", date(2026, 1, 2))]
+
+
+def test_orders_required_fields():
+    frame = order_frame(
+        order(order_no=""),
+        order(order_no="T002", biz_date="  "),
+        {"order_no": "T003", "biz_date": "2026-01-02"},
+    )
+
+    staged, errors = validate_orders(frame, {}, STORE_ID)
+
+    assert staged == []
+    assert error_summary(errors) == [
+        (1, "order_no", "订单号不能为空"),
+        (2, "biz_date", "业务日期不能为空"),
+        (3, "net_amount", "交易金额不能为空"),
+    ]
+
+
+@pytest.mark.parametrize("text", ["2026/01/02", "2026-13-01", "2026-02-30", "abc"])
+def test_orders_invalid_date(text):
+    staged, errors = validate_orders(order_frame(order(biz_date=text)), {}, STORE_ID)
+
+    assert staged == []
+    assert error_summary(errors) == [(1, "biz_date", f"业务日期格式错误，应为 YYYY-MM-DD: {text}")]
+
+
+@pytest.mark.parametrize(
+    "field, text",
+    [
+        ("gross_amount", "abc"),
+        ("gross_amount", "inf"),
+        ("discount_amount", "abc"),
+        ("net_amount", "-inf"),
+        ("net_amount", "1,000"),
+    ],
+)
+def test_orders_invalid_amount(field, text):
+    staged, errors = validate_orders(order_frame(order(**{field: text})), {}, STORE_ID)
+
+    assert staged == []
+    assert error_summary(errors) == [(1, field, f"金额格式错误: {text}")]
+
+
+@pytest.mark.parametrize("field", ["gross_amount", "discount_amount", "net_amount"])
+def test_orders_negative_amount(field):
+    staged, errors = validate_orders(order_frame(order(**{field: "-0.01"})), {}, STORE_ID)
+
+    assert staged == []
+    assert error_summary(errors) == [(1, field, "金额不能为负数")]
+
+
+def test_orders_amount_over_max():
+    frame = order_frame(
+        order("T001", gross_amount="100000000", net_amount="100"),
+        order("T002", gross_amount="99999999.995", net_amount="100"),
+        # 四舍五入后仍为上限，允许导入
+        order("T003", gross_amount="99999999.994", net_amount="100"),
+    )
+
+    staged, errors = validate_orders(frame, {}, STORE_ID)
+
+    assert error_summary(errors) == [
+        (1, "gross_amount", f"金额不能超过 {MAX_AMOUNT}"),
+        (2, "gross_amount", f"金额不能超过 {MAX_AMOUNT}"),
+    ]
+    assert [(row.row_no, row.gross_amount) for row in staged] == [(3, MAX_AMOUNT)]
+
+
+def test_orders_net_greater_than_gross():
+    frame = order_frame(
+        order("T001", gross_amount="100.00", net_amount="100.01"),
+        # 按两位小数比较：取整后相等不算超出
+        order("T002", gross_amount="100.004", net_amount="100.001"),
+    )
+
+    staged, errors = validate_orders(frame, {}, STORE_ID)
+
+    assert error_summary(errors) == [(1, "net_amount", "实收金额不能大于商品总额")]
+    assert [row.order_no for row in staged] == ["T002"]
+
+
+def test_orders_default_gross_and_net():
+    frame = order_frame(
+        # 商品总额为空时取实收金额
+        {"order_no": "T001", "biz_date": "2026-01-02", "net_amount": "88.5"},
+        # 实收金额为空时取商品总额 - 优惠金额
+        {"order_no": "T002", "biz_date": "2026-01-02", "gross_amount": "100", "discount_amount": "12.345"},
+        # 优惠金额为空时按 0 计
+        {"order_no": "T003", "biz_date": "2026-01-02", "gross_amount": "50"},
+    )
+
+    staged, errors = validate_orders(frame, {}, STORE_ID)
+
+    assert errors == []
+    assert [(row.gross_amount, row.discount_amount, row.net_amount) for row in staged] == [
+        (Decimal("88.50"), Decimal("0.00"), Decimal("88.50")),
+        (Decimal("100.00"), Decimal("12.35"), Decimal("87.65")),
+        (Decimal("50.00"), Decimal("0.00"), Decimal("50.00")),
+    ]
+    assert all(row.channel == "dine_in" and row.payment_method == "cash" for row in staged)
+
+
+def test_orders_decimal_rounding_half_up():
+    frame = order_frame(order(gross_amount="0.125", discount_amount="0.005", net_amount="0.115"))
+
+    staged, errors = validate_orders(frame, {}, STORE_ID)
+
+    assert errors == []
+    assert (staged[0].gross_amount, staged[0].discount_amount, staged[0].net_amount) == (
+        Decimal("0.13"), Decimal("0.01"), Decimal("0.12"),
+    )
+
+
+def test_orders_length_limits():
+    frame = order_frame(
+        order("T" * 51),
+        order("T002", channel="c" * 21),
+        order("T003", payment_method="p" * 21),
+        order("T" * 50),
+    )
+
+    staged, errors = validate_orders(frame, {}, STORE_ID)
+
+    assert error_summary(errors) == [
+        (1, "order_no", "订单号长度不能超过 50 个字符"),
+        (2, "channel", "渠道长度不能超过 20 个字符"),
+        (3, "payment_method", "支付方式长度不能超过 20 个字符"),
+    ]
+    assert [row.row_no for row in staged] == [4]
+
+
+def test_orders_only_first_error_reported():
+    frame = order_frame(
+        # 订单号为空且日期、金额均不合法：只报订单号
+        {"order_no": "", "biz_date": "bad", "gross_amount": "abc", "net_amount": "-1"},
+        # 日期格式错误先于金额格式错误
+        order("T002", biz_date="bad", gross_amount="abc"),
+        # 金额格式错误先于负数
+        order("T003", gross_amount="abc", net_amount="-1"),
+        # 负数先于实收大于商品总额
+        order("T004", gross_amount="-1", net_amount="5"),
+    )
+
+    _, errors = validate_orders(frame, {}, STORE_ID)
+
+    assert error_summary(errors) == [
+        (1, "order_no", "订单号不能为空"),
+        (2, "biz_date", "业务日期格式错误，应为 YYYY-MM-DD: bad"),
+        (3, "gross_amount", "金额格式错误: abc"),
+        (4, "gross_amount", "金额不能为负数"),
+    ]
+
+
+def test_orders_duplicate_order_no_in_batch():
+    frame = order_frame(
+        order("T001"),
+        order("T002", biz_date="bad"),
+        # 首次出现的 T002 校验失败，这一行不算重复
+        order("T002"),
+        order("T001", biz_date="2026-01-03"),
+    )
+
+    staged, errors = validate_orders(frame, {}, STORE_ID, start_row_no=10)
+
+    assert error_summary(errors) == [
+        (11, "biz_date", "业务日期格式错误，应为 YYYY-MM-DD: bad"),
+        (13, "order_no", "订单号 T001 已存在，不可重复导入"),
+    ]
+    assert [(row.row_no, row.order_no) for row in staged] == [(10, "T001"), (12, "T002")]
+
+
+def test_orders_error_rows_keep_raw_data():
+    frame = order_frame(order("T001", gross_amount="abc"))
+
+    _, errors = validate_orders(frame, {}, STORE_ID)
+
+    (_, _, _, raw), = errors
+    assert raw["order_no"] == "T001"
+    assert raw["gross_amount"] == "abc"
+
+
+# ──────────────────── 费用 ────────────────────
+
+
+def test_expense_fixture_all_pass():
+    frame = read_fixture("expense_records_import_test.csv")
+
+    staged, errors = validate_expense_records(frame, {}, STORE_ID, EXPENSE_TYPES, start_row_no=2)
+
+    assert errors == []
+    assert len(staged) == len(frame)
+    first = staged[0]
+    assert first.row_no == 2
+    assert first.store_id == STORE_ID
+    assert first.expense_type_id == EXPENSE_TYPES["EXP_RENT"]
+    assert first.biz_date == date(2026, 1, 3)
+    assert first.amount == Decimal("21849.57")
+    assert first.description == "测试费用-EXP_RENT-1"
+
+
+def test_expense_required_fields():
+    frame = expense_frame(
+        expense(code=""),
+        expense(biz_date=""),
+        expense(amount=" "),
+    )
+
+    staged, errors = validate_expense_records(frame, {}, STORE_ID, EXPENSE_TYPES)
+
+    assert staged == []
+    assert error_summary(errors) == [
+        (1, "expense_type_code", "费用科目编码不能为空"),
+        (2, "biz_date", "业务日期不能为空"),
+        (3, "amount", "金额不能为空"),
+    ]
+
+
+def test_expense_unknown_type_reported_before_format_errors():
+    frame = expense_frame(expense(code="EXP_UNKNOWN", biz_date="bad", amount="abc"))
+
+    _, errors = validate_expense_records(frame, {}, STORE_ID, EXPENSE_TYPES)
+
+    assert error_summary(errors) == [(1, "expense_type_code", "费用科目编码 EXP_UNKNOWN 不存在")]
+
+
+@pytest.mark.parametrize("text", ["2026/01/02", "2026-02-30", "abc"])
+def test_expense_invalid_date(text):
+    _, errors = validate_expense_records(expense_frame(expense(biz_date=text)), {}, STORE_ID, EXPENSE_TYPES)
+
+    assert error_summary(errors) == [(1, "biz_date", f"业务日期格式错误: {text}")]
+
+
+@pytest.mark.parametrize("text", ["abc", "inf", "nan"])
+def test_expense_invalid_amount(text):
+    _, errors = validate_expense_records(expense_frame(expense(amount=text)), {}, STORE_ID, EXPENSE_TYPES)
+
+    assert error_summary(errors) == [(1, "amount", f"金额格式错误: {text}")]
+
+
+def test_expense_amount_range():
+    frame = expense_frame(
+        expense(amount="-0.01"),
+        expense(amount="100000000"),
+        expense(amount="99999999.994"),
+        expense(amount="0"),
+    )
+
+    staged, errors = validate_expense_records(frame, {}, STORE_ID, EXPENSE_TYPES)
+
+    assert error_summary(errors) == [
+        (1, "amount", "金额不能为负数"),
+        (2, "amount", f"金额不能超过 {MAX_AMOUNT}"),
+    ]
+    assert [(row.row_no, row.amount) for row in staged] == [(3, MAX_AMOUNT), (4, Decimal("0.00"))]
+
+
+def test_expense_duplicate_key_in_batch():
+    frame = expense_frame(
+        expense(amount="100"),
+        # 取整到两位小数后与第 1 行相同
+        expense(amount="100.004"),
+        # 描述不同，不算重复
+        expense(amount="100", description="水电"),
+        # 日期不同，不算重复
+        expense(biz_date="2026-01-03", amount="100"),
+        # 科目不同，不算重复
+        expense(code="EXP_MARKETING_AD", amount="100"),
+    )
+
+    staged, errors = validate_expense_records(frame, {}, STORE_ID, EXPENSE_TYPES)
+
+    assert error_summary(errors) == [(2, "", "记录已存在（门店、日期、科目、金额、描述完全相同）")]
+    assert [row.row_no for row in staged] == [1, 3, 4, 5]
+    assert staged[0].amount == Decimal("100.00")
+
+
+def test_expense_failed_rows_do_not_count_as_duplicates():
+    frame = expense_frame(
+        expense(biz_date="bad"),
+        expense(),
+    )
+
+    staged, errors = validate_expense_records(frame, {}, STORE_ID, EXPENSE_TYPES, start_row_no=5)
+
+    assert error_summary(errors) == [(5, "biz_date", "业务日期格式错误: bad")]
+    assert [row.row_no for row in staged] == [6]
+
+
+def test_to_money_rounds_half_up():
+    assert to_money("0.125") == Decimal("0.13")
+    assert to_money("2.675") == Decimal("2.68")
+    assert to_money("-0.005") == Decimal("-0.01")
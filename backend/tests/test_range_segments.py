@@ -0,0 +1,191 @@
+"""
+日期范围切分单元测试
+
+plan_segments（KPI 周/月汇总）与 split_month_range（费用月度汇总）决定哪些日期由汇总行代替日明细，
+边界差一天会重复统计或漏掉首尾日期。只测试纯函数，不需要数据库。
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.expense_cube_service import split_month_range
+from app.services.kpi_rollup_service import (
+    GRAIN_DAY,
+    GRAIN_MONTH,
+    GRAIN_WEEK,
+    next_month_start,
+    plan_segments,
+)
+
+
+pytestmark = pytest.mark.unit
+
+D = date
+
+# 穷举校验的日期窗口：跨年、跨二月
+WINDOW_START = D(2025, 11, 20)
+WINDOW_END = D(2026, 3, 10)
+
+
+def _days(start: date, end: date):
+    """闭区间内的全部日期"""
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
+def _window_ranges(step: int = 1):
+    """窗口内所有 start <= end 的日期范围"""
+    days = _days(WINDOW_START, WINDOW_END)
+    for i in range(0, len(days), step):
+        for end in days[i:]:
+            yield days[i], end
+
+
+# ──────────────────── plan_segments ────────────────────
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    [
+        # 完整自然月
+        (D(2026, 10, 1), D(2026, 10, 31), [(GRAIN_MONTH, D(2026, 10, 1), D(2026, 10, 31))]),
+        (D(2026, 2, 1), D(2026, 2, 28), [(GRAIN_MONTH, D(2026, 2, 1), D(2026, 2, 28))]),
+        # 周三开始、周二结束：首尾零散日期 + 中间完整周
+        (
+            D(2026, 10, 7), D(2026, 10, 20),
+            [
+                (GRAIN_DAY, D(2026, 10, 7), D(2026, 10, 11)),
+                (GRAIN_WEEK, D(2026, 10, 12), D(2026, 10, 18)),
+                (GRAIN_DAY, D(2026, 10, 19), D(2026, 10, 20)),
+            ],
+        ),
+        # 周一至周日
+        (D(2026, 10, 19), D(2026, 10, 25), [(GRAIN_WEEK, D(2026, 10, 19), D(2026, 10, 25))]),
+        # 差一天不足一周
+        (D(2026, 10, 19), D(2026, 10, 24), [(GRAIN_DAY, D(2026, 10, 19), D(2026, 10, 24))]),
+        (D(2026, 10, 20), D(2026, 10, 25), [(GRAIN_DAY, D(2026, 10, 20), D(2026, 10, 25))]),
+        # 月中开始、下月中结束：首个完整月之前的日期按周/日切分
+        (
+            D(2026, 9, 28), D(2026, 11, 3),
+            [
+                (GRAIN_WEEK, D(2026, 9, 28), D(2026, 10, 4)),
+                (GRAIN_WEEK, D(2026, 10, 5), D(2026, 10, 11)),
+                (GRAIN_WEEK, D(2026, 10, 12), D(2026, 10, 18)),
+                (GRAIN_WEEK, D(2026, 10, 19), D(2026, 10, 25)),
+                (GRAIN_WEEK, D(2026, 10, 26), D(2026, 11, 1)),
+                (GRAIN_DAY, D(2026, 11, 2), D(2026, 11, 3)),
+            ],
+        ),
+        # 月初开始、月末后几天结束
+        (
+            D(2026, 10, 1), D(2026, 11, 3),
+            [
+                (GRAIN_MONTH, D(2026, 10, 1), D(2026, 10, 31)),
+                (GRAIN_DAY, D(2026, 11, 1), D(2026, 11, 3)),
+            ],
+        ),
+        # 单日
+        (D(2026, 10, 18), D(2026, 10, 18), [(GRAIN_DAY, D(2026, 10, 18), D(2026, 10, 18))]),
+        (D(2026, 10, 1), D(2026, 10, 1), [(GRAIN_DAY, D(2026, 10, 1), D(2026, 10, 1))]),
+        # 跨年：两个完整月
+        (
+            D(2025, 12, 1), D(2026, 1, 31),
+            [
+                (GRAIN_MONTH, D(2025, 12, 1), D(2025, 12, 31)),
+                (GRAIN_MONTH, D(2026, 1, 1), D(2026, 1, 31)),
+            ],
+        ),
+        # 跨年的自然周（2025-12-29 为周一）
+        (D(2025, 12, 29), D(2026, 1, 4), [(GRAIN_WEEK, D(2025, 12, 29), D(2026, 1, 4))]),
+        (D(2025, 12, 30), D(2026, 1, 2), [(GRAIN_DAY, D(2025, 12, 30), D(2026, 1, 2))]),
+        # 开始日期晚于结束日期
+        (D(2026, 10, 2), D(2026, 10, 1), []),
+    ],
+)
+def test_plan_segments(start, end, expected):
+    assert plan_segments(start, end) == expected
+
+
+def test_plan_segments_cover_range_exactly():
+    """窗口内任意范围：各段首尾相接、恰好覆盖范围，汇总段均为完整周期，日段之间不相邻"""
+    for start, end in _window_ranges():
+        segments = plan_segments(start, end)
+
+        assert segments[0][1] == start, (start, end)
+        assert segments[-1][2] == end, (start, end)
+        for (_, _, prev_end), (_, next_start, _) in zip(segments, segments[1:]):
+            assert next_start == prev_end + timedelta(days=1), (start, end, segments)
+        for (grain, _, _), (next_grain, _, _) in zip(segments, segments[1:]):
+            assert not (grain == GRAIN_DAY and next_grain == GRAIN_DAY), (start, end, segments)
+
+        for grain, seg_start, seg_end in segments:
+            assert seg_start <= seg_end
+            if grain == GRAIN_MONTH:
+                assert seg_start.day == 1
+                assert seg_end == next_month_start(seg_start) - timedelta(days=1)
+            elif grain == GRAIN_WEEK:
+                assert seg_start.weekday() == 0
+                assert seg_end == seg_start + timedelta(days=6)
+
+
+def test_plan_segments_empty_when_start_after_end():
+    for start, end in _window_ranges(step=7):
+        if start < end:
+            assert plan_segments(end, start) == []
+
+
+# ──────────────────── split_month_range ────────────────────
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    [
+        # 完整月：月份段为左闭右开
+        (D(2026, 10, 1), D(2026, 10, 31), ((D(2026, 10, 1), D(2026, 11, 1)), [])),
+        (D(2026, 2, 1), D(2026, 2, 28), ((D(2026, 2, 1), D(2026, 3, 1)), [])),
+        # 月中开始、月中结束，中间有完整月
+        (
+            D(2026, 9, 15), D(2026, 11, 10),
+            ((D(2026, 10, 1), D(2026, 11, 1)), [(D(2026, 9, 15), D(2026, 9, 30)), (D(2026, 11, 1), D(2026, 11, 10))]),
+        ),
+        # 月初开始、月中结束
+        (D(2026, 10, 1), D(2026, 11, 10), ((D(2026, 10, 1), D(2026, 11, 1)), [(D(2026, 11, 1), D(2026, 11, 10))])),
+        # 月中开始、月末结束
+        (D(2026, 9, 15), D(2026, 10, 31), ((D(2026, 10, 1), D(2026, 11, 1)), [(D(2026, 9, 15), D(2026, 9, 30))])),
+        # 同月内（差一天不满月）
+        (D(2026, 10, 1), D(2026, 10, 30), (None, [(D(2026, 10, 1), D(2026, 10, 30))])),
+        (D(2026, 10, 2), D(2026, 10, 31), (None, [(D(2026, 10, 2), D(2026, 10, 31))])),
+        # 跨月但没有完整月
+        (D(2026, 9, 15), D(2026, 10, 10), (None, [(D(2026, 9, 15), D(2026, 10, 10))])),
+        # 单日
+        (D(2026, 10, 18), D(2026, 10, 18), (None, [(D(2026, 10, 18), D(2026, 10, 18))])),
+        (D(2026, 10, 31), D(2026, 10, 31), (None, [(D(2026, 10, 31), D(2026, 10, 31))])),
+        # 跨年
+        (
+            D(2025, 12, 20), D(2026, 2, 3),
+            ((D(2026, 1, 1), D(2026, 2, 1)), [(D(2025, 12, 20), D(2025, 12, 31)), (D(2026, 2, 1), D(2026, 2, 3))]),
+        ),
+        (D(2025, 12, 1), D(2026, 1, 31), ((D(2025, 12, 1), D(2026, 2, 1)), [])),
+        # 开始日期晚于结束日期
+        (D(2026, 10, 2), D(2026, 10, 1), (None, [])),
+    ],
+)
+def test_split_month_range(start, end, expected):
+    assert split_month_range(start, end) == expected
+
+
+def test_split_month_range_covers_range_exactly():
+    """窗口内任意范围：完整月份段与零散段合起来恰好覆盖范围且不重叠"""
+    for start, end in _window_ranges():
+        months, day_ranges = split_month_range(start, end)
+
+        covered = []
+        if months is not None:
+            cube_from, cube_to = months
+            assert cube_from.day == 1 and cube_to.day == 1
+            assert cube_from < cube_to
+            covered.extend(_days(cube_from, cube_to - timedelta(days=1)))
+        for range_start, range_end in day_ranges:
+            assert range_start <= range_end
+            covered.extend(_days(range_start, range_end))
+
+        assert sorted(covered) == _days(start, end), (start, end)
@@ -30,6 +30,13 @@ export function runImportJob(id: number): Promise<ApiResponse<ImportJob>> {
   return request.post(`/import-jobs/${id}/run`)
 }
 
+/**
+ * 从检查点续传导入任务
+ */
+export function resumeImportJob(id: number): Promise<ApiResponse<ImportJob>> {
+  return request.post(`/import-jobs/${id}/resume`)
+}
+
 /**
  * 获取导入任务列表
  */
@@ -19,6 +19,7 @@ export enum ImportTargetType {
 // 导入任务状态（对应后端 ImportJobStatus）
 export enum ImportJobStatus {
   PENDING = 'pending',
+  QUEUED = 'queued',
   RUNNING = 'running',
   SUCCESS = 'success',
   PARTIAL_FAIL = 'partial_fail',
@@ -37,6 +38,13 @@ export interface ImportJob {
   total_rows: number
   success_rows: number
   fail_rows: number
+  processed_rows?: number
+  checkpoint_at?: string
+  lease_expires_at?: string
+  queued_at?: string
+  started_at?: string
+  finished_at?: string
+  error_message?: string
   created_by_id: number
   created_by_name?: string
   created_at: string
@@ -94,6 +102,7 @@ export interface ImportJobErrorQuery {
 // 状态显示映射
 export const ImportJobStatusMap = {
   [ImportJobStatus.PENDING]: { text: '待处理', color: 'info', type: 'info' as const },
+  [ImportJobStatus.QUEUED]: { text: '排队中', color: 'info', type: 'info' as const },
   [ImportJobStatus.RUNNING]: { text: '运行中', color: 'warning', type: 'warning' as const },
   [ImportJobStatus.SUCCESS]: { text: '全部成功', color: 'success', type: 'success' as const },
   [ImportJobStatus.PARTIAL_FAIL]: { text: '部分失败', color: 'warning', type: 'warning' as const },
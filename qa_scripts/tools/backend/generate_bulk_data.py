@@ -28,9 +28,10 @@ from app.core.database import AsyncSessionLocal
 from app.core.security import hash_password
 from app.models.user import User, Role, user_role
 from app.models.store import Store, ProductCategory, Product
-from app.models.order import OrderHeader, OrderItem
+from app.models.order import OrderHeader, OrderItem, OrderNoRegistry
 from app.models.expense import ExpenseType, ExpenseRecord
 from app.models.kpi import KpiDailyStore
+from app.services.partition_service import PARTITIONED_TABLES, ensure_partitions, iter_months
 
 
 # 中国常见姓氏和名字
@@ -372,6 +373,8 @@ async def generate_orders_for_period(
             )
             orders_batch.append((order, temp_items))
             session.add(order)
+            # 订单号登记表保证订单号全局唯一，直接写订单时需同步登记
+            session.add(OrderNoRegistry(order_no=order_no, biz_date=current_date))
         
         # 每天提交一次订单头
         await session.flush()
@@ -384,6 +387,7 @@ async def generate_orders_for_period(
                 
                 item = OrderItem(
                     order_id=order.id,
+                    biz_date=order.biz_date,
                     product_id=product.id,
                     product_sku=product.sku_code,
                     product_name=product.name,
@@ -680,6 +684,9 @@ async def main():
             # 6. 生成订单
             print(f"📋 生成最近 {config['days']} 天的订单（包含真实时间分布）...")
             start_date = date.today() - timedelta(days=config["days"])
+            # 订单、费用为按月分区表，先建好覆盖日期范围的分区（独立会话建表，先结束本会话对订单表的读事务）
+            await session.commit()
+            await ensure_partitions(PARTITIONED_TABLES, iter_months(start_date, date.today()))
             final_counter = await generate_orders_for_period(
                 session, stores, products, start_date, config["days"], counter
             )
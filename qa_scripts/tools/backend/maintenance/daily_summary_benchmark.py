@@ -0,0 +1,253 @@
+# pyright: reportAny=false, reportUnknownVariableType=false, reportUnknownMemberType=false, reportUnknownArgumentType=false
+
+"""
+日汇总报表性能对比脚本（三条查询 + Python 合并 vs 单条 SQL）
+
+用途：
+- legacy：原实现，KPI、费用、订单数三条查询后在 Python 中按 (日期, 门店) 合并，
+  费用和订单数查询只按请求的 store_id 过滤（不按用户可访问门店过滤）
+- single：report_service.get_daily_summary，CTE 单条 SQL，三部分均按可访问门店过滤，利润率在 SQL 中计算
+- 记录耗时（多次取中位数）、SQL 语句数、结果行数，并校验两种实现结果一致
+- 生成可留档、可对比的 Markdown 报告
+
+建议先用 generate_bulk_data.py 生成批量数据，再以受限门店的用户运行以观察门店过滤的收益。
+
+使用方法：
+cd backend
+python qa_scripts/tools/backend/maintenance/daily_summary_benchmark.py --start-date 2026-01-01 --end-date 2026-03-31
+python qa_scripts/tools/backend/maintenance/daily_summary_benchmark.py --start-date 2026-01-01 --end-date 2026-12-31 --username manager01 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import statistics
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from sqlalchemy import and_, event, func, select
+
+
+class BenchmarkArgs(NamedTuple):
+    start_date: str
+    end_date: str
+    store_id: int | None
+    username: str
+    repeat: int
+    output: str | None
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    median_seconds: float
+    statements: int
+    rows: int
+
+
+def parse_args() -> BenchmarkArgs:
+    parser = argparse.ArgumentParser(description="日汇总报表实现性能对比")
+    _ = parser.add_argument("--start-date", type=str, required=True, help="开始日期，格式 YYYY-MM-DD")
+    _ = parser.add_argument("--end-date", type=str, required=True, help="结束日期，格式 YYYY-MM-DD")
+    _ = parser.add_argument("--store-id", type=int, default=None, help="门店ID（可选）")
+    _ = parser.add_argument("--username", type=str, default="admin", help="以该用户的数据权限运行（默认 admin）")
+    _ = parser.add_argument("--repeat", type=int, default=3, help="每种实现执行次数，取中位数（默认 3）")
+    _ = parser.add_argument("--output", type=str, default=None, help="输出文件路径（可选）")
+    parsed = parser.parse_args()
+    return BenchmarkArgs(
+        start_date=parsed.start_date,
+        end_date=parsed.end_date,
+        store_id=parsed.store_id,
+        username=parsed.username,
+        repeat=max(1, parsed.repeat),
+        output=parsed.output,
+    )
+
+
+async def legacy_daily_summary(session: Any, filters: Any, user: Any) -> list[dict[str, Any]]:
+    """原三条查询实现（仅用于对比）"""
+    kpi_model = importlib.import_module("app.models.kpi").KpiDailyStore
+    order_model = importlib.import_module("app.models.order").OrderHeader
+    expense_model = importlib.import_module("app.models.expense").ExpenseRecord
+    store_model = importlib.import_module("app.models.store").Store
+    data_scope = importlib.import_module("app.services.data_scope_service")
+
+    query = select(
+        kpi_model.biz_date,
+        kpi_model.store_id,
+        store_model.name.label("store_name"),
+        func.sum(kpi_model.revenue).label("revenue"),
+        func.sum(kpi_model.net_revenue).label("net_revenue"),
+        func.sum(kpi_model.discount_amount).label("discount_amount"),
+        func.sum(kpi_model.refund_amount).label("refund_amount"),
+        func.sum(kpi_model.cost_total).label("cost_total"),
+        func.sum(kpi_model.cost_material).label("cost_material"),
+        func.sum(kpi_model.cost_labor).label("cost_labor"),
+        func.sum(kpi_model.gross_profit).label("gross_profit"),
+        func.sum(kpi_model.operating_profit).label("operating_profit"),
+    ).select_from(kpi_model).join(
+        store_model, kpi_model.store_id == store_model.id
+    ).where(and_(kpi_model.biz_date >= filters.start_date, kpi_model.biz_date <= filters.end_date))
+
+    accessible_store_ids = await data_scope.filter_stores_by_access(session, user, filters.store_id)
+    if accessible_store_ids is not None:
+        query = query.where(kpi_model.store_id.in_(accessible_store_ids))
+    query = query.group_by(kpi_model.biz_date, kpi_model.store_id, store_model.name).order_by(
+        kpi_model.biz_date.desc(), store_model.name
+    )
+    rows = (await session.execute(query)).all()
+
+    expense_query = select(
+        expense_model.biz_date,
+        expense_model.store_id,
+        func.sum(expense_model.amount).label("expense_total"),
+    ).where(
+        and_(expense_model.biz_date >= filters.start_date, expense_model.biz_date <= filters.end_date)
+    ).group_by(expense_model.biz_date, expense_model.store_id)
+    if filters.store_id:
+        expense_query = expense_query.where(expense_model.store_id == filters.store_id)
+    expense_dict = {(r.biz_date, r.store_id): r.expense_total for r in (await session.execute(expense_query)).all()}
+
+    order_query = select(
+        order_model.biz_date,
+        order_model.store_id,
+        func.count(order_model.id).label("order_count"),
+    ).where(
+        and_(
+            order_model.biz_date >= filters.start_date,
+            order_model.biz_date <= filters.end_date,
+            order_model.status != "cancelled",
+        )
+    ).group_by(order_model.biz_date, order_model.store_id)
+    if filters.store_id:
+        order_query = order_query.where(order_model.store_id == filters.store_id)
+    order_dict = {(r.biz_date, r.store_id): r.order_count for r in (await session.execute(order_query)).all()}
+
+    result: list[dict[str, Any]] = []
+    for row in rows:
+        gross_profit_rate = None
+        operating_profit_rate = None
+        if row.revenue and row.revenue > 0:
+            gross_profit_rate = (row.gross_profit / row.revenue * 100).quantize(Decimal("0.01"))
+            operating_profit_rate = (row.operating_profit / row.revenue * 100).quantize(Decimal("0.01"))
+        item = dict(row._mapping)
+        item["expense_total"] = expense_dict.get((row.biz_date, row.store_id), Decimal("0.00"))
+        item["order_count"] = order_dict.get((row.biz_date, row.store_id), 0)
+        item["gross_profit_rate"] = gross_profit_rate
+        item["operating_profit_rate"] = operating_profit_rate
+        result.append(item)
+    return result
+
+
+def _same_rows(legacy: list[dict[str, Any]], single: list[dict[str, Any]]) -> bool:
+    """逐行比对，利润率允许 0.01 的舍入差异（Python 银行家舍入 vs SQL 四舍五入）"""
+    if len(legacy) != len(single):
+        return False
+    for left, right in zip(legacy, single):
+        for key, value in left.items():
+            other = right.get(key)
+            if key.endswith("_rate") and value is not None and other is not None:
+                if abs(Decimal(value) - Decimal(other)) > Decimal("0.01"):
+                    return False
+            elif value != other:
+                return False
+    return True
+
+
+async def run_benchmark(args: BenchmarkArgs) -> Path:
+    now = datetime.now()
+    default_output = Path("logs") / f"daily_summary_benchmark_{now.strftime('%Y%m%d_%H%M%S')}.md"
+    output_path = Path(args.output) if args.output else default_output
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    database_module = importlib.import_module("app.core.database")
+    report_service = importlib.import_module("app.services.report_service")
+    report_schema = importlib.import_module("app.schemas.report")
+    user_model = importlib.import_module("app.models.user").User
+    engine = database_module.engine
+
+    filters = report_schema.ReportQuery(
+        start_date=date.fromisoformat(args.start_date),
+        end_date=date.fromisoformat(args.end_date),
+        store_id=args.store_id,
+    )
+
+    async def run_single(session: Any, query_filters: Any, user: Any) -> list[dict[str, Any]]:
+        rows = await report_service.get_daily_summary(session, query_filters, user)
+        return [row.model_dump() for row in rows]
+
+    implementations = [("legacy", legacy_daily_summary), ("single", run_single)]
+
+    statement_counter = {"count": 0}
+
+    def _count_statement(*_args, **_kwargs) -> None:
+        statement_counter["count"] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _count_statement)
+
+    results: list[BenchmarkResult] = []
+    outputs: dict[str, list[dict[str, Any]]] = {}
+    try:
+        async with database_module.AsyncSessionLocal() as session:
+            user = (
+                await session.execute(select(user_model).where(user_model.username == args.username))
+            ).scalar_one()
+
+            for name, implementation in implementations:
+                timings: list[float] = []
+                statements = 0
+                for _ in range(args.repeat):
+                    statement_counter["count"] = 0
+                    started = time.perf_counter()
+                    outputs[name] = await implementation(session, filters, user)
+                    timings.append(time.perf_counter() - started)
+                    statements = statement_counter["count"]
+                results.append(BenchmarkResult(
+                    name=name,
+                    median_seconds=statistics.median(timings),
+                    statements=statements,
+                    rows=len(outputs[name]),
+                ))
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _count_statement)
+
+    consistent = _same_rows(outputs["legacy"], outputs["single"])
+    report_lines: list[str] = [
+        "# 日汇总报表性能对比报告",
+        "",
+        f"- 生成时间：{now.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- 日期范围：{args.start_date} ~ {args.end_date}",
+        f"- 门店ID：{args.store_id if args.store_id is not None else '全部可访问门店'}",
+        f"- 用户：{args.username}",
+        f"- 每种实现执行次数：{args.repeat}（耗时取中位数）",
+        f"- 结果一致性：{'一致' if consistent else '不一致（请排查）'}",
+        "",
+        "| 实现 | 耗时(秒) | SQL 语句数（含权限查询） | 结果行数 |",
+        "|---|---|---|---|",
+    ]
+    for item in results:
+        report_lines.append(
+            f"| {item.name} | {item.median_seconds:.4f} | {item.statements} | {item.rows} |"
+        )
+
+    legacy, single = results
+    if single.median_seconds > 0:
+        report_lines.extend(["", f"- single 相对 legacy 加速比：{legacy.median_seconds / single.median_seconds:.2f}x"])
+
+    _ = output_path.write_text("\n".join(report_lines), encoding="utf-8")
+    return output_path
+
+
+async def main() -> None:
+    args = parse_args()
+    output_path = await run_benchmark(args)
+    print("✅ 日汇总报表性能对比完成")
+    print(f"📄 报告路径: {output_path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,244 @@
+# pyright: reportAny=false, reportUnknownVariableType=false, reportUnknownMemberType=false, reportUnknownArgumentType=false
+
+"""
+订单导出性能对比脚本（逐格 xlsx vs 流式 xlsx / csv / parquet / arrow）
+
+用途：
+- legacy：原实现，全量读取 ORM 行后用 openpyxl 普通工作簿逐格写入，再整体保存到内存
+- xlsx / csv / parquet / arrow：app.services.export_stream 的流式导出（与 /orders/export 相同的查询）
+- 记录耗时（多次取中位数）、输出字节数、Python 内存峰值（tracemalloc，单独执行一次测量）
+- 生成可留档、可对比的 Markdown 报告
+
+parquet / arrow 需要安装 pyarrow，未安装时跳过。
+各实现均不限制条数，建议先用 generate_bulk_data.py 生成批量数据。
+
+使用方法：
+cd backend
+python qa_scripts/tools/backend/maintenance/export_benchmark.py --start-date 2026-01-01 --end-date 2026-03-31
+python qa_scripts/tools/backend/maintenance/export_benchmark.py --start-date 2026-01-01 --end-date 2026-12-31 --username admin --repeat 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import io
+import statistics
+import time
+import tracemalloc
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from sqlalchemy import and_, select
+
+
+class BenchmarkArgs(NamedTuple):
+    start_date: str
+    end_date: str
+    store_id: int | None
+    username: str
+    repeat: int
+    output: str | None
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    median_seconds: float
+    output_bytes: int
+    peak_memory_mb: float
+
+
+def parse_args() -> BenchmarkArgs:
+    parser = argparse.ArgumentParser(description="订单导出实现性能对比")
+    _ = parser.add_argument("--start-date", type=str, required=True, help="开始日期，格式 YYYY-MM-DD")
+    _ = parser.add_argument("--end-date", type=str, required=True, help="结束日期，格式 YYYY-MM-DD")
+    _ = parser.add_argument("--store-id", type=int, default=None, help="门店ID（可选）")
+    _ = parser.add_argument("--username", type=str, default="admin", help="以该用户的数据权限运行（默认 admin）")
+    _ = parser.add_argument("--repeat", type=int, default=3, help="每种实现执行次数，取中位数（默认 3）")
+    _ = parser.add_argument("--output", type=str, default=None, help="输出文件路径（可选）")
+    parsed = parser.parse_args()
+    return BenchmarkArgs(
+        start_date=parsed.start_date,
+        end_date=parsed.end_date,
+        store_id=parsed.store_id,
+        username=parsed.username,
+        repeat=max(1, parsed.repeat),
+        output=parsed.output,
+    )
+
+
+async def legacy_export(session: Any, user: Any, args: BenchmarkArgs) -> int:
+    """原实现：全量读取后逐格写入普通工作簿（仅用于对比）"""
+    openpyxl = importlib.import_module("openpyxl")
+    order_model = importlib.import_module("app.models.order").OrderHeader
+    store_model = importlib.import_module("app.models.store").Store
+    data_scope = importlib.import_module("app.services.data_scope_service")
+
+    accessible_store_ids = await data_scope.filter_stores_by_access(session, user, args.store_id)
+    conditions = [
+        order_model.biz_date >= date.fromisoformat(args.start_date),
+        order_model.biz_date <= date.fromisoformat(args.end_date),
+    ]
+    if accessible_store_ids is not None:
+        conditions.append(order_model.store_id.in_(accessible_store_ids))
+    query = select(order_model, store_model.name.label("store_name")).join(
+        store_model, order_model.store_id == store_model.id, isouter=True
+    ).where(and_(*conditions)).order_by(order_model.order_time.desc())
+    rows = (await session.execute(query)).all()
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    headers = ["序号", "订单号", "门店", "渠道", "金额", "订单时间", "备注", "状态"]
+    for col, header in enumerate(headers, 1):
+        _ = ws.cell(row=1, column=col, value=header)
+    for idx, row in enumerate(rows, 1):
+        order = row.OrderHeader
+        _ = ws.cell(row=idx + 1, column=1, value=idx)
+        _ = ws.cell(row=idx + 1, column=2, value=order.order_no)
+        _ = ws.cell(row=idx + 1, column=3, value=row.store_name or "未知门店")
+        _ = ws.cell(row=idx + 1, column=4, value=order.channel or "未知")
+        _ = ws.cell(row=idx + 1, column=5, value=float(order.net_amount or 0))
+        _ = ws.cell(
+            row=idx + 1, column=6,
+            value=order.order_time.strftime("%Y-%m-%d %H:%M:%S") if order.order_time else "",
+        )
+        _ = ws.cell(row=idx + 1, column=7, value=order.remark or "")
+        _ = ws.cell(row=idx + 1, column=8, value=order.status or "completed")
+
+    output = io.BytesIO()
+    wb.save(output)
+    session.expunge_all()
+    return len(output.getvalue())
+
+
+def streaming_export(export_format: str) -> Callable[[Any, Any, BenchmarkArgs], Awaitable[int]]:
+    """/orders/export 使用的流式导出（不限条数）"""
+
+    async def _run(session: Any, user: Any, args: BenchmarkArgs) -> int:
+        export_stream = importlib.import_module("app.services.export_stream")
+        order_service = importlib.import_module("app.services.order_service")
+        query = await order_service.build_order_export_query(
+            db=session,
+            current_user=user,
+            store_id=args.store_id,
+            channel=None,
+            order_no=None,
+            start_date=date.fromisoformat(args.start_date),
+            end_date=date.fromisoformat(args.end_date),
+        )
+        if export_format == "xlsx":
+            writer = export_stream.XlsxStreamWriter()
+            _ = await writer.write_query(
+                session, "订单列表", order_service.ORDER_EXPORT_COLUMNS, query, row_number_title="序号"
+            )
+            body = writer.iter_bytes()
+        else:
+            body = export_stream.stream_export(session, query, order_service.ORDER_EXPORT_COLUMNS, export_format)
+
+        total = 0
+        async for chunk in body:
+            total += len(chunk)
+        return total
+
+    return _run
+
+
+def _has_pyarrow() -> bool:
+    try:
+        _ = importlib.import_module("pyarrow")
+    except ImportError:
+        return False
+    return True
+
+
+async def run_benchmark(args: BenchmarkArgs) -> Path:
+    now = datetime.now()
+    default_output = Path("logs") / f"export_benchmark_{now.strftime('%Y%m%d_%H%M%S')}.md"
+    output_path = Path(args.output) if args.output else default_output
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    database_module = importlib.import_module("app.core.database")
+    user_model = importlib.import_module("app.models.user").User
+
+    formats = ["xlsx", "csv"] + (["parquet", "arrow"] if _has_pyarrow() else [])
+    implementations: list[tuple[str, Callable[[Any, Any, BenchmarkArgs], Awaitable[int]]]] = [
+        ("legacy", legacy_export),
+        *[(name, streaming_export(name)) for name in formats],
+    ]
+
+    results: list[BenchmarkResult] = []
+    async with database_module.AsyncSessionLocal() as session:
+        user = (
+            await session.execute(select(user_model).where(user_model.username == args.username))
+        ).scalar_one()
+
+        for name, implementation in implementations:
+            timings: list[float] = []
+            output_bytes = 0
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                output_bytes = await implementation(session, user, args)
+                timings.append(time.perf_counter() - started)
+                await session.rollback()
+
+            # 内存峰值单独测量（tracemalloc 会拖慢执行，不计入耗时）
+            tracemalloc.start()
+            _ = await implementation(session, user, args)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            await session.rollback()
+
+            results.append(BenchmarkResult(
+                name=name,
+                median_seconds=statistics.median(timings),
+                output_bytes=output_bytes,
+                peak_memory_mb=peak / 1024 / 1024,
+            ))
+
+    legacy = results[0]
+    report_lines: list[str] = [
+        "# 订单导出性能对比报告",
+        "",
+        f"- 生成时间：{now.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- 日期范围：{args.start_date} ~ {args.end_date}",
+        f"- 门店ID：{args.store_id if args.store_id is not None else '全部可访问门店'}",
+        f"- 用户：{args.username}",
+        f"- 每种实现执行次数：{args.repeat}（耗时取中位数）",
+        f"- pyarrow：{'已安装' if _has_pyarrow() else '未安装（跳过 parquet / arrow）'}",
+        "",
+        "| 实现 | 耗时(秒) | 相对 legacy 加速比 | 输出大小(KB) | Python 内存峰值(MB) |",
+        "|---|---|---|---|---|",
+    ]
+    for item in results:
+        speedup = f"{legacy.median_seconds / item.median_seconds:.2f}x" if item.median_seconds > 0 else "-"
+        report_lines.append(
+            f"| {item.name} | {item.median_seconds:.4f} | {speedup} "
+            f"| {item.output_bytes / 1024:,.1f} | {item.peak_memory_mb:.1f} |"
+        )
+
+    report_lines.extend(
+        [
+            "",
+            "## 说明",
+            "",
+            "- legacy 内存峰值随行数线性增长；流式实现的峰值只取决于批大小，应基本不随行数变化。",
+            "- csv 由数据库 COPY 直接输出，Python 侧不逐格处理，通常最快。",
+            "- xlsx 压缩在线程中执行，耗时包含生成整个 zip 的时间。",
+        ]
+    )
+
+    _ = output_path.write_text("\n".join(report_lines), encoding="utf-8")
+    return output_path
+
+
+async def main() -> None:
+    args = parse_args()
+    output_path = await run_benchmark(args)
+    print("✅ 订单导出性能对比完成")
+    print(f"📄 报告路径: {output_path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+# pyright: reportAny=false, reportUnknownVariableType=false, reportUnknownMemberType=false, reportUnknownArgumentType=false
+
+"""
+KPI 一致性校验脚本（按 门店 × 月 校验和检测漂移）
+
+用途：
+- 按 (门店, 月) 比对源数据（订单、费用）与 kpi_daily_store 的校验和
+- 只对不一致的 (门店, 月) 逐日定位差异单元
+- 可选将差异单元登记为脏单元（--enqueue），由增量刷新（POST /kpi/refresh）重算
+- 生成可留档、可对比的 Markdown 报告
+
+使用方法：
+cd backend
+python qa_scripts/tools/backend/maintenance/kpi_consistency_check.py --start-date 2026-01-01 --end-date 2026-12-31
+python qa_scripts/tools/backend/maintenance/kpi_consistency_check.py --start-date 2026-01-01 --end-date 2026-12-31 --store-id 1 --enqueue
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import NamedTuple
+
+
+class CheckArgs(NamedTuple):
+    start_date: str
+    end_date: str
+    store_id: int | None
+    drill_down: bool
+    enqueue: bool
+    output: str | None
+
+
+def parse_args() -> CheckArgs:
+    parser = argparse.ArgumentParser(description="KPI 一致性校验")
+    _ = parser.add_argument("--start-date", type=str, required=True, help="开始日期，格式 YYYY-MM-DD")
+    _ = parser.add_argument("--end-date", type=str, required=True, help="结束日期，格式 YYYY-MM-DD")
+    _ = parser.add_argument("--store-id", type=int, default=None, help="门店ID（可选）")
+    _ = parser.add_argument("--no-drill-down", action="store_true", help="只比对月度校验和，不逐日定位")
+    _ = parser.add_argument("--enqueue", action="store_true", help="将差异单元登记为脏单元，等待增量刷新")
+    _ = parser.add_argument("--output", type=str, default=None, help="输出文件路径（可选）")
+    parsed = parser.parse_args()
+    return CheckArgs(
+        start_date=parsed.start_date,
+        end_date=parsed.end_date,
+        store_id=parsed.store_id,
+        drill_down=not parsed.no_drill_down,
+        enqueue=bool(parsed.enqueue),
+        output=parsed.output,
+    )
+
+
+async def run_check(args: CheckArgs) -> tuple[Path, int]:
+    now = datetime.now()
+    default_output = Path("logs") / f"kpi_consistency_{now.strftime('%Y%m%d_%H%M%S')}.md"
+    output_path = Path(args.output) if args.output else default_output
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    database_module = importlib.import_module("app.core.database")
+    consistency_module = importlib.import_module("app.services.kpi_consistency_service")
+
+    async with database_module.AsyncSessionLocal() as session:
+        started = time.perf_counter()
+        result = await consistency_module.check_kpi_consistency(
+            session,
+            date.fromisoformat(args.start_date),
+            date.fromisoformat(args.end_date),
+            store_ids=[args.store_id] if args.store_id else None,
+            drill_down=args.drill_down or args.enqueue,
+            enqueue=args.enqueue,
+        )
+        if args.enqueue:
+            await session.commit()
+        elapsed = time.perf_counter() - started
+
+    buckets = result["mismatched_buckets"]
+    cells = result["mismatched_cells"]
+    report_lines: list[str] = [
+        "# KPI 一致性校验报告",
+        "",
+        f"- 生成时间：{now.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- 日期范围：{args.start_date} ~ {args.end_date}",
+        f"- 门店ID：{args.store_id if args.store_id is not None else '全部门店'}",
+        f"- 耗时：{elapsed:.3f} 秒",
+        f"- 校验 (门店, 月)：{result['checked_buckets']}",
+        f"- 不一致 (门店, 月)：{len(buckets)}",
+        f"- 差异单元：{result['mismatched_cell_count']}",
+        f"- 已登记脏单元：{result['queued_cells']}",
+    ]
+
+    if buckets:
+        report_lines.extend([
+            "",
+            "## 不一致的 (门店, 月)",
+            "",
+            "| 门店ID | 月份 | 源数据校验和 | KPI 校验和 | 差异指标 |",
+            "|---|---|---|---|---|",
+        ])
+        for bucket in buckets:
+            report_lines.append(
+                f"| {bucket['store_id']} | {bucket['month']} | {bucket['source_checksum'][:12]} "
+                f"| {bucket['kpi_checksum'][:12]} | {', '.join(bucket['diffs'])} |"
+            )
+
+    if cells:
+        report_lines.extend([
+            "",
+            "## 差异单元",
+            "",
+            "| 门店ID | 日期 | 缺失 KPI 行 | 指标 | 源数据 | KPI |",
+            "|---|---|---|---|---|---|",
+        ])
+        for cell in cells:
+            for measure, diff in cell["diffs"].items():
+                report_lines.append(
+                    f"| {cell['store_id']} | {cell['biz_date']} | {'是' if cell['missing'] else '否'} "
+                    f"| {measure} | {diff['expected']} | {diff['actual']} |"
+                )
+
+    _ = output_path.write_text("\n".join(report_lines), encoding="utf-8")
+    return output_path, len(buckets)
+
+
+async def main() -> int:
+    args = parse_args()
+    output_path, mismatched = await run_check(args)
+    if mismatched:
+        print(f"⚠️  发现 {mismatched} 个不一致的 (门店, 月)")
+    else:
+        print("✅ KPI 与源数据一致")
+    print(f"📄 报告路径: {output_path}")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
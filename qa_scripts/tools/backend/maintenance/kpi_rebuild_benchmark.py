@@ -0,0 +1,221 @@
+# pyright: reportAny=false, reportUnknownVariableType=false, reportUnknownMemberType=false, reportUnknownArgumentType=false
+
+"""
+KPI 重建性能对比脚本（per_cell vs bulk vs parallel）
+
+用途：
+- 在同一日期范围内分别以 per_cell（逐门店逐日）与 bulk（集合式批量 upsert）模式重建 KPI
+- 以不同并发数运行 parallel 模式，观察耗时随并发会话数的变化
+- 记录耗时、SQL 语句数、写入行数
+- 校验两种模式写入结果一致
+- 生成可留档、可对比的 Markdown 报告
+
+使用方法：
+cd backend
+python qa_scripts/tools/backend/maintenance/kpi_rebuild_benchmark.py --start-date 2026-01-01 --end-date 2026-01-31
+python qa_scripts/tools/backend/maintenance/kpi_rebuild_benchmark.py --start-date 2026-01-01 --end-date 2026-12-31 --modes bulk --concurrency 1,2,4,8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import NamedTuple
+
+from sqlalchemy import event, select
+
+
+class BenchmarkArgs(NamedTuple):
+    start_date: str
+    end_date: str
+    store_id: int | None
+    modes: list[str]
+    concurrency: list[int]
+    output: str | None
+
+
+class BenchmarkResult(NamedTuple):
+    mode: str
+    concurrency: int | None
+    seconds: float
+    statements: int
+    affected_dates: int
+    affected_stores: int
+    total_records: int
+
+
+def parse_args() -> BenchmarkArgs:
+    parser = argparse.ArgumentParser(description="KPI 重建模式性能对比")
+    _ = parser.add_argument("--start-date", type=str, required=True, help="开始日期，格式 YYYY-MM-DD")
+    _ = parser.add_argument("--end-date", type=str, required=True, help="结束日期，格式 YYYY-MM-DD")
+    _ = parser.add_argument("--store-id", type=int, default=None, help="门店ID（可选）")
+    _ = parser.add_argument(
+        "--modes",
+        type=str,
+        default="per_cell,bulk",
+        help="参与对比的模式，逗号分隔（默认 per_cell,bulk）",
+    )
+    _ = parser.add_argument(
+        "--concurrency",
+        type=str,
+        default="",
+        help="parallel 模式的并发数列表，逗号分隔（如 1,2,4,8；为空则不运行 parallel）",
+    )
+    _ = parser.add_argument("--output", type=str, default=None, help="输出文件路径（可选）")
+    parsed = parser.parse_args()
+    return BenchmarkArgs(
+        start_date=parsed.start_date,
+        end_date=parsed.end_date,
+        store_id=parsed.store_id,
+        modes=[m.strip() for m in str(parsed.modes).split(",") if m.strip()],
+        concurrency=[int(c) for c in str(parsed.concurrency).split(",") if c.strip()],
+        output=parsed.output,
+    )
+
+
+async def _snapshot_kpi(session, kpi_model, start: date, end: date, store_id: int | None) -> dict:
+    """读取 KPI 结果快照，用于校验不同模式结果一致"""
+    query = select(kpi_model).where(kpi_model.biz_date >= start, kpi_model.biz_date <= end)
+    if store_id:
+        query = query.where(kpi_model.store_id == store_id)
+    result = await session.execute(query)
+    return {
+        (row.store_id, row.biz_date): (
+            row.revenue,
+            row.refund_amount,
+            row.net_revenue,
+            row.cost_total,
+            row.operating_profit,
+            row.order_count,
+        )
+        for row in result.scalars().all()
+    }
+
+
+async def run_benchmark(args: BenchmarkArgs) -> Path:
+    now = datetime.now()
+    default_output = Path("logs") / f"kpi_rebuild_benchmark_{now.strftime('%Y%m%d_%H%M%S')}.md"
+    output_path = Path(args.output) if args.output else default_output
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    start = date.fromisoformat(args.start_date)
+    end = date.fromisoformat(args.end_date)
+
+    database_module = importlib.import_module("app.core.database")
+    calculator_module = importlib.import_module("app.services.kpi_calculator")
+    kpi_module = importlib.import_module("app.models.kpi")
+    engine = database_module.engine
+    async_session_local = database_module.AsyncSessionLocal
+
+    statement_counter = {"count": 0}
+
+    def _count_statement(*_args, **_kwargs) -> None:
+        statement_counter["count"] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _count_statement)
+
+    runs: list[tuple[str, int | None]] = [(mode, None) for mode in args.modes]
+    runs.extend(("parallel", n) for n in args.concurrency)
+
+    results: list[BenchmarkResult] = []
+    snapshots: dict[str, dict] = {}
+    try:
+        for mode, concurrency in runs:
+            label = mode if concurrency is None else f"{mode}({concurrency})"
+            async with async_session_local() as session:
+                calculator = calculator_module.KpiCalculator(session)
+                statement_counter["count"] = 0
+                started = time.perf_counter()
+                affected_dates, affected_stores, total_records = await calculator.rebuild_daily_kpi(
+                    start_date=start,
+                    end_date=end,
+                    store_id=args.store_id,
+                    mode=mode,
+                    concurrency=concurrency,
+                )
+                elapsed = time.perf_counter() - started
+                statements = statement_counter["count"]
+
+                snapshots[label] = await _snapshot_kpi(
+                    session, kpi_module.KpiDailyStore, start, end, args.store_id
+                )
+
+            results.append(
+                BenchmarkResult(
+                    mode=label,
+                    concurrency=concurrency,
+                    seconds=elapsed,
+                    statements=statements,
+                    affected_dates=affected_dates,
+                    affected_stores=affected_stores,
+                    total_records=total_records,
+                )
+            )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _count_statement)
+
+    snapshot_values = list(snapshots.values())
+    consistent = all(s == snapshot_values[0] for s in snapshot_values[1:]) if snapshot_values else True
+
+    report_lines: list[str] = [
+        "# KPI 重建性能对比报告",
+        "",
+        f"- 生成时间：{now.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- 日期范围：{args.start_date} ~ {args.end_date}",
+        f"- 门店ID：{args.store_id if args.store_id is not None else '全部启用门店'}",
+        f"- 结果一致性：{'一致' if consistent else '不一致（请排查）'}",
+        "",
+        "| 模式 | 耗时(秒) | SQL 语句数 | 日期数 | 门店数 | 写入行数 | 行/秒 |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for item in results:
+        throughput = item.total_records / item.seconds if item.seconds > 0 else 0
+        report_lines.append(
+            f"| {item.mode} | {item.seconds:.3f} | {item.statements} | {item.affected_dates} "
+            f"| {item.affected_stores} | {item.total_records} | {throughput:.1f} |"
+        )
+
+    baseline = next((r for r in results if r.mode == "per_cell"), None)
+    if baseline:
+        report_lines.extend(["", "## 相对 per_cell 加速比", ""])
+        for item in results:
+            if item.mode == baseline.mode or item.seconds <= 0:
+                continue
+            report_lines.append(f"- {item.mode}: {baseline.seconds / item.seconds:.1f}x")
+
+    parallel_results = [r for r in results if r.concurrency is not None]
+    if parallel_results:
+        single = min(parallel_results, key=lambda r: r.concurrency or 0)
+        report_lines.extend(
+            [
+                "",
+                "## parallel 并发扩展性",
+                "",
+                "| 并发会话数 | 耗时(秒) | 相对最小并发加速比 | 并行效率 |",
+                "|---|---|---|---|",
+            ]
+        )
+        for item in sorted(parallel_results, key=lambda r: r.concurrency or 0):
+            speedup = single.seconds / item.seconds if item.seconds > 0 else 0
+            scale = (item.concurrency or 1) / (single.concurrency or 1)
+            report_lines.append(
+                f"| {item.concurrency} | {item.seconds:.3f} | {speedup:.2f}x | {speedup / scale:.0%} |"
+            )
+
+    _ = output_path.write_text("\n".join(report_lines), encoding="utf-8")
+    return output_path
+
+
+async def main() -> None:
+    args = parse_args()
+    output_path = await run_benchmark(args)
+    print("✅ KPI 重建性能对比完成")
+    print(f"📄 报告路径: {output_path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
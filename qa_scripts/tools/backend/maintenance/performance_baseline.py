@@ -44,12 +44,12 @@ CORE_QUERIES: list[QuerySpec] = [
         sql="""
 EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT)
 SELECT oh.id, oh.order_no, oh.store_id, oh.channel, oh.net_amount, oh.order_time, oh.remark, oh.status
-FROM order_headers oh
-LEFT JOIN stores s ON oh.store_id = s.id
+FROM order_header oh
+LEFT JOIN store s ON oh.store_id = s.id
 WHERE (:store_id::int IS NULL OR oh.store_id = :store_id)
   AND (:channel::text IS NULL OR oh.channel = :channel)
-  AND (:start_date::date IS NULL OR DATE(oh.order_time) >= :start_date)
-  AND (:end_date::date IS NULL OR DATE(oh.order_time) <= :end_date)
+  AND (:start_date::date IS NULL OR oh.biz_date >= :start_date)
+  AND (:end_date::date IS NULL OR oh.biz_date <= :end_date)
 ORDER BY oh.order_time DESC
 LIMIT 100;
 """,
@@ -59,9 +59,9 @@ LIMIT 100;
         sql="""
 EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT)
 SELECT er.id, er.store_id, er.expense_type_id, er.biz_date, er.amount, er.remark
-FROM expense_records er
-LEFT JOIN stores s ON er.store_id = s.id
-LEFT JOIN expense_types et ON er.expense_type_id = et.id
+FROM expense_record er
+LEFT JOIN store s ON er.store_id = s.id
+LEFT JOIN expense_type et ON er.expense_type_id = et.id
 WHERE (:store_id::int IS NULL OR er.store_id = :store_id)
   AND (:expense_type_id::int IS NULL OR er.expense_type_id = :expense_type_id)
   AND (:start_date::date IS NULL OR er.biz_date >= :start_date)
@@ -78,7 +78,7 @@ SELECT kds.store_id,
        SUM(kds.revenue) AS total_revenue,
        SUM(kds.order_count) AS total_orders,
        AVG(kds.avg_order_value) AS avg_order_value
-FROM kpi_daily_stores kds
+FROM kpi_daily_store kds
 WHERE (:store_id::int IS NULL OR kds.store_id = :store_id)
   AND (:start_date::date IS NULL OR kds.biz_date >= :start_date)
   AND (:end_date::date IS NULL OR kds.biz_date <= :end_date)
@@ -91,7 +91,7 @@ ORDER BY total_revenue DESC;
 INDEX_AUDIT_SQL = """
 SELECT schemaname, tablename, indexname, indexdef
 FROM pg_indexes
-WHERE tablename IN ('order_headers', 'expense_records', 'kpi_daily_stores', 'user_store_permissions')
+WHERE tablename IN ('order_header', 'order_item', 'expense_record', 'kpi_daily_store', 'user_store_permissions')
 ORDER BY tablename, indexname;
 """
 
@@ -175,9 +175,8 @@ async def collect_baseline(args: BaselineArgs) -> Path:
         )
         for row in index_rows:
             schemaname, tablename, indexname, indexdef = row
-            report_lines.append(
-                f"| {schemaname} | {tablename} | {indexname} | {str(indexdef).replace('|', '\\|')} |"
-            )
+            escaped_indexdef = str(indexdef).replace("|", "\\|")
+            report_lines.append(f"| {schemaname} | {tablename} | {indexname} | {escaped_indexdef} |")
 
     report_lines.extend(
         [